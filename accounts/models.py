@@ -64,221 +64,6 @@ class UserManager(BaseUserManager):
     def par_bureau(self, bureau_vote):
         """Retourne le superviseur d'un bureau"""
         return self.filter(bureau_vote=bureau_vote, role='SUPERVISEUR', is_active=True).first()
-    # À ajouter dans la classe User, après les propriétés existantes
-
-# ========== MÉTHODES D'ACCÈS ET PERMISSIONS ==========
-
-    def a_acces_complet(self):
-        """Le back office a un accès complet à tout"""
-        return self.role == 'BACK_OFFICE' and self.is_active
-
-    def peut_voir_region(self, region):
-        """Vérifie si l'utilisateur peut voir une région"""
-        if self.role == 'BACK_OFFICE':
-            return True
-        return self.region == region if self.region else False
-
-    def peut_voir_departement(self, departement):
-        """Vérifie si l'utilisateur peut voir un département"""
-        if self.role == 'BACK_OFFICE':
-            return True
-        if self.departement:
-            return self.departement == departement
-        if self.region:
-            return departement.region == self.region
-        return False
-
-    def peut_voir_commune(self, commune):
-        """Vérifie si l'utilisateur peut voir une commune"""
-        if self.role == 'BACK_OFFICE':
-            return True
-        if self.commune:
-            return self.commune == commune
-        if self.departement:
-            return commune.departement == self.departement
-        if self.region:
-            return commune.departement.region == self.region
-        return False
-
-    def peut_voir_bureau(self, bureau_vote):
-        """Vérifie si l'utilisateur peut voir un bureau de vote"""
-        if self.role == 'BACK_OFFICE':
-            return True
-        if self.role == 'SUPERVISEUR':
-            return self.bureau_vote == bureau_vote
-        if self.lieu_vote:
-            return bureau_vote.lieu_vote == self.lieu_vote
-        if self.sous_prefecture:
-            return bureau_vote.lieu_vote.sous_prefecture == self.sous_prefecture
-        if self.commune:
-            return bureau_vote.lieu_vote.sous_prefecture.commune == self.commune
-        if self.region:
-            return bureau_vote.lieu_vote.sous_prefecture.commune.departement.region == self.region
-        return False
-
-    def get_incidents_accessibles(self):
-        """Retourne les incidents accessibles selon le rôle"""
-        from incidents.models import Incident  # Import local pour éviter les imports circulaires
-        
-        if self.role == 'BACK_OFFICE':
-            # Accès complet à tous les incidents
-            return Incident.objects.all()
-        
-        elif self.role == 'SUPER_ADMIN':
-            if self.region:
-                return Incident.objects.filter(
-                    bureau_vote__lieu_vote__sous_prefecture__commune__departement__region=self.region
-                )
-            return Incident.objects.none()
-        
-        elif self.role == 'ADMIN':
-            if self.lieu_vote:
-                return Incident.objects.filter(bureau_vote__lieu_vote=self.lieu_vote)
-            elif self.sous_prefecture:
-                return Incident.objects.filter(bureau_vote__lieu_vote__sous_prefecture=self.sous_prefecture)
-            elif self.commune:
-                return Incident.objects.filter(bureau_vote__lieu_vote__sous_prefecture__commune=self.commune)
-            elif self.departement:
-                return Incident.objects.filter(bureau_vote__lieu_vote__sous_prefecture__commune__departement=self.departement)
-            elif self.region:
-                return Incident.objects.filter(bureau_vote__lieu_vote__sous_prefecture__commune__departement__region=self.region)
-            return Incident.objects.none()
-        
-        elif self.role == 'SUPERVISEUR':
-            if self.bureau_vote:
-                return Incident.objects.filter(bureau_vote=self.bureau_vote)
-            return Incident.objects.none()
-        
-        return Incident.objects.none()
-
-    def get_pv_accessibles(self):
-        """Retourne les PV accessibles selon le rôle"""
-        from pv.models import PV  # Import local
-        
-        if self.role == 'BACK_OFFICE':
-            return PV.objects.all()
-        
-        elif self.role == 'SUPER_ADMIN':
-            if self.region:
-                return PV.objects.filter(
-                    bureau_vote__lieu_vote__sous_prefecture__commune__departement__region=self.region
-                )
-            return PV.objects.none()
-        
-        elif self.role == 'ADMIN':
-            if self.lieu_vote:
-                return PV.objects.filter(bureau_vote__lieu_vote=self.lieu_vote)
-            elif self.sous_prefecture:
-                return PV.objects.filter(bureau_vote__lieu_vote__sous_prefecture=self.sous_prefecture)
-            elif self.commune:
-                return PV.objects.filter(bureau_vote__lieu_vote__sous_prefecture__commune=self.commune)
-            elif self.departement:
-                return PV.objects.filter(bureau_vote__lieu_vote__sous_prefecture__commune__departement=self.departement)
-            elif self.region:
-                return PV.objects.filter(bureau_vote__lieu_vote__sous_prefecture__commune__departement__region=self.region)
-            return PV.objects.none()
-        
-        elif self.role == 'SUPERVISEUR':
-            return PV.objects.filter(superviseur=self)
-        
-        return PV.objects.none()
-
-    def get_users_accessibles(self):
-        """Retourne les utilisateurs accessibles selon le rôle"""
-        if self.role == 'BACK_OFFICE':
-            return User.objects.all()
-        
-        elif self.role == 'SUPER_ADMIN':
-            if self.region:
-                return User.objects.filter(region=self.region)
-            return User.objects.none()
-        
-        elif self.role == 'ADMIN':
-            if self.lieu_vote:
-                return User.objects.filter(lieu_vote=self.lieu_vote)
-            elif self.sous_prefecture:
-                return User.objects.filter(sous_prefecture=self.sous_prefecture)
-            elif self.commune:
-                return User.objects.filter(commune=self.commune)
-            elif self.departement:
-                return User.objects.filter(departement=self.departement)
-            elif self.region:
-                return User.objects.filter(region=self.region)
-            return User.objects.none()
-        
-        return User.objects.filter(pk=self.pk)
-
-    def get_bureaux_vote_accessibles(self):
-        """Retourne les bureaux de vote accessibles selon le rôle"""
-        from geography.models import BureauVote  # Import local
-        
-        if self.role == 'BACK_OFFICE':
-            return BureauVote.objects.all()
-        
-        elif self.role == 'SUPER_ADMIN':
-            if self.region:
-                return BureauVote.objects.filter(
-                    lieu_vote__sous_prefecture__commune__departement__region=self.region
-                )
-            return BureauVote.objects.none()
-        
-        elif self.role == 'ADMIN':
-            if self.lieu_vote:
-                return BureauVote.objects.filter(lieu_vote=self.lieu_vote)
-            elif self.sous_prefecture:
-                return BureauVote.objects.filter(lieu_vote__sous_prefecture=self.sous_prefecture)
-            elif self.commune:
-                return BureauVote.objects.filter(lieu_vote__sous_prefecture__commune=self.commune)
-            elif self.departement:
-                return BureauVote.objects.filter(lieu_vote__sous_prefecture__commune__departement=self.departement)
-            elif self.region:
-                return BureauVote.objects.filter(lieu_vote__sous_prefecture__commune__departement__region=self.region)
-            return BureauVote.objects.none()
-        
-        elif self.role == 'SUPERVISEUR':
-            if self.bureau_vote:
-                return BureauVote.objects.filter(pk=self.bureau_vote.pk)
-            return BureauVote.objects.none()
-        
-        return BureauVote.objects.none()
-
-    def peut_creer_utilisateur(self):
-        """Vérifie si l'utilisateur peut créer d'autres utilisateurs"""
-        return self.role in ['BACK_OFFICE', 'SUPER_ADMIN', 'ADMIN']
-
-    def peut_modifier_utilisateur(self, user):
-        """Vérifie si l'utilisateur peut modifier un autre utilisateur"""
-        if self.role == 'BACK_OFFICE':
-            return True
-        if self.role == 'SUPER_ADMIN':
-            return user.region == self.region
-        if self.role == 'ADMIN':
-            return user.region == self.region
-        return False
-
-    def peut_supprimer_utilisateur(self, user):
-        """Vérifie si l'utilisateur peut supprimer un autre utilisateur"""
-        if self.role == 'BACK_OFFICE':
-            return True
-        if self.role == 'SUPER_ADMIN':
-            return user.region == self.region and user.role not in ['BACK_OFFICE', 'SUPER_ADMIN']
-        return False
-
-    def peut_valider_pv(self):
-        """Vérifie si l'utilisateur peut valider des PV"""
-        return self.role in ['BACK_OFFICE', 'SUPER_ADMIN', 'ADMIN']
-
-    def peut_exporter_rapports(self):
-        """Vérifie si l'utilisateur peut exporter des rapports"""
-        return self.role in ['BACK_OFFICE', 'SUPER_ADMIN', 'ADMIN']
-
-    def peut_voir_statistiques_globales(self):
-        """Vérifie si l'utilisateur peut voir les statistiques globales"""
-        return self.role in ['BACK_OFFICE', 'SUPER_ADMIN']
-
-    def peut_gerer_parametres_systeme(self):
-        """Vérifie si l'utilisateur peut gérer les paramètres système"""
-        return self.role == 'BACK_OFFICE'
 
 
 # ============================================================
@@ -476,11 +261,11 @@ class User(AbstractUser):
             
             # Auto-remplissage de la hiérarchie depuis le bureau
             if self.bureau_vote:
-                self.lieu_vote = self.bureau_vote.lieu_vote
-                self.sous_prefecture = self.bureau_vote.lieu_vote.sous_prefecture
-                self.commune = self.bureau_vote.lieu_vote.sous_prefecture.commune
-                self.departement = self.bureau_vote.lieu_vote.sous_prefecture.commune.departement
-                self.region = self.bureau_vote.lieu_vote.sous_prefecture.commune.departement.region
+                self.lieu_vote_id = self.bureau_vote.lieu_vote_id
+                self.sous_prefecture_id = self.bureau_vote.sous_prefecture_id
+                self.commune_id = self.bureau_vote.commune_id
+                self.departement_id = self.bureau_vote.departement_id
+                self.region_id = self.bureau_vote.region_id
     
     # ========== PROPRIÉTÉS ==========
     
@@ -573,6 +358,198 @@ class User(AbstractUser):
             'taux_validation': round((valides / total * 100), 2),
             'taux_rejet': round((rejetes / total * 100), 2),
         }
+    
+    # ========== MÉTHODES D'ACCÈS ET PERMISSIONS ==========
+
+    def a_acces_complet(self):
+        """Le back office a un accès complet à tout"""
+        return self.role == 'BACK_OFFICE' and self.is_active
+
+    @property
+    def noeud_perimetre(self):
+        """Noeud géographique le plus précis de l'affectation (None si aucun)"""
+        if self.role == 'SUPERVISEUR':
+            return self.bureau_vote
+        if self.role == 'SUPER_ADMIN':
+            return self.region
+        return self.lieu_vote or self.sous_prefecture or self.commune or self.departement or self.region
+
+    def peut_voir_noeud(self, noeud):
+        """
+        Vérifie si l'utilisateur peut voir un noeud géographique : le noeud est
+        dans son périmètre, ou en est un ancêtre (comparaison de chemins, sans requête)
+        """
+        if self.role == 'BACK_OFFICE':
+            return True
+        perimetre = self.noeud_perimetre
+        if perimetre is None:
+            return False
+        return noeud.est_sous(perimetre) or perimetre.est_sous(noeud)
+
+    def peut_voir_region(self, region):
+        """Vérifie si l'utilisateur peut voir une région"""
+        return self.peut_voir_noeud(region)
+
+    def peut_voir_departement(self, departement):
+        """Vérifie si l'utilisateur peut voir un département"""
+        return self.peut_voir_noeud(departement)
+
+    def peut_voir_commune(self, commune):
+        """Vérifie si l'utilisateur peut voir une commune"""
+        return self.peut_voir_noeud(commune)
+
+    def peut_voir_bureau(self, bureau_vote):
+        """Vérifie si l'utilisateur peut voir un bureau de vote"""
+        if self.role == 'BACK_OFFICE':
+            return True
+        perimetre = self.noeud_perimetre
+        return perimetre is not None and bureau_vote.est_sous(perimetre)
+
+    def get_incidents_accessibles(self):
+        """Retourne les incidents accessibles selon le rôle"""
+        from incidents.models import Incident  # Import local pour éviter les imports circulaires
+        
+        if self.role == 'BACK_OFFICE':
+            # Accès complet à tous les incidents
+            return Incident.objects.all()
+        
+        elif self.role == 'SUPER_ADMIN':
+            if self.region:
+                return Incident.objects.filter(
+                    region=self.region
+                )
+            return Incident.objects.none()
+        
+        elif self.role == 'ADMIN':
+            if self.lieu_vote:
+                return Incident.objects.filter(bureau_vote__lieu_vote=self.lieu_vote)
+            elif self.sous_prefecture:
+                return Incident.objects.filter(sous_prefecture=self.sous_prefecture)
+            elif self.commune:
+                return Incident.objects.filter(commune=self.commune)
+            elif self.departement:
+                return Incident.objects.filter(departement=self.departement)
+            elif self.region:
+                return Incident.objects.filter(region=self.region)
+            return Incident.objects.none()
+        
+        elif self.role == 'SUPERVISEUR':
+            if self.bureau_vote:
+                return Incident.objects.filter(bureau_vote=self.bureau_vote)
+            return Incident.objects.none()
+        
+        return Incident.objects.none()
+
+    def get_pv_accessibles(self):
+        """Retourne les PV accessibles selon le rôle"""
+        from pv.models import ProcesVerbal as PV  # Import local
+        
+        if self.role == 'BACK_OFFICE':
+            return PV.objects.all()
+        
+        elif self.role == 'SUPER_ADMIN':
+            if self.region:
+                return PV.objects.filter(
+                    region=self.region
+                )
+            return PV.objects.none()
+        
+        elif self.role == 'ADMIN':
+            if self.lieu_vote:
+                return PV.objects.filter(bureau_vote__lieu_vote=self.lieu_vote)
+            elif self.sous_prefecture:
+                return PV.objects.filter(sous_prefecture=self.sous_prefecture)
+            elif self.commune:
+                return PV.objects.filter(commune=self.commune)
+            elif self.departement:
+                return PV.objects.filter(departement=self.departement)
+            elif self.region:
+                return PV.objects.filter(region=self.region)
+            return PV.objects.none()
+        
+        elif self.role == 'SUPERVISEUR':
+            return PV.objects.filter(superviseur=self)
+        
+        return PV.objects.none()
+
+    def get_users_accessibles(self):
+        """Retourne les utilisateurs accessibles selon le rôle"""
+        if self.role == 'BACK_OFFICE':
+            return User.objects.all()
+        
+        elif self.role == 'SUPER_ADMIN':
+            if self.region:
+                return User.objects.filter(region=self.region)
+            return User.objects.none()
+        
+        elif self.role == 'ADMIN':
+            if self.lieu_vote:
+                return User.objects.filter(lieu_vote=self.lieu_vote)
+            elif self.sous_prefecture:
+                return User.objects.filter(sous_prefecture=self.sous_prefecture)
+            elif self.commune:
+                return User.objects.filter(commune=self.commune)
+            elif self.departement:
+                return User.objects.filter(departement=self.departement)
+            elif self.region:
+                return User.objects.filter(region=self.region)
+            return User.objects.none()
+        
+        return User.objects.filter(pk=self.pk)
+
+    def get_bureaux_vote_accessibles(self):
+        """Retourne les bureaux de vote accessibles selon le rôle"""
+        from geography.models import BureauVote  # Import local
+        
+        if self.role == 'BACK_OFFICE':
+            return BureauVote.objects.all()
+        
+        perimetre = self.noeud_perimetre
+        if perimetre is None:
+            return BureauVote.objects.none()
+        
+        # Un seul préfixe indexé, quel que soit le niveau d'affectation
+        return BureauVote.objects.sous(perimetre)
+
+    get_bureaux_accessibles = get_bureaux_vote_accessibles
+
+    def peut_creer_utilisateur(self):
+        """Vérifie si l'utilisateur peut créer d'autres utilisateurs"""
+        return self.role in ['BACK_OFFICE', 'SUPER_ADMIN', 'ADMIN']
+
+    def peut_modifier_utilisateur(self, user):
+        """Vérifie si l'utilisateur peut modifier un autre utilisateur"""
+        if self.role == 'BACK_OFFICE':
+            return True
+        if self.role == 'SUPER_ADMIN':
+            return user.region == self.region
+        if self.role == 'ADMIN':
+            return user.region == self.region
+        return False
+
+    def peut_supprimer_utilisateur(self, user):
+        """Vérifie si l'utilisateur peut supprimer un autre utilisateur"""
+        if self.role == 'BACK_OFFICE':
+            return True
+        if self.role == 'SUPER_ADMIN':
+            return user.region == self.region and user.role not in ['BACK_OFFICE', 'SUPER_ADMIN']
+        return False
+
+    def peut_valider_pv(self):
+        """Vérifie si l'utilisateur peut valider des PV"""
+        return self.role in ['BACK_OFFICE', 'SUPER_ADMIN', 'ADMIN']
+
+    def peut_exporter_rapports(self):
+        """Vérifie si l'utilisateur peut exporter des rapports"""
+        return self.role in ['BACK_OFFICE', 'SUPER_ADMIN', 'ADMIN']
+
+    def peut_voir_statistiques_globales(self):
+        """Vérifie si l'utilisateur peut voir les statistiques globales"""
+        return self.role in ['BACK_OFFICE', 'SUPER_ADMIN']
+
+    def peut_gerer_parametres_systeme(self):
+        """Vérifie si l'utilisateur peut gérer les paramètres système"""
+        return self.role == 'BACK_OFFICE'
 
 
 # ============================================================
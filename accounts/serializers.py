@@ -0,0 +1,15 @@
+# accounts/serializers.py
+from rest_framework import serializers
+from accounts.models import CheckIn
+
+
+class CheckInSerializer(serializers.ModelSerializer):
+    """Check-in saisi par l'application mobile"""
+    
+    class Meta:
+        model = CheckIn
+        fields = [
+            'id', 'nom_saisi', 'latitude', 'longitude', 'precision_gps',
+            'device_info', 'checkin_time', 'is_active'
+        ]
+        read_only_fields = ['id', 'checkin_time', 'is_active']
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OperationSynchronisation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("cle", models.CharField(max_length=64, unique=True)),
+                (
+                    "type_operation",
+                    models.CharField(
+                        choices=[
+                            ("CHECKIN", "Check-in"),
+                            ("PV", "Soumission de PV"),
+                            ("RESULTATS", "Résultats"),
+                            ("INCIDENT", "Incident"),
+                            ("MESSAGE", "Message d'incident"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("objet_id", models.CharField(max_length=64)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "superviseur",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="operations_synchronisees",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Opération synchronisée",
+                "verbose_name_plural": "Opérations synchronisées",
+                "db_table": "operations_synchronisation",
+                "ordering": ["-created_at"],
+            },
+        ),
+    ]
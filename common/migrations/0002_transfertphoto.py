@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("common", "0001_operationsynchronisation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TransfertPhoto",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("modele", models.CharField(max_length=100)),
+                ("objet_id", models.CharField(max_length=64)),
+                ("champ", models.CharField(max_length=50)),
+                (
+                    "fichier",
+                    models.CharField(
+                        help_text="Nom du fichier dans le stockage local",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "reference",
+                    models.CharField(
+                        blank=True,
+                        help_text="Référence dans le stockage distant",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "statut",
+                    models.CharField(
+                        choices=[
+                            ("EN_ATTENTE", "En attente"),
+                            ("EN_COURS", "En cours"),
+                            ("ENVOYEE", "Envoyée"),
+                            ("ECHEC", "Échec"),
+                        ],
+                        default="EN_ATTENTE",
+                        max_length=20,
+                    ),
+                ),
+                ("tentatives", models.PositiveSmallIntegerField(default=0)),
+                ("message", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Transfert de photo",
+                "verbose_name_plural": "Transferts de photos",
+                "db_table": "transferts_photos",
+                "ordering": ["created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["modele", "objet_id"],
+                        name="transferts__modele_f26a64_idx",
+                    ),
+                    models.Index(
+                        fields=["statut", "updated_at"],
+                        name="transferts__statut_7cdb1c_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("common", "0002_transfertphoto"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transfertphoto",
+            name="date_prise",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="transfertphoto",
+            name="doublon_de",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="doublons",
+                to="common.transfertphoto",
+            ),
+        ),
+        migrations.AddField(
+            model_name="transfertphoto",
+            name="empreinte",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="Empreinte perceptuelle (dHash)",
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="transfertphoto",
+            name="hauteur",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="transfertphoto",
+            name="largeur",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="transfertphoto",
+            name="latitude",
+            field=models.DecimalField(
+                blank=True, decimal_places=7, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="transfertphoto",
+            name="longitude",
+            field=models.DecimalField(
+                blank=True, decimal_places=7, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="transfertphoto",
+            name="miniatures",
+            field=models.JSONField(
+                blank=True, default=dict, help_text="URL des miniatures, par taille"
+            ),
+        ),
+        migrations.AddField(
+            model_name="transfertphoto",
+            name="semblable_a",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="semblables",
+                to="common.transfertphoto",
+            ),
+        ),
+        migrations.AddField(
+            model_name="transfertphoto",
+            name="sha256",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                help_text="Empreinte exacte du fichier reçu",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="transfertphoto",
+            name="taille_envoyee",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="transfertphoto",
+            name="taille_originale",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
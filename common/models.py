@@ -1,3 +1,100 @@
+# common/models.py
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class OperationSynchronisation(models.Model):
+    """
+    Opération hors ligne déjà appliquée : journal d'idempotence de la
+    synchronisation mobile (une ligne par clé générée par le client)
+    """
+    
+    TYPE_CHOICES = [
+        ('CHECKIN', 'Check-in'),
+        ('PV', 'Soumission de PV'),
+        ('RESULTATS', 'Résultats'),
+        ('INCIDENT', 'Incident'),
+        ('MESSAGE', "Message d'incident"),
+    ]
+    
+    cle = models.CharField(max_length=64, unique=True)
+    superviseur = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='operations_synchronisees'
+    )
+    type_operation = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    objet_id = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'operations_synchronisation'
+        ordering = ['-created_at']
+        verbose_name = 'Opération synchronisée'
+        verbose_name_plural = 'Opérations synchronisées'
+    
+    def __str__(self):
+        return f"{self.get_type_operation_display()} {self.cle}"
+
+
+class TransfertPhoto(models.Model):
+    """
+    Photo reçue avec un PV ou un incident, écrite sur le disque local et en
+    attente d'envoi vers le stockage distant (Cloudinary)
+    """
+    
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('ENVOYEE', 'Envoyée'),
+        ('ECHEC', 'Échec'),
+    ]
+    
+    # Objet propriétaire : 'pv.procesverbal', 'incidents.incidentphoto'
+    modele = models.CharField(max_length=100)
+    objet_id = models.CharField(max_length=64)
+    champ = models.CharField(max_length=50)
+    
+    fichier = models.CharField(max_length=255, help_text="Nom du fichier dans le stockage local")
+    reference = models.CharField(max_length=255, blank=True, help_text="Référence dans le stockage distant")
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    message = models.TextField(blank=True)
+    
+    # Traitement de l'image (voir common.services.image_service)
+    miniatures = models.JSONField(default=dict, blank=True, help_text="URL des miniatures, par taille")
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True, help_text="Empreinte exacte du fichier reçu")
+    empreinte = models.CharField(max_length=16, blank=True, db_index=True, help_text="Empreinte perceptuelle (dHash)")
+    # Fichier identique déjà envoyé : sa copie distante est réutilisée
+    doublon_de = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='doublons'
+    )
+    # Photo d'un autre objet visuellement semblable (même dHash) : signalée au validateur, jamais substituée
+    semblable_a = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='semblables'
+    )
+    largeur = models.PositiveIntegerField(null=True, blank=True)
+    hauteur = models.PositiveIntegerField(null=True, blank=True)
+    taille_originale = models.PositiveIntegerField(null=True, blank=True)
+    taille_envoyee = models.PositiveIntegerField(null=True, blank=True)
+    
+    # Métadonnées EXIF conservées (retirées des fichiers envoyés)
+    latitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=10, decimal_places=7, null=True, blank=True)
+    date_prise = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'transferts_photos'
+        ordering = ['created_at']
+        verbose_name = 'Transfert de photo'
+        verbose_name_plural = 'Transferts de photos'
+        indexes = [
+            models.Index(fields=['modele', 'objet_id']),
+            models.Index(fields=['statut', 'updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.modele} {self.objet_id} - {self.champ} ({self.get_statut_display()})"
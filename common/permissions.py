@@ -0,0 +1,16 @@
+# common/permissions.py
+from rest_framework import permissions
+
+
+class IsSuperviseur(permissions.BasePermission):
+    """
+    Permission pour l'application mobile de terrain
+    Réservé aux Superviseurs
+    """
+    
+    def has_permission(self, request, view):
+        return (
+            request.user and
+            request.user.is_authenticated and
+            request.user.role == 'SUPERVISEUR'
+        )
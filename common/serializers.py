@@ -0,0 +1,29 @@
+# common/serializers.py
+from django.conf import settings
+from rest_framework import serializers
+from common.models import OperationSynchronisation
+
+
+class OperationSerializer(serializers.Serializer):
+    """
+    Opération hors ligne : clé d'idempotence générée par le client, type,
+    données et instant de saisie sur l'appareil
+    """
+    
+    cle = serializers.CharField(max_length=64)
+    type = serializers.ChoiceField(choices=OperationSynchronisation.TYPE_CHOICES)
+    donnees = serializers.DictField()
+    horodatage = serializers.DateTimeField(required=False)
+
+
+class SynchronisationSerializer(serializers.Serializer):
+    """File d'opérations envoyée à la reconnexion, dans l'ordre de saisie"""
+    
+    operations = OperationSerializer(many=True, allow_empty=False)
+    
+    def validate_operations(self, operations):
+        if len(operations) > settings.SYNCHRONISATION_LOT_MAX:
+            raise serializers.ValidationError(
+                f"Au plus {settings.SYNCHRONISATION_LOT_MAX} opérations par synchronisation"
+            )
+        return operations
@@ -0,0 +1,6 @@
+# common/services/__init__.py
+from .synchronisation_service import synchronisation_service
+from .image_service import image_service
+from .photo_service import photo_service
+
+__all__ = ['synchronisation_service', 'image_service', 'photo_service']
@@ -0,0 +1,116 @@
+# common/services/image_service.py
+"""
+Traitement des photos avant envoi vers le stockage distant
+
+- image maîtresse ré-encodée en JPEG, plus grand côté ramené à TAILLE_MAX ;
+- miniatures aux tailles de MINIATURES, servies par les listes et la page de
+  validation à la place de l'original ;
+- EXIF supprimé des fichiers envoyés (ré-encodage sans métadonnées), mais
+  coordonnées GPS et date de prise de vue extraites pour être conservées en base ;
+- empreinte perceptuelle (dHash 64 bits) : deux envois de la même photo, même
+  ré-encodée ou redimensionnée, ont la même empreinte. Deux documents de même
+  mise en page (deux PV aux chiffres différents) peuvent aussi l'avoir : elle
+  ne sert qu'à signaler un doublon possible, jamais à substituer une photo.
+"""
+from datetime import datetime
+from decimal import Decimal
+from io import BytesIO
+
+from django.utils import timezone
+
+
+TAILLE_MAX = 2048
+QUALITE_JPEG = 80
+MINIATURES = {'petite': 200, 'moyenne': 800}
+
+# Tags EXIF
+IFD_EXIF = 0x8769
+IFD_GPS = 0x8825
+DATE_ORIGINALE = 36867
+DATE_MODIFICATION = 306
+
+
+def _degres(valeur, reference):
+    """(degrés, minutes, secondes) EXIF -> degrés décimaux signés"""
+    degres, minutes, secondes = (float(partie) for partie in valeur)
+    decimal = degres + minutes / 60 + secondes / 3600
+    if reference in ('S', 'W'):
+        decimal = -decimal
+    return Decimal(str(round(decimal, 7)))
+
+
+class ImageService:
+    """Ré-encodage, miniatures, métadonnées et empreinte d'une photo"""
+    
+    def ouvrir(self, fichier):
+        """Image Pillow, orientation EXIF appliquée ; None si le fichier n'est pas une image lisible"""
+        from PIL import Image, ImageOps, UnidentifiedImageError
+        
+        try:
+            image = Image.open(fichier)
+            image.load()
+        except (UnidentifiedImageError, OSError):
+            return None
+        return image, ImageOps.exif_transpose(image)
+    
+    def metadonnees(self, image):
+        """Coordonnées GPS et date de prise de vue lues dans l'EXIF"""
+        exif = image.getexif()
+        metadonnees = {'latitude': None, 'longitude': None, 'date_prise': None}
+        
+        gps = exif.get_ifd(IFD_GPS)
+        try:
+            metadonnees['latitude'] = _degres(gps[2], gps.get(1))
+            metadonnees['longitude'] = _degres(gps[4], gps.get(3))
+        except (KeyError, TypeError, ValueError, ZeroDivisionError):
+            metadonnees['latitude'] = metadonnees['longitude'] = None
+        
+        date = exif.get_ifd(IFD_EXIF).get(DATE_ORIGINALE) or exif.get(DATE_MODIFICATION)
+        try:
+            metadonnees['date_prise'] = timezone.make_aware(datetime.strptime(str(date), '%Y:%m:%d %H:%M:%S'))
+        except ValueError:
+            pass
+        
+        return metadonnees
+    
+    def empreinte(self, image):
+        """dHash 64 bits en hexadécimal : compare chaque pixel à son voisin de droite sur une vignette 9x8"""
+        from PIL import Image
+        
+        pixels = list(image.convert('L').resize((9, 8), Image.LANCZOS).getdata())
+        bits = 0
+        for ligne in range(8):
+            for colonne in range(8):
+                bits = (bits << 1) | (pixels[ligne * 9 + colonne] > pixels[ligne * 9 + colonne + 1])
+        return f'{bits:016x}'
+    
+    def encoder(self, image, taille):
+        """JPEG sans métadonnées, plus grand côté ramené à `taille`"""
+        copie = image.convert('RGB')
+        copie.thumbnail((taille, taille))
+        tampon = BytesIO()
+        copie.save(tampon, format='JPEG', quality=QUALITE_JPEG, optimize=True)
+        return tampon.getvalue()
+    
+    def traiter(self, fichier):
+        """
+        Traite une photo : None si ce n'est pas une image, sinon un dict avec
+        l'image maîtresse, les miniatures, l'empreinte et les métadonnées
+        """
+        ouverte = self.ouvrir(fichier)
+        if ouverte is None:
+            return None
+        originale, image = ouverte
+        
+        return {
+            'maitre': self.encoder(image, TAILLE_MAX),
+            'miniatures': {nom: self.encoder(image, taille) for nom, taille in MINIATURES.items()},
+            'empreinte': self.empreinte(image),
+            'largeur': image.width,
+            'hauteur': image.height,
+            **self.metadonnees(originale),
+        }
+
+
+# Instance singleton
+image_service = ImageService()
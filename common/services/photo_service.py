@@ -0,0 +1,261 @@
+# common/services/photo_service.py
+"""
+Transfert asynchrone des photos de PV et d'incidents
+
+Les CloudinaryField envoient le fichier pendant save(), ce qui ajoute la
+latence de Cloudinary (plusieurs secondes en 3G) à chaque soumission. Ici le
+fichier reçu est d'abord écrit sur le disque local, la ligne est enregistrée
+tout de suite avec statut_photos = EN_ATTENTE, puis une tâche Celery envoie la
+photo vers le stockage distant (avec nouvelles tentatives) et y rattache la
+référence obtenue.
+
+Avant l'envoi, la photo est ré-encodée et réduite, ses miniatures générées,
+son EXIF retiré (GPS et date de prise de vue conservés sur le transfert). Un
+fichier identique (SHA-256) n'est stocké qu'une fois ; une photo seulement
+semblable (empreinte perceptuelle) à celle d'un autre objet est signalée au
+validateur, jamais remplacée.
+
+Le stockage distant est configurable (PHOTOS_STOCKAGE_DISTANT) : Cloudinary
+par défaut, StockageLocal pour les tests et le développement.
+"""
+import hashlib
+import os
+import uuid
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from common.models import TransfertPhoto
+from common.services.image_service import image_service
+
+
+class StockageCloudinary:
+    """Stockage distant par défaut : envoi vers Cloudinary avec les options du champ"""
+    
+    def envoyer(self, fichier, champ):
+        from cloudinary import uploader
+        
+        options = {'type': champ.type, 'resource_type': champ.resource_type}
+        options.update({cle: valeur for cle, valeur in champ.options.items() if not callable(valeur)})
+        return uploader.upload_resource(fichier, **options).get_prep_value()
+    
+    def url(self, reference, champ):
+        return champ.parse_cloudinary_resource(reference).url
+
+
+class StockageLocal:
+    """Stockage distant de substitution (tests, développement) : copie dans un répertoire local"""
+    
+    @property
+    def stockage(self):
+        return FileSystemStorage(
+            location=getattr(settings, 'PHOTOS_REPERTOIRE_LOCAL', '') or os.path.join(settings.MEDIA_ROOT, 'photos'),
+            base_url=f'{settings.MEDIA_URL}photos/'
+        )
+    
+    def envoyer(self, fichier, champ):
+        return self.stockage.save(os.path.basename(fichier.name), fichier)
+    
+    def url(self, reference, champ):
+        return self.stockage.url(reference)
+
+
+class PhotoService:
+    """Photos reçues : stockage local immédiat, envoi différé vers le stockage distant"""
+    
+    @property
+    def stockage_local(self):
+        return FileSystemStorage(
+            location=getattr(settings, 'PHOTOS_REPERTOIRE_ATTENTE', '') or os.path.join(
+                settings.MEDIA_ROOT, 'photos_en_attente'
+            )
+        )
+    
+    @property
+    def stockage_distant(self):
+        return import_string(settings.PHOTOS_STOCKAGE_DISTANT)()
+    
+    # ========== RÉCEPTION ==========
+    
+    def differer(self, instance, champs=None):
+        """
+        À appeler avant save() : écrit sur le disque local les fichiers reçus
+        dans les champs photo de l'instance et vide ces champs, pour que save()
+        n'envoie rien vers Cloudinary. Renvoie les photos à programmer.
+        """
+        en_attente = []
+        for champ in champs or instance.CHAMPS_PHOTOS:
+            valeur = getattr(instance, champ)
+            if not isinstance(valeur, UploadedFile):
+                continue
+            extension = os.path.splitext(valeur.name)[1].lower()
+            nom = self.stockage_local.save(
+                f'{instance._meta.label_lower}/{uuid.uuid4().hex}{extension}', valeur
+            )
+            en_attente.append((champ, nom))
+            setattr(instance, champ, '')
+        
+        if en_attente:
+            instance.statut_photos = 'EN_ATTENTE'
+        return en_attente
+    
+    def programmer(self, instance, en_attente):
+        """À appeler après save() : enregistre les transferts et les lance après commit"""
+        from common.tasks import transferer_photo
+        
+        transferts = TransfertPhoto.objects.bulk_create([
+            TransfertPhoto(
+                modele=instance._meta.label_lower, objet_id=str(instance.pk), champ=champ, fichier=nom
+            )
+            for champ, nom in en_attente
+        ])
+        for transfert in transferts:
+            transaction.on_commit(lambda pk=transfert.pk: transferer_photo.delay(pk))
+        return transferts
+    
+    # ========== TRANSFERT ==========
+    
+    def transferer(self, transfert_id):
+        """
+        Traite une photo en attente (voir image_service), l'envoie vers le
+        stockage distant avec ses miniatures et rattache la référence à son
+        objet. Un fichier identique (même SHA-256) déjà envoyé n'est pas
+        renvoyé : sa copie distante est réutilisée. Une photo seulement
+        semblable (même dHash) à celle d'un autre objet est envoyée
+        normalement et signalée au validateur. Les erreurs d'envoi sont
+        propagées (la tâche réessaie) ; None si le transfert n'est plus en attente.
+        """
+        reclame = TransfertPhoto.objects.filter(pk=transfert_id, statut='EN_ATTENTE').update(
+            statut='EN_COURS', tentatives=F('tentatives') + 1, updated_at=timezone.now()
+        )
+        if not reclame:
+            return None
+        
+        transfert = TransfertPhoto.objects.get(pk=transfert_id)
+        modele = apps.get_model(transfert.modele)
+        champ = modele._meta.get_field(transfert.champ)
+        
+        with self.stockage_local.open(transfert.fichier, 'rb') as fichier:
+            transfert.taille_originale = fichier.size
+            contenu = hashlib.sha256()
+            for bloc in fichier.chunks():
+                contenu.update(bloc)
+            transfert.sha256 = contenu.hexdigest()
+            transfert.doublon_de = TransfertPhoto.objects.filter(
+                sha256=transfert.sha256, statut='ENVOYEE', doublon_de__isnull=True
+            ).exclude(pk=transfert.pk).order_by('created_at').first()
+            
+            fichier.seek(0)
+            image = image_service.traiter(fichier)
+            if image is None and transfert.doublon_de is None:
+                # Pas une image lisible : envoi tel quel
+                fichier.seek(0)
+                transfert.reference = self.stockage_distant.envoyer(fichier, champ)
+                transfert.taille_envoyee = transfert.taille_originale
+        
+        if image is not None:
+            for attribut in ('empreinte', 'largeur', 'hauteur', 'latitude', 'longitude', 'date_prise'):
+                setattr(transfert, attribut, image[attribut])
+            transfert.semblable_a = TransfertPhoto.objects.filter(
+                empreinte=image['empreinte'], statut='ENVOYEE'
+            ).exclude(modele=transfert.modele, objet_id=transfert.objet_id).order_by('created_at').first()
+        
+        if transfert.doublon_de is not None:
+            transfert.reference = transfert.doublon_de.reference
+            transfert.miniatures = transfert.doublon_de.miniatures
+            transfert.taille_envoyee = 0
+        elif image is not None:
+            self._envoyer_image(transfert, champ, image)
+        
+        with transaction.atomic():
+            modele.objects.filter(pk=transfert.objet_id).update(**{champ.attname: transfert.reference})
+            transfert.statut = 'ENVOYEE'
+            transfert.message = ''
+            transfert.save()
+            self._mettre_a_jour_statut(transfert)
+        
+        self.stockage_local.delete(transfert.fichier)
+        return transfert.reference
+    
+    def _envoyer_image(self, transfert, champ, image):
+        """Envoie l'image maîtresse et les miniatures, sans métadonnées EXIF"""
+        stockage = self.stockage_distant
+        base = os.path.splitext(os.path.basename(transfert.fichier))[0]
+        
+        transfert.reference = stockage.envoyer(ContentFile(image['maitre'], name=f'{base}.jpg'), champ)
+        transfert.miniatures = {
+            taille: stockage.url(stockage.envoyer(ContentFile(contenu, name=f'{base}_{taille}.jpg'), champ), champ)
+            for taille, contenu in image['miniatures'].items()
+        }
+        transfert.taille_envoyee = len(image['maitre']) + sum(map(len, image['miniatures'].values()))
+    
+    def liberer(self, transfert_id, message):
+        """Échec d'une tentative : le transfert repasse en attente d'une nouvelle tentative"""
+        TransfertPhoto.objects.filter(pk=transfert_id, statut='EN_COURS').update(
+            statut='EN_ATTENTE', message=message, updated_at=timezone.now()
+        )
+    
+    def echouer(self, transfert_id, message):
+        """Tentatives épuisées : le transfert et l'objet passent en échec (le fichier local est conservé)"""
+        transfert = TransfertPhoto.objects.get(pk=transfert_id)
+        with transaction.atomic():
+            TransfertPhoto.objects.filter(pk=transfert_id).update(
+                statut='ECHEC', message=message, updated_at=timezone.now()
+            )
+            self._mettre_a_jour_statut(transfert)
+    
+    def _mettre_a_jour_statut(self, transfert):
+        """statut_photos de l'objet : EN_ATTENTE tant qu'un transfert reste à faire, puis ECHEC ou TRANSFEREES"""
+        statuts = set(TransfertPhoto.objects.filter(
+            modele=transfert.modele, objet_id=transfert.objet_id
+        ).values_list('statut', flat=True))
+        if statuts & {'EN_ATTENTE', 'EN_COURS'}:
+            return
+        apps.get_model(transfert.modele).objects.filter(pk=transfert.objet_id).update(
+            statut_photos='ECHEC' if 'ECHEC' in statuts else 'TRANSFEREES'
+        )
+    
+    # ========== AFFICHAGE ==========
+    
+    def attacher_miniatures(self, objets):
+        """
+        Attache à chaque objet (PV, photos d'incident) un attribut `miniatures`
+        {champ: {taille: url}}, en une seule requête pour toute la liste
+        """
+        objets = list(objets)
+        if not objets:
+            return objets
+        
+        par_id = {str(objet.pk): objet for objet in objets}
+        for objet in objets:
+            objet.miniatures = {}
+        for objet_id, champ, miniatures in TransfertPhoto.objects.filter(
+            modele=objets[0]._meta.label_lower, objet_id__in=list(par_id), statut='ENVOYEE'
+        ).exclude(miniatures={}).values_list('objet_id', 'champ', 'miniatures'):
+            par_id[objet_id].miniatures[champ] = miniatures
+        return objets
+    
+    def semblables(self, objet):
+        """Transferts de l'objet dont la photo ressemble à celle d'un autre objet (à vérifier par le validateur)"""
+        return list(TransfertPhoto.objects.filter(
+            modele=objet._meta.label_lower, objet_id=str(objet.pk), semblable_a__isnull=False
+        ).select_related('semblable_a'))
+    
+    def a_relancer(self):
+        """Transferts bloqués : en attente ou en cours sans activité depuis PHOTOS_DELAI_RELANCE secondes"""
+        limite = timezone.now() - timedelta(seconds=settings.PHOTOS_DELAI_RELANCE)
+        return TransfertPhoto.objects.filter(
+            Q(statut='EN_ATTENTE') | Q(statut='EN_COURS'), updated_at__lt=limite
+        )
+
+
+# Instance singleton
+photo_service = PhotoService()
@@ -0,0 +1,291 @@
+# common/services/synchronisation_service.py
+"""
+Synchronisation hors ligne de l'application mobile
+
+Le client accumule des opérations (check-in, PV, résultats, incidents,
+messages), chacune portant une clé d'idempotence qu'il génère, puis les envoie
+en un seul lot à la reconnexion. Les clés déjà appliquées sont retrouvées par
+une seule lecture sur l'index unique du journal ; les autres sont appliquées
+par type, dans l'ordre des dépendances, avec des écritures groupées par modèle.
+PV et incidents restent enregistrés un par un (save()) car les compteurs
+statistiques sont branchés sur leur post_save.
+
+Check-in, PV et incidents sont datés de leur saisie sur l'appareil
+(horodatage de l'opération) et non de la synchronisation.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from common.models import OperationSynchronisation
+
+
+# Ordre d'application : une opération ne référence que des types précédents
+TYPES_OPERATION = ('CHECKIN', 'PV', 'RESULTATS', 'INCIDENT', 'MESSAGE')
+
+APPLIQUEE = 'APPLIQUEE'
+DEJA_APPLIQUEE = 'DEJA_APPLIQUEE'
+ERREUR = 'ERREUR'
+
+
+class _Operation:
+    """Opération du lot et son issue"""
+    
+    def __init__(self, index, cle, type_operation, donnees, horodatage=None):
+        self.index = index
+        self.cle = cle
+        self.type_operation = type_operation
+        self.donnees = donnees
+        self.horodatage = horodatage
+        self.statut = None
+        self.objet_id = None
+        self.message = ''
+    
+    def appliquer(self, objet_id, statut=APPLIQUEE):
+        self.statut, self.objet_id = statut, str(objet_id)
+    
+    def echouer(self, message):
+        self.statut, self.message = ERREUR, message
+    
+    def issue(self):
+        return {
+            'cle': self.cle,
+            'type': self.type_operation,
+            'statut': self.statut,
+            'objet_id': self.objet_id,
+            'message': self.message,
+        }
+
+
+def _erreurs(serializer):
+    """Erreurs d'un serializer aplaties en une ligne"""
+    lignes = []
+    for champ, erreurs in serializer.errors.items():
+        texte = ' '.join(str(erreur) for erreur in erreurs)
+        lignes.append(texte if champ == 'non_field_errors' else f"{champ}: {texte}")
+    return ' ; '.join(lignes)
+
+
+class SynchronisationService:
+    """Application idempotente d'une file d'opérations hors ligne"""
+    
+    def synchroniser(self, superviseur, operations):
+        """
+        Applique une file d'opérations [{cle, type, donnees, horodatage}] et
+        renvoie une issue par opération, dans l'ordre reçu
+        """
+        lot = [
+            _Operation(
+                index, operation['cle'], operation['type'], operation['donnees'], operation.get('horodatage')
+            )
+            for index, operation in enumerate(operations)
+        ]
+        
+        # Une seule lecture du journal : clés du lot et clés référencées
+        cles = {operation.cle for operation in lot}
+        references = {
+            operation.donnees.get(champ)
+            for operation in lot for champ in ('pv_cle', 'incident_cle')
+            if operation.donnees.get(champ)
+        }
+        journal = {
+            entree.cle: entree
+            for entree in OperationSynchronisation.objects.filter(cle__in=cles | references)
+        }
+        
+        vues = set()
+        for operation in lot:
+            entree = journal.get(operation.cle)
+            if operation.cle in vues:
+                operation.echouer("Clé dupliquée dans le lot")
+            elif entree is None:
+                pass
+            elif entree.superviseur_id != superviseur.pk:
+                operation.echouer("Clé déjà utilisée par un autre superviseur")
+            else:
+                operation.appliquer(entree.objet_id, DEJA_APPLIQUEE)
+            vues.add(operation.cle)
+        
+        # Objets désignés par clé : journal, puis opérations du lot au fil de l'application
+        objets = {
+            cle: entree.objet_id for cle, entree in journal.items() if entree.superviseur_id == superviseur.pk
+        }
+        
+        with transaction.atomic():
+            for type_operation in TYPES_OPERATION:
+                a_appliquer = [
+                    operation for operation in lot
+                    if operation.type_operation == type_operation and operation.statut is None
+                ]
+                if a_appliquer:
+                    getattr(self, f'_appliquer_{type_operation.lower()}')(superviseur, a_appliquer, objets)
+                    objets.update({
+                        operation.cle: operation.objet_id for operation in a_appliquer
+                        if operation.statut == APPLIQUEE
+                    })
+            
+            OperationSynchronisation.objects.bulk_create([
+                OperationSynchronisation(
+                    cle=operation.cle,
+                    superviseur=superviseur,
+                    type_operation=operation.type_operation,
+                    objet_id=operation.objet_id
+                )
+                for operation in lot if operation.statut == APPLIQUEE
+            ])
+        
+        return [operation.issue() for operation in lot]
+    
+    # ========== APPLICATION PAR TYPE ==========
+    
+    def _valides(self, operations, serializer_class, **contexte):
+        """Opérations dont les données sont valides, avec leurs données nettoyées"""
+        valides = []
+        for operation in operations:
+            serializer = serializer_class(data=operation.donnees, context=contexte)
+            if serializer.is_valid():
+                valides.append((operation, dict(serializer.validated_data)))
+            else:
+                operation.echouer(_erreurs(serializer))
+        return valides
+    
+    def _appliquer_checkin(self, superviseur, operations, objets):
+        from accounts.models import CheckIn
+        from accounts.serializers import CheckInSerializer
+        
+        if superviseur.bureau_vote_id is None:
+            for operation in operations:
+                operation.echouer("Vous n'êtes affecté à aucun bureau de vote")
+            return
+        
+        actif = CheckIn.objects.filter(superviseur=superviseur, is_active=True).exists()
+        a_creer, dates = [], {}
+        for operation, donnees in self._valides(operations, CheckInSerializer):
+            if actif:
+                operation.echouer("Vous avez déjà un check-in actif")
+                continue
+            if operation.horodatage and operation.horodatage > timezone.now():
+                operation.echouer("L'horodatage du check-in est dans le futur")
+                continue
+            checkin = CheckIn(superviseur=superviseur, bureau_vote_id=superviseur.bureau_vote_id, **donnees)
+            a_creer.append(checkin)
+            if operation.horodatage:
+                dates[checkin.pk] = operation.horodatage
+            operation.appliquer(checkin.pk)
+            actif = True
+        
+        CheckIn.objects.bulk_create(a_creer)
+        # checkin_time est en auto_now_add : l'heure de saisie est reportée après création
+        for pk, horodatage in dates.items():
+            CheckIn.objects.filter(pk=pk).update(checkin_time=horodatage)
+    
+    def _appliquer_pv(self, superviseur, operations, objets):
+        from pv.serializers import SoumissionPVSerializer
+        from pv.services import pv_service
+        
+        contexte = {'candidats': pv_service.candidats_actifs()}
+        for operation, donnees in self._valides(operations, SoumissionPVSerializer, **contexte):
+            resultats = donnees.pop('resultats')
+            try:
+                pv, _ = pv_service.soumettre_pv(
+                    superviseur, donnees, resultats,
+                    cle_idempotence=operation.cle,
+                    candidats=contexte['candidats'],
+                    horodatage=operation.horodatage
+                )
+            except (ValueError, PermissionError) as e:
+                operation.echouer(str(e))
+                continue
+            operation.appliquer(pv.pk)
+    
+    def _appliquer_resultats(self, superviseur, operations, objets):
+        from pv.models import ProcesVerbal
+        from pv.serializers import ResultatsPVSerializer
+        from pv.services import pv_service
+        
+        valides = []
+        for operation, donnees in self._valides(operations, ResultatsPVSerializer):
+            pv_id = donnees.get('pv') or objets.get(donnees.get('pv_cle'))
+            if pv_id is None:
+                operation.echouer("PV introuvable")
+                continue
+            valides.append((operation, int(pv_id), donnees['voix']))
+        
+        pvs = ProcesVerbal.objects.filter(
+            superviseur=superviseur, pk__in=[pv_id for _, pv_id, _ in valides]
+        ).in_bulk()
+        
+        lot = []
+        for operation, pv_id, voix in valides:
+            if pv_id not in pvs:
+                operation.echouer("PV introuvable")
+                continue
+            lot.append((operation, pvs[pv_id], voix))
+        
+        rapport = pv_service.ajouter_resultats_lot([(pv, voix) for _, pv, voix in lot])
+        for operation, pv, _ in lot:
+            erreurs = rapport['erreurs'].get(str(pv.pk))
+            if erreurs:
+                operation.echouer(' ; '.join(erreurs))
+            else:
+                operation.appliquer(pv.pk)
+    
+    def _appliquer_incident(self, superviseur, operations, objets):
+        from incidents.serializers import IncidentSerializer
+        from incidents.services import incident_service
+        
+        if superviseur.bureau_vote_id is None:
+            for operation in operations:
+                operation.echouer("Vous n'êtes affecté à aucun bureau de vote")
+            return
+        
+        valides = []
+        for operation, donnees in self._valides(operations, IncidentSerializer):
+            if operation.horodatage and operation.horodatage > timezone.now():
+                operation.echouer("L'horodatage de l'incident est dans le futur")
+                continue
+            valides.append((operation, donnees))
+        
+        incidents = incident_service.creer_incidents(
+            superviseur.bureau_vote, superviseur, [donnees for _, donnees in valides]
+        )
+        for (operation, _), incident in zip(valides, incidents):
+            if operation.horodatage:
+                # created_at est en auto_now_add : second save, qui déplace
+                # aussi l'incident dans les compteurs de timeline
+                incident.created_at = operation.horodatage
+                incident.save(update_fields=['created_at'])
+            operation.appliquer(incident.pk)
+    
+    def _appliquer_message(self, superviseur, operations, objets):
+        from incidents.models import Incident
+        from incidents.serializers import IncidentMessageSerializer
+        from incidents.services import incident_service
+        
+        valides = []
+        for operation, donnees in self._valides(operations, IncidentMessageSerializer):
+            incident_id = donnees.get('incident') or objets.get(donnees.get('incident_cle'))
+            if incident_id is None:
+                operation.echouer("Incident introuvable")
+                continue
+            valides.append((operation, str(incident_id), donnees['message']))
+        
+        incidents = {
+            str(pk): incident for pk, incident in Incident.objects.filter(
+                superviseur=superviseur, pk__in=[incident_id for _, incident_id, _ in valides]
+            ).in_bulk().items()
+        }
+        
+        lot = []
+        for operation, incident_id, message in valides:
+            if incident_id not in incidents:
+                operation.echouer("Incident introuvable")
+                continue
+            lot.append((operation, incidents[incident_id], message))
+        
+        crees = incident_service.ajouter_messages(superviseur, [(incident, message) for _, incident, message in lot])
+        for (operation, _, _), message in zip(lot, crees):
+            operation.appliquer(message.pk)
+
+
+# Instance singleton
+synchronisation_service = SynchronisationService()
@@ -0,0 +1,41 @@
+# common/tasks.py
+"""
+Tâches Celery pour le transfert des photos vers le stockage distant
+"""
+from celery import shared_task
+from common.models import TransfertPhoto
+from common.services import photo_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, acks_late=True, max_retries=5)
+def transferer_photo(self, transfert_id):
+    """
+    Tâche asynchrone: envoie une photo en attente vers le stockage distant ;
+    en cas d'erreur, nouvelle tentative après 30 s, 1 min, 2 min...
+    """
+    try:
+        return photo_service.transferer(transfert_id)
+    except Exception as e:
+        if self.request.retries >= self.max_retries:
+            logger.error(f"Transfert de photo {transfert_id} abandonné: {e}")
+            photo_service.echouer(transfert_id, str(e))
+            return None
+        photo_service.liberer(transfert_id, str(e))
+        raise self.retry(exc=e, countdown=30 * 2 ** self.request.retries)
+
+
+@shared_task
+def relancer_transferts_photos():
+    """
+    Tâche périodique: relance les transferts de photos bloqués (worker arrêté,
+    message perdu)
+    À exécuter toutes les 10 minutes
+    """
+    transferts = list(photo_service.a_relancer().values_list('pk', flat=True))
+    TransfertPhoto.objects.filter(pk__in=transferts).update(statut='EN_ATTENTE')
+    for transfert_id in transferts:
+        transferer_photo.delay(transfert_id)
+    return len(transferts)
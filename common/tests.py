@@ -1,3 +1,306 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import CheckIn, User
+from common.models import OperationSynchronisation, TransfertPhoto
+from geography.models import Region, Departement, Commune, SousPrefecture, LieuVote, BureauVote
+from incidents.models import Incident, IncidentMessage
+from pv.models import Candidat, ProcesVerbal, ResultatCandidat
+from statistics.models import CompteurTimeline
+from statistics.services import timeline_service
+
+
+class SynchronisationTestCase(TestCase):
+    """Tests de la synchronisation hors ligne"""
+
+    URL = '/mobile/synchronisation/'
+
+    def setUp(self):
+        region = Region.objects.create(code_region='SYN01', nom_region='Region Sync')
+        departement = Departement.objects.create(code_departement='SYND01', nom_departement='Dept', region=region)
+        commune = Commune.objects.create(code_commune='SYNC01', nom_commune='Commune', departement=departement)
+        sous_prefecture = SousPrefecture.objects.create(
+            code_sous_prefecture='SYNSP01', nom_sous_prefecture='SP', commune=commune
+        )
+        lieu = LieuVote.objects.create(code_lv='SYNLV01', nom_lv='Lieu', sous_prefecture=sous_prefecture)
+        self.bureau = BureauVote.objects.create(
+            code_bv='SYNBV01', nom_bv='Bureau', lieu_vote=lieu, numero_ordre=1, nombre_inscrits=100
+        )
+        self.superviseur = User.objects.create_user(
+            email='sync-sup@test.com', password='test123', role='SUPERVISEUR', bureau_vote=self.bureau
+        )
+        self.candidats = [
+            Candidat.objects.create(numero_ordre=i + 1, nom_complet=f'Candidat {i}') for i in range(2)
+        ]
+        self.client.force_login(self.superviseur)
+
+    def _file(self):
+        """Une journée de saisie hors ligne"""
+        a, b = (str(candidat.id) for candidat in self.candidats)
+        pv = {
+            'nombre_inscrits': 100, 'nombre_votants': 50, 'suffrages_exprimes': 40,
+            'bulletins_nuls': 6, 'bulletins_blancs': 4,
+            'photo_pv_officiel': 'pv/sync', 'latitude': '5.3', 'longitude': '-4.0',
+        }
+        return {'operations': [
+            {'cle': 'c1', 'type': 'CHECKIN', 'donnees': {
+                'nom_saisi': 'Bureau', 'latitude': '5.3', 'longitude': '-4.0'
+            }},
+            {'cle': 'i1', 'type': 'INCIDENT', 'donnees': {
+                'categorie': 'RETARD_OUVERTURE', 'description': 'Ouverture à 9h',
+                'heure_incident': '2025-10-25T09:00:00Z'
+            }},
+            {'cle': 'm1', 'type': 'MESSAGE', 'donnees': {'incident_cle': 'i1', 'message': 'Bureau ouvert'}},
+            {'cle': 'p1', 'type': 'PV', 'donnees': {**pv, 'resultats': {a: 25, b: 15}}},
+            {'cle': 'p2', 'type': 'PV', 'donnees': {**pv, 'resultats': {a: 25, b: 10}}},
+        ]}
+
+    def test_synchronisation_idempotente(self):
+        """Chaque opération est appliquée une seule fois, les issues suivent l'ordre reçu"""
+        response = self.client.post(self.URL, self._file(), content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        issues = response.json()['operations']
+        self.assertEqual(
+            [(issue['cle'], issue['statut']) for issue in issues],
+            [('c1', 'APPLIQUEE'), ('i1', 'APPLIQUEE'), ('m1', 'APPLIQUEE'), ('p1', 'APPLIQUEE'), ('p2', 'ERREUR')]
+        )
+        self.assertIn('La somme des voix (35)', issues[4]['message'])
+
+        # Le PV a trouvé le check-in créé dans le même lot
+        pv = ProcesVerbal.objects.get()
+        self.assertEqual(str(pv.pk), issues[3]['objet_id'])
+        self.assertEqual((pv.checkin_id, pv.total_voix_candidats), (CheckIn.objects.get().pk, 40))
+        self.assertEqual(IncidentMessage.objects.get().incident_id, Incident.objects.get().pk)
+
+        # Renvoi du lot complet après une coupure : rien n'est rejoué
+        response = self.client.post(self.URL, self._file(), content_type='application/json')
+        issues_rejeu = response.json()['operations']
+        self.assertEqual([issue['statut'] for issue in issues_rejeu][:4], ['DEJA_APPLIQUEE'] * 4)
+        self.assertEqual(
+            [issue['objet_id'] for issue in issues_rejeu][:4], [issue['objet_id'] for issue in issues][:4]
+        )
+        self.assertEqual(
+            (CheckIn.objects.count(), Incident.objects.count(), IncidentMessage.objects.count(),
+             ProcesVerbal.objects.count(), ResultatCandidat.objects.count(), OperationSynchronisation.objects.count()),
+            (1, 1, 1, 1, 2, 4)
+        )
+
+    def test_resultats_differes(self):
+        """Les résultats d'un PV synchronisé plus tôt le désignent par sa clé"""
+        a, b = (str(candidat.id) for candidat in self.candidats)
+        pv = ProcesVerbal.objects.create(
+            bureau_vote=self.bureau, superviseur=self.superviseur,
+            nombre_inscrits=100, nombre_votants=50, suffrages_exprimes=40,
+            bulletins_nuls=6, bulletins_blancs=4, photo_pv_officiel='pv.jpg', latitude=5.3, longitude=-4.0
+        )
+        OperationSynchronisation.objects.create(
+            cle='p0', superviseur=self.superviseur, type_operation='PV', objet_id=pv.pk
+        )
+
+        response = self.client.post(self.URL, {'operations': [
+            {'cle': 'r1', 'type': 'RESULTATS', 'donnees': {'pv_cle': 'p0', 'voix': {a: 30, b: 10}}},
+            {'cle': 'r2', 'type': 'RESULTATS', 'donnees': {'pv_cle': 'inconnue', 'voix': {a: 40}}},
+        ]}, content_type='application/json')
+
+        self.assertEqual([issue['statut'] for issue in response.json()['operations']], ['APPLIQUEE', 'ERREUR'])
+        self.assertEqual(pv.total_voix_candidats, 40)
+
+    def test_horodatage_de_saisie(self):
+        """Check-in et PV sont datés de leur saisie hors ligne, contrôlée, et non de la synchronisation"""
+        saisie = timezone.now() - timedelta(hours=3)
+        file = self._file()
+        futur = (timezone.now() + timedelta(hours=1)).isoformat()
+        checkin, incident, _, pv, _ = file['operations']
+        checkin['horodatage'] = saisie.isoformat()
+        incident['horodatage'] = (saisie + timedelta(minutes=30)).isoformat()
+        pv['horodatage'] = (saisie + timedelta(hours=1)).isoformat()
+        file['operations'] = [
+            checkin,
+            incident,
+            {**incident, 'cle': 'if', 'horodatage': futur},
+            {**pv, 'cle': 'p0', 'horodatage': (saisie - timedelta(minutes=5)).isoformat()},
+            {**pv, 'cle': 'pf', 'horodatage': futur},
+            pv,
+        ]
+
+        response = self.client.post(self.URL, file, content_type='application/json')
+
+        issues = response.json()['operations']
+        self.assertEqual(
+            [issue['statut'] for issue in issues],
+            ['APPLIQUEE', 'APPLIQUEE', 'ERREUR', 'ERREUR', 'ERREUR', 'APPLIQUEE']
+        )
+        self.assertIn('dans le futur', issues[2]['message'])
+        self.assertIn('précède le check-in', issues[3]['message'])
+        self.assertIn('dans le futur', issues[4]['message'])
+        self.assertEqual(CheckIn.objects.get().checkin_time, saisie)
+        self.assertEqual(Incident.objects.get().created_at, saisie + timedelta(minutes=30))
+        self.assertEqual(ProcesVerbal.objects.get().date_soumission, saisie + timedelta(hours=1))
+        # Soumission et incident sont comptés dans l'heure de leur saisie
+        compteurs = CompteurTimeline.objects.filter(valeur__gt=0).order_by('type_timeline')
+        self.assertEqual(list(compteurs.values_list('type_timeline', 'periode', 'valeur')), [
+            ('INCIDENTS', timeline_service.debut_periode('HEURE', saisie + timedelta(minutes=30)), 1),
+            ('PV_SOUMISSIONS', timeline_service.debut_periode('HEURE', saisie + timedelta(hours=1)), 1),
+        ])
+
+
+class StockageEnPanne:
+    """Stockage distant qui échoue toujours"""
+
+    def envoyer(self, fichier, champ):
+        raise ConnectionError("Cloudinary injoignable")
+
+
+class PhotoTestCase(TestCase):
+    """Tests du transfert différé des photos"""
+
+    def setUp(self):
+        region = Region.objects.create(code_region='PHO01', nom_region='Region Photo')
+        departement = Departement.objects.create(code_departement='PHOD01', nom_departement='Dept', region=region)
+        commune = Commune.objects.create(code_commune='PHOC01', nom_commune='Commune', departement=departement)
+        sous_prefecture = SousPrefecture.objects.create(
+            code_sous_prefecture='PHOSP01', nom_sous_prefecture='SP', commune=commune
+        )
+        lieu = LieuVote.objects.create(code_lv='PHOLV01', nom_lv='Lieu', sous_prefecture=sous_prefecture)
+        self.bureau = BureauVote.objects.create(
+            code_bv='PHOBV01', nom_bv='Bureau', lieu_vote=lieu, numero_ordre=1, nombre_inscrits=100
+        )
+        self.superviseur = User.objects.create_user(
+            email='photo-sup@test.com', password='test123', role='SUPERVISEUR', bureau_vote=self.bureau
+        )
+
+        repertoire = tempfile.TemporaryDirectory()
+        self.addCleanup(repertoire.cleanup)
+        self.attente = os.path.join(repertoire.name, 'attente')
+        self.distant = os.path.join(repertoire.name, 'distant')
+        reglages = override_settings(
+            PHOTOS_STOCKAGE_DISTANT='common.services.photo_service.StockageLocal',
+            PHOTOS_REPERTOIRE_ATTENTE=self.attente,
+            PHOTOS_REPERTOIRE_LOCAL=self.distant,
+        )
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+    def _soumettre(self, contenu=b'jpeg', bureau=None):
+        """Soumission d'un PV avec photo, comme submit_pv"""
+        from common.services import photo_service
+
+        pv = ProcesVerbal(
+            bureau_vote=bureau or self.bureau, superviseur=self.superviseur,
+            nombre_inscrits=100, nombre_votants=50, suffrages_exprimes=40,
+            bulletins_nuls=6, bulletins_blancs=4, latitude=5.3, longitude=-4.0,
+            photo_pv_officiel=SimpleUploadedFile('pv.jpg', contenu, content_type='image/jpeg'),
+        )
+        with self.captureOnCommitCallbacks() as callbacks:
+            photos = photo_service.differer(pv)
+            pv.save()
+            photo_service.programmer(pv, photos)
+
+        # Ligne enregistrée sans attendre le stockage distant
+        pv.refresh_from_db()
+        self.assertEqual(pv.statut_photos, 'EN_ATTENTE')
+        self.assertFalse(pv.photo_pv_officiel)
+        self.assertEqual(len(os.listdir(os.path.join(self.attente, 'pv.procesverbal'))), 1)
+        return pv, callbacks
+
+    def _transferer(self):
+        """Exécute les transferts en attente, comme le worker"""
+        from common.tasks import transferer_photo
+
+        for transfert_id in TransfertPhoto.objects.filter(statut='EN_ATTENTE').values_list('pk', flat=True):
+            transferer_photo.apply(args=[transfert_id])
+
+    def test_transfert(self):
+        """La tâche envoie la photo, rattache la référence et libère le disque local"""
+        pv, _ = self._soumettre()
+        self._transferer()
+
+        pv.refresh_from_db()
+        self.assertEqual(pv.statut_photos, 'TRANSFEREES')
+        self.assertTrue(os.path.exists(os.path.join(self.distant, pv.photo_pv_officiel.public_id + '.jpg')))
+        self.assertEqual(os.listdir(os.path.join(self.attente, 'pv.procesverbal')), [])
+        self.assertEqual(TransfertPhoto.objects.get().statut, 'ENVOYEE')
+
+    def _photo(self, qualite=75):
+        """JPEG 4000x3000 avec coordonnées GPS et date de prise de vue dans l'EXIF"""
+        from io import BytesIO
+        from PIL import Image
+
+        image = Image.linear_gradient('L').resize((4000, 3000)).convert('RGB')
+        exif = Image.Exif()
+        exif[0x8825] = {1: 'N', 2: (5.0, 18.0, 0.0), 3: 'W', 4: (4.0, 1.0, 30.0)}
+        exif[0x8769] = {36867: '2025:10:25 08:30:00'}
+        tampon = BytesIO()
+        image.save(tampon, format='JPEG', quality=qualite, exif=exif)
+        return tampon.getvalue()
+
+    def test_traitement_image(self):
+        """Photo réduite et sans EXIF, miniatures générées, GPS conservé, doublon non renvoyé"""
+        from PIL import Image
+
+        photo = self._photo()
+        pv, _ = self._soumettre(photo)
+        self._transferer()
+
+        transfert = TransfertPhoto.objects.get()
+        pv.refresh_from_db()
+        with Image.open(os.path.join(self.distant, transfert.reference)) as envoyee:
+            self.assertEqual(envoyee.size, (2048, 1536))
+            self.assertFalse(envoyee.getexif())
+        self.assertEqual(set(transfert.miniatures), {'petite', 'moyenne'})
+        self.assertEqual((transfert.largeur, transfert.hauteur), (4000, 3000))
+        self.assertLess(transfert.taille_envoyee, transfert.taille_originale)
+        self.assertEqual(str(transfert.latitude), '5.3000000')
+        self.assertEqual(str(transfert.longitude), '-4.0250000')
+        self.assertEqual(transfert.date_prise.year, 2025)
+
+        # Même fichier pour un autre bureau : copie distante réutilisée, doublon signalé
+        bureaux = [
+            BureauVote.objects.create(
+                code_bv=f'PHOBV0{i}', nom_bv=f'Bureau {i}', lieu_vote=self.bureau.lieu_vote,
+                numero_ordre=i, nombre_inscrits=100
+            )
+            for i in (2, 3)
+        ]
+        fichiers = len(os.listdir(self.distant))
+        doublon, _ = self._soumettre(photo, bureaux[0])
+        self._transferer()
+
+        doublon.refresh_from_db()
+        self.assertEqual(doublon.photo_pv_officiel.public_id, pv.photo_pv_officiel.public_id)
+        transfert_doublon = TransfertPhoto.objects.get(objet_id=str(doublon.pk))
+        self.assertEqual((transfert_doublon.doublon_de, transfert_doublon.semblable_a), (transfert, transfert))
+        self.assertEqual(len(os.listdir(self.distant)), fichiers)
+
+        # Photo seulement semblable (même dHash, autre fichier) : envoyée à part et signalée
+        semblable, _ = self._soumettre(self._photo(qualite=50), bureaux[1])
+        self._transferer()
+
+        semblable.refresh_from_db()
+        transfert_semblable = TransfertPhoto.objects.get(objet_id=str(semblable.pk))
+        self.assertEqual(transfert_semblable.empreinte, transfert.empreinte)
+        self.assertNotEqual(transfert_semblable.sha256, transfert.sha256)
+        self.assertIsNone(transfert_semblable.doublon_de)
+        self.assertEqual(transfert_semblable.semblable_a, transfert)
+        self.assertNotEqual(semblable.photo_pv_officiel.public_id, pv.photo_pv_officiel.public_id)
+        self.assertGreater(len(os.listdir(self.distant)), fichiers)
+
+    def test_echec(self):
+        """Tentatives épuisées : le PV passe en échec et le fichier local est conservé"""
+        pv, _ = self._soumettre()
+        with override_settings(PHOTOS_STOCKAGE_DISTANT='common.tests.StockageEnPanne'):
+            # Les nouvelles tentatives s'enchaînent sans délai hors worker
+            self._transferer()
+
+        transfert = TransfertPhoto.objects.get()
+        self.assertEqual((transfert.statut, transfert.tentatives), ('ECHEC', 6))
+        self.assertIn('Cloudinary injoignable', transfert.message)
+        pv.refresh_from_db()
+        self.assertEqual(pv.statut_photos, 'ECHEC')
+        self.assertEqual(len(os.listdir(os.path.join(self.attente, 'pv.procesverbal'))), 1)
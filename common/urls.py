@@ -0,0 +1,13 @@
+# common/urls.py
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from common.viewsets import SynchronisationViewSet
+
+app_name = 'common'
+
+router = DefaultRouter()
+router.register(r'synchronisation', SynchronisationViewSet, basename='synchronisation')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -0,0 +1,38 @@
+# common/viewsets.py
+from django.db import IntegrityError
+from rest_framework import status, viewsets
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from common.permissions import IsSuperviseur
+from common.serializers import SynchronisationSerializer
+from common.services import synchronisation_service
+
+
+class SynchronisationViewSet(viewsets.GenericViewSet):
+    """
+    Synchronisation hors ligne : une file d'opérations par requête
+    
+    Chaque opération porte une clé d'idempotence ; une opération déjà appliquée
+    est signalée DEJA_APPLIQUEE sans être rejouée, ce qui rend sûr le renvoi
+    de tout le lot après une coupure.
+    """
+    serializer_class = SynchronisationSerializer
+    permission_classes = [IsAuthenticated, IsSuperviseur]
+    
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            issues = synchronisation_service.synchroniser(
+                request.user, serializer.validated_data['operations']
+            )
+        except IntegrityError:
+            # Lot concurrent portant les mêmes clés : rien n'a été appliqué ici
+            return Response(
+                {'error': True, 'message': "Synchronisation concurrente, réessayez"},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        return Response({'operations': issues})
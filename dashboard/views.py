@@ -13,6 +13,7 @@ from incidents.models import Incident
 from geography.models import BureauVote, Region
 from accounts.models import User, CheckIn
 from statistics.models import CacheStatistique
+from statistics.services import timeline_service
 
 
 @login_required
@@ -205,15 +206,17 @@ def admin_dashboard(request):
             'link': '/geography/bureaux/'
         })
     
-    # Graphiques - Évolution des soumissions (7 derniers jours)
-    evolution_soumissions = []
-    for i in range(6, -1, -1):
-        date = timezone.now().date() - timedelta(days=i)
-        count = pv_qs.filter(date_soumission__date=date).count()
-        evolution_soumissions.append({
-            'date': date.strftime('%d/%m'),
-            'count': count
-        })
+    # Graphiques - Évolution des soumissions (7 derniers jours), sur le périmètre de l'utilisateur
+    perimetre = user.noeud_perimetre
+    if user.role == 'BACK_OFFICE' or perimetre is not None:
+        evolution_soumissions = [
+            {'date': point['libelle'], 'count': point['valeur']}
+            for point in timeline_service.evolution(
+                'PV_SOUMISSIONS', 7, noeud=None if user.role == 'BACK_OFFICE' else perimetre
+            )
+        ]
+    else:
+        evolution_soumissions = []
     
     # Répartition des PV par statut (pour graphique)
     repartition_pv = [
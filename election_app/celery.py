@@ -0,0 +1,14 @@
+# election_app/celery.py
+"""
+Application Celery du projet : configuration lue dans les settings Django
+(préfixe CELERY_) et découverte des tasks.py de chaque application
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'election_app.settings')
+
+app = Celery('election_app')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 import os
 from datetime import timedelta
 from pathlib import Path
+from celery.schedules import crontab
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
@@ -217,7 +218,7 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
-    'EXCEPTION_HANDLER': 'apps.common.exceptions.custom_exception_handler',
+    'EXCEPTION_HANDLER': 'common.exceptions.custom_exception_handler',
 }
 
 # JWT Settings
@@ -253,6 +254,44 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
+CELERY_BEAT_SCHEDULE = {
+    'rafraichir-caches-statistiques': {
+        'task': 'statistics.tasks.rafraichir_caches_expires',
+        'schedule': 15 * 60.0,
+    },
+    'vider-compteurs-acces-statistiques': {
+        'task': 'statistics.tasks.vider_compteurs_acces',
+        'schedule': 60.0,
+    },
+    'classer-candidats-statistiques': {
+        'task': 'statistics.tasks.classer_candidats',
+        'schedule': 60.0,
+    },
+    'snapshot-quotidien-statistiques': {
+        'task': 'statistics.tasks.creer_snapshot_quotidien',
+        'schedule': crontab(minute=0, hour=0),
+    },
+    'snapshot-horaire-statistiques': {
+        'task': 'statistics.tasks.creer_snapshot_horaire',
+        'schedule': crontab(minute=0),
+    },
+    'snapshot-intra-horaire-statistiques': {
+        'task': 'statistics.tasks.creer_point_snapshot',
+        'schedule': crontab(minute=f"*/{os.environ.get('STATISTIQUES_SNAPSHOT_INTERVALLE', 5)}"),
+    },
+    'compacter-compteurs-timeline': {
+        'task': 'statistics.tasks.compacter_compteurs_timeline',
+        'schedule': crontab(minute=5),
+    },
+    'reprendre-imports-referentiel': {
+        'task': 'geography.tasks.reprendre_imports_interrompus',
+        'schedule': 5 * 60.0,
+    },
+    'relancer-transferts-photos': {
+        'task': 'common.tasks.relancer_transferts_photos',
+        'schedule': 10 * 60.0,
+    },
+}
 
 # Cache Configuration
 CACHES = {
@@ -267,6 +306,47 @@ CACHES = {
     }
 }
 
+# Cache statistiques : LRU par worker devant Redis et la table cache_statistiques
+STATISTIQUES_CACHE_LOCAL_TAILLE = int(os.environ.get('STATISTIQUES_CACHE_LOCAL_TAILLE', 512))
+STATISTIQUES_CACHE_LOCAL_TTL = int(os.environ.get('STATISTIQUES_CACHE_LOCAL_TTL', 10))  # secondes
+STATISTIQUES_ACCES_INTERVALLE = int(os.environ.get('STATISTIQUES_ACCES_INTERVALLE', 5))  # secondes
+STATISTIQUES_VERROU_CALCUL = int(os.environ.get('STATISTIQUES_VERROU_CALCUL', 60))  # secondes
+STATISTIQUES_ATTENTE_CALCUL = float(os.environ.get('STATISTIQUES_ATTENTE_CALCUL', 2))  # secondes
+# Rafraîchissement en masse : entrées par passage, entrées par lot, lots exécutés en parallèle
+STATISTIQUES_REFRESH_MAX = int(os.environ.get('STATISTIQUES_REFRESH_MAX', 2000))
+STATISTIQUES_REFRESH_TAILLE_LOT = int(os.environ.get('STATISTIQUES_REFRESH_TAILLE_LOT', 50))
+STATISTIQUES_REFRESH_CONCURRENCE = int(os.environ.get('STATISTIQUES_REFRESH_CONCURRENCE', 4))
+# Cube des résultats : snapshot versionné projeté en mémoire par tous les workers
+# (ex: /dev/shm/electoral_pv/cube) ; vide = un cube par worker
+STATISTIQUES_CUBE_REPERTOIRE = os.environ.get('STATISTIQUES_CUBE_REPERTOIRE', '')
+STATISTIQUES_CUBE_DELAI = int(os.environ.get('STATISTIQUES_CUBE_DELAI', 2))  # secondes
+# Série intra-horaire des snapshots : pas (minutes) et fenêtre de dépouillement (ISO 8601, vide = toujours)
+STATISTIQUES_SNAPSHOT_INTERVALLE = int(os.environ.get('STATISTIQUES_SNAPSHOT_INTERVALLE', 5))
+STATISTIQUES_DEPOUILLEMENT_DEBUT = os.environ.get('STATISTIQUES_DEPOUILLEMENT_DEBUT', '')
+STATISTIQUES_DEPOUILLEMENT_FIN = os.environ.get('STATISTIQUES_DEPOUILLEMENT_FIN', '')
+# Durée de validité des timelines en cours (StatistiqueTimeline), en secondes
+STATISTIQUES_TIMELINE_TTL = int(os.environ.get('STATISTIQUES_TIMELINE_TTL', 60))
+# Compteurs des timelines : heures gardées à la granularité horaire avant compactage en jours
+STATISTIQUES_TIMELINE_RETENTION_HEURES = int(os.environ.get('STATISTIQUES_TIMELINE_RETENTION_HEURES', 48))
+# Exports de statistiques : répertoire des fichiers (vide = MEDIA_ROOT/exports) et rétention en jours
+STATISTIQUES_EXPORT_REPERTOIRE = os.environ.get('STATISTIQUES_EXPORT_REPERTOIRE', '')
+STATISTIQUES_EXPORT_RETENTION_JOURS = int(os.environ.get('STATISTIQUES_EXPORT_RETENTION_JOURS', 7))
+# Imports du référentiel : répertoire des fichiers envoyés (vide = MEDIA_ROOT/imports) et délai
+# (secondes) sans nouveau point de reprise au-delà duquel un import en cours est repris
+GEOGRAPHIE_IMPORT_REPERTOIRE = os.environ.get('GEOGRAPHIE_IMPORT_REPERTOIRE', '')
+GEOGRAPHIE_IMPORT_DELAI_REPRISE = int(os.environ.get('GEOGRAPHIE_IMPORT_DELAI_REPRISE', 300))
+# Saisie des résultats en lot : nombre maximal de PV par requête
+PV_RESULTATS_LOT_MAX = int(os.environ.get('PV_RESULTATS_LOT_MAX', 500))
+# Synchronisation hors ligne : nombre maximal d'opérations par lot
+SYNCHRONISATION_LOT_MAX = int(os.environ.get('SYNCHRONISATION_LOT_MAX', 1000))
+# Photos : stockage distant (classe avec envoyer(fichier, champ)), répertoire local d'attente
+# (vide = MEDIA_ROOT/photos_en_attente) et délai (secondes) avant relance d'un transfert bloqué
+PHOTOS_STOCKAGE_DISTANT = os.environ.get(
+    'PHOTOS_STOCKAGE_DISTANT', 'common.services.photo_service.StockageCloudinary'
+)
+PHOTOS_REPERTOIRE_ATTENTE = os.environ.get('PHOTOS_REPERTOIRE_ATTENTE', '')
+PHOTOS_DELAI_RELANCE = int(os.environ.get('PHOTOS_DELAI_RELANCE', 600))
+
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
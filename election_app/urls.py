@@ -40,6 +40,7 @@ urlpatterns = [
     path('pv/', include('pv.urls')),
     path('incidents/', include('incidents.urls')),
     path('statistics/', include('statistics.urls')),
+    path('mobile/', include('common.urls')),
 
     # API
     # path('api/', include([
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class GeographyConfig(AppConfig):
     name = 'geography'
+
+    def ready(self):
+        import geography.signals  # noqa: F401
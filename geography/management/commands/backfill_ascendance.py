@@ -0,0 +1,36 @@
+# geography/management/commands/backfill_ascendance.py
+import time
+from django.core.management.base import BaseCommand
+from geography.services import hierarchie_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Remplit les chemins matérialisés de la hiérarchie et les colonnes "
+        "d'ascendance dénormalisées des bureaux de vote, PV et incidents"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Compte seulement les lignes incohérentes, sans rien modifier"
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            divergences = hierarchie_service.verifier()
+            for table, total in divergences.items():
+                style = self.style.SUCCESS if total == 0 else self.style.WARNING
+                self.stdout.write(style(f'{table}: {total} ligne(s) à resynchroniser'))
+            return
+
+        self.stdout.write("Synchronisation de l'ascendance géographique...")
+        debut = time.monotonic()
+
+        resultats = hierarchie_service.synchroniser_tout()
+
+        duree = time.monotonic() - debut
+        for table, total in resultats.items():
+            self.stdout.write(f'  {table}: {total} ligne(s) mise(s) à jour')
+        self.stdout.write(self.style.SUCCESS(f'✅ Terminé en {duree:.2f}s'))
@@ -0,0 +1,58 @@
+# geography/management/commands/load_complete_data.py
+import os
+from django.core.management.base import BaseCommand
+from geography.models import (
+    Region, Departement, Commune, SousPrefecture, 
+    LieuVote, BureauVote
+)
+from geography.services import import_service
+
+
+class Command(BaseCommand):
+    help = 'Charge les données électorales complètes de Côte d\'Ivoire'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            type=str,
+            default='geography/data/donnees_completes.csv',
+            help='Chemin vers le fichier CSV complet'
+        )
+
+    def handle(self, *args, **options):
+        csv_file = options['file']
+        
+        if not os.path.exists(csv_file):
+            self.stdout.write(self.style.ERROR(f'Fichier non trouvé: {csv_file}'))
+            return
+        
+        self.stdout.write(self.style.SUCCESS('🚀 CHARGEMENT DES DONNÉES ÉLECTORALES'))
+        self.stdout.write('='*70 + '\n')
+        
+        # Import en masse, un lot (une transaction) à la fois
+        rapport = import_service.importer_fichier(
+            csv_file, 'COMPLET',
+            apres_lot=lambda rapport: self.stdout.write(
+                self.style.WARNING(f'📊 {rapport["lignes_traitees"]} lignes traitées...')
+            )
+        )
+        
+        for message in rapport['messages_erreur']:
+            self.stdout.write(self.style.ERROR(f'❌ {message}'))
+        
+        # AFFICHER LE RÉSUMÉ FINAL
+        self.stdout.write('\n' + '='*70)
+        self.stdout.write(self.style.SUCCESS('🎉 CHARGEMENT TERMINÉ'))
+        self.stdout.write('='*70)
+        for ligne in import_service.resume(rapport):
+            self.stdout.write(self.style.SUCCESS(f'📍 {ligne}'))
+        self.stdout.write('='*70)
+        
+        # Afficher les totaux depuis la base
+        self.stdout.write('\n📊 TOTAUX DANS LA BASE DE DONNÉES:')
+        self.stdout.write(f'   Régions: {Region.objects.count()}')
+        self.stdout.write(f'   Départements: {Departement.objects.count()}')
+        self.stdout.write(f'   Communes: {Commune.objects.count()}')
+        self.stdout.write(f'   Sous-préfectures: {SousPrefecture.objects.count()}')
+        self.stdout.write(f'   Lieux de vote: {LieuVote.objects.count()}')
+        self.stdout.write(f'   Bureaux de vote: {BureauVote.objects.count()}')
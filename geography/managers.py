@@ -3,7 +3,25 @@ from django.db import models
 from django.db.models import Count, Sum, Avg, Q
 
 
-class BureauVoteQuerySet(models.QuerySet):
+class HierarchieQuerySet(models.QuerySet):
+    """QuerySet commun aux six niveaux géographiques (chemin matérialisé)"""
+    
+    def sous(self, noeud):
+        """
+        Le noeud et tous ses descendants de ce niveau (1 recherche indexée par
+        préfixe). Aucun résultat si le chemin du noeud n'est pas encore calculé :
+        un préfixe vide couvrirait tout le pays.
+        """
+        if not noeud.chemin:
+            return self.none()
+        return self.filter(chemin__startswith=noeud.chemin)
+    
+    def ancetres_de(self, noeud):
+        """Les ancêtres du noeud à ce niveau (1 recherche indexée)"""
+        return self.filter(chemin__in=noeud.chemins_ancetres)
+
+
+class BureauVoteQuerySet(HierarchieQuerySet):
     """QuerySet personnalisé pour BureauVote"""
     
     def actifs(self):
@@ -13,18 +31,18 @@ class BureauVoteQuerySet(models.QuerySet):
     def par_region(self, region):
         """Filtre par région"""
         return self.filter(
-            lieu_vote__sous_prefecture__commune__departement__region=region
+            region=region
         )
     
     def par_departement(self, departement):
         """Filtre par département"""
         return self.filter(
-            lieu_vote__sous_prefecture__commune__departement=departement
+            departement=departement
         )
     
     def par_commune(self, commune):
         """Filtre par commune"""
-        return self.filter(lieu_vote__sous_prefecture__commune=commune)
+        return self.filter(commune=commune)
     
     def avec_pv_valide(self):
         """Bureaux ayant un PV validé"""
@@ -62,6 +80,9 @@ class BureauVoteManager(models.Manager):
     def par_region(self, region):
         return self.get_queryset().par_region(region)
     
+    def sous(self, noeud):
+        return self.get_queryset().sous(noeud)
+    
     def avec_stats(self):
         return self.get_queryset().avec_stats()
     
\ No newline at end of file
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def recopier_ascendance(apps, schema_editor):
+    """Recopie l'ascendance des lieux de vote sur les bureaux existants"""
+    from geography.services.hierarchie_service import hierarchie_service
+
+    hierarchie_service.synchroniser_bureaux()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("geography", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bureauvote",
+            name="commune",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="bureaux_vote",
+                to="geography.commune",
+            ),
+        ),
+        migrations.AddField(
+            model_name="bureauvote",
+            name="departement",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="bureaux_vote",
+                to="geography.departement",
+            ),
+        ),
+        migrations.AddField(
+            model_name="bureauvote",
+            name="region",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="bureaux_vote",
+                to="geography.region",
+            ),
+        ),
+        migrations.AddField(
+            model_name="bureauvote",
+            name="sous_prefecture",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="bureaux_vote",
+                to="geography.sousprefecture",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bureauvote",
+            index=models.Index(
+                fields=["region", "est_actif"], name="geo_bureaux_region__009950_idx"
+            ),
+        ),
+        migrations.RunPython(recopier_ascendance, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:31
+
+from django.db import migrations, models
+
+
+def calculer_chemins(apps, schema_editor):
+    """Calcule les chemins des noeuds existants : un chemin vide préfixerait tout le pays"""
+    from geography.services.hierarchie_service import hierarchie_service
+
+    hierarchie_service.synchroniser_chemins()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("geography", "0002_bureauvote_commune_bureauvote_departement_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bureauvote",
+            name="chemin",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="commune",
+            name="chemin",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="departement",
+            name="chemin",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="lieuvote",
+            name="chemin",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="region",
+            name="chemin",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="sousprefecture",
+            name="chemin",
+            field=models.CharField(
+                db_index=True, default="", editable=False, max_length=255
+            ),
+        ),
+        migrations.RunPython(calculer_chemins, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "geography",
+            "0003_bureauvote_chemin_commune_chemin_departement_chemin_and_more",
+        ),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportReferentiel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "fichier",
+                    models.CharField(
+                        help_text="Chemin du fichier enregistré", max_length=500
+                    ),
+                ),
+                (
+                    "format",
+                    models.CharField(
+                        choices=[
+                            ("COMPLET", "Fichier complet (un lieu de vote par ligne)"),
+                            ("CIRCONSCRIPTIONS", "Fichier des circonscriptions"),
+                        ],
+                        default="COMPLET",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "statut",
+                    models.CharField(
+                        choices=[
+                            ("EN_ATTENTE", "En attente"),
+                            ("EN_COURS", "En cours"),
+                            ("TERMINE", "Terminé"),
+                            ("ECHEC", "Échec"),
+                        ],
+                        default="EN_ATTENTE",
+                        max_length=20,
+                    ),
+                ),
+                ("lignes_total", models.IntegerField(default=0)),
+                ("lignes_traitees", models.IntegerField(default=0)),
+                ("lignes_erreur", models.IntegerField(default=0)),
+                (
+                    "rapport",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Créations et mises à jour par niveau, erreurs, durée",
+                    ),
+                ),
+                ("message", models.TextField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("date_fin", models.DateTimeField(blank=True, null=True)),
+                (
+                    "demande_par",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Import du référentiel",
+                "verbose_name_plural": "Imports du référentiel",
+                "db_table": "geo_imports_referentiel",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["statut", "updated_at"],
+                        name="geo_imports_statut_2e9687_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -7,18 +7,66 @@ from django.db.models import Sum, Count, Avg, Q, F
 from django.core.validators import RegexValidator
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from .managers import HierarchieQuerySet, BureauVoteManager
 
 
 
 
 class BaseGeoModel(models.Model):
     """Modèle abstrait de base pour les entités géographiques"""
+    
+    # Chemin matérialisé "CODE_REGION/CODE_DEPT/.../CODE/" (préfixe de tous les descendants)
+    chemin = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Champ parent et champ code de chaque niveau, redéfinis par les sous-classes
+    CHAMP_PARENT = None
+    CHAMP_CODE = None
+
     class Meta:
         abstract = True
 
+    def save(self, *args, **kwargs):
+        self.chemin = self.calculer_chemin()
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'chemin'}
+        
+        super().save(*args, **kwargs)
+
+    def calculer_chemin(self):
+        """Chemin matérialisé à partir de celui du parent"""
+        prefixe = getattr(self, self.CHAMP_PARENT).chemin if self.CHAMP_PARENT else ''
+        return f"{prefixe}{getattr(self, self.CHAMP_CODE)}/"
+
+    def est_sous(self, noeud):
+        """
+        Vrai si l'instance est le noeud donné ou l'un de ses descendants (sans requête).
+        Faux si l'un des chemins n'est pas calculé (un chemin vide préfixe tout).
+        """
+        if not self.chemin or not noeud.chemin:
+            return False
+        return self.chemin.startswith(noeud.chemin)
+
+    @property
+    def chemins_ancetres(self):
+        """Chemins de tous les ancêtres, de la région jusqu'au parent"""
+        segments = self.chemin.split('/')[:-2]
+        return ['/'.join(segments[:i]) + '/' for i in range(1, len(segments) + 1)]
+
+    def get_stats(self, refresh=False):
+        """
+        Blocs bureaux / pv / participation / incidents du noeud, calculés
+        en une passe par le moteur d'agrégation et mémorisés sur l'instance
+        """
+        if refresh or getattr(self, '_stats_agregees', None) is None:
+            from geography.services import aggregation_service
+            self._stats_agregees = aggregation_service.stats_noeud(self)
+        return self._stats_agregees
+
 
 class Region(BaseGeoModel):
     """Région administrative - Niveau 1"""
@@ -39,6 +87,11 @@ class Region(BaseGeoModel):
         help_text="Superficie en km²"
     )
     
+    CHAMP_PARENT = None
+    CHAMP_CODE = 'code_region'
+    
+    objects = HierarchieQuerySet.as_manager()
+
     class Meta:
         db_table = 'geo_regions'
         ordering = ['nom_region']
@@ -57,132 +110,33 @@ class Region(BaseGeoModel):
     @property
     def stats_bureaux(self):
         """Statistiques des bureaux de vote de la région"""
-        
-        
-        bureaux = BureauVote.objects.filter(
-            lieu_vote__sous_prefecture__commune__departement__region=self
-        )
-        
-        return {
-            'total': bureaux.count(),
-            'total_inscrits': bureaux.aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0,
-            'moyenne_inscrits': bureaux.aggregate(Avg('nombre_inscrits'))['nombre_inscrits__avg'] or 0,
-        }
+        return self.get_stats()['bureaux']
     
     @property
     def stats_pv(self):
         """Statistiques des PV de la région"""
-        from  pv.models import ProcesVerbal
-        
-        pv_region = ProcesVerbal.objects.filter(
-            bureau_vote__lieu_vote__sous_prefecture__commune__departement__region=self
-        )
-        
-        total_bureaux = self.stats_bureaux['total']
-        total_pv = pv_region.count()
-        
-        return {
-            'total_pv': total_pv,
-            'pv_en_attente': pv_region.filter(statut='EN_ATTENTE').count(),
-            'pv_valides': pv_region.filter(statut='VALIDE').count(),
-            'pv_rejetes': pv_region.filter(statut='REJETE').count(),
-            'pv_en_correction': pv_region.filter(statut='CORRECTION').count(),
-            'taux_soumission': round((total_pv / total_bureaux * 100), 2) if total_bureaux > 0 else 0,
-            'taux_validation': round(
-                (pv_region.filter(statut='VALIDE').count() / total_pv * 100), 2
-            ) if total_pv > 0 else 0,
-        }
+        return self.get_stats()['pv']
     
     @property
     def stats_participation(self):
         """Statistiques de participation de la région"""
-        from  pv.models import ProcesVerbal
-        
-        pv_valides = ProcesVerbal.objects.filter(
-            bureau_vote__lieu_vote__sous_prefecture__commune__departement__region=self,
-            statut='VALIDE'
-        )
-        
-        total_inscrits = pv_valides.aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0
-        total_votants = pv_valides.aggregate(Sum('nombre_votants'))['nombre_votants__sum'] or 0
-        total_exprimes = pv_valides.aggregate(Sum('suffrages_exprimes'))['suffrages_exprimes__sum'] or 0
-        total_nuls = pv_valides.aggregate(Sum('bulletins_nuls'))['bulletins_nuls__sum'] or 0
-        total_blancs = pv_valides.aggregate(Sum('bulletins_blancs'))['bulletins_blancs__sum'] or 0
-        
-        return {
-            'total_inscrits': total_inscrits,
-            'total_votants': total_votants,
-            'total_exprimes': total_exprimes,
-            'total_nuls': total_nuls,
-            'total_blancs': total_blancs,
-            'taux_participation': round((total_votants / total_inscrits * 100), 2) if total_inscrits > 0 else 0,
-            'taux_nuls': round((total_nuls / total_votants * 100), 2) if total_votants > 0 else 0,
-            'taux_blancs': round((total_blancs / total_votants * 100), 2) if total_votants > 0 else 0,
-        }
+        return self.get_stats()['participation']
     
     @property
     def stats_incidents(self):
         """Statistiques des incidents de la région"""
-        from  incidents.models import Incident
-        
-        incidents = Incident.objects.filter(
-            bureau_vote__lieu_vote__sous_prefecture__commune__departement__region=self
-        )
-        
-        return {
-            'total': incidents.count(),
-            'ouverts': incidents.filter(statut='OUVERT').count(),
-            'en_cours': incidents.filter(statut='EN_COURS').count(),
-            'traites': incidents.filter(statut='TRAITE').count(),
-            'clos': incidents.filter(statut='CLOS').count(),
-            'urgents': incidents.filter(priorite='URGENTE').count(),
-            'par_categorie': dict(
-                incidents.values('categorie').annotate(count=Count('id')).values_list('categorie', 'count')
-            ),
-        }
+        return self.get_stats()['incidents']
     
     @property
     def stats_resultats_candidats(self):
-        """Résultats par candidat pour la région"""
-        from  pv.models import ResultatCandidat, ProcesVerbal
-        
-        resultats = ResultatCandidat.objects.filter(
-            proces_verbal__bureau_vote__lieu_vote__sous_prefecture__commune__departement__region=self,
-            proces_verbal__statut='VALIDE'
-        ).values(
-            'candidat__nom_complet',
-            'candidat__parti_politique',
-            'candidat__numero_ordre'
-        ).annotate(
-            total_voix=Sum('nombre_voix')
-        ).order_by('-total_voix')
-        
-        total_voix = sum(r['total_voix'] for r in resultats)
-        
-        return [
-            {
-                'candidat': r['candidat__nom_complet'],
-                'parti': r['candidat__parti_politique'],
-                'numero': r['candidat__numero_ordre'],
-                'voix': r['total_voix'],
-                'pourcentage': round((r['total_voix'] / total_voix * 100), 2) if total_voix > 0 else 0
-            }
-            for r in resultats
-        ]
+        """Résultats par candidat pour la région (cube des résultats, sans requête)"""
+        from statistics.services import cube_service
+        return cube_service.resultats('region', self.pk)
     
     def get_stats_par_departement(self):
         """Statistiques détaillées par département"""
-        stats = []
-        for dept in self.departements.all():
-            stats.append({
-                'departement': dept.nom_departement,
-                'code': dept.code_departement,
-                'bureaux': dept.stats_bureaux,
-                'pv': dept.stats_pv,
-                'participation': dept.stats_participation,
-                'incidents': dept.stats_incidents,
-            })
-        return stats
+        from geography.services import aggregation_service
+        return aggregation_service.stats_enfants(self)
     
     def get_evolution_soumissions(self, jours=7):
         """Évolution des soumissions de PV sur N jours"""
@@ -193,7 +147,7 @@ class Region(BaseGeoModel):
         date_debut = timezone.now() - timedelta(days=jours)
         
         evolution = ProcesVerbal.objects.filter(
-            bureau_vote__lieu_vote__sous_prefecture__commune__departement__region=self,
+            region=self,
             date_soumission__gte=date_debut
         ).extra(
             select={'date': 'DATE(date_soumission)'}
@@ -222,6 +176,11 @@ class Departement(BaseGeoModel):
     chef_lieu = models.CharField(max_length=200, blank=True, null=True)
     population = models.IntegerField(default=0)
 
+    CHAMP_PARENT = 'region'
+    CHAMP_CODE = 'code_departement'
+    
+    objects = HierarchieQuerySet.as_manager()
+
     class Meta:
         db_table = 'geo_departements'
         ordering = ['nom_departement']
@@ -240,132 +199,33 @@ class Departement(BaseGeoModel):
     @property
     def stats_bureaux(self):
         """Statistiques des bureaux de vote du département"""
-        from  geography.models import BureauVote
-        
-        bureaux = BureauVote.objects.filter(
-            lieu_vote__sous_prefecture__commune__departement=self
-        )
-        
-        return {
-            'total': bureaux.count(),
-            'total_inscrits': bureaux.aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0,
-            'moyenne_inscrits': bureaux.aggregate(Avg('nombre_inscrits'))['nombre_inscrits__avg'] or 0,
-        }
+        return self.get_stats()['bureaux']
     
     @property
     def stats_pv(self):
         """Statistiques des PV du département"""
-        from  pv.models import ProcesVerbal
-        
-        pv_dept = ProcesVerbal.objects.filter(
-            bureau_vote__lieu_vote__sous_prefecture__commune__departement=self
-        )
-        
-        total_bureaux = self.stats_bureaux['total']
-        total_pv = pv_dept.count()
-        
-        return {
-            'total_pv': total_pv,
-            'pv_en_attente': pv_dept.filter(statut='EN_ATTENTE').count(),
-            'pv_valides': pv_dept.filter(statut='VALIDE').count(),
-            'pv_rejetes': pv_dept.filter(statut='REJETE').count(),
-            'pv_en_correction': pv_dept.filter(statut='CORRECTION').count(),
-            'taux_soumission': round((total_pv / total_bureaux * 100), 2) if total_bureaux > 0 else 0,
-            'taux_validation': round(
-                (pv_dept.filter(statut='VALIDE').count() / total_pv * 100), 2
-            ) if total_pv > 0 else 0,
-        }
+        return self.get_stats()['pv']
     
     @property
     def stats_participation(self):
         """Statistiques de participation du département"""
-        from  pv.models import ProcesVerbal
-        
-        pv_valides = ProcesVerbal.objects.filter(
-            bureau_vote__lieu_vote__sous_prefecture__commune__departement=self,
-            statut='VALIDE'
-        )
-        
-        total_inscrits = pv_valides.aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0
-        total_votants = pv_valides.aggregate(Sum('nombre_votants'))['nombre_votants__sum'] or 0
-        total_exprimes = pv_valides.aggregate(Sum('suffrages_exprimes'))['suffrages_exprimes__sum'] or 0
-        total_nuls = pv_valides.aggregate(Sum('bulletins_nuls'))['bulletins_nuls__sum'] or 0
-        total_blancs = pv_valides.aggregate(Sum('bulletins_blancs'))['bulletins_blancs__sum'] or 0
-        
-        return {
-            'total_inscrits': total_inscrits,
-            'total_votants': total_votants,
-            'total_exprimes': total_exprimes,
-            'total_nuls': total_nuls,
-            'total_blancs': total_blancs,
-            'taux_participation': round((total_votants / total_inscrits * 100), 2) if total_inscrits > 0 else 0,
-            'taux_nuls': round((total_nuls / total_votants * 100), 2) if total_votants > 0 else 0,
-            'taux_blancs': round((total_blancs / total_votants * 100), 2) if total_votants > 0 else 0,
-        }
+        return self.get_stats()['participation']
     
     @property
     def stats_incidents(self):
         """Statistiques des incidents du département"""
-        from  incidents.models import Incident
-        
-        incidents = Incident.objects.filter(
-            bureau_vote__lieu_vote__sous_prefecture__commune__departement=self
-        )
-        
-        return {
-            'total': incidents.count(),
-            'ouverts': incidents.filter(statut='OUVERT').count(),
-            'en_cours': incidents.filter(statut='EN_COURS').count(),
-            'traites': incidents.filter(statut='TRAITE').count(),
-            'clos': incidents.filter(statut='CLOS').count(),
-            'urgents': incidents.filter(priorite='URGENTE').count(),
-            'par_categorie': dict(
-                incidents.values('categorie').annotate(count=Count('id')).values_list('categorie', 'count')
-            ),
-        }
+        return self.get_stats()['incidents']
     
     @property
     def stats_resultats_candidats(self):
-        """Résultats par candidat pour le département"""
-        from  pv.models import ResultatCandidat
-        
-        resultats = ResultatCandidat.objects.filter(
-            proces_verbal__bureau_vote__lieu_vote__sous_prefecture__commune__departement=self,
-            proces_verbal__statut='VALIDE'
-        ).values(
-            'candidat__nom_complet',
-            'candidat__parti_politique',
-            'candidat__numero_ordre'
-        ).annotate(
-            total_voix=Sum('nombre_voix')
-        ).order_by('-total_voix')
-        
-        total_voix = sum(r['total_voix'] for r in resultats)
-        
-        return [
-            {
-                'candidat': r['candidat__nom_complet'],
-                'parti': r['candidat__parti_politique'],
-                'numero': r['candidat__numero_ordre'],
-                'voix': r['total_voix'],
-                'pourcentage': round((r['total_voix'] / total_voix * 100), 2) if total_voix > 0 else 0
-            }
-            for r in resultats
-        ]
+        """Résultats par candidat pour le département (cube des résultats, sans requête)"""
+        from statistics.services import cube_service
+        return cube_service.resultats('departement', self.pk)
     
     def get_stats_par_commune(self):
         """Statistiques détaillées par commune"""
-        stats = []
-        for commune in self.communes.all():
-            stats.append({
-                'commune': commune.nom_commune,
-                'code': commune.code_commune,
-                'bureaux': commune.stats_bureaux,
-                'pv': commune.stats_pv,
-                'participation': commune.stats_participation,
-                'incidents': commune.stats_incidents,
-            })
-        return stats
+        from geography.services import aggregation_service
+        return aggregation_service.stats_enfants(self)
 
 
 class Commune(BaseGeoModel):
@@ -393,6 +253,11 @@ class Commune(BaseGeoModel):
         default='RURALE'
     )
 
+    CHAMP_PARENT = 'departement'
+    CHAMP_CODE = 'code_commune'
+    
+    objects = HierarchieQuerySet.as_manager()
+
     class Meta:
         db_table = 'geo_communes'
         ordering = ['nom_commune']
@@ -411,132 +276,33 @@ class Commune(BaseGeoModel):
     @property
     def stats_bureaux(self):
         """Statistiques des bureaux de vote de la commune"""
-        from  geography.models import BureauVote
-        
-        bureaux = BureauVote.objects.filter(
-            lieu_vote__sous_prefecture__commune=self
-        )
-        
-        return {
-            'total': bureaux.count(),
-            'total_inscrits': bureaux.aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0,
-            'moyenne_inscrits': bureaux.aggregate(Avg('nombre_inscrits'))['nombre_inscrits__avg'] or 0,
-        }
+        return self.get_stats()['bureaux']
     
     @property
     def stats_pv(self):
         """Statistiques des PV de la commune"""
-        from  pv.models import ProcesVerbal
-        
-        pv_commune = ProcesVerbal.objects.filter(
-            bureau_vote__lieu_vote__sous_prefecture__commune=self
-        )
-        
-        total_bureaux = self.stats_bureaux['total']
-        total_pv = pv_commune.count()
-        
-        return {
-            'total_pv': total_pv,
-            'pv_en_attente': pv_commune.filter(statut='EN_ATTENTE').count(),
-            'pv_valides': pv_commune.filter(statut='VALIDE').count(),
-            'pv_rejetes': pv_commune.filter(statut='REJETE').count(),
-            'pv_en_correction': pv_commune.filter(statut='CORRECTION').count(),
-            'taux_soumission': round((total_pv / total_bureaux * 100), 2) if total_bureaux > 0 else 0,
-            'taux_validation': round(
-                (pv_commune.filter(statut='VALIDE').count() / total_pv * 100), 2
-            ) if total_pv > 0 else 0,
-        }
+        return self.get_stats()['pv']
     
     @property
     def stats_participation(self):
         """Statistiques de participation de la commune"""
-        from  pv.models import ProcesVerbal
-        
-        pv_valides = ProcesVerbal.objects.filter(
-            bureau_vote__lieu_vote__sous_prefecture__commune=self,
-            statut='VALIDE'
-        )
-        
-        total_inscrits = pv_valides.aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0
-        total_votants = pv_valides.aggregate(Sum('nombre_votants'))['nombre_votants__sum'] or 0
-        total_exprimes = pv_valides.aggregate(Sum('suffrages_exprimes'))['suffrages_exprimes__sum'] or 0
-        total_nuls = pv_valides.aggregate(Sum('bulletins_nuls'))['bulletins_nuls__sum'] or 0
-        total_blancs = pv_valides.aggregate(Sum('bulletins_blancs'))['bulletins_blancs__sum'] or 0
-        
-        return {
-            'total_inscrits': total_inscrits,
-            'total_votants': total_votants,
-            'total_exprimes': total_exprimes,
-            'total_nuls': total_nuls,
-            'total_blancs': total_blancs,
-            'taux_participation': round((total_votants / total_inscrits * 100), 2) if total_inscrits > 0 else 0,
-            'taux_nuls': round((total_nuls / total_votants * 100), 2) if total_votants > 0 else 0,
-            'taux_blancs': round((total_blancs / total_votants * 100), 2) if total_votants > 0 else 0,
-        }
+        return self.get_stats()['participation']
     
     @property
     def stats_incidents(self):
         """Statistiques des incidents de la commune"""
-        from  incidents.models import Incident
-        
-        incidents = Incident.objects.filter(
-            bureau_vote__lieu_vote__sous_prefecture__commune=self
-        )
-        
-        return {
-            'total': incidents.count(),
-            'ouverts': incidents.filter(statut='OUVERT').count(),
-            'en_cours': incidents.filter(statut='EN_COURS').count(),
-            'traites': incidents.filter(statut='TRAITE').count(),
-            'clos': incidents.filter(statut='CLOS').count(),
-            'urgents': incidents.filter(priorite='URGENTE').count(),
-            'par_categorie': dict(
-                incidents.values('categorie').annotate(count=Count('id')).values_list('categorie', 'count')
-            ),
-        }
+        return self.get_stats()['incidents']
     
     @property
     def stats_resultats_candidats(self):
-        """Résultats par candidat pour la commune"""
-        from  pv.models import ResultatCandidat
-        
-        resultats = ResultatCandidat.objects.filter(
-            proces_verbal__bureau_vote__lieu_vote__sous_prefecture__commune=self,
-            proces_verbal__statut='VALIDE'
-        ).values(
-            'candidat__nom_complet',
-            'candidat__parti_politique',
-            'candidat__numero_ordre'
-        ).annotate(
-            total_voix=Sum('nombre_voix')
-        ).order_by('-total_voix')
-        
-        total_voix = sum(r['total_voix'] for r in resultats)
-        
-        return [
-            {
-                'candidat': r['candidat__nom_complet'],
-                'parti': r['candidat__parti_politique'],
-                'numero': r['candidat__numero_ordre'],
-                'voix': r['total_voix'],
-                'pourcentage': round((r['total_voix'] / total_voix * 100), 2) if total_voix > 0 else 0
-            }
-            for r in resultats
-        ]
+        """Résultats par candidat pour la commune (cube des résultats, sans requête)"""
+        from statistics.services import cube_service
+        return cube_service.resultats('commune', self.pk)
     
     def get_stats_par_sous_prefecture(self):
         """Statistiques détaillées par sous-préfecture"""
-        stats = []
-        for sp in self.sous_prefectures.all():
-            stats.append({
-                'sous_prefecture': sp.nom_sous_prefecture,
-                'code': sp.code_sous_prefecture,
-                'bureaux': sp.stats_bureaux,
-                'pv': sp.stats_pv,
-                'participation': sp.stats_participation,
-                'incidents': sp.stats_incidents,
-            })
-        return stats
+        from geography.services import aggregation_service
+        return aggregation_service.stats_enfants(self)
 
 
 class SousPrefecture(BaseGeoModel):
@@ -556,6 +322,11 @@ class SousPrefecture(BaseGeoModel):
     # Métadonnées
     population = models.IntegerField(default=0)
 
+    CHAMP_PARENT = 'commune'
+    CHAMP_CODE = 'code_sous_prefecture'
+    
+    objects = HierarchieQuerySet.as_manager()
+
     class Meta:
         db_table = 'geo_sous_prefectures'
         ordering = ['nom_sous_prefecture']
@@ -574,132 +345,33 @@ class SousPrefecture(BaseGeoModel):
     @property
     def stats_bureaux(self):
         """Statistiques des bureaux de vote de la sous-préfecture"""
-        from  geography.models import BureauVote
-        
-        bureaux = BureauVote.objects.filter(
-            lieu_vote__sous_prefecture=self
-        )
-        
-        return {
-            'total': bureaux.count(),
-            'total_inscrits': bureaux.aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0,
-            'moyenne_inscrits': bureaux.aggregate(Avg('nombre_inscrits'))['nombre_inscrits__avg'] or 0,
-        }
+        return self.get_stats()['bureaux']
     
     @property
     def stats_pv(self):
         """Statistiques des PV de la sous-préfecture"""
-        from  pv.models import ProcesVerbal
-        
-        pv_sp = ProcesVerbal.objects.filter(
-            bureau_vote__lieu_vote__sous_prefecture=self
-        )
-        
-        total_bureaux = self.stats_bureaux['total']
-        total_pv = pv_sp.count()
-        
-        return {
-            'total_pv': total_pv,
-            'pv_en_attente': pv_sp.filter(statut='EN_ATTENTE').count(),
-            'pv_valides': pv_sp.filter(statut='VALIDE').count(),
-            'pv_rejetes': pv_sp.filter(statut='REJETE').count(),
-            'pv_en_correction': pv_sp.filter(statut='CORRECTION').count(),
-            'taux_soumission': round((total_pv / total_bureaux * 100), 2) if total_bureaux > 0 else 0,
-            'taux_validation': round(
-                (pv_sp.filter(statut='VALIDE').count() / total_pv * 100), 2
-            ) if total_pv > 0 else 0,
-        }
+        return self.get_stats()['pv']
     
     @property
     def stats_participation(self):
         """Statistiques de participation de la sous-préfecture"""
-        from  pv.models import ProcesVerbal
-        
-        pv_valides = ProcesVerbal.objects.filter(
-            bureau_vote__lieu_vote__sous_prefecture=self,
-            statut='VALIDE'
-        )
-        
-        total_inscrits = pv_valides.aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0
-        total_votants = pv_valides.aggregate(Sum('nombre_votants'))['nombre_votants__sum'] or 0
-        total_exprimes = pv_valides.aggregate(Sum('suffrages_exprimes'))['suffrages_exprimes__sum'] or 0
-        total_nuls = pv_valides.aggregate(Sum('bulletins_nuls'))['bulletins_nuls__sum'] or 0
-        total_blancs = pv_valides.aggregate(Sum('bulletins_blancs'))['bulletins_blancs__sum'] or 0
-        
-        return {
-            'total_inscrits': total_inscrits,
-            'total_votants': total_votants,
-            'total_exprimes': total_exprimes,
-            'total_nuls': total_nuls,
-            'total_blancs': total_blancs,
-            'taux_participation': round((total_votants / total_inscrits * 100), 2) if total_inscrits > 0 else 0,
-            'taux_nuls': round((total_nuls / total_votants * 100), 2) if total_votants > 0 else 0,
-            'taux_blancs': round((total_blancs / total_votants * 100), 2) if total_votants > 0 else 0,
-        }
+        return self.get_stats()['participation']
     
     @property
     def stats_incidents(self):
         """Statistiques des incidents de la sous-préfecture"""
-        from  incidents.models import Incident
-        
-        incidents = Incident.objects.filter(
-            bureau_vote__lieu_vote__sous_prefecture=self
-        )
-        
-        return {
-            'total': incidents.count(),
-            'ouverts': incidents.filter(statut='OUVERT').count(),
-            'en_cours': incidents.filter(statut='EN_COURS').count(),
-            'traites': incidents.filter(statut='TRAITE').count(),
-            'clos': incidents.filter(statut='CLOS').count(),
-            'urgents': incidents.filter(priorite='URGENTE').count(),
-            'par_categorie': dict(
-                incidents.values('categorie').annotate(count=Count('id')).values_list('categorie', 'count')
-            ),
-        }
+        return self.get_stats()['incidents']
     
     @property
     def stats_resultats_candidats(self):
-        """Résultats par candidat pour la sous-préfecture"""
-        from  pv.models import ResultatCandidat
-        
-        resultats = ResultatCandidat.objects.filter(
-            proces_verbal__bureau_vote__lieu_vote__sous_prefecture=self,
-            proces_verbal__statut='VALIDE'
-        ).values(
-            'candidat__nom_complet',
-            'candidat__parti_politique',
-            'candidat__numero_ordre'
-        ).annotate(
-            total_voix=Sum('nombre_voix')
-        ).order_by('-total_voix')
-        
-        total_voix = sum(r['total_voix'] for r in resultats)
-        
-        return [
-            {
-                'candidat': r['candidat__nom_complet'],
-                'parti': r['candidat__parti_politique'],
-                'numero': r['candidat__numero_ordre'],
-                'voix': r['total_voix'],
-                'pourcentage': round((r['total_voix'] / total_voix * 100), 2) if total_voix > 0 else 0
-            }
-            for r in resultats
-        ]
+        """Résultats par candidat pour la sous-préfecture (cube des résultats, sans requête)"""
+        from statistics.services import cube_service
+        return cube_service.resultats('sous_prefecture', self.pk)
     
     def get_stats_par_lieu_vote(self):
         """Statistiques détaillées par lieu de vote"""
-        stats = []
-        for lv in self.lieux_vote.all():
-            stats.append({
-                'lieu_vote': lv.nom_lv,
-                'code': lv.code_lv,
-                'bureaux': lv.stats_bureaux,
-                'pv': lv.stats_pv,
-                'participation': lv.stats_participation,
-                'incidents': lv.stats_incidents,
-            })
-        return stats
+        from geography.services import aggregation_service
+        return aggregation_service.stats_enfants(self)
 
 
 class LieuVote(BaseGeoModel):
@@ -755,6 +427,11 @@ class LieuVote(BaseGeoModel):
     # Capacité
     nombre_salles = models.IntegerField(default=1)
 
+    CHAMP_PARENT = 'sous_prefecture'
+    CHAMP_CODE = 'code_lv'
+    
+    objects = HierarchieQuerySet.as_manager()
+
     class Meta:
         db_table = 'geo_lieux_vote'
         ordering = ['code_lv']
@@ -790,124 +467,33 @@ class LieuVote(BaseGeoModel):
     @property
     def stats_bureaux(self):
         """Statistiques des bureaux de vote du lieu"""
-        bureaux = self.bureaux_vote.all()
-        
-        return {
-            'total': bureaux.count(),
-            'total_inscrits': bureaux.aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0,
-            'moyenne_inscrits': bureaux.aggregate(Avg('nombre_inscrits'))['nombre_inscrits__avg'] or 0,
-        }
+        return self.get_stats()['bureaux']
     
     @property
     def stats_pv(self):
         """Statistiques des PV du lieu de vote"""
-        from  pv.models import ProcesVerbal
-        
-        pv_lv = ProcesVerbal.objects.filter(bureau_vote__lieu_vote=self)
-        
-        total_bureaux = self.bureaux_vote.count()
-        total_pv = pv_lv.count()
-        
-        return {
-            'total_pv': total_pv,
-            'pv_en_attente': pv_lv.filter(statut='EN_ATTENTE').count(),
-            'pv_valides': pv_lv.filter(statut='VALIDE').count(),
-            'pv_rejetes': pv_lv.filter(statut='REJETE').count(),
-            'pv_en_correction': pv_lv.filter(statut='CORRECTION').count(),
-            'taux_soumission': round((total_pv / total_bureaux * 100), 2) if total_bureaux > 0 else 0,
-            'taux_validation': round(
-                (pv_lv.filter(statut='VALIDE').count() / total_pv * 100), 2
-            ) if total_pv > 0 else 0,
-        }
+        return self.get_stats()['pv']
     
     @property
     def stats_participation(self):
         """Statistiques de participation du lieu de vote"""
-        from  pv.models import ProcesVerbal
-        
-        pv_valides = ProcesVerbal.objects.filter(
-            bureau_vote__lieu_vote=self,
-            statut='VALIDE'
-        )
-        
-        total_inscrits = pv_valides.aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0
-        total_votants = pv_valides.aggregate(Sum('nombre_votants'))['nombre_votants__sum'] or 0
-        total_exprimes = pv_valides.aggregate(Sum('suffrages_exprimes'))['suffrages_exprimes__sum'] or 0
-        total_nuls = pv_valides.aggregate(Sum('bulletins_nuls'))['bulletins_nuls__sum'] or 0
-        total_blancs = pv_valides.aggregate(Sum('bulletins_blancs'))['bulletins_blancs__sum'] or 0
-        
-        return {
-            'total_inscrits': total_inscrits,
-            'total_votants': total_votants,
-            'total_exprimes': total_exprimes,
-            'total_nuls': total_nuls,
-            'total_blancs': total_blancs,
-            'taux_participation': round((total_votants / total_inscrits * 100), 2) if total_inscrits > 0 else 0,
-            'taux_nuls': round((total_nuls / total_votants * 100), 2) if total_votants > 0 else 0,
-            'taux_blancs': round((total_blancs / total_votants * 100), 2) if total_votants > 0 else 0,
-        }
+        return self.get_stats()['participation']
     
     @property
     def stats_incidents(self):
         """Statistiques des incidents du lieu de vote"""
-        from  incidents.models import Incident
-        
-        incidents = Incident.objects.filter(bureau_vote__lieu_vote=self)
-        
-        return {
-            'total': incidents.count(),
-            'ouverts': incidents.filter(statut='OUVERT').count(),
-            'en_cours': incidents.filter(statut='EN_COURS').count(),
-            'traites': incidents.filter(statut='TRAITE').count(),
-            'clos': incidents.filter(statut='CLOS').count(),
-            'urgents': incidents.filter(priorite='URGENTE').count(),
-            'par_categorie': dict(
-                incidents.values('categorie').annotate(count=Count('id')).values_list('categorie', 'count')
-            ),
-        }
+        return self.get_stats()['incidents']
     
     @property
     def stats_resultats_candidats(self):
-        """Résultats par candidat pour le lieu de vote"""
-        from  pv.models import ResultatCandidat
-        
-        resultats = ResultatCandidat.objects.filter(
-            proces_verbal__bureau_vote__lieu_vote=self,
-            proces_verbal__statut='VALIDE'
-        ).values(
-            'candidat__nom_complet',
-            'candidat__parti_politique',
-            'candidat__numero_ordre'
-        ).annotate(
-            total_voix=Sum('nombre_voix')
-        ).order_by('-total_voix')
-        
-        total_voix = sum(r['total_voix'] for r in resultats)
-        
-        return [
-            {
-                'candidat': r['candidat__nom_complet'],
-                'parti': r['candidat__parti_politique'],
-                'numero': r['candidat__numero_ordre'],
-                'voix': r['total_voix'],
-                'pourcentage': round((r['total_voix'] / total_voix * 100), 2) if total_voix > 0 else 0
-            }
-            for r in resultats
-        ]
+        """Résultats par candidat pour le lieu de vote (cube des résultats, sans requête)"""
+        from statistics.services import cube_service
+        return cube_service.resultats('lieu_vote', self.pk)
     
     def get_stats_par_bureau(self):
         """Statistiques détaillées par bureau de vote"""
-        stats = []
-        for bureau in self.bureaux_vote.all():
-            stats.append({
-                'bureau': bureau.nom_bv,
-                'code': bureau.code_bv,
-                'inscrits': bureau.nombre_inscrits,
-                'pv': bureau.stats_pv,
-                'participation': bureau.stats_participation,
-                'incidents': bureau.stats_incidents,
-            })
-        return stats
+        from geography.services import aggregation_service
+        return aggregation_service.stats_enfants(self)
 
 
 class BureauVote(BaseGeoModel):
@@ -946,6 +532,46 @@ class BureauVote(BaseGeoModel):
     # Statut opérationnel
     est_actif = models.BooleanField(default=True)
     commentaire = models.TextField(blank=True, null=True)
+    
+    # Ascendance dénormalisée (recopiée depuis lieu_vote à chaque sauvegarde)
+    sous_prefecture = models.ForeignKey(
+        SousPrefecture,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='bureaux_vote'
+    )
+    commune = models.ForeignKey(
+        Commune,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='bureaux_vote'
+    )
+    departement = models.ForeignKey(
+        Departement,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='bureaux_vote'
+    )
+    region = models.ForeignKey(
+        Region,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='bureaux_vote'
+    )
+    
+    CHAMPS_ASCENDANCE = ('sous_prefecture', 'commune', 'departement', 'region')
+    CHAMP_PARENT = 'lieu_vote'
+    CHAMP_CODE = 'code_bv'
+    
+    objects = BureauVoteManager()
 
     class Meta:
         db_table = 'geo_bureaux_vote'
@@ -957,11 +583,42 @@ class BureauVote(BaseGeoModel):
             models.Index(fields=['code_bv']),
             models.Index(fields=['lieu_vote', 'numero_ordre']),
             models.Index(fields=['est_actif']),
+            models.Index(fields=['region', 'est_actif']),
         ]
 
     def __str__(self):
         return f"{self.code_bv} - {self.nom_bv}"
     
+    def save(self, *args, **kwargs):
+        # Recopie de l'ascendance depuis le lieu de vote
+        self.synchroniser_ascendance()
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'lieu_vote' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | set(self.CHAMPS_ASCENDANCE)
+        
+        super().save(*args, **kwargs)
+    
+    def synchroniser_ascendance(self):
+        """Recopie sous-préfecture, commune, département et région depuis le lieu de vote"""
+        sous_prefecture = self.lieu_vote.sous_prefecture
+        commune = sous_prefecture.commune
+        
+        self.sous_prefecture = sous_prefecture
+        self.commune = commune
+        self.departement_id = commune.departement_id
+        self.region_id = commune.departement.region_id
+    
+    @property
+    def ascendance(self):
+        """Identifiants de l'ascendance, à recopier sur les PV et incidents"""
+        return {
+            'region_id': self.region_id,
+            'departement_id': self.departement_id,
+            'commune_id': self.commune_id,
+            'sous_prefecture_id': self.sous_prefecture_id,
+        }
+    
     def clean(self):
         """Validation du modèle"""
         super().clean()
@@ -971,22 +628,22 @@ class BureauVote(BaseGeoModel):
     @property
     def get_region(self):
         """Remonte jusqu'à la région"""
-        return self.lieu_vote.sous_prefecture.commune.departement.region
+        return self.region
     
     @property
     def get_departement(self):
         """Récupère le département"""
-        return self.lieu_vote.sous_prefecture.commune.departement
+        return self.departement
     
     @property
     def get_commune(self):
         """Récupère la commune"""
-        return self.lieu_vote.sous_prefecture.commune
+        return self.commune
     
     @property
     def get_sous_prefecture(self):
         """Récupère la sous-préfecture"""
-        return self.lieu_vote.sous_prefecture
+        return self.sous_prefecture
     
     @property
     def hierarchie_complete(self):
@@ -1005,71 +662,17 @@ class BureauVote(BaseGeoModel):
     @property
     def stats_pv(self):
         """Statistiques des PV du bureau"""
-        from  pv.models import ProcesVerbal
-        
-        pv_bureau = self.proces_verbaux.all()
-        
-        return {
-            'total_pv': pv_bureau.count(),
-            'pv_en_attente': pv_bureau.filter(statut='EN_ATTENTE').count(),
-            'pv_valides': pv_bureau.filter(statut='VALIDE').count(),
-            'pv_rejetes': pv_bureau.filter(statut='REJETE').count(),
-            'pv_en_correction': pv_bureau.filter(statut='CORRECTION').count(),
-            'a_pv_valide': pv_bureau.filter(statut='VALIDE').exists(),
-        }
+        return self.get_stats()['pv']
     
     @property
     def stats_participation(self):
         """Statistiques de participation du bureau"""
-        from  pv.models import ProcesVerbal
-        
-        pv_valide = self.proces_verbaux.filter(statut='VALIDE').first()
-        
-        if not pv_valide:
-            return {
-                'pv_disponible': False,
-                'total_inscrits': self.nombre_inscrits,
-                'total_votants': 0,
-                'total_exprimes': 0,
-                'total_nuls': 0,
-                'total_blancs': 0,
-                'taux_participation': 0,
-                'taux_nuls': 0,
-                'taux_blancs': 0,
-            }
-        
-        return {
-            'pv_disponible': True,
-            'total_inscrits': pv_valide.nombre_inscrits,
-            'total_votants': pv_valide.nombre_votants,
-            'total_exprimes': pv_valide.suffrages_exprimes,
-            'total_nuls': pv_valide.bulletins_nuls,
-            'total_blancs': pv_valide.bulletins_blancs,
-            'taux_participation': pv_valide.taux_participation,
-            'taux_nuls': round(
-                (pv_valide.bulletins_nuls / pv_valide.nombre_votants * 100), 2
-            ) if pv_valide.nombre_votants > 0 else 0,
-            'taux_blancs': round(
-                (pv_valide.bulletins_blancs / pv_valide.nombre_votants * 100), 2
-            ) if pv_valide.nombre_votants > 0 else 0,
-        }
+        return self.get_stats()['participation']
     
     @property
     def stats_incidents(self):
         """Statistiques des incidents du bureau"""
-        incidents = self.incidents.all()
-        
-        return {
-            'total': incidents.count(),
-            'ouverts': incidents.filter(statut='OUVERT').count(),
-            'en_cours': incidents.filter(statut='EN_COURS').count(),
-            'traites': incidents.filter(statut='TRAITE').count(),
-            'clos': incidents.filter(statut='CLOS').count(),
-            'urgents': incidents.filter(priorite='URGENTE').count(),
-            'par_categorie': dict(
-                incidents.values('categorie').annotate(count=Count('id')).values_list('categorie', 'count')
-            ),
-        }
+        return self.get_stats()['incidents']
     
     @property
     def stats_resultats_candidats(self):
@@ -1137,4 +740,70 @@ class BureauVote(BaseGeoModel):
             dates.append(dernier_checkin)
         
         return max(dates) if dates else None
-    
\ No newline at end of file
+    
+
+
+class ImportReferentiel(models.Model):
+    """
+    Import en tâche de fond d'un fichier du référentiel électoral, avec sa
+    progression et son point de reprise (lignes validées)
+    """
+    
+    FORMAT_CHOICES = [
+        ('COMPLET', 'Fichier complet (un lieu de vote par ligne)'),
+        ('CIRCONSCRIPTIONS', 'Fichier des circonscriptions'),
+    ]
+    
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('TERMINE', 'Terminé'),
+        ('ECHEC', 'Échec'),
+    ]
+    
+    fichier = models.CharField(max_length=500, help_text="Chemin du fichier enregistré")
+    format = models.CharField(max_length=20, choices=FORMAT_CHOICES, default='COMPLET')
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    
+    # Progression (lignes_traitees est le point de reprise)
+    lignes_total = models.IntegerField(default=0)
+    lignes_traitees = models.IntegerField(default=0)
+    lignes_erreur = models.IntegerField(default=0)
+    rapport = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Créations et mises à jour par niveau, erreurs, durée"
+    )
+    message = models.TextField(blank=True, null=True)
+    
+    demande_par = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'geo_imports_referentiel'
+        ordering = ['-created_at']
+        verbose_name = 'Import du référentiel'
+        verbose_name_plural = 'Imports du référentiel'
+        indexes = [
+            models.Index(fields=['statut', 'updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"Import {self.pk} ({self.format}) - {self.statut}"
+    
+    @property
+    def progression(self):
+        """Pourcentage de lignes traitées"""
+        if self.statut == 'TERMINE':
+            return 100
+        if not self.lignes_total:
+            return 0
+        return min(99, round(self.lignes_traitees * 100 / self.lignes_total))
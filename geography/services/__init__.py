@@ -0,0 +1,13 @@
+# geography/services/__init__.py
+from .aggregation_service import aggregation_service, AggregationService
+from .hierarchie_service import hierarchie_service, HierarchieService
+from .import_service import import_service, ImportService
+
+__all__ = [
+    'aggregation_service',
+    'AggregationService',
+    'hierarchie_service',
+    'HierarchieService',
+    'import_service',
+    'ImportService',
+]
@@ -0,0 +1,363 @@
+# geography/services/aggregation_service.py
+"""
+Moteur d'agrégation hiérarchique des statistiques géographiques
+
+Calcule les blocs bureaux / pv / participation / incidents d'un noeud
+(ou de tout un niveau) avec une requête GROUP BY par table, au lieu
+des 5 à 10 COUNT/SUM séparés de chaque propriété stats_*.
+"""
+from django.db.models import Count, Sum, Avg, Q, F, Value
+
+from geography.models import Region, Departement, Commune, SousPrefecture, LieuVote, BureauVote
+from pv.models import ProcesVerbal
+from incidents.models import Incident
+
+
+# Chemins vers chaque niveau : (depuis BureauVote, depuis ProcesVerbal / Incident).
+# Les niveaux administratifs utilisent les colonnes d'ascendance dénormalisées.
+NIVEAUX = {
+    'national': (None, None),
+    'region': ('region', 'region'),
+    'departement': ('departement', 'departement'),
+    'commune': ('commune', 'commune'),
+    'sous_prefecture': ('sous_prefecture', 'sous_prefecture'),
+    'lieu_vote': ('lieu_vote', 'bureau_vote__lieu_vote'),
+    'bureau_vote': ('id', 'bureau_vote'),
+}
+
+MODELES_NIVEAUX = {
+    Region: 'region',
+    Departement: 'departement',
+    Commune: 'commune',
+    SousPrefecture: 'sous_prefecture',
+    LieuVote: 'lieu_vote',
+    BureauVote: 'bureau_vote',
+}
+
+# Enfants directs de chaque niveau : (relation, niveau enfant, clé du nom, champ nom, champ code)
+ENFANTS = {
+    'region': ('departements', 'departement', 'departement', 'nom_departement', 'code_departement'),
+    'departement': ('communes', 'commune', 'commune', 'nom_commune', 'code_commune'),
+    'commune': ('sous_prefectures', 'sous_prefecture', 'sous_prefecture', 'nom_sous_prefecture', 'code_sous_prefecture'),
+    'sous_prefecture': ('lieux_vote', 'lieu_vote', 'lieu_vote', 'nom_lv', 'code_lv'),
+    'lieu_vote': ('bureaux_vote', 'bureau_vote', 'bureau', 'nom_bv', 'code_bv'),
+}
+
+
+class AggregationService:
+    """Service d'agrégation des statistiques par niveau géographique"""
+
+    def niveau_de(self, noeud):
+        """Retourne le nom du niveau d'une instance géographique"""
+        try:
+            return MODELES_NIVEAUX[type(noeud)]
+        except KeyError:
+            raise ValueError(f"Niveau géographique non supporté: {type(noeud).__name__}")
+
+    def _chemin(self, niveau, rattache=False):
+        """Chemin ORM vers le niveau, depuis BureauVote ou depuis un PV / incident"""
+        return NIVEAUX[niveau][1 if rattache else 0]
+
+    def _grouper(self, queryset, chemin, ids, *champs):
+        """Applique le filtre sur les noeuds et le regroupement par noeud"""
+        if chemin is None:
+            # Pas de regroupement : une seule ligne agrégée
+            return queryset.values(*champs, noeud=Value('national')).order_by()
+
+        if ids is not None:
+            queryset = queryset.filter(**{f'{chemin}__in': ids})
+
+        # order_by() vide : l'ordering par défaut ne doit pas entrer dans le GROUP BY
+        return queryset.values(*champs, noeud=F(chemin)).order_by()
+
+    # ========== REQUÊTES GROUPÉES ==========
+
+    def _agreger_bureaux(self, niveau, ids=None):
+        """Nombre de bureaux et inscrits par noeud (1 requête)"""
+        lignes = self._grouper(
+            BureauVote.objects.all(), self._chemin(niveau), ids
+        ).annotate(
+            total=Count('id'),
+            total_inscrits=Sum('nombre_inscrits'),
+            moyenne_inscrits=Avg('nombre_inscrits'),
+        )
+
+        return {ligne['noeud']: ligne for ligne in lignes}
+
+    def _agreger_pv(self, niveau, ids=None):
+        """Compteurs de PV par statut et sommes des PV validés par noeud (1 requête)"""
+        valide = Q(statut='VALIDE')
+
+        lignes = self._grouper(
+            ProcesVerbal.objects.all(), self._chemin(niveau, rattache=True), ids
+        ).annotate(
+            total_pv=Count('id'),
+            pv_en_attente=Count('id', filter=Q(statut='EN_ATTENTE')),
+            pv_valides=Count('id', filter=valide),
+            pv_rejetes=Count('id', filter=Q(statut='REJETE')),
+            pv_en_correction=Count('id', filter=Q(statut='CORRECTION')),
+            total_inscrits=Sum('nombre_inscrits', filter=valide),
+            total_votants=Sum('nombre_votants', filter=valide),
+            total_exprimes=Sum('suffrages_exprimes', filter=valide),
+            total_nuls=Sum('bulletins_nuls', filter=valide),
+            total_blancs=Sum('bulletins_blancs', filter=valide),
+        )
+
+        return {ligne['noeud']: ligne for ligne in lignes}
+
+    def _agreger_incidents(self, niveau, ids=None):
+        """Compteurs d'incidents par noeud, ventilés par catégorie (1 requête)"""
+        lignes = self._grouper(
+            Incident.objects.all(), self._chemin(niveau, rattache=True), ids, 'categorie'
+        ).annotate(
+            total=Count('id'),
+            ouverts=Count('id', filter=Q(statut='OUVERT')),
+            en_cours=Count('id', filter=Q(statut='EN_COURS')),
+            traites=Count('id', filter=Q(statut='TRAITE')),
+            clos=Count('id', filter=Q(statut='CLOS')),
+            urgents=Count('id', filter=Q(priorite='URGENTE')),
+        )
+
+        # Cumul des catégories pour obtenir les totaux du noeud
+        resultats = {}
+        for ligne in lignes:
+            stats = resultats.setdefault(ligne['noeud'], self._bloc_incidents_vide())
+            for champ in ('total', 'ouverts', 'en_cours', 'traites', 'clos', 'urgents'):
+                stats[champ] += ligne[champ]
+            stats['par_categorie'][ligne['categorie']] = ligne['total']
+
+        return resultats
+
+    def _pv_valides_bureaux(self, ids=None):
+        """Dernier PV validé de chaque bureau (1 requête, DISTINCT ON)"""
+        pv_valides = ProcesVerbal.objects.filter(statut='VALIDE')
+        if ids is not None:
+            pv_valides = pv_valides.filter(bureau_vote_id__in=ids)
+
+        lignes = pv_valides.order_by('bureau_vote_id', '-date_soumission').distinct(
+            'bureau_vote_id'
+        ).values(
+            'bureau_vote_id',
+            'nombre_inscrits',
+            'nombre_votants',
+            'suffrages_exprimes',
+            'bulletins_nuls',
+            'bulletins_blancs',
+        )
+
+        return {ligne['bureau_vote_id']: ligne for ligne in lignes}
+
+    # ========== MISE EN FORME ==========
+
+    def _bloc_bureaux(self, ligne):
+        """Bloc stats_bureaux"""
+        ligne = ligne or {}
+        return {
+            'total': ligne.get('total') or 0,
+            'total_inscrits': ligne.get('total_inscrits') or 0,
+            'moyenne_inscrits': ligne.get('moyenne_inscrits') or 0,
+        }
+
+    def _bloc_pv(self, ligne, total_bureaux):
+        """Bloc stats_pv"""
+        ligne = ligne or {}
+        total_pv = ligne.get('total_pv') or 0
+        pv_valides = ligne.get('pv_valides') or 0
+
+        return {
+            'total_pv': total_pv,
+            'pv_en_attente': ligne.get('pv_en_attente') or 0,
+            'pv_valides': pv_valides,
+            'pv_rejetes': ligne.get('pv_rejetes') or 0,
+            'pv_en_correction': ligne.get('pv_en_correction') or 0,
+            'taux_soumission': round((total_pv / total_bureaux * 100), 2) if total_bureaux > 0 else 0,
+            'taux_validation': round((pv_valides / total_pv * 100), 2) if total_pv > 0 else 0,
+        }
+
+    def _bloc_participation(self, ligne):
+        """Bloc stats_participation"""
+        ligne = ligne or {}
+        total_inscrits = ligne.get('total_inscrits') or 0
+        total_votants = ligne.get('total_votants') or 0
+        total_nuls = ligne.get('total_nuls') or 0
+        total_blancs = ligne.get('total_blancs') or 0
+
+        return {
+            'total_inscrits': total_inscrits,
+            'total_votants': total_votants,
+            'total_exprimes': ligne.get('total_exprimes') or 0,
+            'total_nuls': total_nuls,
+            'total_blancs': total_blancs,
+            'taux_participation': round((total_votants / total_inscrits * 100), 2) if total_inscrits > 0 else 0,
+            'taux_nuls': round((total_nuls / total_votants * 100), 2) if total_votants > 0 else 0,
+            'taux_blancs': round((total_blancs / total_votants * 100), 2) if total_votants > 0 else 0,
+        }
+
+    def _bloc_pv_bureau(self, ligne):
+        """Bloc stats_pv d'un bureau de vote"""
+        ligne = ligne or {}
+        pv_valides = ligne.get('pv_valides') or 0
+
+        return {
+            'total_pv': ligne.get('total_pv') or 0,
+            'pv_en_attente': ligne.get('pv_en_attente') or 0,
+            'pv_valides': pv_valides,
+            'pv_rejetes': ligne.get('pv_rejetes') or 0,
+            'pv_en_correction': ligne.get('pv_en_correction') or 0,
+            'a_pv_valide': pv_valides > 0,
+        }
+
+    def _bloc_participation_bureau(self, pv_valide, nombre_inscrits):
+        """Bloc stats_participation d'un bureau, à partir de son PV validé"""
+        if not pv_valide:
+            return {
+                'pv_disponible': False,
+                **self._bloc_participation({'total_inscrits': nombre_inscrits}),
+            }
+
+        return {
+            'pv_disponible': True,
+            **self._bloc_participation({
+                'total_inscrits': pv_valide['nombre_inscrits'],
+                'total_votants': pv_valide['nombre_votants'],
+                'total_exprimes': pv_valide['suffrages_exprimes'],
+                'total_nuls': pv_valide['bulletins_nuls'],
+                'total_blancs': pv_valide['bulletins_blancs'],
+            }),
+        }
+
+    def _bloc_incidents_vide(self):
+        """Bloc stats_incidents à zéro"""
+        return {
+            'total': 0,
+            'ouverts': 0,
+            'en_cours': 0,
+            'traites': 0,
+            'clos': 0,
+            'urgents': 0,
+            'par_categorie': {},
+        }
+
+    # ========== API PUBLIQUE ==========
+
+    def stats_niveau(self, niveau, ids=None):
+        """
+        Calcule les quatre blocs statistiques pour tous les noeuds d'un niveau
+        (ou seulement ceux de `ids`) en 3 requêtes GROUP BY (4 pour les bureaux).
+        Retourne {id_noeud: {'bureaux', 'pv', 'participation', 'incidents'}}
+        """
+        if niveau not in NIVEAUX:
+            raise ValueError(f"Niveau géographique inconnu: {niveau}")
+
+        if ids is not None:
+            ids = list(ids)
+            if not ids:
+                return {}
+
+        bureaux = self._agreger_bureaux(niveau, ids)
+        pv = self._agreger_pv(niveau, ids)
+        incidents = self._agreger_incidents(niveau, ids)
+
+        if ids is None:
+            noeuds = set(bureaux) | set(pv) | set(incidents)
+        else:
+            noeuds = ids
+
+        if niveau == 'bureau_vote':
+            return self._stats_bureaux_vote(noeuds, bureaux, pv, incidents, ids)
+
+        resultats = {}
+        for noeud in noeuds:
+            bloc_bureaux = self._bloc_bureaux(bureaux.get(noeud))
+            resultats[noeud] = {
+                'bureaux': bloc_bureaux,
+                'pv': self._bloc_pv(pv.get(noeud), bloc_bureaux['total']),
+                'participation': self._bloc_participation(pv.get(noeud)),
+                'incidents': incidents.get(noeud) or self._bloc_incidents_vide(),
+            }
+
+        return resultats
+
+    def _stats_bureaux_vote(self, noeuds, bureaux, pv, incidents, ids):
+        """Blocs au format des propriétés stats_* de BureauVote (+1 requête)"""
+        pv_valides = self._pv_valides_bureaux(ids)
+
+        resultats = {}
+        for noeud in noeuds:
+            bloc_bureaux = self._bloc_bureaux(bureaux.get(noeud))
+            resultats[noeud] = {
+                'bureaux': bloc_bureaux,
+                'pv': self._bloc_pv_bureau(pv.get(noeud)),
+                'participation': self._bloc_participation_bureau(
+                    pv_valides.get(noeud), bloc_bureaux['total_inscrits']
+                ),
+                'incidents': incidents.get(noeud) or self._bloc_incidents_vide(),
+            }
+
+        return resultats
+
+    def stats_noeud(self, noeud):
+        """Les quatre blocs statistiques d'une instance géographique"""
+        return self.stats_niveau(self.niveau_de(noeud), [noeud.pk])[noeud.pk]
+
+    def stats_national(self):
+        """Les quatre blocs statistiques au niveau national"""
+        return self.stats_niveau('national')['national']
+
+    def attacher_stats(self, noeuds):
+        """
+        Pré-calcule les statistiques d'une liste d'instances d'un même niveau
+        et les attache aux instances : leurs propriétés stats_* ne font
+        ensuite plus aucune requête.
+        """
+        noeuds = list(noeuds)
+        if not noeuds:
+            return noeuds
+
+        stats = self.stats_niveau(self.niveau_de(noeuds[0]), [n.pk for n in noeuds])
+        for noeud in noeuds:
+            noeud._stats_agregees = stats[noeud.pk]
+
+        return noeuds
+
+    def stats_enfants(self, noeud):
+        """
+        Statistiques détaillées de tous les enfants directs d'un noeud,
+        au format des méthodes get_stats_par_*.
+        Nombre de requêtes fixe (enfants + GROUP BY), quel que soit le nombre d'enfants.
+        """
+        niveau = self.niveau_de(noeud)
+        if niveau not in ENFANTS:
+            raise ValueError(f"Le niveau {niveau} n'a pas d'enfants")
+
+        relation, niveau_enfant, cle_nom, champ_nom, champ_code = ENFANTS[niveau]
+
+        enfants = list(getattr(noeud, relation).all())
+        stats = self.stats_niveau(niveau_enfant, [enfant.pk for enfant in enfants])
+
+        resultats = []
+        for enfant in enfants:
+            stats_enfant = stats[enfant.pk]
+            enfant._stats_agregees = stats_enfant
+
+            ligne = {
+                cle_nom: getattr(enfant, champ_nom),
+                'code': getattr(enfant, champ_code),
+            }
+            if niveau_enfant == 'bureau_vote':
+                ligne['inscrits'] = enfant.nombre_inscrits
+            else:
+                ligne['bureaux'] = stats_enfant['bureaux']
+
+            ligne.update({
+                'pv': stats_enfant['pv'],
+                'participation': stats_enfant['participation'],
+                'incidents': stats_enfant['incidents'],
+            })
+            resultats.append(ligne)
+
+        return resultats
+
+
+# Instance singleton
+aggregation_service = AggregationService()
@@ -0,0 +1,175 @@
+# geography/services/hierarchie_service.py
+"""
+Maintien de l'ascendance dénormalisée (région, département, commune,
+sous-préfecture) portée par BureauVote, ProcesVerbal et Incident,
+et des chemins matérialisés des six niveaux géographiques.
+
+Toutes les mises à jour sont ensemblistes : un UPDATE ... SET col = (SELECT ...)
+par table, sans charger les lignes en mémoire.
+"""
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Q, F, Value, CharField
+from django.db.models.functions import Concat, Substr
+
+from geography.models import Region, Departement, Commune, SousPrefecture, LieuVote, BureauVote
+from pv.models import ProcesVerbal
+from incidents.models import Incident
+
+
+# Ascendance d'un bureau, lue depuis son lieu de vote
+CHEMINS_DEPUIS_LIEU_VOTE = {
+    'sous_prefecture': 'sous_prefecture',
+    'commune': 'sous_prefecture__commune',
+    'departement': 'sous_prefecture__commune__departement',
+    'region': 'sous_prefecture__commune__departement__region',
+}
+
+# Objets rattachés à un bureau, qui recopient son ascendance
+RATTACHES = {
+    'proces_verbaux': ProcesVerbal,
+    'incidents': Incident,
+}
+
+# Niveaux du haut vers le bas
+MODELES_HIERARCHIE = [Region, Departement, Commune, SousPrefecture, LieuVote, BureauVote]
+
+# Niveau de chaque modèle dans la colonne d'ascendance des bureaux
+COLONNES_NIVEAUX = {
+    Departement: 'departement',
+    Commune: 'commune',
+    SousPrefecture: 'sous_prefecture',
+    LieuVote: 'lieu_vote',
+}
+
+
+class HierarchieService:
+    """Service de synchronisation de l'ascendance dénormalisée"""
+
+    def _sous_requetes(self, modele, reference, chemins):
+        """Une sous-requête corrélée par colonne à recopier"""
+        return {
+            champ: Subquery(modele.objects.filter(pk=OuterRef(reference)).values(chemin)[:1])
+            for champ, chemin in chemins.items()
+        }
+
+    def synchroniser_bureaux(self, bureaux=None):
+        """Recopie l'ascendance des lieux de vote sur les bureaux"""
+        if bureaux is None:
+            bureaux = BureauVote.objects.all()
+
+        return bureaux.update(
+            **self._sous_requetes(LieuVote, 'lieu_vote_id', CHEMINS_DEPUIS_LIEU_VOTE)
+        )
+
+    def synchroniser_rattaches(self, bureaux=None, rattaches=None):
+        """
+        Recopie l'ascendance des bureaux sur leurs PV et incidents
+        (`rattaches` : sous-ensemble des clés de RATTACHES, tous par défaut)
+        """
+        chemins = {champ: champ for champ in BureauVote.CHAMPS_ASCENDANCE}
+        resultats = {}
+
+        for cle in rattaches or RATTACHES:
+            modele = RATTACHES[cle]
+            queryset = modele.objects.all()
+            if bureaux is not None:
+                queryset = queryset.filter(bureau_vote__in=bureaux.values('pk'))
+
+            resultats[cle] = queryset.update(
+                **self._sous_requetes(BureauVote, 'bureau_vote_id', chemins)
+            )
+
+        return resultats
+
+    @transaction.atomic
+    def propager(self, noeud):
+        """
+        Propage un changement de parent d'un noeud (département, commune,
+        sous-préfecture, lieu de vote ou bureau) à tous ses descendants
+        """
+        if isinstance(noeud, BureauVote):
+            # Le bureau s'est déjà resynchronisé dans save()
+            bureaux = BureauVote.objects.filter(pk=noeud.pk)
+        else:
+            colonne = COLONNES_NIVEAUX[type(noeud)]
+            bureaux = BureauVote.objects.filter(**{colonne: noeud})
+            self.synchroniser_bureaux(bureaux)
+
+        return self.synchroniser_rattaches(bureaux)
+
+    @transaction.atomic
+    def propager_chemin(self, noeud, ancien_chemin):
+        """Réécrit le préfixe des chemins de tous les descendants d'un noeud déplacé ou renommé"""
+        index = MODELES_HIERARCHIE.index(type(noeud))
+        nouveau_chemin = Concat(
+            Value(noeud.chemin),
+            Substr('chemin', len(ancien_chemin) + 1),
+            output_field=CharField(),
+        )
+
+        return {
+            modele._meta.model_name: modele.objects.filter(
+                chemin__startswith=ancien_chemin
+            ).update(chemin=nouveau_chemin)
+            for modele in MODELES_HIERARCHIE[index + 1:]
+        }
+
+    def synchroniser_chemins(self):
+        """Recalcule les chemins matérialisés, niveau par niveau (du haut vers le bas)"""
+        resultats = {}
+
+        for modele in MODELES_HIERARCHIE:
+            elements = [F(modele.CHAMP_CODE), Value('/')]
+            if modele.CHAMP_PARENT:
+                parent = modele._meta.get_field(modele.CHAMP_PARENT).related_model
+                elements.insert(0, Subquery(
+                    parent.objects.filter(pk=OuterRef(f'{modele.CHAMP_PARENT}_id')).values('chemin')[:1]
+                ))
+
+            resultats[modele._meta.model_name] = modele.objects.update(
+                chemin=Concat(*elements, output_field=CharField())
+            )
+
+        return resultats
+
+    @transaction.atomic
+    def synchroniser_tout(self):
+        """Recalcule chemins et ascendance dénormalisée (backfill)"""
+        resultats = {
+            'chemins': sum(self.synchroniser_chemins().values()),
+            'bureaux_vote': self.synchroniser_bureaux(),
+        }
+        resultats.update(self.synchroniser_rattaches())
+        return resultats
+
+    def verifier(self):
+        """Nombre de lignes dont l'ascendance est vide ou diverge de la hiérarchie réelle"""
+        def divergents(queryset, chemin):
+            return queryset.filter(
+                Q(region__isnull=True) | ~Q(region=F(f'{chemin}region')) |
+                ~Q(commune=F(f'{chemin}commune'))
+            ).count()
+
+        chemins_divergents = 0
+        for modele in MODELES_HIERARCHIE:
+            attendu = [F(modele.CHAMP_CODE), Value('/')]
+            if modele.CHAMP_PARENT:
+                attendu.insert(0, F(f'{modele.CHAMP_PARENT}__chemin'))
+            chemins_divergents += modele.objects.exclude(
+                chemin=Concat(*attendu, output_field=CharField())
+            ).count()
+
+        return {
+            'chemins': chemins_divergents,
+            'bureaux_vote': BureauVote.objects.filter(
+                Q(region__isnull=True) |
+                ~Q(region=F(f"lieu_vote__{CHEMINS_DEPUIS_LIEU_VOTE['region']}")) |
+                ~Q(commune=F(f"lieu_vote__{CHEMINS_DEPUIS_LIEU_VOTE['commune']}"))
+            ).count(),
+            'proces_verbaux': divergents(ProcesVerbal.objects.all(), 'bureau_vote__'),
+            'incidents': divergents(Incident.objects.all(), 'bureau_vote__'),
+        }
+
+
+# Instance singleton
+hierarchie_service = HierarchieService()
@@ -0,0 +1,419 @@
+# geography/services/import_service.py
+"""
+Import en masse du référentiel électoral (régions -> bureaux de vote)
+
+Le fichier est lu en flux (générateur de lignes) et traité par lots de
+TAILLE_LOT lignes. Pour chaque lot et chaque niveau, dans l'ordre de la
+hiérarchie : une requête sur les codes du lot, puis bulk_create des noeuds
+nouveaux (chemin et ascendance calculés en mémoire, les signaux n'étant pas
+émis) et bulk_update des noms ou volumes modifiés. Un noeud existant n'est
+jamais déplacé : le rattachement en base fait foi.
+
+Chaque ligne du fichier est convertie en noeuds (niveau, code, code parent,
+valeurs) par le format du fichier : COMPLET (une ligne par lieu de vote,
+séparateur TAB) ou CIRCONSCRIPTIONS (une ligne par circonscription).
+
+ImportReferentiel suit un import en tâche de fond : chaque lot est validé
+dans la même transaction que le point de reprise (lignes traitées), si bien
+qu'un import interrompu reprend au lot suivant le dernier validé.
+"""
+import csv
+import os
+import time
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from geography.models import Region, Departement, Commune, SousPrefecture, LieuVote, BureauVote
+
+
+TAILLE_LOT = 1000
+
+# Niveau -> (modèle, champ code, niveau parent, ascendance lue en base : champ -> chemin ORM)
+NIVEAUX_IMPORT = {
+    'regions': (Region, 'code_region', None, {}),
+    'departements': (Departement, 'code_departement', 'regions', {
+        'region_id': 'region_id',
+    }),
+    'communes': (Commune, 'code_commune', 'departements', {
+        'departement_id': 'departement_id',
+        'region_id': 'departement__region_id',
+    }),
+    'sous_prefectures': (SousPrefecture, 'code_sous_prefecture', 'communes', {
+        'commune_id': 'commune_id',
+        'departement_id': 'commune__departement_id',
+        'region_id': 'commune__departement__region_id',
+    }),
+    'lieux_vote': (LieuVote, 'code_lv', 'sous_prefectures', {
+        'sous_prefecture_id': 'sous_prefecture_id',
+        'commune_id': 'sous_prefecture__commune_id',
+        'departement_id': 'sous_prefecture__commune__departement_id',
+        'region_id': 'sous_prefecture__commune__departement__region_id',
+    }),
+    'bureaux_vote': (BureauVote, 'code_bv', 'lieux_vote', {}),
+}
+
+# Champ identifiant du parent, recopié dans l'ascendance des enfants
+CHAMPS_PARENT = {
+    'regions': 'region_id',
+    'departements': 'departement_id',
+    'communes': 'commune_id',
+    'sous_prefectures': 'sous_prefecture_id',
+    'lieux_vote': 'lieu_vote_id',
+}
+
+
+def _entier(valeur):
+    return int(valeur.strip().replace(' ', '').replace(',', ''))
+
+
+def _noeuds_complet(row):
+    """Ligne du fichier complet (un lieu de vote et ses bureaux) -> noeuds"""
+    cr = row['C.R'].strip()
+    code_dept = row['CODE_DEPT'].strip()
+    code_sp = row['CODE_SP'].strip()
+    code_com = row['CODE_COM'].strip()
+    code_lv = row['CODE_LV'].strip()
+    lib_lv = row['LIB_LV'].strip()
+    nbre_bv = _entier(row['NBRE BV'])
+    pop_elect = _entier(row['POP ELECT'])
+    code_region = f"REG-{cr.zfill(2)}"
+
+    # Coordonnées fictives dérivées des codes
+    offset = Decimal(code_lv) * Decimal('0.001') if code_lv.isdigit() else Decimal('0.001')
+    latitude = Decimal('5.0') + int(cr) * Decimal('0.5') + offset
+    longitude = Decimal('-4.0') - int(code_dept) * Decimal('0.1') + offset
+
+    inscrits_par_bv = pop_elect // nbre_bv if nbre_bv > 0 else pop_elect
+
+    return [
+        ('regions', code_region, None, {'nom_region': row['REGION'].strip()}),
+        ('departements', code_dept, code_region, {'nom_departement': row['LIB_DEPT'].strip()}),
+        ('communes', code_com, code_dept, {'nom_commune': row['LIB_COM'].strip()}),
+        ('sous_prefectures', code_sp, code_com, {'nom_sous_prefecture': row['LIB_SP'].strip()}),
+        ('lieux_vote', code_lv, code_sp, {
+            'nom_lv': lib_lv, 'latitude': latitude, 'longitude': longitude, 'type_lieu': 'ECOLE',
+        }),
+    ] + [
+        ('bureaux_vote', f"{code_lv}-BV{bv_num:02d}", code_lv, {
+            'nom_bv': f"{lib_lv} - Bureau {bv_num}", 'numero_ordre': bv_num, 'nombre_inscrits': inscrits_par_bv,
+        })
+        for bv_num in range(1, nbre_bv + 1)
+    ]
+
+
+MENTIONS_GENERIQUES = ('COMMUNES ET SOUS-PREFECTURES', 'COMMUNE ET SOUS-PREFECTURE', 'SOUS-PREFECTURE', 'COMMUNE')
+
+
+def extraire_communes(circonscription):
+    """Extrait la liste des communes (3 au plus) depuis le libellé d'une circonscription"""
+    communes = []
+    for part in circonscription.upper().split(','):
+        part = part.strip()
+        # Enlever les mentions génériques
+        for mention in MENTIONS_GENERIQUES:
+            part = part.replace(mention, '')
+        part = part.strip()
+        if part and len(part) > 2:
+            communes.append(part.title())
+
+    # Si aucune commune extraite, utiliser le premier élément
+    return (communes or [circonscription.split(',')[0].strip().title()])[:3]
+
+
+def _noeuds_circonscription(row):
+    """Ligne du fichier des circonscriptions -> noeuds (lieux et bureaux générés)"""
+    cod_cir = row['Cod Cir'].strip()
+    circonscription = row['Circonscription'].strip()
+    nbre_lv = _entier(row['Nbre LV'])
+    nbre_bv = _entier(row['Nbre de BV'])
+    pop_electorale = _entier(row['Pop Electorale'])
+    code_region = f"REG-{row['N°Ordre'].strip().zfill(2)}"
+    code_dept = f"DEPT-{cod_cir}"
+    nom_dept = circonscription.split(',')[0].strip()
+
+    noeuds = [
+        ('regions', code_region, None, {'nom_region': row['Libelle_Region'].strip()}),
+        ('departements', code_dept, code_region, {'nom_departement': nom_dept}),
+    ]
+    for i, commune_nom in enumerate(extraire_communes(circonscription), 1):
+        noeuds.append(('communes', f"COM-{cod_cir}-{i:02d}", code_dept, {'nom_commune': commune_nom}))
+        noeuds.append(('sous_prefectures', f"SP-{cod_cir}-{i:02d}", f"COM-{cod_cir}-{i:02d}", {
+            'nom_sous_prefecture': f'Sous-Préfecture {commune_nom}',
+        }))
+    code_sp = noeuds[-1][1]
+
+    # Lieux de vote rattachés à la dernière sous-préfecture, bureaux répartis par lieu
+    inscrits_par_bv = pop_electorale // nbre_bv if nbre_bv > 0 else 500
+    bv_par_lv = max(1, nbre_bv // nbre_lv if nbre_lv > 0 else 1)
+    for lv_num in range(1, nbre_lv + 1):
+        code_lv = f"LV-{cod_cir}-{lv_num:03d}"
+        noeuds.append(('lieux_vote', code_lv, code_sp, {
+            'nom_lv': f'Lieu de vote {nom_dept} - {lv_num}',
+            'latitude': Decimal('5.3599517') + lv_num * Decimal('0.001'),
+            'longitude': Decimal('-4.0082563') + lv_num * Decimal('0.001'),
+            'type_lieu': 'ECOLE',
+        }))
+        for bv_num in range(1, bv_par_lv + 1):
+            global_bv_num = (lv_num - 1) * bv_par_lv + bv_num
+            if global_bv_num > nbre_bv:
+                break
+            noeuds.append(('bureaux_vote', f"BV-{cod_cir}-{global_bv_num:03d}", code_lv, {
+                'nom_bv': f'Bureau {nom_dept} - {global_bv_num}',
+                'numero_ordre': bv_num,
+                'nombre_inscrits': inscrits_par_bv,
+            }))
+    return noeuds
+
+
+# Format de fichier -> (séparateur, conversion d'une ligne en noeuds)
+FORMATS = {
+    'COMPLET': ('\t', _noeuds_complet),
+    'CIRCONSCRIPTIONS': (',', _noeuds_circonscription),
+}
+
+
+class ImportService:
+    """Import en masse, par lots, du référentiel électoral"""
+
+    @property
+    def repertoire(self):
+        return getattr(settings, 'GEOGRAPHIE_IMPORT_REPERTOIRE', '') or os.path.join(
+            settings.MEDIA_ROOT, 'imports'
+        )
+
+    def rapport_vide(self):
+        return {
+            'niveaux': {niveau: {'crees': 0, 'mis_a_jour': 0} for niveau in NIVEAUX_IMPORT},
+            'lignes_traitees': 0,
+            'erreurs': 0,
+            'messages_erreur': [],
+            'duree_ms': 0,
+        }
+
+    def resume(self, rapport):
+        """Résumé lisible d'un rapport d'import, une ligne par niveau"""
+        libelles = {
+            'regions': 'Régions', 'departements': 'Départements', 'communes': 'Communes',
+            'sous_prefectures': 'Sous-préfectures', 'lieux_vote': 'Lieux de vote', 'bureaux_vote': 'Bureaux de vote',
+        }
+        lignes = [
+            f"{libelles[niveau]}: {compteurs['crees']} créé(s), {compteurs['mis_a_jour']} mis à jour"
+            for niveau, compteurs in rapport['niveaux'].items()
+        ]
+        lignes.append(
+            f"{rapport['lignes_traitees']} lignes traitées, {rapport['erreurs']} en erreur, "
+            f"en {rapport['duree_ms']} ms"
+        )
+        return lignes
+
+    def lignes(self, flux, format_fichier='COMPLET', debut=0):
+        """
+        Lignes du fichier en flux : (numéro, noeuds) ou (numéro, exception) si la
+        ligne est invalide. Les `debut` premières lignes sont sautées (reprise)
+        """
+        delimiteur, convertir = FORMATS[format_fichier]
+        reader = csv.DictReader(flux, delimiter=delimiteur)
+        for numero, row in enumerate(islice(reader, debut, None), start=debut + 1):
+            try:
+                yield numero, convertir(row)
+            except (KeyError, ValueError, TypeError, AttributeError) as e:
+                yield numero, e
+
+    def lots(self, lignes, taille=TAILLE_LOT):
+        while lot := list(islice(lignes, taille)):
+            yield lot
+
+    def importer_lot(self, lot, rapport):
+        """Applique un lot de lignes : une lecture par niveau, puis créations et mises à jour groupées"""
+        par_niveau = {niveau: {} for niveau in NIVEAUX_IMPORT}
+        for numero, noeuds in lot:
+            rapport['lignes_traitees'] += 1
+            if isinstance(noeuds, Exception):
+                rapport['erreurs'] += 1
+                if len(rapport['messages_erreur']) < 50:
+                    rapport['messages_erreur'].append(f"Ligne {numero}: {noeuds!r}")
+                continue
+            for niveau, code, parent, valeurs in noeuds:
+                par_niveau[niveau].setdefault(code, (parent, valeurs))
+
+        # Noeuds du lot, par niveau : code -> (pk, chemin, ascendance complète)
+        positions = {}
+        for niveau, (modele, champ_code, niveau_parent, chemins_ascendance) in NIVEAUX_IMPORT.items():
+            noeuds = par_niveau[niveau]
+            positions[niveau] = {}
+            if not noeuds:
+                continue
+
+            champs = sorted({champ for _, valeurs in noeuds.values() for champ in valeurs})
+            existants = {
+                ligne[champ_code]: ligne
+                for ligne in modele.objects.filter(**{f'{champ_code}__in': list(noeuds)}).values(
+                    'pk', 'chemin', champ_code, *champs, **{
+                        f'_{champ}': F(chemin) for champ, chemin in chemins_ascendance.items()
+                    }
+                )
+            }
+
+            attributs = {champ.attname for champ in modele._meta.concrete_fields}
+            a_creer, a_modifier = [], []
+            for code, (parent, valeurs) in noeuds.items():
+                existant = existants.get(code)
+                if existant is not None:
+                    ascendance = {champ: existant[f'_{champ}'] for champ in chemins_ascendance}
+                    positions[niveau][code] = (existant['pk'], existant['chemin'], ascendance)
+                    if any(existant[champ] != valeur for champ, valeur in valeurs.items()):
+                        a_modifier.append(modele(
+                            pk=existant['pk'], **{**{champ: existant[champ] for champ in champs}, **valeurs}
+                        ))
+                    continue
+
+                prefixe, ascendance = '', {}
+                if niveau_parent:
+                    parent_pk, prefixe, ascendance = positions[niveau_parent][parent]
+                    ascendance = {**ascendance, CHAMPS_PARENT[niveau_parent]: parent_pk}
+                instance = modele(
+                    **{champ_code: code, 'chemin': f'{prefixe}{code}/'},
+                    **{champ: valeur for champ, valeur in ascendance.items() if champ in attributs},
+                    **valeurs
+                )
+                a_creer.append(instance)
+                positions[niveau][code] = (instance, instance.chemin, ascendance)
+
+            # PostgreSQL renvoie les clés des lignes insérées
+            modele.objects.bulk_create(a_creer, batch_size=TAILLE_LOT)
+            for instance in a_creer:
+                code = getattr(instance, champ_code)
+                _, chemin, ascendance = positions[niveau][code]
+                positions[niveau][code] = (instance.pk, chemin, ascendance)
+
+            if a_modifier:
+                maintenant = timezone.now()
+                for instance in a_modifier:
+                    instance.updated_at = maintenant
+                modele.objects.bulk_update(a_modifier, champs + ['updated_at'], batch_size=TAILLE_LOT)
+
+            rapport['niveaux'][niveau]['crees'] += len(a_creer)
+            rapport['niveaux'][niveau]['mis_a_jour'] += len(a_modifier)
+
+        return rapport
+
+    def importer(self, flux, format_fichier='COMPLET', rapport=None, apres_lot=None):
+        """
+        Importe un fichier en flux, un lot par transaction. `apres_lot(rapport)`
+        est appelé dans la transaction de chaque lot (point de reprise)
+        """
+        from geography.signals import referentiel_importe
+
+        debut = time.monotonic()
+        rapport = rapport or self.rapport_vide()
+        duree_initiale = rapport['duree_ms']
+
+        for lot in self.lots(self.lignes(flux, format_fichier, rapport['lignes_traitees'])):
+            with transaction.atomic():
+                self.importer_lot(lot, rapport)
+                rapport['duree_ms'] = duree_initiale + int((time.monotonic() - debut) * 1000)
+                if apres_lot:
+                    apres_lot(rapport)
+
+        referentiel_importe.send(sender=self.__class__, rapport=rapport)
+        return rapport
+
+    def importer_fichier(self, chemin, format_fichier='COMPLET', rapport=None, apres_lot=None):
+        with open(chemin, 'r', encoding='utf-8', newline='') as flux:
+            return self.importer(flux, format_fichier, rapport, apres_lot)
+
+    # ========== IMPORT EN TÂCHE DE FOND ==========
+
+    def enregistrer(self, fichier, format_fichier='COMPLET', user=None):
+        """
+        Enregistre un fichier envoyé (par morceaux, sans le charger en mémoire)
+        et planifie son import ; retourne l'ImportReferentiel
+        """
+        from geography.models import ImportReferentiel
+        from geography.tasks import importer_referentiel
+
+        if format_fichier not in FORMATS:
+            raise ValueError(f"Format de fichier non supporté: {format_fichier}")
+
+        os.makedirs(self.repertoire, exist_ok=True)
+        chemin = os.path.join(self.repertoire, f"{timezone.now():%Y%m%d_%H%M%S}_{os.path.basename(fichier.name)}")
+        lignes_total = -1
+        with open(chemin, 'wb') as destination:
+            for morceau in fichier.chunks():
+                destination.write(morceau)
+                lignes_total += morceau.count(b'\n')
+
+        import_referentiel = ImportReferentiel.objects.create(
+            fichier=chemin,
+            format=format_fichier,
+            lignes_total=max(lignes_total, 0),
+            demande_par=user,
+        )
+        transaction.on_commit(lambda: importer_referentiel.delay(import_referentiel.pk))
+        return import_referentiel
+
+    def executer(self, import_id):
+        """
+        Exécute (ou reprend au dernier point de reprise) un import. Un import en
+        cours dont le point de reprise date de plus de GEOGRAPHIE_IMPORT_DELAI_REPRISE
+        secondes est considéré comme interrompu et peut être repris
+        """
+        from geography.models import ImportReferentiel
+
+        delai = getattr(settings, 'GEOGRAPHIE_IMPORT_DELAI_REPRISE', 300)
+        limite = timezone.now() - timedelta(seconds=delai)
+        if not ImportReferentiel.objects.filter(
+            Q(statut='EN_ATTENTE') | Q(statut='EN_COURS', updated_at__lt=limite), pk=import_id
+        ).update(statut='EN_COURS', updated_at=timezone.now()):
+            return None
+
+        import_referentiel = ImportReferentiel.objects.get(pk=import_id)
+        rapport = import_referentiel.rapport or self.rapport_vide()
+        rapport['lignes_traitees'] = import_referentiel.lignes_traitees
+
+        def point_de_reprise(rapport):
+            ImportReferentiel.objects.filter(pk=import_id).update(
+                lignes_traitees=rapport['lignes_traitees'],
+                lignes_erreur=rapport['erreurs'],
+                rapport=rapport,
+                updated_at=timezone.now(),
+            )
+
+        try:
+            rapport = self.importer_fichier(
+                import_referentiel.fichier, import_referentiel.format, rapport, point_de_reprise
+            )
+        except Exception as e:
+            ImportReferentiel.objects.filter(pk=import_id).update(
+                statut='ECHEC', message=str(e), date_fin=timezone.now()
+            )
+            raise
+
+        ImportReferentiel.objects.filter(pk=import_id).update(
+            statut='TERMINE',
+            lignes_traitees=rapport['lignes_traitees'],
+            lignes_total=rapport['lignes_traitees'],
+            lignes_erreur=rapport['erreurs'],
+            rapport=rapport,
+            date_fin=timezone.now(),
+        )
+        return rapport
+
+    def interrompus(self):
+        """Imports en cours dont le point de reprise est trop ancien (worker arrêté)"""
+        from geography.models import ImportReferentiel
+
+        delai = getattr(settings, 'GEOGRAPHIE_IMPORT_DELAI_REPRISE', 300)
+        return ImportReferentiel.objects.filter(
+            statut='EN_COURS', updated_at__lt=timezone.now() - timedelta(seconds=delai)
+        )
+
+
+# Instance singleton
+import_service = ImportService()
@@ -0,0 +1,57 @@
+# geography/signals.py
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import Signal, receiver
+from .models import Region, Departement, Commune, SousPrefecture, LieuVote, BureauVote
+
+
+# Champ parent de chaque niveau dont le déplacement impacte l'ascendance dénormalisée
+PARENTS = {
+    Region: None,
+    Departement: 'region_id',
+    Commune: 'departement_id',
+    SousPrefecture: 'commune_id',
+    LieuVote: 'sous_prefecture_id',
+    BureauVote: 'lieu_vote_id',
+}
+
+# Émis après un import en masse (bulk_create / bulk_update, sans signaux par instance)
+# argument : rapport (créations et mises à jour par niveau)
+referentiel_importe = Signal()
+
+
+@receiver(pre_save, sender=Region)
+@receiver(pre_save, sender=Departement)
+@receiver(pre_save, sender=Commune)
+@receiver(pre_save, sender=SousPrefecture)
+@receiver(pre_save, sender=LieuVote)
+@receiver(pre_save, sender=BureauVote)
+def memoriser_position(sender, instance, raw=False, **kwargs):
+    """Mémorise le chemin et le parent en base avant la sauvegarde"""
+    if raw or not instance.pk:
+        return
+
+    champs = ['chemin'] + ([PARENTS[sender]] if PARENTS[sender] else [])
+    instance._position_initiale = sender.objects.filter(pk=instance.pk).values(*champs).first()
+
+
+@receiver(post_save, sender=Region)
+@receiver(post_save, sender=Departement)
+@receiver(post_save, sender=Commune)
+@receiver(post_save, sender=SousPrefecture)
+@receiver(post_save, sender=LieuVote)
+@receiver(post_save, sender=BureauVote)
+def propager_position(sender, instance, created, raw=False, **kwargs):
+    """Répercute un déplacement ou un renommage sur tous les descendants"""
+    position = instance.__dict__.pop('_position_initiale', None)
+    if raw or created or not position:
+        return
+
+    from geography.services import hierarchie_service
+
+    # Ancien chemin vide (pas encore calculé) : rien à réécrire, le préfixe couvrirait tout
+    if position['chemin'] and position['chemin'] != instance.chemin:
+        hierarchie_service.propager_chemin(instance, position['chemin'])
+
+    champ_parent = PARENTS[sender]
+    if champ_parent and position[champ_parent] != getattr(instance, champ_parent):
+        hierarchie_service.propager(instance)
@@ -0,0 +1,38 @@
+# geography/tasks.py
+"""
+Tâches Celery pour l'import du référentiel électoral
+"""
+from celery import shared_task
+from geography.services import import_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(acks_late=True)
+def importer_referentiel(import_id):
+    """
+    Tâche asynchrone: importe (ou reprend au dernier point de reprise) un fichier
+    du référentiel ; acks_late : le message est redélivré si le worker s'arrête
+    """
+    rapport = import_service.executer(import_id)
+    if rapport:
+        logger.info(
+            f"Import {import_id} terminé: {rapport['lignes_traitees']} lignes, "
+            f"{rapport['erreurs']} erreurs en {rapport['duree_ms']} ms"
+        )
+    return rapport
+
+
+@shared_task
+def reprendre_imports_interrompus():
+    """
+    Tâche périodique: relance les imports dont le point de reprise n'avance
+    plus (worker arrêté en cours d'import)
+    À exécuter toutes les 5 minutes
+    """
+    import_ids = list(import_service.interrompus().values_list('pk', flat=True))
+    for import_id in import_ids:
+        logger.warning(f"Reprise de l'import {import_id}")
+        importer_referentiel.delay(import_id)
+    return len(import_ids)
@@ -1,3 +1,368 @@
+# geography/tests.py
+import os
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User
+from geography.models import Region, Departement, Commune, SousPrefecture, LieuVote, BureauVote
+from geography.services import aggregation_service
+from incidents.models import Incident
+from pv.models import ProcesVerbal
+
+
+class HierarchieTestCase(TestCase):
+    """Hiérarchie de test commune : 2 lieux de vote, 4 bureaux, 3 PV, 3 incidents"""
+
+    def setUp(self):
+        """Créer une hiérarchie avec deux lieux de vote"""
+        self.region = Region.objects.create(code_region='AGG01', nom_region='Region Agg')
+        self.departement = Departement.objects.create(
+            code_departement='AGGDEPT01', nom_departement='Dept Agg', region=self.region
+        )
+        self.commune = Commune.objects.create(
+            code_commune='AGGCOM01', nom_commune='Commune Agg', departement=self.departement
+        )
+        self.sous_prefecture = SousPrefecture.objects.create(
+            code_sous_prefecture='AGGSP01', nom_sous_prefecture='SP Agg', commune=self.commune
+        )
+        self.lieux = [
+            LieuVote.objects.create(
+                code_lv=f'AGGLV0{i}', nom_lv=f'Lieu {i}', sous_prefecture=self.sous_prefecture
+            )
+            for i in range(2)
+        ]
+        self.bureaux = [
+            BureauVote.objects.create(
+                code_bv=f'AGGBV0{i}', nom_bv=f'Bureau {i}', lieu_vote=self.lieux[i % 2],
+                numero_ordre=i + 1, nombre_inscrits=100 * (i + 1)
+            )
+            for i in range(4)
+        ]
+
+        self.superviseur = User.objects.create_user(
+            email='agg@test.com', password='test123', first_name='Agg', last_name='Test',
+            role='SUPERVISEUR', bureau_vote=self.bureaux[0]
+        )
+
+        for bureau, statut in zip(self.bureaux[:3], ['VALIDE', 'VALIDE', 'EN_ATTENTE']):
+            ProcesVerbal.objects.create(
+                bureau_vote=bureau, superviseur=self.superviseur,
+                nombre_inscrits=bureau.nombre_inscrits, nombre_votants=50,
+                suffrages_exprimes=40, bulletins_nuls=6, bulletins_blancs=4,
+                photo_pv_officiel='pv.jpg', latitude=5.3, longitude=-4.0, statut=statut
+            )
+
+        for categorie, priorite in [('CONFLIT', 'URGENTE'), ('CONFLIT', 'BASSE'), ('AUTRE', 'MOYENNE')]:
+            Incident.objects.create(
+                bureau_vote=self.bureaux[0], superviseur=self.superviseur,
+                categorie=categorie, priorite=priorite, titre='Incident',
+                description='Test', heure_incident=timezone.now()
+            )
+
+
+class AggregationServiceTestCase(HierarchieTestCase):
+    """Tests du moteur d'agrégation des statistiques géographiques"""
+
+    def test_stats_region(self):
+        """Les blocs de la région agrègent tous les bureaux"""
+        stats = self.region.get_stats()
+
+        self.assertEqual(stats['bureaux']['total'], 4)
+        self.assertEqual(stats['bureaux']['total_inscrits'], 1000)
+        self.assertEqual(stats['pv']['total_pv'], 3)
+        self.assertEqual(stats['pv']['pv_valides'], 2)
+        self.assertEqual(stats['pv']['pv_en_attente'], 1)
+        self.assertEqual(stats['pv']['taux_soumission'], 75.0)
+        self.assertEqual(stats['participation']['total_inscrits'], 300)
+        self.assertEqual(stats['participation']['total_votants'], 100)
+        self.assertEqual(stats['participation']['taux_nuls'], 12.0)
+        self.assertEqual(stats['incidents']['total'], 3)
+        self.assertEqual(stats['incidents']['urgents'], 1)
+        self.assertEqual(stats['incidents']['par_categorie'], {'CONFLIT': 2, 'AUTRE': 1})
+
+    def test_proprietes_une_seule_passe(self):
+        """Les quatre propriétés stats_* ne coûtent que 3 requêtes au total"""
+        commune = Commune.objects.get(pk=self.commune.pk)
+
+        with self.assertNumQueries(3):
+            commune.stats_bureaux
+            commune.stats_pv
+            commune.stats_participation
+            commune.stats_incidents
+
+    def test_stats_niveau(self):
+        """Un niveau complet est calculé en 3 requêtes, noeuds vides compris"""
+        vide = LieuVote.objects.create(
+            code_lv='AGGLV09', nom_lv='Lieu vide', sous_prefecture=self.sous_prefecture
+        )
+        ids = [self.lieux[0].pk, self.lieux[1].pk, vide.pk]
+
+        with self.assertNumQueries(3):
+            stats = aggregation_service.stats_niveau('lieu_vote', ids)
+
+        self.assertEqual(stats[self.lieux[0].pk]['bureaux']['total'], 2)
+        self.assertEqual(stats[self.lieux[0].pk]['pv']['pv_valides'], 1)
+        self.assertEqual(stats[self.lieux[1].pk]['pv']['total_pv'], 1)
+        self.assertEqual(stats[vide.pk]['bureaux']['total'], 0)
+        self.assertEqual(stats[vide.pk]['incidents']['par_categorie'], {})
+
+    def test_stats_bureau(self):
+        """Les propriétés de BureauVote gardent leur format propre"""
+        bureau = BureauVote.objects.get(pk=self.bureaux[0].pk)
+
+        with self.assertNumQueries(4):
+            pv = bureau.stats_pv
+            participation = bureau.stats_participation
+            incidents = bureau.stats_incidents
+
+        self.assertTrue(pv['a_pv_valide'])
+        self.assertTrue(participation['pv_disponible'])
+        self.assertEqual(participation['total_votants'], 50)
+        self.assertEqual(participation['taux_participation'], 50.0)
+        self.assertEqual(incidents['total'], 3)
+
+        sans_pv = BureauVote.objects.get(pk=self.bureaux[3].pk)
+        self.assertFalse(sans_pv.stats_pv['a_pv_valide'])
+        self.assertFalse(sans_pv.stats_participation['pv_disponible'])
+        self.assertEqual(sans_pv.stats_participation['total_inscrits'], 400)
+
+    def test_stats_par_lieu_vote(self):
+        """get_stats_par_lieu_vote garde le format attendu par les templates"""
+        stats = self.sous_prefecture.get_stats_par_lieu_vote()
+
+        self.assertEqual(len(stats), 2)
+        self.assertEqual(
+            set(stats[0]), {'lieu_vote', 'code', 'bureaux', 'pv', 'participation', 'incidents'}
+        )
+
+    def _compter_requetes(self, appel):
+        with CaptureQueriesContext(connection) as contexte:
+            appel()
+        return len(contexte.captured_queries)
+
+    def test_benchmark_drill_down_constant(self):
+        """Le nombre de requêtes du drill-down ne dépend pas du nombre d'enfants"""
+        lieu = self.lieux[0]
+        avant_bureaux = self._compter_requetes(lieu.get_stats_par_bureau)
+        avant_lieux = self._compter_requetes(self.sous_prefecture.get_stats_par_lieu_vote)
+
+        for i in range(10, 40):
+            nouveau_lieu = LieuVote.objects.create(
+                code_lv=f'AGGLV{i}', nom_lv=f'Lieu {i}', sous_prefecture=self.sous_prefecture
+            )
+            BureauVote.objects.create(
+                code_bv=f'AGGBV{i}', nom_bv=f'Bureau {i}', lieu_vote=nouveau_lieu, nombre_inscrits=10
+            )
+            BureauVote.objects.create(
+                code_bv=f'AGGBVX{i}', nom_bv=f'Bureau X{i}', lieu_vote=lieu,
+                numero_ordre=i, nombre_inscrits=10
+            )
+
+        self.assertEqual(len(lieu.get_stats_par_bureau()), 32)
+        self.assertEqual(len(self.sous_prefecture.get_stats_par_lieu_vote()), 32)
+        self.assertEqual(self._compter_requetes(lieu.get_stats_par_bureau), avant_bureaux)
+        self.assertEqual(
+            self._compter_requetes(self.sous_prefecture.get_stats_par_lieu_vote), avant_lieux
+        )
+        self.assertEqual(avant_bureaux, 5)
+        self.assertEqual(avant_lieux, 4)
+
+
+class AscendanceTestCase(HierarchieTestCase):
+    """Tests de l'ascendance dénormalisée des bureaux, PV et incidents"""
+
+    def test_ascendance_a_la_creation(self):
+        """Bureaux, PV et incidents reçoivent l'ascendance à la création"""
+        bureau = self.bureaux[0]
+        pv = ProcesVerbal.objects.get(bureau_vote=bureau)
+        incident = Incident.objects.filter(bureau_vote=bureau).first()
+
+        self.assertEqual(bureau.region_id, self.region.pk)
+        self.assertEqual(bureau.sous_prefecture_id, self.sous_prefecture.pk)
+        self.assertEqual(pv.commune_id, self.commune.pk)
+        self.assertEqual(incident.departement_id, self.departement.pk)
+
+    def test_deplacement_commune(self):
+        """Déplacer une commune met à jour tous ses descendants"""
+        autre_region = Region.objects.create(code_region='AGG02', nom_region='Autre')
+        autre_departement = Departement.objects.create(
+            code_departement='AGGDEPT02', nom_departement='Autre', region=autre_region
+        )
+
+        self.commune.departement = autre_departement
+        self.commune.save()
+
+        self.assertEqual(
+            set(BureauVote.objects.values_list('region', 'departement').distinct()),
+            {(autre_region.pk, autre_departement.pk)}
+        )
+        self.assertFalse(ProcesVerbal.objects.exclude(region=autre_region).exists())
+        self.assertFalse(Incident.objects.exclude(departement=autre_departement).exists())
+
+    def test_chemin_materialise(self):
+        """Les chemins permettent les tests d'appartenance sans requête"""
+        bureau = BureauVote.objects.get(pk=self.bureaux[0].pk)
+
+        self.assertEqual(bureau.chemin, 'AGG01/AGGDEPT01/AGGCOM01/AGGSP01/AGGLV00/AGGBV00/')
+        with self.assertNumQueries(0):
+            self.assertTrue(bureau.est_sous(self.region))
+            self.assertTrue(bureau.est_sous(self.lieux[0]))
+            self.assertFalse(bureau.est_sous(self.lieux[1]))
+
+        self.assertEqual(BureauVote.objects.sous(self.lieux[1]).count(), 2)
+        self.assertEqual(list(Commune.objects.ancetres_de(bureau)), [self.commune])
+
+    def test_chemins_vides(self):
+        """Tant que les chemins ne sont pas calculés, personne n'est sous personne"""
+        autre_region = Region.objects.create(code_region='AGG02', nom_region='Autre')
+        admin = User.objects.create_user(
+            email='agg-admin@test.com', password='test123', role='ADMIN', region=autre_region
+        )
+        for modele in (Region, Departement, Commune, SousPrefecture, LieuVote, BureauVote):
+            modele.objects.update(chemin='')
+        bureau = BureauVote.objects.get(pk=self.bureaux[0].pk)
+        admin = User.objects.get(pk=admin.pk)
+
+        self.assertFalse(bureau.est_sous(Region.objects.get(pk=autre_region.pk)))
+        self.assertFalse(admin.peut_voir_bureau(bureau))
+        self.assertFalse(admin.get_bureaux_vote_accessibles().exists())
+        self.assertFalse(BureauVote.objects.sous(Region.objects.get(pk=self.region.pk)).exists())
+
+    def test_deplacement_reecrit_les_chemins(self):
+        """Déplacer un département réécrit les chemins de ses descendants"""
+        autre_region = Region.objects.create(code_region='AGG02', nom_region='Autre')
+
+        self.departement.region = autre_region
+        self.departement.save()
+
+        self.assertEqual(BureauVote.objects.sous(autre_region).count(), 4)
+        self.assertEqual(BureauVote.objects.sous(self.region).count(), 0)
+        self.assertTrue(
+            LieuVote.objects.get(pk=self.lieux[0].pk).chemin.startswith('AGG02/AGGDEPT01/')
+        )
+
+    def test_backfill(self):
+        """La commande de backfill répare des colonnes vidées"""
+        from io import StringIO
+        from django.core.management import call_command
+        from geography.services import hierarchie_service
+
+        BureauVote.objects.update(region=None, commune=None, chemin='')
+        ProcesVerbal.objects.update(region=None)
+        self.assertEqual(hierarchie_service.verifier()['bureaux_vote'], 4)
+        self.assertEqual(hierarchie_service.verifier()['chemins'], 4)
+
+        call_command('backfill_ascendance', stdout=StringIO())
+
+        self.assertEqual(
+            hierarchie_service.verifier(),
+            {'chemins': 0, 'bureaux_vote': 0, 'proces_verbaux': 0, 'incidents': 0}
+        )
+        self.assertEqual(BureauVote.objects.filter(region=self.region).count(), 4)
+
+
+class ImportTestCase(TestCase):
+    """Tests de l'import en masse du référentiel"""
+
+    ENTETE = 'C.R\tREGION\tCODE_DEPT\tLIB_DEPT\tCODE_SP\tLIB_SP\tCODE_COM\tLIB_COM\tCODE_LV\tLIB_LV\tNBRE BV\tPOP ELECT\n'
+
+    def _fichier(self, *lignes):
+        import tempfile
+
+        fichier = tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False)
+        fichier.write(self.ENTETE + ''.join('\t'.join(ligne) + '\n' for ligne in lignes))
+        fichier.close()
+        self.addCleanup(os.remove, fichier.name)
+        return fichier.name
+
+    def _ligne(self, code_lv, nom_lv='Ecole', nbre_bv='2'):
+        return ['1', 'ABIDJAN', '10', 'Dept', '101', 'SP', '1001', 'Commune', code_lv, nom_lv, nbre_bv, '1 000']
+
+    def test_import_par_lots(self):
+        """Une requête par niveau et par lot ; chemins et ascendance cohérents ; ré-import = mises à jour"""
+        from geography.services import hierarchie_service, import_service
+
+        chemin = self._fichier(self._ligne('11'), self._ligne('12', nbre_bv='1'), ['1', 'ABIDJAN'])
+
+        # + 1 : lignes StatistiqueRegion à recalculer après l'import (aucune ici)
+        with self.assertNumQueries(6 * 2 + 2 + 1):
+            rapport = import_service.importer_fichier(chemin)
+
+        self.assertEqual(
+            {niveau: compteurs['crees'] for niveau, compteurs in rapport['niveaux'].items()},
+            {'regions': 1, 'departements': 1, 'communes': 1, 'sous_prefectures': 1, 'lieux_vote': 2, 'bureaux_vote': 3}
+        )
+        self.assertEqual((rapport['lignes_traitees'], rapport['erreurs']), (3, 1))
+        self.assertEqual(
+            hierarchie_service.verifier(),
+            {'chemins': 0, 'bureaux_vote': 0, 'proces_verbaux': 0, 'incidents': 0}
+        )
+        bureau = BureauVote.objects.get(code_bv='11-BV02')
+        self.assertEqual((bureau.region.code_region, bureau.numero_ordre, bureau.nombre_inscrits), ('REG-01', 2, 500))
+
+        rapport = import_service.importer_fichier(self._fichier(self._ligne('11', nom_lv='Lycee')))
+        self.assertEqual(rapport['niveaux']['lieux_vote'], {'crees': 0, 'mis_a_jour': 1})
+        self.assertEqual(rapport['niveaux']['bureaux_vote'], {'crees': 0, 'mis_a_jour': 2})
+        self.assertEqual(LieuVote.objects.get(code_lv='11').nom_lv, 'Lycee')
+
+    def test_circonscriptions(self):
+        """Le fichier des circonscriptions fourni se charge entièrement"""
+        from geography.services import import_service
+
+        rapport = import_service.importer_fichier('geography/data/donnees_electorales.csv', 'CIRCONSCRIPTIONS')
+
+        self.assertEqual(rapport['erreurs'], 0)
+        self.assertEqual(BureauVote.objects.count(), rapport['niveaux']['bureaux_vote']['crees'])
+        self.assertFalse(BureauVote.objects.filter(region__isnull=True).exists())
+
+    def test_reprise(self):
+        """Un import interrompu reprend après son dernier point de reprise"""
+        from datetime import timedelta
+        from geography.models import ImportReferentiel
+        from geography.services import import_service
+
+        chemin = self._fichier(self._ligne('11'), self._ligne('12'))
+        import_referentiel = ImportReferentiel.objects.create(
+            fichier=chemin, statut='EN_COURS', lignes_total=2, lignes_traitees=1
+        )
+        self.assertIsNone(import_service.executer(import_referentiel.pk))
+
+        ImportReferentiel.objects.filter(pk=import_referentiel.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(list(import_service.interrompus()), [import_referentiel])
+        import_service.executer(import_referentiel.pk)
+
+        import_referentiel.refresh_from_db()
+        self.assertEqual((import_referentiel.statut, import_referentiel.progression), ('TERMINE', 100))
+        self.assertEqual(list(LieuVote.objects.values_list('code_lv', flat=True)), ['12'])
+
+    def test_upload(self):
+        """L'upload enregistre le fichier et l'importe en tâche de fond"""
+        import tempfile
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+        from geography.tasks import importer_referentiel
+
+        user = User.objects.create_user(
+            email='bo@test.com', password='test123', first_name='Back', last_name='Office', role='BACK_OFFICE'
+        )
+        self.client.force_login(user)
+
+        with open(self._fichier(self._ligne('11')), 'rb') as f:
+            fichier = SimpleUploadedFile('referentiel.csv', f.read())
+
+        with tempfile.TemporaryDirectory() as repertoire, override_settings(GEOGRAPHIE_IMPORT_REPERTOIRE=repertoire):
+            with self.captureOnCommitCallbacks() as taches:
+                response = self.client.post('/geography/upload/', {'csv_file': fichier, 'format': 'COMPLET'})
+            self.assertEqual((response.status_code, len(taches)), (302, 1))
 
-# Create your tests here.
+            # Exécution de la tâche programmée, comme le worker
+            import_id = response['Location'].rsplit('=', 1)[1]
+            importer_referentiel.apply(args=[import_id])
+            data = self.client.get(f'/geography/upload/imports/{import_id}/').json()
+        self.assertEqual((data['statut'], data['lignes_traitees']), ('TERMINE', 1))
+        self.assertEqual(data['niveaux']['bureaux_vote']['crees'], 2)
@@ -6,4 +6,5 @@ app_name = 'geography'
 
 urlpatterns = [
     path('upload/', views.upload_electoral_data, name='upload_data'),
+    path('upload/imports/<int:import_id>/', views.import_statut, name='import_statut'),
 ]
\ No newline at end of file
@@ -59,7 +59,7 @@ class IncidentQuerySet(models.QuerySet):
     def par_region(self, region):
         """Filtre par région"""
         return self.filter(
-            bureau_vote__lieu_vote__sous_prefecture__commune__departement__region=region
+            region=region
         )
     
     def derniers_jours(self, jours=7):
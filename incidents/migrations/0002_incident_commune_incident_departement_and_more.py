@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def recopier_ascendance(apps, schema_editor):
+    """Recopie l'ascendance des bureaux sur les incidents existants"""
+    from geography.services.hierarchie_service import hierarchie_service
+
+    hierarchie_service.synchroniser_rattaches(rattaches=['incidents'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("geography", "0002_bureauvote_commune_bureauvote_departement_and_more"),
+        ("incidents", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="incident",
+            name="commune",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="incidents",
+                to="geography.commune",
+            ),
+        ),
+        migrations.AddField(
+            model_name="incident",
+            name="departement",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="incidents",
+                to="geography.departement",
+            ),
+        ),
+        migrations.AddField(
+            model_name="incident",
+            name="region",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="incidents",
+                to="geography.region",
+            ),
+        ),
+        migrations.AddField(
+            model_name="incident",
+            name="sous_prefecture",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="incidents",
+                to="geography.sousprefecture",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="incident",
+            index=models.Index(
+                fields=["region", "statut"], name="incidents_region__37ca81_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="incident",
+            index=models.Index(
+                fields=["departement", "statut"], name="incidents_departe_3fac19_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="incident",
+            index=models.Index(
+                fields=["commune", "statut"], name="incidents_commune_bd5fd2_idx"
+            ),
+        ),
+        migrations.RunPython(recopier_ascendance, migrations.RunPython.noop),
+    ]
@@ -100,6 +100,24 @@ class Incident(models.Model):
     delai_resolution_cible = models.IntegerField(default=240)
     temps_resolution = models.IntegerField(null=True, blank=True)
     
+    # Ascendance du bureau (dénormalisée pour les filtres de périmètre)
+    region = models.ForeignKey(
+        'geography.Region', on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='incidents'
+    )
+    departement = models.ForeignKey(
+        'geography.Departement', on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='incidents'
+    )
+    commune = models.ForeignKey(
+        'geography.Commune', on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='incidents'
+    )
+    sous_prefecture = models.ForeignKey(
+        'geography.SousPrefecture', on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='incidents'
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -108,6 +126,11 @@ class Incident(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Incident'
         verbose_name_plural = 'Incidents'
+        indexes = [
+            models.Index(fields=['region', 'statut']),
+            models.Index(fields=['departement', 'statut']),
+            models.Index(fields=['commune', 'statut']),
+        ]
     
     def __str__(self):
         return f"{self.numero_ticket} - {self.get_categorie_display()}"
@@ -122,6 +145,10 @@ class Incident(models.Model):
         if not self.titre:
             self.titre = f"{self.get_categorie_display()} - {self.bureau_vote.nom_bv}"
         
+        # Recopie de l'ascendance du bureau
+        for champ, valeur in self.bureau_vote.ascendance.items():
+            setattr(self, champ, valeur)
+        
         super().save(*args, **kwargs)
     
     @property
@@ -165,9 +192,20 @@ class IncidentPhoto(models.Model):
         ('AUTRE', 'Autre'),
     ]
     
+    STATUT_PHOTOS_CHOICES = [
+        ('EN_ATTENTE', 'En attente de transfert'),
+        ('TRANSFEREES', 'Transférée'),
+        ('ECHEC', 'Échec du transfert'),
+    ]
+    
+    CHAMPS_PHOTOS = ['photo']
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     incident = models.ForeignKey(Incident, on_delete=models.CASCADE, related_name='photos')
     photo = CloudinaryField('incident_photo', folder='incidents/photos/')
+    statut_photos = models.CharField(
+        max_length=20, choices=STATUT_PHOTOS_CHOICES, default='TRANSFEREES', editable=False
+    )
     type_photo = models.CharField(max_length=20, choices=TYPE_CHOICES, default='PREUVE')
     legende = models.CharField(max_length=200, blank=True, null=True)
     ordre = models.IntegerField(default=0)
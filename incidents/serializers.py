@@ -0,0 +1,34 @@
+# incidents/serializers.py
+from rest_framework import serializers
+from incidents.models import Incident
+
+
+class IncidentSerializer(serializers.ModelSerializer):
+    """Incident signalé par l'application mobile"""
+    
+    class Meta:
+        model = Incident
+        fields = [
+            'id', 'numero_ticket', 'statut',
+            'categorie', 'titre', 'description', 'heure_incident',
+            'impact', 'vote_affecte', 'nombre_electeurs_impactes',
+            'latitude', 'longitude'
+        ]
+        read_only_fields = ['id', 'numero_ticket', 'statut']
+        extra_kwargs = {'titre': {'required': False, 'allow_blank': True}}
+
+
+class IncidentMessageSerializer(serializers.Serializer):
+    """
+    Message sur un incident : l'incident est désigné par son identifiant ou,
+    s'il a été créé hors ligne, par la clé de l'opération qui l'a créé
+    """
+    
+    incident = serializers.UUIDField(required=False)
+    incident_cle = serializers.CharField(max_length=64, required=False)
+    message = serializers.CharField()
+    
+    def validate(self, attrs):
+        if not attrs.get('incident') and not attrs.get('incident_cle'):
+            raise serializers.ValidationError("L'incident ou la clé de l'opération qui l'a créé est obligatoire")
+        return attrs
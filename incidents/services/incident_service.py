@@ -25,6 +25,30 @@ class IncidentService:
         
         return incident
     
+    @transaction.atomic
+    def creer_incidents(self, bureau_vote, superviseur, liste_data):
+        """
+        Créer plusieurs incidents (synchronisation hors ligne). Chaque incident
+        passe par save() (numéro de ticket, compteurs statistiques), l'historique
+        est écrit en un seul bulk_create
+        """
+        incidents = [
+            Incident.objects.create(bureau_vote=bureau_vote, superviseur=superviseur, **data)
+            for data in liste_data
+        ]
+        
+        HistoriqueIncident.objects.bulk_create([
+            HistoriqueIncident(
+                incident=incident,
+                action='CREER',
+                utilisateur=superviseur,
+                description=f"Incident créé: {incident.titre}"
+            )
+            for incident in incidents
+        ])
+        
+        return incidents
+    
     @transaction.atomic
     def attribuer_incident(self, incident, admin):
         """Attribuer un incident à un admin"""
@@ -131,6 +155,13 @@ class IncidentService:
         )
         
         return msg
+    
+    def ajouter_messages(self, auteur, messages):
+        """Ajouter plusieurs messages [(incident, message)] en un seul bulk_create"""
+        return IncidentMessage.objects.bulk_create([
+            IncidentMessage(incident=incident, auteur=auteur, message=message)
+            for incident, message in messages
+        ])
 
 
 # Instance singleton - IMPORTANT !
@@ -20,6 +20,7 @@ from incidents.forms import (
 )
 from incidents.services.incident_service import incident_service
 from accounts.models import CheckIn
+from common.services import photo_service
 
 
 @login_required
@@ -95,7 +96,9 @@ def incident_detail(request, incident_id):
     messages_list = incident.messages.select_related('auteur').order_by('created_at')
     
     # Photos
-    photos = incident.photos.select_related('prise_par').order_by('ordre')
+    photos = photo_service.attacher_miniatures(
+        incident.photos.select_related('prise_par').order_by('ordre')
+    )
     
     # Historique
     historique = incident.historique.select_related('utilisateur').order_by('-date_action')
@@ -304,7 +307,11 @@ def add_photo(request, incident_id):
             photo = form.save(commit=False)
             photo.incident = incident
             photo.prise_par = request.user
+            
+            # Fichier écrit sur disque, envoyé vers Cloudinary en tâche de fond
+            photos = photo_service.differer(photo)
             photo.save()
+            photo_service.programmer(photo, photos)
             
             messages.success(request, "Photo ajoutée avec succès")
             return redirect('incidents:detail', incident_id=incident_id)
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def recopier_ascendance(apps, schema_editor):
+    """Recopie l'ascendance des bureaux sur les PV existants"""
+    from geography.services.hierarchie_service import hierarchie_service
+
+    hierarchie_service.synchroniser_rattaches(rattaches=['proces_verbaux'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_remove_auditlog_audit_logs_user_id_88267f_idx_and_more"),
+        ("geography", "0002_bureauvote_commune_bureauvote_departement_and_more"),
+        ("pv", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="procesverbal",
+            name="commune",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="proces_verbaux",
+                to="geography.commune",
+            ),
+        ),
+        migrations.AddField(
+            model_name="procesverbal",
+            name="departement",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="proces_verbaux",
+                to="geography.departement",
+            ),
+        ),
+        migrations.AddField(
+            model_name="procesverbal",
+            name="region",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="proces_verbaux",
+                to="geography.region",
+            ),
+        ),
+        migrations.AddField(
+            model_name="procesverbal",
+            name="sous_prefecture",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="proces_verbaux",
+                to="geography.sousprefecture",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="procesverbal",
+            index=models.Index(
+                fields=["region", "statut"], name="proces_verb_region__91f3d6_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="procesverbal",
+            index=models.Index(
+                fields=["departement", "statut"], name="proces_verb_departe_2dcd54_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="procesverbal",
+            index=models.Index(
+                fields=["commune", "statut"], name="proces_verb_commune_c43765_idx"
+            ),
+        ),
+        migrations.RunPython(recopier_ascendance, migrations.RunPython.noop),
+    ]
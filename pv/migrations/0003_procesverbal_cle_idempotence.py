@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pv", "0002_procesverbal_commune_procesverbal_departement_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="procesverbal",
+            name="cle_idempotence",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True, unique=True
+            ),
+        ),
+    ]
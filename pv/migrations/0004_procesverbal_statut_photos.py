@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pv", "0003_procesverbal_cle_idempotence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="procesverbal",
+            name="statut_photos",
+            field=models.CharField(
+                choices=[
+                    ("EN_ATTENTE", "En attente de transfert"),
+                    ("TRANSFEREES", "Transférées"),
+                    ("ECHEC", "Échec du transfert"),
+                ],
+                default="TRANSFEREES",
+                editable=False,
+                max_length=20,
+            ),
+        ),
+    ]
@@ -49,6 +49,14 @@ class ProcesVerbal(models.Model):
         ('CORRECTION', 'En correction'),
     ]
     
+    STATUT_PHOTOS_CHOICES = [
+        ('EN_ATTENTE', 'En attente de transfert'),
+        ('TRANSFEREES', 'Transférées'),
+        ('ECHEC', 'Échec du transfert'),
+    ]
+    
+    CHAMPS_PHOTOS = ['photo_pv_officiel', 'photo_tableau_resultats']
+    
     # Identification
     numero_reference = models.CharField(max_length=50, unique=True, editable=False)
     bureau_vote = models.ForeignKey(BureauVote, on_delete=models.PROTECT, related_name='proces_verbaux')
@@ -62,9 +70,12 @@ class ProcesVerbal(models.Model):
     bulletins_nuls = models.IntegerField(validators=[MinValueValidator(0)])
     bulletins_blancs = models.IntegerField(validators=[MinValueValidator(0)])
     
-    # Photos via Cloudinary
+    # Photos via Cloudinary (transférées en tâche de fond, voir common.services.photo_service)
     photo_pv_officiel = cloudinary.models.CloudinaryField('pv_officiel')
     photo_tableau_resultats = cloudinary.models.CloudinaryField('tableau_resultats', blank=True, null=True)
+    statut_photos = models.CharField(
+        max_length=20, choices=STATUT_PHOTOS_CHOICES, default='TRANSFEREES', editable=False
+    )
     
     # Géolocalisation et horodatage
     latitude = models.DecimalField(max_digits=10, decimal_places=7)
@@ -88,6 +99,27 @@ class ProcesVerbal(models.Model):
     has_incoherence = models.BooleanField(default=False)
     erreurs_detectees = models.JSONField(default=list, blank=True)
     
+    # Clé d'idempotence fournie par l'application mobile (rejeu sans doublon)
+    cle_idempotence = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+    
+    # Ascendance du bureau (dénormalisée pour les filtres de périmètre)
+    region = models.ForeignKey(
+        'geography.Region', on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='proces_verbaux'
+    )
+    departement = models.ForeignKey(
+        'geography.Departement', on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='proces_verbaux'
+    )
+    commune = models.ForeignKey(
+        'geography.Commune', on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='proces_verbaux'
+    )
+    sous_prefecture = models.ForeignKey(
+        'geography.SousPrefecture', on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name='proces_verbaux'
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -97,6 +129,11 @@ class ProcesVerbal(models.Model):
         verbose_name = 'Procès-verbal'
         verbose_name_plural = 'Procès-verbaux'
         unique_together = ['bureau_vote', 'date_soumission']
+        indexes = [
+            models.Index(fields=['region', 'statut']),
+            models.Index(fields=['departement', 'statut']),
+            models.Index(fields=['commune', 'statut']),
+        ]
 
     def __str__(self):
         return f"PV {self.numero_reference} - {self.bureau_vote.code_bv}"
@@ -108,6 +145,10 @@ class ProcesVerbal(models.Model):
             timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
             self.numero_reference = f"PV-{self.bureau_vote.code_bv}-{timestamp}"
         
+        # Recopie de l'ascendance du bureau
+        for champ, valeur in self.bureau_vote.ascendance.items():
+            setattr(self, champ, valeur)
+        
         # Validation des cohérences
         self.validate_coherence()
         
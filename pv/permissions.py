@@ -0,0 +1,16 @@
+# pv/permissions.py
+from rest_framework import permissions
+
+
+class CanSubmitPV(permissions.BasePermission):
+    """
+    Permission pour soumettre un PV
+    Réservé aux Superviseurs
+    """
+    
+    def has_permission(self, request, view):
+        return (
+            request.user and
+            request.user.is_authenticated and
+            request.user.role == 'SUPERVISEUR'
+        )
@@ -0,0 +1,60 @@
+# pv/serializers.py
+from rest_framework import serializers
+from pv.models import ProcesVerbal
+from pv.services import pv_service
+
+
+class SoumissionPVSerializer(serializers.ModelSerializer):
+    """
+    Soumission complète d'un PV par l'application mobile : chiffres du
+    bureau, voix par candidat ({candidat_id: voix}) et références des photos
+    déjà téléversées
+    """
+    
+    resultats = serializers.DictField(child=serializers.IntegerField(min_value=0), write_only=True)
+    photo_pv_officiel = serializers.CharField(max_length=255)
+    photo_tableau_resultats = serializers.CharField(
+        max_length=255, required=False, allow_blank=True, allow_null=True
+    )
+    
+    class Meta:
+        model = ProcesVerbal
+        fields = [
+            'id', 'numero_reference', 'statut',
+            'nombre_inscrits', 'nombre_votants', 'suffrages_exprimes',
+            'bulletins_nuls', 'bulletins_blancs',
+            'photo_pv_officiel', 'photo_tableau_resultats', 'latitude', 'longitude',
+            'has_incoherence', 'erreurs_detectees', 'date_soumission', 'resultats'
+        ]
+        read_only_fields = [
+            'id', 'numero_reference', 'statut', 'has_incoherence', 'erreurs_detectees', 'date_soumission'
+        ]
+    
+    def validate(self, attrs):
+        """Somme des voix contrôlée en mémoire, avant toute écriture"""
+        candidats = self.context.get('candidats')
+        if candidats is None:
+            candidats = self.context['candidats'] = pv_service.candidats_actifs()
+        
+        _, erreurs = pv_service.controler_resultats(
+            ProcesVerbal(suffrages_exprimes=attrs['suffrages_exprimes']), attrs['resultats'], candidats
+        )
+        if erreurs:
+            raise serializers.ValidationError({'resultats': erreurs})
+        return attrs
+
+
+class ResultatsPVSerializer(serializers.Serializer):
+    """
+    Résultats d'un PV déjà soumis : le PV est désigné par son identifiant ou,
+    s'il a été soumis hors ligne, par la clé de l'opération qui l'a créé
+    """
+    
+    pv = serializers.IntegerField(required=False)
+    pv_cle = serializers.CharField(max_length=64, required=False)
+    voix = serializers.DictField(child=serializers.IntegerField(min_value=0))
+    
+    def validate(self, attrs):
+        if not attrs.get('pv') and not attrs.get('pv_cle'):
+            raise serializers.ValidationError("Le PV ou la clé de l'opération qui l'a créé est obligatoire")
+        return attrs
@@ -1,5 +1,6 @@
 # pv/services/__init__.py
 from .validation_service import validation_service
 from .pv_service import pv_service
+from .export_service import export_service
 
-__all__ = ['validation_service', 'pv_service']
\ No newline at end of file
+__all__ = ['validation_service', 'pv_service', 'export_service']
\ No newline at end of file
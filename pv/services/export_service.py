@@ -0,0 +1,117 @@
+# pv/services/export_service.py
+"""
+Export des PV en CSV ou en Excel, à mémoire constante
+
+Les lignes sont lues par blocs de TAILLE_BLOC (values_list + iterator : ni
+instance de modèle, ni cache du queryset) et écrites au fil de l'eau : le CSV
+part directement dans une StreamingHttpResponse, le classeur Excel est écrit
+en mode write-only dans un fichier temporaire puis servi par une FileResponse.
+"""
+import csv
+import tempfile
+
+
+TAILLE_BLOC = 2000
+
+# En-tête -> champs lus en base
+COLONNES = (
+    ('N° Référence', ('numero_reference',)),
+    ('Bureau', ('bureau_vote__code_bv',)),
+    ('Superviseur', ('superviseur__first_name', 'superviseur__last_name', 'superviseur__email')),
+    ('Date Soumission', ('date_soumission',)),
+    ('Inscrits', ('nombre_inscrits',)),
+    ('Votants', ('nombre_votants',)),
+    ('Exprimés', ('suffrages_exprimes',)),
+    ('Nuls', ('bulletins_nuls',)),
+    ('Blancs', ('bulletins_blancs',)),
+    ('Taux Participation', ()),
+    ('Validateur', ('validateur__first_name', 'validateur__last_name', 'validateur__email')),
+    ('Date Validation', ('date_validation',)),
+)
+
+FORMAT_DATE = '%d/%m/%Y %H:%M'
+
+
+class _Tampon:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne au lieu de la stocker"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def _nom(prenom, nom, email):
+    """Même règle que User.nom_complet, sans charger l'utilisateur"""
+    if email is None:
+        return ''
+    return f'{prenom} {nom}'.strip() or email
+
+
+def _date(valeur):
+    return valeur.strftime(FORMAT_DATE) if valeur else ''
+
+
+class ExportService:
+    """Export des PV validés accessibles à un utilisateur"""
+
+    FORMATS = ('xlsx', 'csv')
+
+    def entetes(self):
+        return [entete for entete, _ in COLONNES]
+
+    def lignes(self, queryset):
+        """Lignes de l'export, lues par blocs de TAILLE_BLOC"""
+        champs = [champ for _, champs in COLONNES for champ in champs]
+        for (
+            reference, bureau, sup_prenom, sup_nom, sup_email, date_soumission,
+            inscrits, votants, exprimes, nuls, blancs,
+            val_prenom, val_nom, val_email, date_validation
+        ) in queryset.values_list(*champs).iterator(chunk_size=TAILLE_BLOC):
+            taux = round((votants / inscrits) * 100, 2) if inscrits else 0
+            yield [
+                reference, bureau, _nom(sup_prenom, sup_nom, sup_email), _date(date_soumission),
+                inscrits, votants, exprimes, nuls, blancs,
+                f"{taux}%", _nom(val_prenom, val_nom, val_email), _date(date_validation),
+            ]
+
+    def flux_csv(self, queryset):
+        """Flux CSV (UTF-8 avec BOM, séparateur ';' pour Excel), une ligne par morceau"""
+        writer = csv.writer(_Tampon(), delimiter=';')
+        yield '\ufeff' + writer.writerow(self.entetes())
+        for ligne in self.lignes(queryset):
+            yield writer.writerow(ligne)
+
+    def fichier_xlsx(self, queryset, fichier=None):
+        """
+        Écrit le classeur en mode write-only (les lignes ne restent pas en mémoire)
+        dans `fichier`, par défaut un fichier temporaire, et le renvoie rembobiné
+        """
+        import openpyxl
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Alignment, Font
+        from openpyxl.utils import get_column_letter
+
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("PV Validés")
+
+        for col in range(1, len(COLONNES) + 1):
+            ws.column_dimensions[get_column_letter(col)].width = 15
+
+        entetes = []
+        for entete in self.entetes():
+            cell = WriteOnlyCell(ws, value=entete)
+            cell.font = Font(bold=True)
+            cell.alignment = Alignment(horizontal='center')
+            entetes.append(cell)
+        ws.append(entetes)
+
+        for ligne in self.lignes(queryset):
+            ws.append(ligne)
+
+        fichier = fichier or tempfile.TemporaryFile()
+        wb.save(fichier)
+        fichier.seek(0)
+        return fichier
+
+
+# Instance singleton
+export_service = ExportService()
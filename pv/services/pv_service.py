@@ -1,6 +1,11 @@
 # pv/services/pv_service.py
-from django.db import transaction
-from pv.models import ProcesVerbal, ResultatCandidat
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from accounts.models import CheckIn
+from pv.models import Candidat, ProcesVerbal, ResultatCandidat
+
+
+TAILLE_LOT_RESULTATS = 1000
 
 
 class PVService:
@@ -20,27 +25,156 @@ class PVService:
         
         return pv
     
-    @transaction.atomic
-    def ajouter_resultats(self, pv, resultats_data):
-        """Ajouter les résultats par candidat"""
-        total_voix = 0
+    def candidats_actifs(self):
+        """Candidats pouvant recevoir des voix, indexés par identifiant (str)"""
+        return {str(candidat.pk): candidat for candidat in Candidat.objects.filter(est_actif=True)}
+    
+    def controler_resultats(self, pv, resultats_data, candidats):
+        """
+        Contrôle en mémoire d'une saisie {candidat_id: voix} : renvoie les
+        résultats à insérer et la liste des erreurs (vide si la saisie est valide)
+        """
+        if pv.statut == 'VALIDE':
+            return [], ["Les résultats d'un PV validé ne peuvent plus être modifiés"]
+        if not resultats_data:
+            return [], ["Aucun résultat saisi"]
         
+        resultats, erreurs = [], []
         for candidat_id, nombre_voix in resultats_data.items():
-            ResultatCandidat.objects.create(
-                pv=pv,
-                candidat_id=candidat_id,
-                nombre_voix=nombre_voix
-            )
-            total_voix += nombre_voix
+            candidat = candidats.get(str(candidat_id))
+            if candidat is None:
+                erreurs.append(f"Candidat inconnu ou inactif: {candidat_id}")
+                continue
+            try:
+                voix = int(nombre_voix)
+            except (TypeError, ValueError):
+                voix = -1
+            if voix < 0:
+                erreurs.append(f"Nombre de voix invalide pour {candidat.nom_complet}")
+                continue
+            resultats.append(ResultatCandidat(pv=pv, candidat=candidat, nombre_voix=voix))
         
-        if total_voix != pv.suffrages_exprimes:
-            raise ValueError(
+        total_voix = sum(resultat.nombre_voix for resultat in resultats)
+        if not erreurs and total_voix != pv.suffrages_exprimes:
+            erreurs.append(
                 f"La somme des voix ({total_voix}) ne correspond pas "
                 f"aux suffrages exprimés ({pv.suffrages_exprimes})"
             )
+        return resultats, erreurs
+    
+    @transaction.atomic
+    def ajouter_resultats_lot(self, saisies, candidats=None):
+        """
+        Ajouter les résultats de plusieurs PV : `saisies` est une liste de
+        (pv, {candidat_id: voix}). Chaque saisie est contrôlée en mémoire, les
+        saisies invalides sont écartées avec leurs erreurs et toutes les autres
+        sont insérées par un seul bulk_create. Les PV ne sont pas ré-enregistrés :
+        leurs totaux n'ont pas changé.
+        """
+        if candidats is None:
+            candidats = self.candidats_actifs()
+        
+        deja_saisis = set(ResultatCandidat.objects.filter(
+            pv_id__in=[pv.pk for pv, _ in saisies]
+        ).order_by().values_list('pv_id', flat=True).distinct())
+        
+        a_creer, enregistres, erreurs = [], [], {}
+        for pv, resultats_data in saisies:
+            if pv.pk in deja_saisis:
+                erreurs[str(pv.pk)] = ["Les résultats ont déjà été enregistrés"]
+                continue
+            resultats, erreurs_pv = self.controler_resultats(pv, resultats_data, candidats)
+            if erreurs_pv:
+                erreurs[str(pv.pk)] = erreurs_pv
+                continue
+            a_creer.extend(resultats)
+            enregistres.append(str(pv.pk))
+            deja_saisis.add(pv.pk)
+        
+        ResultatCandidat.objects.bulk_create(a_creer, batch_size=TAILLE_LOT_RESULTATS)
+        
+        return {'enregistres': enregistres, 'erreurs': erreurs}
+    
+    def soumission_existante(self, superviseur, cle_idempotence):
+        """PV déjà créé avec cette clé d'idempotence, None s'il n'y en a pas"""
+        pv = ProcesVerbal.objects.filter(cle_idempotence=cle_idempotence).first()
+        if pv is not None and pv.superviseur_id != superviseur.pk:
+            raise PermissionError("Clé d'idempotence déjà utilisée par un autre superviseur")
+        return pv
+    
+    def soumettre_pv(self, superviseur, data, resultats_data, cle_idempotence=None, candidats=None,
+                     horodatage=None):
+        """
+        Soumission complète d'un PV en un appel : chiffres, voix par candidat et
+        références des photos. Cohérence et somme des voix sont contrôlées en
+        mémoire, puis le PV et ses résultats sont écrits dans une transaction
+        (un INSERT pour le PV, un bulk_create pour les résultats).
         
-        pv.resultats_calcules = True
-        pv.save()
+        Renvoie (pv, cree) : un rejeu avec la même clé d'idempotence renvoie
+        le PV déjà créé, y compris en cas de requêtes concurrentes.
+        
+        `horodatage` (saisie hors ligne) date la soumission à la place de
+        l'instant d'écriture ; il doit suivre le check-in et ne pas être futur.
+        """
+        if cle_idempotence:
+            existant = self.soumission_existante(superviseur, cle_idempotence)
+            if existant is not None:
+                return existant, False
+        
+        bureau_vote = superviseur.bureau_vote
+        if bureau_vote is None:
+            raise ValueError("Vous n'êtes affecté à aucun bureau de vote")
+        
+        checkin = CheckIn.objects.filter(superviseur=superviseur, is_active=True).first()
+        if checkin is None:
+            raise ValueError("Vous devez effectuer un check-in avant de soumettre un PV")
+        
+        if horodatage is not None:
+            if horodatage > timezone.now():
+                raise ValueError("L'horodatage du PV est dans le futur")
+            if horodatage < checkin.checkin_time:
+                raise ValueError("L'horodatage du PV précède le check-in")
+        
+        if ProcesVerbal.objects.filter(bureau_vote=bureau_vote, statut='VALIDE').exists():
+            raise ValueError("Un PV validé existe déjà pour ce bureau")
+        
+        pv = ProcesVerbal(
+            bureau_vote=bureau_vote,
+            superviseur=superviseur,
+            checkin=checkin,
+            cle_idempotence=cle_idempotence or None,
+            **data
+        )
+        resultats, erreurs = self.controler_resultats(
+            pv, resultats_data, candidats if candidats is not None else self.candidats_actifs()
+        )
+        if erreurs:
+            raise ValueError(' ; '.join(erreurs))
+        
+        try:
+            with transaction.atomic():
+                # save() recalcule la cohérence (has_incoherence, erreurs_detectees)
+                pv.save()
+                if horodatage is not None:
+                    # date_soumission est en auto_now_add : second save, qui déplace
+                    # aussi la soumission dans les compteurs de timeline
+                    pv.date_soumission = horodatage
+                    pv.save(update_fields=['date_soumission'])
+                ResultatCandidat.objects.bulk_create(resultats, batch_size=TAILLE_LOT_RESULTATS)
+        except IntegrityError:
+            # Requête concurrente portant la même clé : elle a gagné
+            existant = cle_idempotence and self.soumission_existante(superviseur, cle_idempotence)
+            if not existant:
+                raise
+            return existant, False
+        
+        return pv, True
+    
+    def ajouter_resultats(self, pv, resultats_data):
+        """Ajouter les résultats par candidat (un seul INSERT, somme contrôlée avant écriture)"""
+        rapport = self.ajouter_resultats_lot([(pv, resultats_data)])
+        if rapport['erreurs']:
+            raise ValueError(' ; '.join(rapport['erreurs'][str(pv.pk)]))
         
         return pv
 
@@ -1,3 +1,251 @@
+from io import BytesIO
+
+import openpyxl
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import CheckIn, User
+from geography.models import Region, Departement, Commune, SousPrefecture, LieuVote, BureauVote
+from pv.models import Candidat, ProcesVerbal, ResultatCandidat
+
+
+class ExportTestCase(TestCase):
+    """Tests de l'export des PV validés"""
+
+    def setUp(self):
+        """Une région, trois bureaux, deux PV validés et un en attente"""
+        region = Region.objects.create(code_region='EXP01', nom_region='Region Export')
+        departement = Departement.objects.create(
+            code_departement='EXPDEPT01', nom_departement='Dept Export', region=region
+        )
+        commune = Commune.objects.create(
+            code_commune='EXPCOM01', nom_commune='Commune Export', departement=departement
+        )
+        sous_prefecture = SousPrefecture.objects.create(
+            code_sous_prefecture='EXPSP01', nom_sous_prefecture='SP Export', commune=commune
+        )
+        lieu = LieuVote.objects.create(code_lv='EXPLV01', nom_lv='Lieu', sous_prefecture=sous_prefecture)
+
+        self.admin = User.objects.create_user(
+            email='export-admin@test.com', password='test123', first_name='Admin', last_name='Export',
+            role='SUPER_ADMIN', region=region
+        )
+        bureaux = [
+            BureauVote.objects.create(
+                code_bv=f'EXPBV0{i}', nom_bv=f'Bureau {i}', lieu_vote=lieu,
+                numero_ordre=i + 1, nombre_inscrits=100
+            )
+            for i in range(3)
+        ]
+        superviseur = User.objects.create_user(
+            email='export-sup@test.com', password='test123', role='SUPERVISEUR', bureau_vote=bureaux[0]
+        )
+
+        for bureau, statut in zip(bureaux, ['VALIDE', 'VALIDE', 'EN_ATTENTE']):
+            ProcesVerbal.objects.create(
+                bureau_vote=bureau, superviseur=superviseur, statut=statut,
+                validateur=self.admin if statut == 'VALIDE' else None,
+                date_validation=timezone.now() if statut == 'VALIDE' else None,
+                nombre_inscrits=100, nombre_votants=50, suffrages_exprimes=40,
+                bulletins_nuls=6, bulletins_blancs=4,
+                photo_pv_officiel='pv.jpg', latitude=5.3, longitude=-4.0
+            )
+
+        self.client.force_login(self.admin)
+
+    def test_export_csv(self):
+        """Le CSV est diffusé en flux, une ligne par PV validé"""
+        response = self.client.get('/pv/export/excel/', {'format': 'csv'})
+
+        self.assertTrue(response.streaming)
+        lignes = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lignes), 3)
+        self.assertTrue(lignes[0].startswith('N° Référence;Bureau;Superviseur'))
+        self.assertIn(';export-sup@test.com;', lignes[1])
+        self.assertIn(';50.0%;Admin Export;', lignes[1])
+
+    def test_export_xlsx(self):
+        """Le classeur write-only contient l'en-tête et les PV validés"""
+        response = self.client.get('/pv/export/excel/')
+
+        wb = openpyxl.load_workbook(BytesIO(b''.join(response.streaming_content)))
+        lignes = list(wb['PV Validés'].values)
+        self.assertEqual(len(lignes), 3)
+        self.assertEqual(lignes[0][:2], ('N° Référence', 'Bureau'))
+        self.assertEqual(lignes[1][4:10], (100, 50, 40, 6, 4, '50.0%'))
+
+        self.assertEqual(self.client.get('/pv/export/excel/', {'format': 'pdf'}).status_code, 400)
+
+
+class ResultatsTestCase(TestCase):
+    """Tests de la saisie groupée des résultats"""
+
+    def setUp(self):
+        """Deux bureaux, un PV en attente par bureau, trois candidats dont un inactif"""
+        region = Region.objects.create(code_region='RES01', nom_region='Region Resultats')
+        departement = Departement.objects.create(code_departement='RESD01', nom_departement='Dept', region=region)
+        commune = Commune.objects.create(code_commune='RESC01', nom_commune='Commune', departement=departement)
+        sous_prefecture = SousPrefecture.objects.create(
+            code_sous_prefecture='RESSP01', nom_sous_prefecture='SP', commune=commune
+        )
+        lieu = LieuVote.objects.create(code_lv='RESLV01', nom_lv='Lieu', sous_prefecture=sous_prefecture)
+        bureaux = [
+            BureauVote.objects.create(
+                code_bv=f'RESBV0{i}', nom_bv=f'Bureau {i}', lieu_vote=lieu, numero_ordre=i + 1, nombre_inscrits=100
+            )
+            for i in range(2)
+        ]
+        self.superviseur = User.objects.create_user(
+            email='resultats-sup@test.com', password='test123', role='SUPERVISEUR', bureau_vote=bureaux[0]
+        )
+        self.pvs = [
+            ProcesVerbal.objects.create(
+                bureau_vote=bureau, superviseur=self.superviseur,
+                nombre_inscrits=100, nombre_votants=50, suffrages_exprimes=40,
+                bulletins_nuls=6, bulletins_blancs=4,
+                photo_pv_officiel='pv.jpg', latitude=5.3, longitude=-4.0
+            )
+            for bureau in bureaux
+        ]
+        self.candidats = [
+            Candidat.objects.create(numero_ordre=i + 1, nom_complet=f'Candidat {i}', est_actif=i < 2)
+            for i in range(3)
+        ]
+        self.client.force_login(self.superviseur)
+
+    def test_ajouter_resultats(self):
+        """Somme contrôlée en mémoire, un seul INSERT, PV non ré-enregistré"""
+        from pv.services import pv_service
+
+        a, b, inactif = self.candidats
+        with self.assertRaisesMessage(ValueError, 'La somme des voix (39)'):
+            pv_service.ajouter_resultats(self.pvs[0], {a.id: 30, b.id: 9})
+        with self.assertRaisesMessage(ValueError, 'Candidat inconnu ou inactif'):
+            pv_service.ajouter_resultats(self.pvs[0], {a.id: 30, inactif.id: 10})
+
+        updated_at = self.pvs[0].updated_at
+        with CaptureQueriesContext(connection) as requetes:
+            pv_service.ajouter_resultats(self.pvs[0], {a.id: 30, b.id: 10})
+        verbes = [requete['sql'].split()[0] for requete in requetes.captured_queries]
+        self.assertEqual([verbe for verbe in verbes if verbe in ('INSERT', 'UPDATE')], ['INSERT'])
+        self.assertEqual(self.pvs[0].total_voix_candidats, 40)
+        self.pvs[0].refresh_from_db()
+        self.assertEqual(self.pvs[0].updated_at, updated_at)
+
+        with self.assertRaisesMessage(ValueError, 'déjà été enregistrés'):
+            pv_service.ajouter_resultats(self.pvs[0], {a.id: 30, b.id: 10})
+
+    def test_lot(self):
+        """Le lot enregistre les saisies valides et rapporte les autres"""
+        a, b, _ = self.candidats
+        autre = User.objects.create_user(
+            email='resultats-autre@test.com', password='test123', role='SUPERVISEUR',
+            bureau_vote=self.pvs[1].bureau_vote
+        )
+        ProcesVerbal.objects.filter(pk=self.pvs[1].pk).update(superviseur=autre)
+
+        corps = {'resultats': [
+            {'pv': str(self.pvs[0].pk), 'voix': {str(a.id): 25, str(b.id): 15}},
+            {'pv': str(self.pvs[1].pk), 'voix': {str(a.id): 25, str(b.id): 15}},
+        ]}
+        response = self.client.post('/pv/resultats/lot/', corps, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'enregistres': [str(self.pvs[0].pk)],
+            'erreurs': {str(self.pvs[1].pk): ['PV introuvable']},
+        })
+        self.assertEqual(ResultatCandidat.objects.filter(pv=self.pvs[0]).count(), 2)
+
+        response = self.client.post('/pv/resultats/lot/', {'resultats': [{'pv': 'x'}]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_formulaire(self):
+        """Le formulaire de saisie passe par la même insertion groupée"""
+        a, b, _ = self.candidats
+        url = f'/pv/{self.pvs[0].pk}/add-results/'
+
+        response = self.client.post(url, {f'voix_{a.id}': '20', f'voix_{b.id}': '-1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.pvs[0].resultats.exists())
+
+        response = self.client.post(url, {f'voix_{a.id}': '20', f'voix_{b.id}': '20'})
+        self.assertRedirects(response, f'/pv/{self.pvs[0].pk}/', fetch_redirect_response=False)
+        self.assertEqual(self.pvs[0].total_voix_candidats, 40)
+
+
+class SoumissionAPITestCase(TestCase):
+    """Tests de la soumission d'un PV en un appel (API mobile)"""
+
+    URL = '/pv/api/soumissions/'
+
+    def setUp(self):
+        region = Region.objects.create(code_region='API01', nom_region='Region API')
+        departement = Departement.objects.create(code_departement='APID01', nom_departement='Dept', region=region)
+        commune = Commune.objects.create(code_commune='APIC01', nom_commune='Commune', departement=departement)
+        sous_prefecture = SousPrefecture.objects.create(
+            code_sous_prefecture='APISP01', nom_sous_prefecture='SP', commune=commune
+        )
+        lieu = LieuVote.objects.create(code_lv='APILV01', nom_lv='Lieu', sous_prefecture=sous_prefecture)
+        self.bureau = BureauVote.objects.create(
+            code_bv='APIBV01', nom_bv='Bureau', lieu_vote=lieu, numero_ordre=1, nombre_inscrits=100
+        )
+        self.superviseur = User.objects.create_user(
+            email='api-sup@test.com', password='test123', role='SUPERVISEUR', bureau_vote=self.bureau
+        )
+        CheckIn.objects.create(
+            superviseur=self.superviseur, bureau_vote=self.bureau, nom_saisi='Bureau', latitude=5.3, longitude=-4.0
+        )
+        self.candidats = [
+            Candidat.objects.create(numero_ordre=i + 1, nom_complet=f'Candidat {i}') for i in range(2)
+        ]
+        self.client.force_login(self.superviseur)
+
+    def _payload(self, voix=(25, 15)):
+        return {
+            'nombre_inscrits': 100, 'nombre_votants': 50, 'suffrages_exprimes': 40,
+            'bulletins_nuls': 6, 'bulletins_blancs': 4,
+            'photo_pv_officiel': 'pv/officiel-api', 'latitude': '5.3', 'longitude': '-4.0',
+            'resultats': {str(candidat.id): n for candidat, n in zip(self.candidats, voix)},
+        }
+
+    def test_soumission_idempotente(self):
+        """Un rejeu avec la même clé renvoie le PV déjà créé"""
+        response = self.client.post(
+            self.URL, self._payload(), content_type='application/json', HTTP_IDEMPOTENCY_KEY='cle-1'
+        )
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertTrue(data['numero_reference'].startswith('PV-APIBV01-'))
+        self.assertFalse(data['has_incoherence'])
+
+        pv = ProcesVerbal.objects.get()
+        self.assertEqual((pv.total_voix_candidats, pv.checkin.superviseur_id), (40, self.superviseur.pk))
+
+        # Rejeu après clôture du check-in : même réponse, pas de doublon
+        CheckIn.objects.update(is_active=False)
+        response = self.client.post(
+            self.URL, self._payload(), content_type='application/json', HTTP_IDEMPOTENCY_KEY='cle-1'
+        )
+        self.assertEqual((response.status_code, response.json()['id']), (200, data['id']))
+        self.assertEqual(ProcesVerbal.objects.count(), 1)
+
+        autre = User.objects.create_user(
+            email='api-autre@test.com', password='test123', role='SUPERVISEUR', bureau_vote=self.bureau
+        )
+        self.client.force_login(autre)
+        response = self.client.post(
+            self.URL, self._payload(), content_type='application/json', HTTP_IDEMPOTENCY_KEY='cle-1'
+        )
+        self.assertEqual(response.status_code, 409)
+
+    def test_somme_des_voix(self):
+        """La somme des voix est contrôlée avant toute écriture"""
+        response = self.client.post(self.URL, self._payload(voix=(25, 10)), content_type='application/json')
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('La somme des voix (35)', str(response.json()['details']['resultats']))
+        self.assertFalse(ProcesVerbal.objects.exists())
@@ -1,23 +1,29 @@
 # apps/pv/urls.py
-from django.urls import path
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
 from pv import views
+from pv.viewsets import SoumissionPVViewSet
 
 app_name = 'pv'
 
+router = DefaultRouter()
+router.register(r'soumissions', SoumissionPVViewSet, basename='soumissions')
+
 urlpatterns = [
     # Liste et détails
     path('', views.pv_list, name='list'),
-    path('<uuid:pv_id>/', views.pv_detail, name='detail'),
-    path('<uuid:pv_id>/delete/', views.pv_delete, name='delete'),
+    path('<int:pv_id>/', views.pv_detail, name='detail'),
+    path('<int:pv_id>/delete/', views.pv_delete, name='delete'),
     
     # Soumission (Superviseur)
     path('submit/', views.submit_pv, name='submit'),
-    path('<uuid:pv_id>/add-results/', views.add_results, name='add_results'),
+    path('<int:pv_id>/add-results/', views.add_results, name='add_results'),
+    path('resultats/lot/', views.add_results_batch, name='add_results_batch'),
     path('my-pv/', views.my_pv_list, name='my_pv_list'),
     
     # Validation (Admin)
     path('validation/queue/', views.validation_queue, name='validation_queue'),
-    path('<uuid:pv_id>/validate/', views.validate_pv, name='validate'),
+    path('<int:pv_id>/validate/', views.validate_pv, name='validate'),
     
     # Candidats
     path('candidats/', views.candidat_list, name='candidat_list'),
@@ -25,4 +31,7 @@ urlpatterns = [
     
     # Export
     path('export/excel/', views.pv_export, name='export'),
-]
\ No newline at end of file
+    
+    # API mobile
+    path('api/', include(router.urls)),
+]
@@ -2,19 +2,25 @@ from django.shortcuts import render
 
 # Create your views here.
 # apps/pv/views.py
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.conf import settings
 from django.http import HttpResponseForbidden, JsonResponse
 from django.core.paginator import Paginator
-from django.db.models import Q, Count, Sum
+from django.db.models import Q
 from django.utils import timezone
+from django.views.decorators.http import require_http_methods
 from datetime import timedelta
 
-from pv.models import ProcesVerbal, Candidat, ResultatCandidat, HistoriqueValidation
+from pv.models import ProcesVerbal, Candidat, HistoriqueValidation
 from pv.forms import ProcesVerbalForm, ResultatCandidatFormSet, ValidationForm
 from pv.services.validation_service import validation_service
+from pv.services.pv_service import pv_service
 from accounts.models import CheckIn
+from common.services import photo_service
 
 
 @login_required
@@ -39,7 +45,7 @@ def pv_list(request):
     
     if region:
         pv_qs = pv_qs.filter(
-            bureau_vote__lieu_vote__sous_prefecture__commune__departement__region_id=region
+            region_id=region
         )
     
     if date_from:
@@ -99,6 +105,8 @@ def pv_detail(request, pv_id):
     # Historique de validation
     historique = pv.historique_validations.select_related('validateur').order_by('-date_action')
     
+    photo_service.attacher_miniatures([pv])
+    
     context = {
         'pv': pv,
         'resultats': resultats,
@@ -148,9 +156,13 @@ def submit_pv(request):
             pv.superviseur = request.user
             pv.checkin = checkin
             
+            # Photos écrites sur disque, envoyées vers Cloudinary en tâche de fond
+            photos = photo_service.differer(pv)
+            
             # Validation automatique des cohérences
             pv.save()
             pv.validate_coherence()
+            photo_service.programmer(pv, photos)
             
             messages.success(request, f"PV {pv.numero_reference} soumis avec succès!")
             return redirect('pv:add_results', pv_id=pv.id)
@@ -184,45 +196,22 @@ def add_results(request, pv_id):
         messages.warning(request, "Les résultats ont déjà été enregistrés")
         return redirect('pv:detail', pv_id=pv.id)
     
-    candidats = Candidat.objects.actifs().order_by('numero_ordre')
+    candidats = Candidat.objects.filter(est_actif=True).order_by('numero_ordre')
     
     if request.method == 'POST':
-        # Validation de la somme
-        total_voix = 0
-        erreurs = []
-        
-        for candidat in candidats:
-            voix_str = request.POST.get(f'voix_{candidat.id}', '0')
-            try:
-                voix = int(voix_str)
-                if voix < 0:
-                    erreurs.append(f"Nombre de voix invalide pour {candidat.nom_complet}")
-                total_voix += voix
-            except ValueError:
-                erreurs.append(f"Nombre de voix invalide pour {candidat.nom_complet}")
+        # Contrôle en mémoire puis insertion groupée
+        resultats_data = {
+            candidat.id: request.POST.get(f'voix_{candidat.id}', '0') for candidat in candidats
+        }
+        rapport = pv_service.ajouter_resultats_lot(
+            [(pv, resultats_data)],
+            {str(candidat.pk): candidat for candidat in candidats}
+        )
         
-        if erreurs:
-            for erreur in erreurs:
+        if rapport['erreurs']:
+            for erreur in rapport['erreurs'][str(pv.pk)]:
                 messages.error(request, erreur)
-        elif total_voix != pv.suffrages_exprimes:
-            messages.error(
-                request,
-                f"La somme des voix ({total_voix}) ne correspond pas aux suffrages exprimés ({pv.suffrages_exprimes})"
-            )
         else:
-            # Créer les résultats
-            for candidat in candidats:
-                voix = int(request.POST.get(f'voix_{candidat.id}', 0))
-                ResultatCandidat.objects.create(
-                    proces_verbal=pv,
-                    candidat=candidat,
-                    nombre_voix=voix
-                )
-            
-            # Marquer comme calculé
-            pv.resultats_calcules = True
-            pv.save()
-            
             messages.success(request, "Résultats enregistrés avec succès!")
             return redirect('pv:detail', pv_id=pv.id)
     
@@ -234,6 +223,51 @@ def add_results(request, pv_id):
     return render(request, 'pv/add_results.html', context)
 
 
+@login_required
+@require_http_methods(["POST"])
+def add_results_batch(request):
+    """
+    Saisie des résultats de plusieurs PV en une requête (JSON) :
+    {"resultats": [{"pv": "<id>", "voix": {"<candidat_id>": 120, ...}}, ...]}
+    """
+    if request.user.role not in ['SUPERVISEUR', 'BACK_OFFICE']:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    try:
+        saisies = json.loads(request.body)['resultats']
+        pv_ids = [str(int(saisie['pv'])) for saisie in saisies]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Corps JSON invalide'}, status=400)
+    
+    if len(saisies) > settings.PV_RESULTATS_LOT_MAX:
+        return JsonResponse(
+            {'error': f"Au plus {settings.PV_RESULTATS_LOT_MAX} PV par requête"}, status=400
+        )
+    
+    # PV modifiables par l'utilisateur, en une requête
+    if request.user.role == 'SUPERVISEUR':
+        pv_qs = ProcesVerbal.objects.filter(superviseur=request.user)
+    else:
+        pv_qs = request.user.get_pv_accessibles()
+    pv_par_id = {str(pv.pk): pv for pv in pv_qs.filter(pk__in=pv_ids)}
+    
+    erreurs = {}
+    lot = []
+    for pv_id, saisie in zip(pv_ids, saisies):
+        pv = pv_par_id.get(pv_id)
+        if pv is None:
+            erreurs[pv_id] = ["PV introuvable"]
+        elif not isinstance(saisie.get('voix'), dict):
+            erreurs[pv_id] = ["Voix manquantes"]
+        else:
+            lot.append((pv, saisie['voix']))
+    
+    rapport = pv_service.ajouter_resultats_lot(lot)
+    rapport['erreurs'].update(erreurs)
+    
+    return JsonResponse(rapport)
+
+
 @login_required
 def validation_queue(request):
     """File d'attente de validation (Admin)"""
@@ -254,7 +288,7 @@ def validation_queue(request):
     }
     
     context = {
-        'pv_list': pv_en_attente[:100],  # Limiter à 100
+        'pv_list': photo_service.attacher_miniatures(pv_en_attente[:100]),  # Limiter à 100
         'stats': stats,
     }
     
@@ -279,6 +313,8 @@ def validate_pv(request, pv_id):
         messages.warning(request, "Ce PV n'est pas en attente de validation")
         return redirect('pv:detail', pv_id=pv.id)
     
+    photo_service.attacher_miniatures([pv])
+    
     if request.method == 'POST':
         form = ValidationForm(request.POST)
         
@@ -322,6 +358,7 @@ def validate_pv(request, pv_id):
         'pv': pv,
         'form': form,
         'resultats': resultats,
+        'photos_semblables': photo_service.semblables(pv),
     }
     
     return render(request, 'pv/validate_pv.html', context)
@@ -358,12 +395,16 @@ def candidat_list(request):
     """Liste des candidats"""
     candidats = Candidat.objects.all().order_by('numero_ordre')
     
-    # Ajouter les résultats si admin
+    # Ajouter les résultats si admin (cube des résultats)
     if request.user.role in ['ADMIN', 'SUPER_ADMIN']:
-        candidats = candidats.annotate(
-            total_voix=Sum('resultats__nombre_voix', filter=Q(resultats__proces_verbal__statut='VALIDE')),
-            nb_bureaux=Count('resultats__proces_verbal', filter=Q(resultats__proces_verbal__statut='VALIDE'), distinct=True)
-        )
+        from statistics.services import cube_service
+        
+        classement = {ligne['id']: ligne for ligne in cube_service.classement_national()}
+        candidats = list(candidats)
+        for candidat in candidats:
+            ligne = classement.get(candidat.id, {})
+            candidat.total_voix = ligne.get('total_voix', 0)
+            candidat.nb_bureaux = ligne.get('nombre_bureaux', 0)
     
     context = {
         'candidats': candidats,
@@ -420,60 +461,30 @@ def pv_delete(request, pv_id):
 
 @login_required
 def pv_export(request):
-    """Exporter les PV en Excel"""
+    """Exporter les PV validés en Excel (?format=xlsx, défaut) ou en CSV (?format=csv), en flux"""
     if request.user.role not in ['ADMIN', 'SUPER_ADMIN']:
         return HttpResponseForbidden()
     
-    import openpyxl
-    from django.http import HttpResponse
-    from openpyxl.styles import Font, Alignment
-    
-    # Créer un workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "PV Validés"
-    
-    # En-têtes
-    headers = [
-        'N° Référence', 'Bureau', 'Superviseur', 'Date Soumission',
-        'Inscrits', 'Votants', 'Exprimés', 'Nuls', 'Blancs',
-        'Taux Participation', 'Validateur', 'Date Validation'
-    ]
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = header
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal='center')
-    
-    # Données
-    pv_list = request.user.get_pv_accessibles().filter(statut='VALIDE').select_related(
-        'bureau_vote', 'superviseur', 'validateur'
-    )
+    from django.http import FileResponse, HttpResponseBadRequest, StreamingHttpResponse
+    from pv.services.export_service import export_service
+    
+    format_export = request.GET.get('format', 'xlsx')
+    if format_export not in export_service.FORMATS:
+        return HttpResponseBadRequest(f"Format d'export non supporté: {format_export}")
     
-    for row, pv in enumerate(pv_list, 2):
-        ws.cell(row=row, column=1).value = pv.numero_reference
-        ws.cell(row=row, column=2).value = pv.bureau_vote.code_bv
-        ws.cell(row=row, column=3).value = pv.superviseur.nom_complet
-        ws.cell(row=row, column=4).value = pv.date_soumission.strftime('%d/%m/%Y %H:%M')
-        ws.cell(row=row, column=5).value = pv.nombre_inscrits
-        ws.cell(row=row, column=6).value = pv.nombre_votants
-        ws.cell(row=row, column=7).value = pv.suffrages_exprimes
-        ws.cell(row=row, column=8).value = pv.bulletins_nuls
-        ws.cell(row=row, column=9).value = pv.bulletins_blancs
-        ws.cell(row=row, column=10).value = f"{pv.taux_participation}%"
-        ws.cell(row=row, column=11).value = pv.validateur.nom_complet if pv.validateur else ''
-        ws.cell(row=row, column=12).value = pv.date_validation.strftime('%d/%m/%Y %H:%M') if pv.date_validation else ''
-    
-    # Ajuster les largeurs
-    for col in range(1, len(headers) + 1):
-        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 15
-    
-    # Préparer la réponse
-    response = HttpResponse(
+    pv_list = request.user.get_pv_accessibles().filter(statut='VALIDE')
+    nom_fichier = f'pv_export_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{format_export}'
+    
+    if format_export == 'csv':
+        response = StreamingHttpResponse(
+            export_service.flux_csv(pv_list), content_type='text/csv; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename={nom_fichier}'
+        return response
+    
+    return FileResponse(
+        export_service.fichier_xlsx(pv_list),
+        as_attachment=True,
+        filename=nom_fichier,
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
-    response['Content-Disposition'] = f'attachment; filename=pv_export_{timezone.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    
-    wb.save(response)
-    return response
\ No newline at end of file
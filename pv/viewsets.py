@@ -0,0 +1,51 @@
+# pv/viewsets.py
+from rest_framework import serializers, status, viewsets
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from pv.permissions import CanSubmitPV
+from pv.serializers import SoumissionPVSerializer
+from pv.services import pv_service
+
+
+class SoumissionPVViewSet(viewsets.GenericViewSet):
+    """
+    Soumission d'un PV en un seul appel (application mobile)
+    
+    L'en-tête `Idempotency-Key` rend les rejeus sûrs : une requête répétée
+    avec la même clé renvoie le PV déjà créé (200) au lieu d'en créer un second.
+    """
+    serializer_class = SoumissionPVSerializer
+    permission_classes = [IsAuthenticated, CanSubmitPV]
+    
+    def create(self, request):
+        cle_idempotence = request.headers.get('Idempotency-Key') or None
+        if cle_idempotence and len(cle_idempotence) > 64:
+            raise serializers.ValidationError({'Idempotency-Key': "64 caractères au plus"})
+        
+        try:
+            # Rejeu : la réponse ne dépend pas de l'état courant (check-in clos, etc.)
+            if cle_idempotence:
+                existant = pv_service.soumission_existante(request.user, cle_idempotence)
+                if existant is not None:
+                    return Response(self.get_serializer(existant).data, status=status.HTTP_200_OK)
+            
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            data = dict(serializer.validated_data)
+            resultats = data.pop('resultats')
+            
+            pv, cree = pv_service.soumettre_pv(
+                request.user, data, resultats,
+                cle_idempotence=cle_idempotence,
+                candidats=serializer.context['candidats']
+            )
+        except PermissionError as e:
+            return Response({'error': True, 'message': str(e)}, status=status.HTTP_409_CONFLICT)
+        except ValueError as e:
+            raise serializers.ValidationError({'detail': str(e)})
+        
+        return Response(
+            self.get_serializer(pv).data,
+            status=status.HTTP_201_CREATED if cree else status.HTTP_200_OK
+        )
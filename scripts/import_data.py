@@ -0,0 +1,46 @@
+# scripts/import_data.py
+"""
+Import du référentiel électoral hors de manage.py (cron, conteneur d'initialisation)
+
+    python scripts/import_data.py geography/data/donnees_completes.csv
+    python scripts/import_data.py geography/data/donnees_electorales.csv --format CIRCONSCRIPTIONS
+"""
+import argparse
+import os
+import sys
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'election_app.settings')
+django.setup()
+
+from geography.services import import_service
+from geography.services.import_service import FORMATS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import du référentiel électoral")
+    parser.add_argument('fichier', help='Chemin vers le fichier CSV')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='COMPLET')
+    options = parser.parse_args()
+
+    if not os.path.exists(options.fichier):
+        print(f"✗ Fichier non trouvé: {options.fichier}")
+        return 1
+
+    print(f"Import de {options.fichier} ({options.format})...")
+    rapport = import_service.importer_fichier(
+        options.fichier, options.format,
+        apres_lot=lambda rapport: print(f"  → {rapport['lignes_traitees']} lignes traitées")
+    )
+
+    for message in rapport['messages_erreur']:
+        print(f"✗ {message}")
+    for ligne in import_service.resume(rapport):
+        print(f"✓ {ligne}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
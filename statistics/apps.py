@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class StatisticConfig(AppConfig):
     name = 'statistics'
+
+    def ready(self):
+        import statistics.signals  # noqa: F401
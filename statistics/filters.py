@@ -40,4 +40,4 @@ class SnapshotQuotidienFilter(filters.FilterSet):
     
     class Meta:
         model = SnapshotQuotidien
-        fields = ['date']
\ No newline at end of file
+        fields = ['date', 'granularite']
\ No newline at end of file
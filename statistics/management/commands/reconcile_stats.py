@@ -0,0 +1,39 @@
+# statistics/management/commands/reconcile_stats.py
+import time
+from django.core.management.base import BaseCommand
+from statistics.services import compteur_service
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les compteurs dénormalisés (StatistiqueRegion, StatistiqueCandidat, "
+        "StatistiqueBureau) à un recalcul complet depuis les PV et incidents"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help="Reconstruit les lignes divergentes"
+        )
+
+    def handle(self, *args, **options):
+        debut = time.monotonic()
+
+        divergences = compteur_service.reconcilier(corriger=options['fix'])
+
+        for table, lignes in divergences.items():
+            style = self.style.SUCCESS if not lignes else self.style.WARNING
+            self.stdout.write(style(f'{table}: {len(lignes)} ligne(s) divergente(s)'))
+            for cle, ecarts in lignes[:20]:
+                detail = ', '.join(
+                    f'{champ}={stocke} (attendu {attendu})'
+                    for champ, (stocke, attendu) in ecarts.items()
+                )
+                self.stdout.write(f'  {cle}: {detail}')
+
+        duree = time.monotonic() - debut
+        if options['fix'] and any(divergences.values()):
+            self.stdout.write(self.style.SUCCESS(f'✅ Lignes reconstruites en {duree:.2f}s'))
+        else:
+            self.stdout.write(f'Vérification terminée en {duree:.2f}s')
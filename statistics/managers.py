@@ -31,8 +31,11 @@ class CacheStatistiqueManager(models.Manager):
         )
     
     def a_rafraichir(self):
-        """Retourne les caches à rafraîchir"""
-        return self.expires().order_by('-hit_count')
+        """
+        Retourne les caches à rafraîchir par priorité : invalidés d'abord
+        (données fausses), puis les plus lus, puis les plus anciennement expirés
+        """
+        return self.expires().order_by('is_valid', '-force_refresh', '-hit_count', 'date_expiration')
     
     def peu_utilises(self, jours=7):
         """Caches peu utilisés dans les X derniers jours"""
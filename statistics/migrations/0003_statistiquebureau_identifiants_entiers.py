@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:45
+
+from django.db import migrations, models
+
+# pv_id et superviseur_id référencent des clés entières (ProcesVerbal, User) :
+# les colonnes UUID, jamais alimentées, sont recréées car PostgreSQL ne sait pas
+# convertir uuid -> bigint.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('statistics', '0002_alter_logrefreshstatistique_cache_statistique'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='statistiquebureau',
+            name='pv_id',
+        ),
+        migrations.AddField(
+            model_name='statistiquebureau',
+            name='pv_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.RemoveField(
+            model_name='statistiquebureau',
+            name='superviseur_id',
+        ),
+        migrations.AddField(
+            model_name='statistiquebureau',
+            name='superviseur_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("statistics", "0003_statistiquebureau_identifiants_entiers"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="logrefreshstatistique",
+            name="metriques",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                help_text="Métriques d'un passage de rafraîchissement en masse (lots, débit, erreurs)",
+            ),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:10
+
+from datetime import datetime, time
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def renseigner_horodatage(apps, schema_editor):
+    """Les snapshots existants sont quotidiens : période commençant à minuit"""
+    SnapshotQuotidien = apps.get_model("statistics", "SnapshotQuotidien")
+    for snapshot in SnapshotQuotidien.objects.filter(horodatage__isnull=True):
+        snapshot.horodatage = timezone.make_aware(datetime.combine(snapshot.date, time.min))
+        snapshot.save(update_fields=["horodatage"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("statistics", "0004_logrefreshstatistique_metriques"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="snapshotquotidien",
+            name="granularite",
+            field=models.CharField(
+                choices=[("HEURE", "Par heure"), ("JOUR", "Par jour")],
+                default="JOUR",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="snapshotquotidien",
+            name="horodatage",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(renseigner_horodatage, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="snapshotquotidien",
+            name="horodatage",
+            field=models.DateTimeField(
+                db_index=True, help_text="Début de la période couverte"
+            ),
+        ),
+        migrations.AddField(
+            model_name="snapshotquotidien",
+            name="duree_calcul_ms",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="snapshotquotidien",
+            name="date",
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="snapshotquotidien",
+            name="resultats_snapshot",
+            field=models.JSONField(
+                default=list, help_text="Classement complet des candidats"
+            ),
+        ),
+        migrations.AlterModelOptions(
+            name="snapshotquotidien",
+            options={
+                "ordering": ["-horodatage"],
+                "verbose_name": "Snapshot quotidien",
+                "verbose_name_plural": "Snapshots quotidiens",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="snapshotquotidien",
+            constraint=models.UniqueConstraint(
+                fields=("granularite", "horodatage"), name="snapshot_unique_par_periode"
+            ),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("statistics", "0005_snapshot_granularite"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SnapshotDelta",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("horodatage", models.DateTimeField(unique=True)),
+                (
+                    "delta",
+                    models.JSONField(
+                        default=dict,
+                        help_text="Écarts avec le snapshot de base (champs modifiés uniquement)",
+                    ),
+                ),
+                ("duree_calcul_ms", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "base",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="deltas",
+                        to="statistics.snapshotquotidien",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Delta de snapshot",
+                "verbose_name_plural": "Deltas de snapshots",
+                "db_table": "snapshots_deltas",
+                "ordering": ["horodatage"],
+            },
+        ),
+    ]
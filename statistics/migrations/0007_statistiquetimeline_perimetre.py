@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:02
+
+from django.db import migrations, models
+
+
+def vider_series(apps, schema_editor):
+    """
+    Les séries en cache sont recalculées à la demande : les anciennes lignes,
+    toutes rattachées au périmètre national par défaut, violeraient l'unicité
+    """
+    apps.get_model("statistics", "StatistiqueTimeline").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "geography",
+            "0003_bureauvote_chemin_commune_chemin_departement_chemin_and_more",
+        ),
+        ("statistics", "0006_snapshotdelta"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="statistiquetimeline",
+            name="perimetre",
+            field=models.CharField(
+                default="national",
+                help_text="Noeud géographique de la série (ex: national, region:3, commune:12)",
+                max_length=50,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="statistiquetimeline",
+            index=models.Index(
+                fields=["type_timeline", "granularite", "perimetre", "date_debut"],
+                name="statistique_type_ti_67f4d8_idx",
+            ),
+        ),
+        migrations.RunPython(vider_series, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="statistiquetimeline",
+            constraint=models.UniqueConstraint(
+                fields=("type_timeline", "granularite", "perimetre", "date_debut", "date_fin"),
+                name="timeline_unique_par_serie",
+            ),
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncHour
+
+
+def initialiser_compteurs(apps, schema_editor):
+    """Compteurs horaires des événements déjà en base (compactés ensuite par la tâche périodique)"""
+    CompteurTimeline = apps.get_model("statistics", "CompteurTimeline")
+    ProcesVerbal = apps.get_model("pv", "ProcesVerbal")
+    Incident = apps.get_model("incidents", "Incident")
+
+    sources = [
+        ("PV_SOUMISSIONS", ProcesVerbal, "date_soumission", Q(), Count("id")),
+        ("PV_VALIDATIONS", ProcesVerbal, "date_validation", Q(statut="VALIDE"), Count("id")),
+        ("INCIDENTS", Incident, "created_at", Q(), Count("id")),
+        ("PARTICIPATION", ProcesVerbal, "date_validation", Q(statut="VALIDE"), Sum("nombre_votants")),
+    ]
+    for type_timeline, modele, champ, filtre, agregat in sources:
+        lignes = (
+            modele.objects.filter(filtre, region__isnull=False, **{f"{champ}__isnull": False})
+            .annotate(periode=TruncHour(champ))
+            .values("region_id", "periode")
+            .annotate(valeur=agregat)
+            .order_by()
+        )
+        CompteurTimeline.objects.bulk_create(
+            [
+                CompteurTimeline(
+                    type_timeline=type_timeline,
+                    granularite="HEURE",
+                    region_id=ligne["region_id"],
+                    periode=ligne["periode"],
+                    valeur=ligne["valeur"] or 0,
+                )
+                for ligne in lignes
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "geography",
+            "0003_bureauvote_chemin_commune_chemin_departement_chemin_and_more",
+        ),
+        ("incidents", "0002_incident_commune_incident_departement_and_more"),
+        ("pv", "0002_procesverbal_commune_procesverbal_departement_and_more"),
+        ("statistics", "0007_statistiquetimeline_perimetre"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CompteurTimeline",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "type_timeline",
+                    models.CharField(
+                        choices=[
+                            ("PV_SOUMISSIONS", "Soumissions de PV"),
+                            ("PV_VALIDATIONS", "Validations de PV"),
+                            ("INCIDENTS", "Incidents"),
+                            ("PARTICIPATION", "Participation"),
+                            ("RESULTATS", "Résultats"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "granularite",
+                    models.CharField(
+                        choices=[("HEURE", "Par heure"), ("JOUR", "Par jour")],
+                        max_length=10,
+                    ),
+                ),
+                ("periode", models.DateTimeField(help_text="Début de la période")),
+                ("valeur", models.BigIntegerField(default=0)),
+                (
+                    "region",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="compteurs_timeline",
+                        to="geography.region",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Compteur de timeline",
+                "verbose_name_plural": "Compteurs de timeline",
+                "db_table": "statistiques_timeline_compteurs",
+                "indexes": [
+                    models.Index(
+                        fields=["type_timeline", "periode"],
+                        name="statistique_type_ti_0f272a_idx",
+                    ),
+                    models.Index(
+                        fields=["granularite", "periode"],
+                        name="statistique_granula_7e40fa_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("type_timeline", "granularite", "region", "periode"),
+                        name="compteur_timeline_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(initialiser_compteurs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:10
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("statistics", "0008_compteurtimeline"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExportStatistique",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("empreinte", models.CharField(max_length=64, unique=True)),
+                (
+                    "contenu",
+                    models.CharField(
+                        choices=[
+                            ("PARTICIPATION", "Participation par bureau"),
+                            ("RESULTATS", "Résultats par candidat"),
+                            ("INCIDENTS", "Incidents"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "format",
+                    models.CharField(
+                        choices=[
+                            ("JSON", "JSON"),
+                            ("CSV", "CSV"),
+                            ("XLSX", "Excel"),
+                            ("COLONNES", "Colonnes NumPy (.npz)"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("niveau", models.CharField(default="national", max_length=20)),
+                ("entite_id", models.IntegerField(blank=True, null=True)),
+                ("version_donnees", models.CharField(max_length=100)),
+                (
+                    "statut",
+                    models.CharField(
+                        choices=[
+                            ("EN_ATTENTE", "En attente"),
+                            ("EN_COURS", "En cours"),
+                            ("TERMINE", "Terminé"),
+                            ("ECHEC", "Échec"),
+                        ],
+                        default="EN_ATTENTE",
+                        max_length=20,
+                    ),
+                ),
+                ("fichier", models.CharField(blank=True, max_length=255)),
+                ("nombre_lignes", models.IntegerField(default=0)),
+                ("taille_octets", models.BigIntegerField(default=0)),
+                ("message", models.TextField(blank=True, null=True)),
+                ("duree_ms", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("date_fin", models.DateTimeField(blank=True, null=True)),
+                (
+                    "demande_par",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Export statistique",
+                "verbose_name_plural": "Exports statistiques",
+                "db_table": "exports_statistiques",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["statut", "created_at"],
+                        name="exports_sta_statut_4becad_idx",
+                    )
+                ],
+            },
+        ),
+    ]
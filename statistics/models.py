@@ -175,66 +175,65 @@ class CacheStatistique(models.Model):
         return self.is_valid and not self.est_expire and not self.force_refresh
     
     def invalider(self):
-        """Invalide le cache"""
+        """Invalide le cache (base, Redis et mémoire des workers)"""
+        from statistics.services import cache_service
+        
+        cache_service.invalider(CacheStatistique.objects.filter(pk=self.pk), is_valid=False)
         self.is_valid = False
-        self.save(update_fields=['is_valid'])
     
     def forcer_refresh(self):
         """Force le rafraîchissement au prochain accès"""
+        from statistics.services import cache_service
+        
+        cache_service.invalider(CacheStatistique.objects.filter(pk=self.pk), force_refresh=True)
         self.force_refresh = True
-        self.save(update_fields=['force_refresh'])
     
     def incrementer_hit(self):
-        """Incrémente le compteur d'accès"""
-        self.hit_count = F('hit_count') + 1
-        self.last_accessed = timezone.now()
-        self.save(update_fields=['hit_count', 'last_accessed'])
+        """Compte un accès (reporté en base par lots, voir vider_compteurs_acces)"""
+        from statistics.services import cache_service
+        
+        cache_service.compter_acces(self.cache_key)
     
     @classmethod
     def obtenir(cls, type_entite, entite_id, type_statistique, auto_refresh=True):
         """
-        Obtient les statistiques depuis le cache
-        Rafraîchit automatiquement si nécessaire
+        Obtient les statistiques depuis le cache (mémoire du worker, Redis,
+        puis base). Rafraîchit automatiquement si nécessaire
         """
-        cache_key = f"{type_entite}_{entite_id}_{type_statistique}".lower()
+        from statistics.services import cache_service
         
-        try:
-            cache_obj = cls.objects.get(cache_key=cache_key)
-            
-            # Vérifier la validité
-            if cache_obj.est_valide:
-                cache_obj.incrementer_hit()
-                return cache_obj.data
-            
-            # Cache invalide - rafraîchir si auto_refresh
-            if auto_refresh:
-                from statistics.services import StatistiqueService
-                service = StatistiqueService()
-                return service.calculer_et_sauvegarder(
-                    type_entite, entite_id, type_statistique
-                )
-            
-            return None
-            
-        except cls.DoesNotExist:
-            # Cache n'existe pas - créer si auto_refresh
-            if auto_refresh:
-                from statistics.services import StatistiqueService
-                service = StatistiqueService()
-                return service.calculer_et_sauvegarder(
-                    type_entite, entite_id, type_statistique
-                )
-            
-            return None
+        return cache_service.obtenir(type_entite, entite_id, type_statistique, auto_refresh)
     
     @classmethod
     def invalider_par_pattern(cls, pattern):
-        """Invalide tous les caches correspondant à un pattern"""
-        cls.objects.filter(cache_key__contains=pattern).update(
+        """
+        Invalide les caches dont la clé commence par le pattern, segment par
+        segment : "region_1" désigne region_1_* mais pas region_10_*
+        """
+        from statistics.services import cache_service
+        
+        pattern = pattern.lower().rstrip('_')
+        return cache_service.invalider(
+            cls.objects.filter(Q(cache_key=pattern) | Q(cache_key__startswith=f'{pattern}_')),
             is_valid=False,
             force_refresh=True
         )
     
+    @classmethod
+    def invalider_par_dimensions(cls, type_entite=None, entite_id=None, type_statistique=None):
+        """Invalide les caches désignés par type d'entité, identifiant et/ou type de statistique"""
+        from statistics.services import cache_service
+        
+        return cache_service.invalider_dimensions(type_entite, entite_id, type_statistique)
+    
+    @classmethod
+    def invalider_ascendance(cls, bureau_vote, type_statistique=None):
+        """Invalide les caches d'un bureau, de ses ancêtres géographiques et du national"""
+        from statistics.services import cache_service
+        
+        bureau_id = getattr(bureau_vote, 'pk', bureau_vote)
+        return cache_service.invalider_ascendance([bureau_id], type_statistique)
+    
     @classmethod
     def nettoyer_expires(cls):
         """Supprime les caches expirés depuis plus de 7 jours"""
@@ -325,7 +324,7 @@ class StatistiqueBureau(models.Model):
     
     # PV
     has_pv_valide = models.BooleanField(default=False)
-    pv_id = models.UUIDField(null=True, blank=True)
+    pv_id = models.BigIntegerField(null=True, blank=True)
     statut_pv = models.CharField(max_length=20, blank=True, null=True)
     date_soumission_pv = models.DateTimeField(null=True, blank=True)
     date_validation_pv = models.DateTimeField(null=True, blank=True)
@@ -353,7 +352,7 @@ class StatistiqueBureau(models.Model):
     
     # Superviseur
     superviseur_nom = models.CharField(max_length=200, blank=True, null=True)
-    superviseur_id = models.UUIDField(null=True, blank=True)
+    superviseur_id = models.BigIntegerField(null=True, blank=True)
     derniere_activite = models.DateTimeField(null=True, blank=True)
     
     # Métadonnées
@@ -455,6 +454,11 @@ class StatistiqueTimeline(models.Model):
         null=True,
         blank=True
     )
+    perimetre = models.CharField(
+        max_length=50,
+        default='national',
+        help_text="Noeud géographique de la série (ex: national, region:3, commune:12)"
+    )
     
     # Période
     date_debut = models.DateTimeField()
@@ -481,14 +485,61 @@ class StatistiqueTimeline(models.Model):
         verbose_name_plural = 'Statistiques timeline'
         indexes = [
             models.Index(fields=['type_timeline', 'granularite']),
+            models.Index(fields=['type_timeline', 'granularite', 'perimetre', 'date_debut']),
             models.Index(fields=['date_debut', 'date_fin']),
             models.Index(fields=['region']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['type_timeline', 'granularite', 'perimetre', 'date_debut', 'date_fin'],
+                name='timeline_unique_par_serie'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.type_timeline} - {self.granularite}"
 
 
+class CompteurTimeline(models.Model):
+    """
+    Compteur d'événements par période (heure, puis jour une fois compacté),
+    type de timeline et région, incrémenté à chaque transition d'un PV ou d'un incident
+    """
+    
+    GRANULARITE_CHOICES = [
+        ('HEURE', 'Par heure'),
+        ('JOUR', 'Par jour'),
+    ]
+    
+    type_timeline = models.CharField(max_length=20, choices=StatistiqueTimeline.TYPE_CHOICES)
+    granularite = models.CharField(max_length=10, choices=GRANULARITE_CHOICES)
+    region = models.ForeignKey(
+        'geography.Region',
+        on_delete=models.CASCADE,
+        related_name='compteurs_timeline'
+    )
+    periode = models.DateTimeField(help_text="Début de la période")
+    valeur = models.BigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'statistiques_timeline_compteurs'
+        verbose_name = 'Compteur de timeline'
+        verbose_name_plural = 'Compteurs de timeline'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['type_timeline', 'granularite', 'region', 'periode'],
+                name='compteur_timeline_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['type_timeline', 'periode']),
+            models.Index(fields=['granularite', 'periode']),
+        ]
+    
+    def __str__(self):
+        return f"{self.type_timeline} - {self.granularite} {self.periode:%Y-%m-%d %H:%M}"
+
+
 class StatistiquePerformance(models.Model):
     """
     Cache pour les statistiques de performance des utilisateurs
@@ -584,6 +635,11 @@ class LogRefreshStatistique(models.Model):
     # Performance
     duree_ms = models.IntegerField(help_text="Durée en millisecondes")
     nombre_requetes_db = models.IntegerField(default=0)
+    metriques = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Métriques d'un passage de rafraîchissement en masse (lots, débit, erreurs)"
+    )
     
     # Contexte
     triggered_by = models.CharField(
@@ -622,11 +678,21 @@ class LogRefreshStatistique(models.Model):
 
 class SnapshotQuotidien(models.Model):
     """
-    Snapshot des statistiques principales chaque jour
+    Snapshot des statistiques principales chaque jour (ou chaque heure)
     Permet d'analyser les tendances historiques
     """
     
-    date = models.DateField(unique=True, db_index=True)
+    GRANULARITE_CHOICES = [
+        ('HEURE', 'Par heure'),
+        ('JOUR', 'Par jour'),
+    ]
+    
+    date = models.DateField(db_index=True)
+    granularite = models.CharField(max_length=10, choices=GRANULARITE_CHOICES, default='JOUR')
+    horodatage = models.DateTimeField(
+        db_index=True,
+        help_text="Début de la période couverte"
+    )
     
     # Statistiques globales
     total_bureaux = models.IntegerField(default=0)
@@ -647,10 +713,10 @@ class SnapshotQuotidien(models.Model):
     incidents_actifs = models.IntegerField(default=0)
     taux_resolution = models.FloatField(default=0)
     
-    # Résultats (top 3)
+    # Résultats
     resultats_snapshot = models.JSONField(
         default=list,
-        help_text="Snapshot des résultats principaux"
+        help_text="Classement complet des candidats"
     )
     
     # Détails par région
@@ -660,30 +726,143 @@ class SnapshotQuotidien(models.Model):
     )
     
     # Métadonnées
+    duree_calcul_ms = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         db_table = 'snapshots_quotidiens'
         verbose_name = 'Snapshot quotidien'
         verbose_name_plural = 'Snapshots quotidiens'
-        ordering = ['-date']
+        ordering = ['-horodatage']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularite', 'horodatage'], name='snapshot_unique_par_periode'
+            ),
+        ]
     
     def __str__(self):
+        if self.granularite == 'HEURE':
+            return f"Snapshot {timezone.localtime(self.horodatage):%Y-%m-%d %H:%M}"
         return f"Snapshot {self.date}"
     
     @classmethod
     def creer_snapshot_aujourdhui(cls):
         """Crée le snapshot du jour"""
-        from statistics.services import StatistiqueService
-        
-        service = StatistiqueService()
-        data = service.calculer_snapshot_national()
+        from statistics.services import snapshot_service
         
-        snapshot, created = cls.objects.update_or_create(
-            date=timezone.now().date(),
-            defaults=data
-        )
+        return snapshot_service.enregistrer('JOUR')
+    
+    @classmethod
+    def creer_snapshot_horaire(cls):
+        """Crée le snapshot de l'heure en cours"""
+        from statistics.services import snapshot_service
         
-        return snapshot
+        return snapshot_service.enregistrer('HEURE')
+
+
+class SnapshotDelta(models.Model):
+    """
+    Point intra-horaire (toutes les quelques minutes) de la série des snapshots,
+    stocké comme écart avec le snapshot horaire de base : seuls les champs
+    modifiés sont enregistrés
+    """
+    
+    base = models.ForeignKey(
+        SnapshotQuotidien,
+        on_delete=models.CASCADE,
+        related_name='deltas'
+    )
+    horodatage = models.DateTimeField(unique=True)
+    
+    delta = models.JSONField(
+        default=dict,
+        help_text="Écarts avec le snapshot de base (champs modifiés uniquement)"
+    )
+    
+    # Métadonnées
+    duree_calcul_ms = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'snapshots_deltas'
+        verbose_name = 'Delta de snapshot'
+        verbose_name_plural = 'Deltas de snapshots'
+        ordering = ['horodatage']
+    
+    def __str__(self):
+        return f"Delta {timezone.localtime(self.horodatage):%Y-%m-%d %H:%M}"
     
 
+
+
+# ============================================================
+# MODÈLE EXPORT STATISTIQUES
+# ============================================================
+
+class ExportStatistique(models.Model):
+    """
+    Tâche d'export des statistiques, adressée par son contenu : l'empreinte
+    (contenu, format, périmètre, version des données) identifie le fichier, si
+    bien qu'une demande identique sur des données inchangées réutilise l'export
+    """
+    
+    CONTENU_CHOICES = [
+        ('PARTICIPATION', 'Participation par bureau'),
+        ('RESULTATS', 'Résultats par candidat'),
+        ('INCIDENTS', 'Incidents'),
+    ]
+    
+    FORMAT_CHOICES = [
+        ('JSON', 'JSON'),
+        ('CSV', 'CSV'),
+        ('XLSX', 'Excel'),
+        ('COLONNES', 'Colonnes NumPy (.npz)'),
+    ]
+    
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('TERMINE', 'Terminé'),
+        ('ECHEC', 'Échec'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    empreinte = models.CharField(max_length=64, unique=True)
+    
+    # Demande
+    contenu = models.CharField(max_length=20, choices=CONTENU_CHOICES)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    niveau = models.CharField(max_length=20, default='national')
+    entite_id = models.IntegerField(null=True, blank=True)
+    version_donnees = models.CharField(max_length=100)
+    
+    # Résultat
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    fichier = models.CharField(max_length=255, blank=True)
+    nombre_lignes = models.IntegerField(default=0)
+    taille_octets = models.BigIntegerField(default=0)
+    message = models.TextField(blank=True, null=True)
+    duree_ms = models.IntegerField(default=0)
+    
+    demande_par = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+    
+    # Métadonnées
+    created_at = models.DateTimeField(auto_now_add=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'exports_statistiques'
+        verbose_name = 'Export statistique'
+        verbose_name_plural = 'Exports statistiques'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['statut', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Export {self.contenu} {self.format} ({self.niveau}) - {self.statut}"
@@ -15,14 +15,14 @@ class CanViewStatistics(permissions.BasePermission):
 class CanViewNationalStatistics(permissions.BasePermission):
     """
     Permission pour voir les statistiques nationales
-    Réservé aux Super Admins
+    Réservé aux Super Admins et au Back Office (seul rôle sans restriction géographique)
     """
     
     def has_permission(self, request, view):
         return (
             request.user and
             request.user.is_authenticated and
-            request.user.role == 'SUPER_ADMIN'
+            request.user.role in ['SUPER_ADMIN', 'BACK_OFFICE']
         )
 
 
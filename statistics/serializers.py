@@ -3,7 +3,7 @@ from rest_framework import serializers
 from statistics.models import (
     CacheStatistique, StatistiqueRegion, StatistiqueBureau,
     StatistiqueCandidat, StatistiqueTimeline, StatistiquePerformance,
-    SnapshotQuotidien
+    SnapshotQuotidien, ExportStatistique
 )
 from geography.models import Region, Departement, Commune, BureauVote
 from pv.models import Candidat
@@ -125,6 +125,18 @@ class SnapshotQuotidienSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class ExportStatistiqueSerializer(serializers.ModelSerializer):
+    """Serializer pour ExportStatistique (suivi d'un export)"""
+    
+    class Meta:
+        model = ExportStatistique
+        fields = [
+            'id', 'contenu', 'format', 'niveau', 'entite_id', 'statut',
+            'nombre_lignes', 'taille_octets', 'message', 'duree_ms',
+            'created_at', 'date_fin'
+        ]
+
+
 # ============================================================
 # SERIALIZERS POUR LES VUES PERSONNALISÉES
 # ============================================================
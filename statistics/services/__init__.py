@@ -1,4 +1,25 @@
 # statistic/services/__init__.py
 from .statistique_service import statistique_service, StatistiqueService
+from .compteur_service import compteur_service, CompteurService
+from .cache_service import cache_service, CacheService
+from .cube_service import cube_service, CubeService
+from .snapshot_service import snapshot_service, SnapshotService
+from .timeline_service import timeline_service, TimelineService
+from .export_service import export_service, ExportService
 
-__all__ = ['statistique_service', 'StatistiqueService']
\ No newline at end of file
+__all__ = [
+    'statistique_service',
+    'StatistiqueService',
+    'compteur_service',
+    'CompteurService',
+    'cache_service',
+    'CacheService',
+    'cube_service',
+    'CubeService',
+    'snapshot_service',
+    'SnapshotService',
+    'timeline_service',
+    'TimelineService',
+    'export_service',
+    'ExportService',
+]
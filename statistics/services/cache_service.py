@@ -0,0 +1,413 @@
+# statistic/services/cache_service.py
+"""
+Lecture à plusieurs niveaux des entrées CacheStatistique :
+
+1. LRU borné par worker, TTL court ;
+2. backend `default` de CACHES (Redis) ;
+3. table cache_statistiques, source durable.
+
+Les données publiées dans les deux premiers niveaux sont indexées par la
+version de l'entrée. La clé de version conservée dans Redis fait autorité :
+une invalidation incrémente la version en base et la republie, ce qui rend
+caduques d'un coup toutes les copies mémoire et Redis de l'ancienne version.
+
+Les lectures n'écrivent rien en base : les accès sont comptés en mémoire,
+poussés par lots dans un hash Redis, puis reportés dans cache_statistiques
+par une tâche Celery périodique en un seul UPDATE.
+
+Un seul recalcul par entrée à la fois (single-flight) : le verrou est une clé
+posée avec SET NX. Une entrée simplement expirée est servie telle quelle,
+marquée `stale`, pendant qu'une tâche Celery la recalcule ; une entrée
+invalidée est recalculée par le détenteur du verrou, les autres lecteurs
+attendant brièvement sa publication.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q, Case, When, Value, IntegerField, DateTimeField
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from statistics.models import CacheStatistique
+
+logger = logging.getLogger(__name__)
+
+# Ascendance d'un bureau : type d'entité -> colonne dénormalisée de BureauVote
+ASCENDANCE_BUREAU = (
+    ('BUREAU_VOTE', 'id'),
+    ('LIEU_VOTE', 'lieu_vote_id'),
+    ('SOUS_PREFECTURE', 'sous_prefecture_id'),
+    ('COMMUNE', 'commune_id'),
+    ('DEPARTEMENT', 'departement_id'),
+    ('REGION', 'region_id'),
+)
+
+class CacheLocal:
+    """LRU borné avec TTL, propre au processus (un par worker)"""
+
+    def __init__(self, taille, ttl):
+        self.taille = taille
+        self.ttl = ttl
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def get(self, cle, version):
+        """Données mémorisées pour cette version exacte, None sinon"""
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None:
+                return None
+
+            version_entree, expiration, data = entree
+            if version_entree != version or expiration < time.monotonic():
+                del self._entrees[cle]
+                return None
+
+            self._entrees.move_to_end(cle)
+            return data
+
+    def set(self, cle, version, data, ttl=None):
+        """Mémorise des données, en évinçant les entrées les moins récemment lues"""
+        ttl = self.ttl if ttl is None else min(self.ttl, ttl)
+
+        with self._verrou:
+            self._entrees[cle] = (version, time.monotonic() + ttl, data)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille:
+                self._entrees.popitem(last=False)
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+
+class TamponAcces:
+    """Accès aux entrées comptés en mémoire par le worker, poussés par lots"""
+
+    def __init__(self, intervalle):
+        self.intervalle = intervalle
+        self._acces = {}
+        self._verrou = threading.Lock()
+        self._dernier_envoi = time.monotonic()
+
+    def ajouter(self, cle):
+        """Compte un accès ; retourne True quand le tampon est à pousser"""
+        with self._verrou:
+            nombre, _ = self._acces.get(cle, (0, None))
+            self._acces[cle] = (nombre + 1, timezone.now())
+            return time.monotonic() - self._dernier_envoi >= self.intervalle
+
+    def extraire(self):
+        """Vide le tampon : {cache_key: (nombre d'accès, dernier accès)}"""
+        with self._verrou:
+            acces, self._acces = self._acces, {}
+            self._dernier_envoi = time.monotonic()
+            return acces
+
+
+class CacheService:
+    """Lecture, publication et invalidation des entrées de cache statistiques"""
+
+    # Taille maximale d'un UPDATE groupé des compteurs d'accès
+    TAILLE_LOT_ACCES = 500
+
+    # Intervalle de scrutation pendant l'attente d'un recalcul concurrent (secondes)
+    PAS_ATTENTE = 0.05
+
+    def __init__(self):
+        self.local = CacheLocal(
+            taille=getattr(settings, 'STATISTIQUES_CACHE_LOCAL_TAILLE', 512),
+            ttl=getattr(settings, 'STATISTIQUES_CACHE_LOCAL_TTL', 10),
+        )
+        self.acces = TamponAcces(getattr(settings, 'STATISTIQUES_ACCES_INTERVALLE', 5))
+        self.duree_verrou = getattr(settings, 'STATISTIQUES_VERROU_CALCUL', 60)
+        self.attente_max = getattr(settings, 'STATISTIQUES_ATTENTE_CALCUL', 2)
+
+    def cle(self, type_entite, entite_id, type_statistique):
+        """Clé d'une entrée, identique à CacheStatistique.generer_cache_key"""
+        return f"{type_entite}_{entite_id}_{type_statistique}".lower()
+
+    def _cle_version(self, cache_key):
+        return f'stats:version:{cache_key}'
+
+    def _cle_donnees(self, cache_key, version):
+        return f'stats:data:{cache_key}:v{version}'
+
+    def _cle_verrou(self, cache_key):
+        return f'stats:verrou:{cache_key}'
+
+    def _perime(self, data):
+        return {**data, 'stale': True}
+
+    # ========== LECTURE ==========
+
+    def obtenir(self, type_entite, entite_id, type_statistique, auto_refresh=True):
+        """
+        Données d'une entrée : mémoire du worker, puis Redis, puis base ;
+        recalculées si l'entrée est absente ou invalide et `auto_refresh`.
+        Une entrée expirée est servie avec `stale: True` et recalculée en tâche de fond
+        """
+        cache_key = self.cle(type_entite, entite_id, type_statistique)
+
+        version = cache.get(self._cle_version(cache_key))
+        if version is not None:
+            data = self.local.get(cache_key, version)
+            if data is not None:
+                self.compter_acces(cache_key)
+                return data
+
+            data = cache.get(self._cle_donnees(cache_key, version))
+            if data is not None:
+                self.local.set(cache_key, version, data)
+                self.compter_acces(cache_key)
+                return data
+
+        # Niveau durable
+        cache_obj = CacheStatistique.objects.filter(cache_key=cache_key).first()
+        if cache_obj is not None and cache_obj.est_valide:
+            self.compter_acces(cache_key)
+            self.publier(cache_obj, remplacer=False)
+            return cache_obj.data
+
+        if not auto_refresh:
+            return None
+
+        # Entrée expirée mais non invalidée : stale-while-revalidate
+        if cache_obj is not None and cache_obj.data and cache_obj.is_valid and not cache_obj.force_refresh:
+            self.compter_acces(cache_key)
+            self.revalider(type_entite, entite_id, type_statistique)
+            return self._perime(cache_obj.data)
+
+        return self.recalculer(type_entite, entite_id, type_statistique, perime=cache_obj)
+
+    # ========== RECALCUL ==========
+
+    def acquerir_verrou(self, cache_key):
+        """Pose le verrou de recalcul d'une entrée ; False s'il est déjà détenu"""
+        return cache.add(self._cle_verrou(cache_key), timezone.now().isoformat(), self.duree_verrou)
+
+    def liberer_verrou(self, cache_key):
+        cache.delete(self._cle_verrou(cache_key))
+
+    def revalider(self, type_entite, entite_id, type_statistique):
+        """Programme le recalcul d'une entrée en tâche de fond, une seule fois à la fois"""
+        cache_key = self.cle(type_entite, entite_id, type_statistique)
+        if not self.acquerir_verrou(cache_key):
+            return False
+
+        from statistics.tasks import rafraichir_cache_statistique
+
+        try:
+            rafraichir_cache_statistique.delay(type_entite, str(entite_id), type_statistique)
+        except Exception as e:
+            # Broker indisponible : le prochain lecteur retentera
+            logger.warning(f"Recalcul de {cache_key} non programmé: {str(e)}")
+            self.liberer_verrou(cache_key)
+            return False
+
+        return True
+
+    def recalculer(self, type_entite, entite_id, type_statistique, perime=None):
+        """
+        Recalcule une entrée sous verrou. Si un autre worker la recalcule déjà,
+        attend sa publication, puis sert `perime` (l'ancienne entrée) à défaut
+        """
+        from statistics.services import statistique_service
+
+        cache_key = self.cle(type_entite, entite_id, type_statistique)
+        if self.acquerir_verrou(cache_key):
+            try:
+                return statistique_service.calculer_et_sauvegarder(type_entite, entite_id, type_statistique)
+            finally:
+                self.liberer_verrou(cache_key)
+
+        limite = time.monotonic() + self.attente_max
+        while time.monotonic() < limite:
+            time.sleep(self.PAS_ATTENTE)
+
+            version = cache.get(self._cle_version(cache_key))
+            data = cache.get(self._cle_donnees(cache_key, version)) if version is not None else None
+            if data is not None:
+                self.local.set(cache_key, version, data)
+                return data
+
+        if perime is not None and perime.data:
+            return self._perime(perime.data)
+
+        # Aucune valeur à servir : calcul sans verrou plutôt qu'une erreur
+        return statistique_service.calculer_et_sauvegarder(type_entite, entite_id, type_statistique)
+
+    # ========== PUBLICATION ==========
+
+    def publier(self, cache_obj, remplacer=True):
+        """
+        Publie une entrée de la base dans Redis et la mémoire du worker jusqu'à
+        son expiration. Sans `remplacer` (lecture en base), une version déjà
+        publiée par un recalcul ou une invalidation plus récente est conservée
+        """
+        restant = int((cache_obj.date_expiration - timezone.now()).total_seconds())
+        if restant < 1:
+            return
+
+        cle_version = self._cle_version(cache_obj.cache_key)
+        if remplacer:
+            cache.set(cle_version, cache_obj.version, restant)
+        elif not cache.add(cle_version, cache_obj.version, restant):
+            if cache.get(cle_version) != cache_obj.version:
+                return
+
+        cache.set(self._cle_donnees(cache_obj.cache_key, cache_obj.version), cache_obj.data, restant)
+        self.local.set(cache_obj.cache_key, cache_obj.version, cache_obj.data, restant)
+
+    # ========== INVALIDATION ==========
+
+    def invalider(self, queryset, **champs):
+        """
+        Invalide des entrées dans les trois niveaux : marque les lignes
+        (is_valid=False par défaut), incrémente leur version et republie
+        les nouvelles versions, sans données associées
+        """
+        champs = champs or {'is_valid': False}
+        pks = list(queryset.values_list('pk', flat=True))
+        if not pks:
+            return 0
+
+        CacheStatistique.objects.filter(pk__in=pks).update(version=F('version') + 1, **champs)
+
+        versions = CacheStatistique.objects.filter(pk__in=pks).values_list('cache_key', 'version')
+        cache.set_many({
+            self._cle_version(cache_key): version for cache_key, version in versions
+        })
+
+        return len(pks)
+
+    def filtre_dimensions(self, type_entite=None, entite_id=None, type_statistique=None):
+        """Égalités sur les colonnes indexées ; au moins une dimension est requise"""
+        dimensions = {
+            'type_entite': type_entite,
+            'entite_id': None if entite_id is None else str(entite_id),
+            'type_statistique': type_statistique,
+        }
+        dimensions = {champ: valeur for champ, valeur in dimensions.items() if valeur is not None}
+        if not dimensions:
+            raise ValueError("Au moins une dimension (type_entite, entite_id, type_statistique) est requise")
+        return Q(**dimensions)
+
+    def filtre_ascendance(self, bureau_ids):
+        """Entrées d'un ou plusieurs bureaux, de tous leurs ancêtres et du national"""
+        from geography.models import BureauVote
+
+        paires = {('NATIONAL', 'national')}
+        colonnes = [colonne for _, colonne in ASCENDANCE_BUREAU]
+        for ligne in BureauVote.objects.filter(pk__in=bureau_ids).values(*colonnes):
+            paires.update(
+                (type_entite, str(ligne[colonne]))
+                for type_entite, colonne in ASCENDANCE_BUREAU
+                if ligne[colonne] is not None
+            )
+
+        return reduce(or_, (Q(type_entite=type_entite, entite_id=entite_id) for type_entite, entite_id in paires))
+
+    def invalider_dimensions(self, type_entite=None, entite_id=None, type_statistique=None):
+        """Invalide les entrées désignées par leurs dimensions"""
+        filtre = self.filtre_dimensions(type_entite, entite_id, type_statistique)
+        return self.invalider(CacheStatistique.objects.filter(filtre))
+
+    def invalider_ascendance(self, bureau_ids, type_statistique=None):
+        """Invalide les entrées d'un bureau, de ses ancêtres (lieu de vote à région) et du national"""
+        queryset = CacheStatistique.objects.filter(self.filtre_ascendance(bureau_ids))
+        if type_statistique:
+            queryset = queryset.filter(type_statistique=type_statistique)
+        return self.invalider(queryset)
+
+    # ========== COMPTEURS D'ACCÈS ==========
+
+    def _client_redis(self):
+        """Client Redis brut du backend `default`, None pour un autre backend"""
+        try:
+            from django_redis import get_redis_connection
+            return get_redis_connection('default')
+        except (ImportError, NotImplementedError):
+            return None
+
+    def _cles_acces(self):
+        return cache.make_key('stats:acces:nombre'), cache.make_key('stats:acces:date')
+
+    def compter_acces(self, cache_key):
+        """Compte un accès sans écrire en base"""
+        if self.acces.ajouter(cache_key):
+            self.pousser_acces()
+
+    def pousser_acces(self):
+        """
+        Pousse le tampon du worker dans Redis (HINCRBY, un aller-retour) ;
+        sans Redis, les accès sont reportés directement en base
+        """
+        acces = self.acces.extraire()
+        if not acces:
+            return
+
+        client = self._client_redis()
+        if client is None:
+            self.ecrire_acces(acces)
+            return
+
+        cle_nombres, cle_dates = self._cles_acces()
+        with client.pipeline() as pipe:
+            for cache_key, (nombre, date) in acces.items():
+                pipe.hincrby(cle_nombres, cache_key, nombre)
+                pipe.hset(cle_dates, cache_key, date.isoformat())
+            pipe.execute()
+
+    def vider_acces(self):
+        """Reporte en base les accès accumulés dans Redis ; retourne le nombre d'entrées mises à jour"""
+        self.pousser_acces()
+
+        client = self._client_redis()
+        if client is None:
+            return 0
+
+        # Lecture et suppression dans un même MULTI/EXEC : aucun accès perdu ni compté deux fois
+        cle_nombres, cle_dates = self._cles_acces()
+        with client.pipeline() as pipe:
+            pipe.hgetall(cle_nombres)
+            pipe.hgetall(cle_dates)
+            pipe.delete(cle_nombres, cle_dates)
+            nombres, dates, _ = pipe.execute()
+
+        return self.ecrire_acces({
+            cle.decode(): (int(nombre), parse_datetime(dates[cle].decode()) if cle in dates else None)
+            for cle, nombre in nombres.items()
+        })
+
+    def ecrire_acces(self, acces):
+        """hit_count += n et last_accessed pour chaque entrée, un UPDATE par lot"""
+        cles = list(acces)
+        total = 0
+
+        for i in range(0, len(cles), self.TAILLE_LOT_ACCES):
+            lot = cles[i:i + self.TAILLE_LOT_ACCES]
+            total += CacheStatistique.objects.filter(cache_key__in=lot).update(
+                hit_count=F('hit_count') + Case(
+                    *[When(cache_key=cle, then=Value(acces[cle][0])) for cle in lot],
+                    default=Value(0),
+                    output_field=IntegerField()
+                ),
+                last_accessed=Case(
+                    *[When(cache_key=cle, then=Value(acces[cle][1])) for cle in lot if acces[cle][1]],
+                    default=F('last_accessed'),
+                    output_field=DateTimeField()
+                )
+            )
+
+        return total
+
+
+# Instance singleton
+cache_service = CacheService()
@@ -0,0 +1,694 @@
+# statistic/services/compteur_service.py
+"""
+Compteurs dénormalisés StatistiqueRegion, StatistiqueBureau et StatistiqueCandidat.
+
+Chaque transition d'un PV ou d'un incident est convertie en deltas (±1 PV,
+±votants, ±voix par candidat) appliqués par UPDATE ... SET col = col + delta ;
+les tableaux de bord lisent ensuite une seule ligne par clé. Le classement
+national des candidats (pourcentage, position) est recalculé périodiquement
+par classer_candidats, pour qu'une validation ne verrouille que les lignes
+des candidats qu'elle modifie. La réconciliation
+compare ces compteurs à un recalcul complet en quelques requêtes GROUP BY.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import (
+    Count, Sum, Avg, Min, Max, StdDev, Q, F, Case, When, Value, FloatField, Window
+)
+from django.db.models.functions import Cast, Coalesce, RowNumber
+from django.utils import timezone
+
+from accounts.models import User
+from geography.models import BureauVote, Region
+from incidents.models import Incident
+from pv.models import Candidat, ProcesVerbal, ResultatCandidat
+from statistics.models import StatistiqueRegion, StatistiqueBureau, StatistiqueCandidat
+
+
+# Champs dont dépend la contribution d'un PV / d'un incident aux compteurs (et aux compteurs de timeline)
+CHAMPS_SUIVIS_PV = (
+    'statut', 'region_id', 'bureau_vote_id', 'nombre_votants',
+    'suffrages_exprimes', 'bulletins_nuls', 'bulletins_blancs',
+    'date_soumission', 'date_validation',
+)
+CHAMPS_SUIVIS_INCIDENT = ('statut', 'priorite', 'region_id', 'bureau_vote_id', 'created_at')
+
+COMPTEURS_STATUT_PV = {
+    'VALIDE': 'total_pv_valides',
+    'EN_ATTENTE': 'total_pv_en_attente',
+    'REJETE': 'total_pv_rejetes',
+}
+
+# Compteur régional -> champ du PV validé
+VOLUMES_PV = {
+    'total_votants': 'nombre_votants',
+    'total_suffrages_exprimes': 'suffrages_exprimes',
+    'total_bulletins_nuls': 'bulletins_nuls',
+    'total_bulletins_blancs': 'bulletins_blancs',
+}
+
+COMPTEURS_STATUT_INCIDENT = {
+    'OUVERT': 'incidents_ouverts',
+    'EN_COURS': 'incidents_en_cours',
+    'TRAITE': 'incidents_traites',
+    'CLOS': 'incidents_clos',
+}
+
+COMPTEURS_REGION = (
+    'total_bureaux', 'total_inscrits', 'total_pv_soumis',
+    *COMPTEURS_STATUT_PV.values(), *VOLUMES_PV,
+    'total_incidents', *COMPTEURS_STATUT_INCIDENT.values(), 'incidents_urgents',
+)
+
+COMPTEURS_CANDIDAT = ('total_voix_national', 'nombre_bureaux', 'resultats_par_region')
+
+
+def _ratio(numerateur, denominateur, facteur=100.0):
+    """numerateur / denominateur * facteur calculé en base, 0 si le dénominateur est nul"""
+    return Case(
+        When(**{f'{denominateur}__gt': 0}, then=(
+            Cast(numerateur, FloatField()) * Value(facteur) / Cast(F(denominateur), FloatField())
+        )),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+# Taux dérivés des compteurs, recalculés par le même UPDATE après chaque delta
+TAUX_REGION = {
+    'moyenne_inscrits_par_bureau': _ratio(F('total_inscrits'), 'total_bureaux', facteur=1.0),
+    'taux_soumission': _ratio(F('total_pv_soumis'), 'total_bureaux'),
+    'taux_validation': _ratio(F('total_pv_valides'), 'total_pv_soumis'),
+    'taux_participation': _ratio(F('total_votants'), 'total_inscrits'),
+    'taux_nuls': _ratio(F('total_bulletins_nuls'), 'total_votants'),
+    'taux_blancs': _ratio(F('total_bulletins_blancs'), 'total_votants'),
+    'taux_resolution_incidents': _ratio(
+        F('incidents_traites') + F('incidents_clos'), 'total_incidents'
+    ),
+}
+
+
+class CompteurService:
+    """Maintien incrémental des tables de statistiques dénormalisées"""
+
+    # ========== ÉTATS ET CONTRIBUTIONS ==========
+
+    def etat_en_base(self, modele, pk):
+        """
+        État suivi d'une ligne tel qu'il est en base, ligne verrouillée
+        jusqu'à la fin de la transaction pour sérialiser les transitions concurrentes
+        """
+        champs = CHAMPS_SUIVIS_PV if modele is ProcesVerbal else CHAMPS_SUIVIS_INCIDENT
+        queryset = modele.objects.filter(pk=pk)
+        if transaction.get_connection().in_atomic_block:
+            queryset = queryset.select_for_update()
+        return queryset.values(*champs).first()
+
+    def _etat(self, instance, champs):
+        """État suivi d'une instance après sa sauvegarde"""
+        return {champ: getattr(instance, champ) for champ in champs}
+
+    def _contribution_pv(self, etat):
+        """Compteurs régionaux apportés par un PV dans un état donné"""
+        if not etat or not etat['region_id']:
+            return {}
+
+        compteurs = {'total_pv_soumis': 1}
+        if etat['statut'] in COMPTEURS_STATUT_PV:
+            compteurs[COMPTEURS_STATUT_PV[etat['statut']]] = 1
+        if etat['statut'] == 'VALIDE':
+            for cible, source in VOLUMES_PV.items():
+                compteurs[cible] = etat[source] or 0
+
+        return {etat['region_id']: compteurs}
+
+    def _contribution_incident(self, etat):
+        """Compteurs régionaux apportés par un incident dans un état donné"""
+        if not etat or not etat['region_id']:
+            return {}
+
+        compteurs = {'total_incidents': 1}
+        if etat['statut'] in COMPTEURS_STATUT_INCIDENT:
+            compteurs[COMPTEURS_STATUT_INCIDENT[etat['statut']]] = 1
+        if etat['priorite'] == 'URGENTE':
+            compteurs['incidents_urgents'] = 1
+
+        return {etat['region_id']: compteurs}
+
+    def _difference(self, avant, apres):
+        """Deltas non nuls par région entre deux contributions"""
+        deltas = defaultdict(lambda: defaultdict(int))
+        for signe, contribution in ((-1, avant), (1, apres)):
+            for region_id, compteurs in contribution.items():
+                for champ, valeur in compteurs.items():
+                    deltas[region_id][champ] += signe * valeur
+
+        return {
+            region_id: {champ: delta for champ, delta in compteurs.items() if delta}
+            for region_id, compteurs in deltas.items()
+        }
+
+    # ========== TRANSITIONS ==========
+
+    @transaction.atomic
+    def pv_enregistre(self, pv, avant=None):
+        """Répercute la création (avant=None) ou la transition d'un PV"""
+        apres = self._etat(pv, CHAMPS_SUIVIS_PV)
+        if avant == apres:
+            # Aucun champ suivi n'a changé : ni delta, ni bureau à reconstruire
+            return
+        valide_avant = bool(avant) and avant['statut'] == 'VALIDE'
+        valide_apres = apres['statut'] == 'VALIDE'
+        # Les voix ne bougent que si le PV entre/sort de VALIDE ou change de région en restant validé
+        voix_modifiees = valide_avant != valide_apres or (
+            valide_apres and avant['region_id'] != apres['region_id']
+        )
+
+        deltas = self._difference(self._contribution_pv(avant), self._contribution_pv(apres))
+        for region_id, compteurs in deltas.items():
+            if compteurs:
+                self._appliquer_region(region_id, compteurs, top=voix_modifiees)
+
+        if voix_modifiees:
+            voix = list(ResultatCandidat.objects.filter(pv=pv).values_list('candidat_id', 'nombre_voix'))
+            mouvements = []
+            if valide_avant:
+                mouvements.append((avant['region_id'], voix, -1))
+            if valide_apres:
+                mouvements.append((apres['region_id'], voix, 1))
+            self._appliquer_candidats(mouvements)
+
+        for bureau_id in {apres['bureau_vote_id'], (avant or {}).get('bureau_vote_id')} - {None}:
+            self.reconstruire_bureau(bureau_id)
+
+    @transaction.atomic
+    def pv_supprime(self, pv):
+        """Retire la contribution d'un PV supprimé"""
+        etat = self._etat(pv, CHAMPS_SUIVIS_PV)
+        valide = etat['statut'] == 'VALIDE'
+
+        for region_id, compteurs in self._difference(self._contribution_pv(etat), {}).items():
+            self._appliquer_region(region_id, compteurs, top=valide)
+
+        # Les résultats sont déjà supprimés en cascade : les voix ne sont plus connues
+        if valide:
+            self.reconstruire_candidats()
+        self.reconstruire_bureau(etat['bureau_vote_id'])
+
+    @transaction.atomic
+    def incident_enregistre(self, incident, avant=None):
+        """Répercute la création (avant=None) ou le changement de statut d'un incident"""
+        apres = self._etat(incident, CHAMPS_SUIVIS_INCIDENT)
+
+        deltas = self._difference(
+            self._contribution_incident(avant), self._contribution_incident(apres)
+        )
+        for region_id, compteurs in deltas.items():
+            if compteurs:
+                self._appliquer_region(region_id, compteurs, delai=True)
+
+        for bureau_id in {apres['bureau_vote_id'], (avant or {}).get('bureau_vote_id')} - {None}:
+            self.reconstruire_bureau(bureau_id)
+
+    @transaction.atomic
+    def incident_supprime(self, incident):
+        """Retire la contribution d'un incident supprimé"""
+        etat = self._etat(incident, CHAMPS_SUIVIS_INCIDENT)
+
+        for region_id, compteurs in self._difference(self._contribution_incident(etat), {}).items():
+            self._appliquer_region(region_id, compteurs, delai=True)
+
+        self.reconstruire_bureau(etat['bureau_vote_id'])
+
+    # ========== APPLICATION DES DELTAS ==========
+
+    def _appliquer_region(self, region_id, deltas, top=False, delai=False):
+        """Applique des deltas à une ligne StatistiqueRegion, reconstruite si elle n'existe pas"""
+        lignes = StatistiqueRegion.objects.filter(region_id=region_id).update(
+            version=F('version') + 1,
+            date_calcul=timezone.now(),
+            **{champ: F(champ) + delta for champ, delta in deltas.items()}
+        )
+        if not lignes:
+            return self.reconstruire_region(region_id)
+
+        valeurs = {}
+        if top:
+            valeurs['top_3_candidats'] = self._top_candidats(region_id)
+        if delai:
+            valeurs['delai_moyen_resolution_incidents'] = Incident.objects.filter(
+                region_id=region_id
+            ).aggregate(delai=Avg('temps_resolution'))['delai']
+
+        # Second UPDATE : les taux doivent lire les compteurs déjà incrémentés
+        StatistiqueRegion.objects.filter(region_id=region_id).update(**TAUX_REGION, **valeurs)
+
+    def _appliquer_candidats(self, mouvements):
+        """
+        Applique des mouvements (region_id, [(candidat_id, voix)], signe) aux
+        seules lignes StatistiqueCandidat concernées : un UPDATE ... SET col = col + delta
+        par mouvement, sans verrouiller les autres candidats. Pourcentages et
+        classement sont recalculés par classer_candidats (tâche périodique).
+        """
+        table = StatistiqueCandidat._meta.db_table
+
+        for region_id, voix, signe in mouvements:
+            if not voix:
+                continue
+            cle_region = None if region_id is None else str(region_id)
+            valeurs = ', '.join(['(%s::uuid, %s::bigint)'] * len(voix))
+            parametres = [valeur for candidat_id, nombre in voix for valeur in (str(candidat_id), signe * nombre)]
+
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {table} AS s SET '
+                    f'total_voix_national = s.total_voix_national + v.voix, '
+                    f'nombre_bureaux = s.nombre_bureaux + %s, '
+                    f'resultats_par_region = CASE '
+                    f"  WHEN %s::text IS NULL THEN s.resultats_par_region "
+                    f"  WHEN COALESCE((s.resultats_par_region ->> %s::text)::bigint, 0) + v.voix = 0 "
+                    f"    THEN s.resultats_par_region - %s::text "
+                    f"  ELSE jsonb_set(s.resultats_par_region, ARRAY[%s::text], "
+                    f"    to_jsonb(COALESCE((s.resultats_par_region ->> %s::text)::bigint, 0) + v.voix)) "
+                    f'END, '
+                    f'version = s.version + 1, date_calcul = %s '
+                    f'FROM (VALUES {valeurs}) AS v (candidat_id, voix) '
+                    f'WHERE s.candidat_id = v.candidat_id',
+                    [signe, *[cle_region] * 5, timezone.now(), *parametres]
+                )
+                mises_a_jour = cursor.rowcount
+
+            if mises_a_jour < len(voix):
+                # Ligne manquante : reconstruction complète (premier calcul)
+                return self.reconstruire_candidats()
+
+    def classer_candidats(self):
+        """
+        Pourcentage national, position et moyenne par bureau de chaque candidat,
+        à partir des compteurs courants. N'écrit que les lignes dont le
+        classement a changé, et seulement ces champs dérivés (les compteurs
+        incrémentés en parallèle ne sont pas réécrits)
+        """
+        lignes = list(StatistiqueCandidat.objects.only(
+            'candidat_id', 'total_voix_national', 'nombre_bureaux',
+            'position_nationale', 'pourcentage_national', 'moyenne_voix_par_bureau',
+        ))
+        avant = {
+            ligne.pk: (ligne.position_nationale, ligne.pourcentage_national, ligne.moyenne_voix_par_bureau)
+            for ligne in lignes
+        }
+        self._calculer_classement(lignes)
+
+        modifiees = [
+            ligne for ligne in lignes
+            if avant[ligne.pk] != (ligne.position_nationale, ligne.pourcentage_national, ligne.moyenne_voix_par_bureau)
+        ]
+        StatistiqueCandidat.objects.bulk_update(
+            modifiees, ['position_nationale', 'pourcentage_national', 'moyenne_voix_par_bureau']
+        )
+        return len(modifiees)
+
+    def _calculer_classement(self, lignes):
+        """Champs dérivés des compteurs, calculés en mémoire sur toutes les lignes"""
+        lignes = sorted(lignes, key=lambda ligne: -ligne.total_voix_national)
+        total = sum(ligne.total_voix_national for ligne in lignes)
+
+        for position, ligne in enumerate(lignes, 1):
+            ligne.position_nationale = position
+            ligne.pourcentage_national = (
+                round(ligne.total_voix_national / total * 100, 2) if total > 0 else 0
+            )
+            ligne.moyenne_voix_par_bureau = (
+                ligne.total_voix_national / ligne.nombre_bureaux if ligne.nombre_bureaux > 0 else 0
+            )
+        return lignes
+
+    def _classer_candidats(self, lignes, champs=()):
+        """Classement et écriture groupée de lignes verrouillées (reconstruction complète)"""
+        for ligne in self._calculer_classement(lignes):
+            ligne.version += 1
+            ligne.date_calcul = timezone.now()
+
+        StatistiqueCandidat.objects.bulk_update(lignes, [
+            *champs, 'position_nationale', 'pourcentage_national',
+            'moyenne_voix_par_bureau', 'version', 'date_calcul',
+        ])
+
+    def _top_candidats(self, region_id, limite=3):
+        """Candidats en tête d'une région (1 requête GROUP BY)"""
+        top = ResultatCandidat.objects.filter(
+            pv__region_id=region_id,
+            pv__statut='VALIDE'
+        ).values(
+            'candidat_id',
+            'candidat__nom_complet',
+            'candidat__parti_politique'
+        ).annotate(
+            total_voix=Sum('nombre_voix')
+        ).order_by('-total_voix')[:limite]
+
+        return [{
+            'candidat_id': str(ligne['candidat_id']),
+            'nom_complet': ligne['candidat__nom_complet'],
+            'parti_politique': ligne['candidat__parti_politique'],
+            'total_voix': ligne['total_voix'],
+        } for ligne in top]
+
+    def _enregistrer(self, modele, valeurs, **cle):
+        """Crée ou remplace une ligne de statistiques en incrémentant sa version"""
+        ligne, cree = modele.objects.select_for_update().get_or_create(defaults=valeurs, **cle)
+        if not cree:
+            for champ, valeur in valeurs.items():
+                setattr(ligne, champ, valeur)
+            ligne.version += 1
+            ligne.save()
+        return ligne
+
+    # ========== RECALCUL COMPLET ==========
+
+    def calculer_regions(self, region_ids=None):
+        """Recalcul complet des compteurs régionaux (3 requêtes GROUP BY)"""
+        def grouper(queryset, **agregats):
+            queryset = queryset.filter(region_id__isnull=False)
+            if region_ids is not None:
+                queryset = queryset.filter(region_id__in=region_ids)
+            return {
+                ligne.pop('region_id'): ligne
+                for ligne in queryset.values('region_id').annotate(**agregats).order_by()
+            }
+
+        valide = Q(statut='VALIDE')
+        bureaux = grouper(
+            BureauVote.objects.all(),
+            total_bureaux=Count('id'),
+            total_inscrits=Coalesce(Sum('nombre_inscrits'), 0),
+        )
+        pv = grouper(
+            ProcesVerbal.objects.all(),
+            total_pv_soumis=Count('id'),
+            **{champ: Count('id', filter=Q(statut=statut)) for statut, champ in COMPTEURS_STATUT_PV.items()},
+            **{cible: Coalesce(Sum(source, filter=valide), 0) for cible, source in VOLUMES_PV.items()},
+        )
+        incidents = grouper(
+            Incident.objects.all(),
+            total_incidents=Count('id'),
+            **{champ: Count('id', filter=Q(statut=statut)) for statut, champ in COMPTEURS_STATUT_INCIDENT.items()},
+            incidents_urgents=Count('id', filter=Q(priorite='URGENTE')),
+            delai_moyen_resolution_incidents=Avg('temps_resolution'),
+        )
+
+        if region_ids is None:
+            region_ids = set(bureaux) | set(pv) | set(incidents)
+
+        return {
+            region_id: {
+                **dict.fromkeys(COMPTEURS_REGION, 0),
+                'delai_moyen_resolution_incidents': None,
+                **bureaux.get(region_id, {}),
+                **pv.get(region_id, {}),
+                **incidents.get(region_id, {}),
+            }
+            for region_id in region_ids
+        }
+
+    def calculer_candidats(self):
+        """Recalcul complet des voix par candidat et par région (2 requêtes)"""
+        valeurs = {
+            candidat_id: {'total_voix_national': 0, 'nombre_bureaux': 0, 'resultats_par_region': {}}
+            for candidat_id in Candidat.objects.values_list('id', flat=True)
+        }
+
+        lignes = ResultatCandidat.objects.filter(pv__statut='VALIDE').values(
+            'candidat_id', 'pv__region_id'
+        ).annotate(voix=Sum('nombre_voix'), bureaux=Count('id')).order_by()
+
+        for ligne in lignes:
+            candidat = valeurs[ligne['candidat_id']]
+            candidat['total_voix_national'] += ligne['voix']
+            candidat['nombre_bureaux'] += ligne['bureaux']
+            if ligne['pv__region_id'] is not None and ligne['voix']:
+                candidat['resultats_par_region'][str(ligne['pv__region_id'])] = ligne['voix']
+
+        return valeurs
+
+    @transaction.atomic
+    def reconstruire_region(self, region_id):
+        """Recalcule entièrement la ligne StatistiqueRegion d'une région"""
+        valeurs = self.calculer_regions([region_id])[region_id]
+        valeurs['top_3_candidats'] = self._top_candidats(region_id)
+        self._enregistrer(StatistiqueRegion, valeurs, region_id=region_id)
+
+        StatistiqueRegion.objects.filter(region_id=region_id).update(**TAUX_REGION)
+        return StatistiqueRegion.objects.get(region_id=region_id)
+
+    def reconstruire_regions(self, region_ids=None):
+        """
+        Recalcule les lignes StatistiqueRegion déjà créées des régions données
+        (toutes par défaut) : bureaux et inscrits ne sont pas tenus par deltas
+        """
+        lignes = StatistiqueRegion.objects.all()
+        if region_ids is not None:
+            lignes = lignes.filter(region_id__in=region_ids)
+        for region_id in lignes.values_list('region_id', flat=True):
+            self.reconstruire_region(region_id)
+
+    def meilleurs_bureaux(self, limite, candidat_ids=None):
+        """Meilleurs bureaux de chaque candidat (1 requête, ROW_NUMBER() par candidat)"""
+        valides = ResultatCandidat.objects.filter(pv__statut='VALIDE')
+        if candidat_ids is not None:
+            valides = valides.filter(candidat_id__in=candidat_ids)
+
+        lignes = valides.annotate(
+            rang=Window(
+                RowNumber(),
+                partition_by=[F('candidat_id')],
+                order_by=[F('nombre_voix').desc(), F('pv__bureau_vote__code_bv').asc()]
+            )
+        ).filter(rang__lte=limite).values(
+            'candidat_id', 'pv__bureau_vote_id', 'pv__bureau_vote__code_bv',
+            'pv__suffrages_exprimes', 'nombre_voix'
+        ).order_by('candidat_id', 'rang')
+
+        meilleurs = defaultdict(list)
+        for ligne in lignes:
+            meilleurs[ligne['candidat_id']].append(ligne)
+        return meilleurs
+
+    @transaction.atomic
+    def reconstruire_candidats(self):
+        """
+        Recalcule toutes les lignes StatistiqueCandidat en une passe : voix par
+        région, dispersion et meilleurs bureaux en 4 requêtes, écriture groupée
+        """
+        valides = ResultatCandidat.objects.filter(pv__statut='VALIDE')
+        dispersion = {
+            ligne.pop('candidat_id'): ligne
+            for ligne in valides.values('candidat_id').annotate(
+                score_minimum=Min('nombre_voix'),
+                score_maximum=Max('nombre_voix'),
+                ecart_type=StdDev('nombre_voix'),
+            ).order_by()
+        }
+        meilleurs = self.meilleurs_bureaux(5)
+        existantes = {
+            ligne.candidat_id: ligne for ligne in StatistiqueCandidat.objects.select_for_update()
+        }
+
+        lignes, a_creer = [], []
+        for candidat_id, valeurs in self.calculer_candidats().items():
+            valeurs.update({'score_minimum': 0, 'score_maximum': 0, 'ecart_type': None})
+            valeurs.update(dispersion.get(candidat_id, {}))
+            valeurs['meilleurs_bureaux'] = [{
+                'bureau_id': ligne['pv__bureau_vote_id'],
+                'code_bv': ligne['pv__bureau_vote__code_bv'],
+                'voix': ligne['nombre_voix'],
+            } for ligne in meilleurs.get(candidat_id, [])]
+
+            ligne = existantes.get(candidat_id)
+            if ligne is None:
+                ligne = StatistiqueCandidat(candidat_id=candidat_id, **valeurs)
+                a_creer.append(ligne)
+            else:
+                for champ, valeur in valeurs.items():
+                    setattr(ligne, champ, valeur)
+            lignes.append(ligne)
+
+        StatistiqueCandidat.objects.bulk_create(a_creer)
+        self._classer_candidats(lignes, champs=(
+            'total_voix_national', 'nombre_bureaux', 'resultats_par_region',
+            'score_minimum', 'score_maximum', 'ecart_type', 'meilleurs_bureaux',
+        ))
+        return lignes
+
+    def calculer_bureau(self, bureau_id):
+        """Recalcul complet de l'état d'un bureau (3 à 4 requêtes)"""
+        pv = ProcesVerbal.objects.filter(bureau_vote_id=bureau_id).select_related(
+            'superviseur'
+        ).order_by(
+            Case(When(statut='VALIDE', then=Value(0)), default=Value(1)),
+            '-date_soumission'
+        ).first()
+        valide = pv is not None and pv.statut == 'VALIDE'
+
+        resultats = []
+        if valide:
+            resultats = [{
+                'candidat_id': str(candidat_id),
+                'candidat': nom,
+                'voix': voix,
+            } for candidat_id, nom, voix in pv.resultats.order_by('-nombre_voix').values_list(
+                'candidat_id', 'candidat__nom_complet', 'nombre_voix'
+            )]
+
+        incidents = Incident.objects.filter(bureau_vote_id=bureau_id).aggregate(
+            total=Count('id'),
+            ouverts=Count('id', filter=Q(statut__in=['OUVERT', 'EN_COURS'])),
+            critiques=Count('id', filter=Q(priorite__in=['URGENTE', 'CRITIQUE'])),
+            derniere=Max('created_at'),
+        )
+
+        superviseur = pv.superviseur if pv else User.objects.filter(
+            bureau_vote_id=bureau_id, role='SUPERVISEUR'
+        ).first()
+        activites = [date for date in (pv and pv.updated_at, incidents['derniere']) if date]
+
+        return {
+            'has_pv_valide': valide,
+            'pv_id': pv.pk if pv else None,
+            'statut_pv': pv.statut if pv else None,
+            'date_soumission_pv': pv.date_soumission if pv else None,
+            'date_validation_pv': pv.date_validation if pv else None,
+            'nombre_votants': pv.nombre_votants if valide else 0,
+            'suffrages_exprimes': pv.suffrages_exprimes if valide else 0,
+            'bulletins_nuls': pv.bulletins_nuls if valide else 0,
+            'bulletins_blancs': pv.bulletins_blancs if valide else 0,
+            'taux_participation': pv.taux_participation if valide else 0,
+            'resultats_candidats': resultats,
+            'candidat_vainqueur': resultats[0]['candidat'] if resultats else None,
+            'voix_vainqueur': resultats[0]['voix'] if resultats else 0,
+            'total_incidents': incidents['total'],
+            'incidents_ouverts': incidents['ouverts'],
+            'incidents_critiques': incidents['critiques'],
+            'superviseur_nom': superviseur.nom_complet if superviseur else None,
+            'superviseur_id': superviseur.pk if superviseur else None,
+            'derniere_activite': max(activites) if activites else None,
+        }
+
+    @transaction.atomic
+    def reconstruire_bureau(self, bureau_id):
+        """Recalcule la ligne StatistiqueBureau d'un bureau (état propre au bureau, peu de lignes)"""
+        return self._enregistrer(StatistiqueBureau, self.calculer_bureau(bureau_id), bureau_id=bureau_id)
+
+    # ========== LECTURES ==========
+
+    def statistique_region(self, region_id):
+        """Ligne StatistiqueRegion d'une région (lecture par clé, construite au premier accès)"""
+        ligne = StatistiqueRegion.objects.select_related('region').filter(region_id=region_id).first()
+        if ligne is None:
+            Region.objects.get(pk=region_id)  # Region.DoesNotExist pour une région inconnue
+            ligne = self.reconstruire_region(region_id)
+        return ligne
+
+    def statistique_bureau(self, bureau_id):
+        """Ligne StatistiqueBureau d'un bureau (lecture par clé, construite au premier accès)"""
+        ligne = StatistiqueBureau.objects.filter(bureau_id=bureau_id).first()
+        return ligne or self.reconstruire_bureau(bureau_id)
+
+    def statistique_candidat(self, candidat_id):
+        """Ligne StatistiqueCandidat d'un candidat (lecture par clé, construite au premier accès)"""
+        ligne = StatistiqueCandidat.objects.filter(candidat_id=candidat_id).first()
+        if ligne is None:
+            self.reconstruire_candidats()
+            ligne = StatistiqueCandidat.objects.get(candidat_id=candidat_id)
+        return ligne
+
+    # ========== RÉCONCILIATION ==========
+
+    def reconcilier(self, corriger=False):
+        """
+        Compare les compteurs maintenus par deltas à un recalcul complet.
+        Retourne {table: [(clé, {champ: (compteur, attendu)})]} ; avec `corriger`,
+        les lignes divergentes sont reconstruites
+        """
+        divergences = {'regions': [], 'candidats': [], 'bureaux': []}
+
+        attendus = self.calculer_regions()
+        lignes = {
+            ligne['region_id']: ligne
+            for ligne in StatistiqueRegion.objects.values('region_id', *COMPTEURS_REGION)
+        }
+        for region_id in set(attendus) | set(lignes):
+            ecarts = self._ecarts(lignes.get(region_id), attendus.get(region_id), COMPTEURS_REGION)
+            if ecarts:
+                divergences['regions'].append((region_id, ecarts))
+
+        attendus = self.calculer_candidats()
+        lignes = {
+            ligne['candidat_id']: ligne
+            for ligne in StatistiqueCandidat.objects.values('candidat_id', *COMPTEURS_CANDIDAT)
+        }
+        for candidat_id in attendus:
+            ecarts = self._ecarts(lignes.get(candidat_id), attendus[candidat_id], COMPTEURS_CANDIDAT)
+            if ecarts:
+                divergences['candidats'].append((candidat_id, ecarts))
+
+        divergences['bureaux'] = self._reconcilier_bureaux()
+
+        if corriger:
+            for region_id, _ in divergences['regions']:
+                self.reconstruire_region(region_id)
+            if divergences['candidats']:
+                self.reconstruire_candidats()
+            for bureau_id, _ in divergences['bureaux']:
+                self.reconstruire_bureau(bureau_id)
+
+        return divergences
+
+    def _ecarts(self, ligne, attendu, champs):
+        """Champs dont la valeur stockée diffère de la valeur recalculée (ligne absente = zéros)"""
+        ligne = ligne or {}
+        attendu = attendu or {}
+        ecarts = {}
+        for champ in champs:
+            vide = {} if champ == 'resultats_par_region' else 0
+            stocke, calcule = ligne.get(champ, vide), attendu.get(champ, vide)
+            if stocke != calcule:
+                ecarts[champ] = (stocke, calcule)
+        return ecarts
+
+    def _reconcilier_bureaux(self):
+        """Vérifie PV validé et nombre d'incidents de chaque bureau (2 requêtes GROUP BY)"""
+        valides = set(
+            ProcesVerbal.objects.filter(statut='VALIDE').values_list('bureau_vote_id', flat=True)
+        )
+        incidents = dict(
+            Incident.objects.values('bureau_vote_id').annotate(total=Count('id'))
+            .order_by().values_list('bureau_vote_id', 'total')
+        )
+        lignes = {
+            bureau_id: {'has_pv_valide': pv_valide, 'total_incidents': total}
+            for bureau_id, pv_valide, total in StatistiqueBureau.objects.values_list(
+                'bureau_id', 'has_pv_valide', 'total_incidents'
+            )
+        }
+
+        divergences = []
+        for bureau_id in valides | set(incidents) | set(lignes):
+            attendu = {
+                'has_pv_valide': bureau_id in valides,
+                'total_incidents': incidents.get(bureau_id, 0),
+            }
+            ligne = lignes.get(bureau_id, {'has_pv_valide': False, 'total_incidents': 0})
+            ecarts = {
+                champ: (ligne[champ], valeur)
+                for champ, valeur in attendu.items() if ligne[champ] != valeur
+            }
+            if ecarts:
+                divergences.append((bureau_id, ecarts))
+
+        return divergences
+
+
+# Instance singleton
+compteur_service = CompteurService()
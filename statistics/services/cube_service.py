@@ -0,0 +1,562 @@
+# statistics/services/cube_service.py
+"""
+Cube des résultats : matrice bureaux x candidats (int32) des voix des PV
+validés, accompagnée, pour chaque niveau géographique, d'un tableau donnant
+la position de l'ancêtre de chaque bureau.
+
+Une seconde matrice bureaux x 5 porte la participation des PV validés.
+
+Tout cumul (noeud, niveau entier, national) ou classement est une réduction
+NumPy sur la matrice, sans requête SQL. Deux modes de partage :
+
+- snapshot partagé (STATISTIQUES_CUBE_REPERTOIRE, idéalement sous /dev/shm) : une
+  tâche Celery reconstruit le cube et l'écrit dans un répertoire versionné
+  (fichiers .npy), puis bascule atomiquement le lien `courant` vers lui. Les
+  workers gunicorn projettent les fichiers en mémoire (mmap, lecture seule) :
+  une seule copie physique pour tous, relue sans copie, et un changement de
+  version détecté par un simple readlink ;
+- sans répertoire : chaque worker construit son cube ; la validation d'un PV
+  patche la ligne du bureau dans le worker qui l'a traitée, incrémente un
+  compteur de version partagé (cache `default`) et inscrit le bureau dans un
+  journal des versions. Les autres workers relisent alors les seuls bureaux
+  journalisés depuis leur version ; ils ne reconstruisent tout le cube que si
+  le journal est incomplet (invalidation, entrée expirée, retard trop grand).
+
+Les tableaux sont en lecture seule : un patch ou une publication produit un
+nouveau cube, substitué d'un bloc à l'ancien.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+
+from geography.models import BureauVote
+from pv.models import Candidat, ProcesVerbal, ResultatCandidat
+
+logger = logging.getLogger(__name__)
+
+
+# Niveaux géographiques indexés : niveau -> colonne dénormalisée de BureauVote
+NIVEAUX = {
+    'lieu_vote': 'lieu_vote_id',
+    'sous_prefecture': 'sous_prefecture_id',
+    'commune': 'commune_id',
+    'departement': 'departement_id',
+    'region': 'region_id',
+}
+
+# Colonnes de la matrice de participation (PV validés)
+PARTICIPATION = (
+    'nombre_inscrits', 'nombre_votants', 'suffrages_exprimes', 'bulletins_nuls', 'bulletins_blancs',
+)
+
+
+def _lecture_seule(tableau):
+    tableau.flags.writeable = False
+    return tableau
+
+
+class CubeResultats:
+    """Voix validées bureaux x candidats et index géographiques des bureaux"""
+
+    def __init__(self, version, bureau_ids, candidats, voix, participation, index):
+        self.version = version
+        self.bureau_ids = _lecture_seule(bureau_ids)
+        self.candidats = candidats
+        self.colonnes = {candidat['id']: j for j, candidat in enumerate(candidats)}
+        self.numeros = _lecture_seule(np.array([c['numero_ordre'] for c in candidats], dtype=np.int64))
+        self.voix = _lecture_seule(voix)
+        self.participation = _lecture_seule(participation)
+        # niveau -> (identifiants des noeuds triés, position du noeud de chaque bureau)
+        self.index = {
+            niveau: (_lecture_seule(ids), _lecture_seule(positions))
+            for niveau, (ids, positions) in index.items()
+        }
+        # niveau -> (bureaux triés par noeud, début de chaque noeud), calculé à la première lecture
+        self._groupes = {}
+
+    @classmethod
+    def construire(cls, version):
+        """Construit le cube depuis la base (4 requêtes)"""
+        colonnes = ['id', *NIVEAUX.values()]
+        lignes = list(BureauVote.objects.order_by('id').values_list(*colonnes))
+        valeurs = np.array(
+            [[-1 if valeur is None else valeur for valeur in ligne] for ligne in lignes],
+            dtype=np.int64
+        ).reshape(len(lignes), len(colonnes))
+        bureau_ids = valeurs[:, 0].copy()
+
+        index = {}
+        for k, niveau in enumerate(NIVEAUX, 1):
+            colonne = valeurs[:, k]
+            ids = np.unique(colonne[colonne >= 0])
+            # Les bureaux sans ancêtre connu tombent dans un groupe fictif (len(ids)), ignoré
+            positions = np.where(colonne >= 0, np.searchsorted(ids, colonne), len(ids))
+            index[niveau] = (ids, positions.astype(np.int64))
+
+        candidats = list(Candidat.objects.order_by('numero_ordre').values(
+            'id', 'nom_complet', 'parti_politique', 'numero_ordre'
+        ))
+        colonnes_candidats = {candidat['id']: j for j, candidat in enumerate(candidats)}
+
+        voix = np.zeros((len(bureau_ids), len(candidats)), dtype=np.int32)
+        resultats = list(ResultatCandidat.objects.filter(pv__statut='VALIDE').values_list(
+            'pv__bureau_vote_id', 'candidat_id', 'nombre_voix'
+        ))
+        if resultats:
+            bureaux, candidats_ids, nombres = zip(*resultats)
+            np.add.at(
+                voix,
+                (
+                    np.searchsorted(bureau_ids, np.array(bureaux, dtype=np.int64)),
+                    np.array([colonnes_candidats[candidat_id] for candidat_id in candidats_ids]),
+                ),
+                np.array(nombres, dtype=np.int32)
+            )
+
+        participation = np.zeros((len(bureau_ids), len(PARTICIPATION)), dtype=np.int32)
+        pvs = list(ProcesVerbal.objects.filter(statut='VALIDE').values_list('bureau_vote_id', *PARTICIPATION))
+        if pvs:
+            valeurs_pv = np.array(pvs, dtype=np.int64)
+            np.add.at(
+                participation,
+                np.searchsorted(bureau_ids, valeurs_pv[:, 0]),
+                valeurs_pv[:, 1:].astype(np.int32)
+            )
+
+        return cls(version, bureau_ids, candidats, voix, participation, index)
+
+    # ========== SNAPSHOT SUR DISQUE ==========
+
+    def ecrire(self, chemin):
+        """Écrit le cube dans un répertoire : un .npy par tableau, candidats en JSON"""
+        tableaux = {
+            'bureau_ids': self.bureau_ids,
+            'voix': self.voix,
+            'participation': self.participation,
+        }
+        for niveau, (ids, positions) in self.index.items():
+            tableaux[f'{niveau}_ids'] = ids
+            tableaux[f'{niveau}_positions'] = positions
+
+        for nom, tableau in tableaux.items():
+            np.save(os.path.join(chemin, f'{nom}.npy'), tableau)
+
+        with open(os.path.join(chemin, 'candidats.json'), 'w') as fichier:
+            json.dump([{**candidat, 'id': str(candidat['id'])} for candidat in self.candidats], fichier)
+
+    @classmethod
+    def charger(cls, chemin, version):
+        """Projette en mémoire (mmap, lecture seule) un cube écrit par `ecrire`"""
+        def lire(nom):
+            return np.load(os.path.join(chemin, f'{nom}.npy'), mmap_mode='r')
+
+        with open(os.path.join(chemin, 'candidats.json')) as fichier:
+            candidats = [{**candidat, 'id': uuid.UUID(candidat['id'])} for candidat in json.load(fichier)]
+
+        return cls(
+            version,
+            lire('bureau_ids'),
+            candidats,
+            lire('voix'),
+            lire('participation'),
+            {niveau: (lire(f'{niveau}_ids'), lire(f'{niveau}_positions')) for niveau in NIVEAUX}
+        )
+
+    def ligne_bureau(self, bureau_id):
+        """Position d'un bureau dans la matrice, None s'il est inconnu du cube"""
+        position = int(np.searchsorted(self.bureau_ids, bureau_id))
+        if position < len(self.bureau_ids) and self.bureau_ids[position] == bureau_id:
+            return position
+        return None
+
+    def avec_bureaux(self, etats, version):
+        """
+        Nouveau cube où les lignes des bureaux {bureau_id: (voix par candidat,
+        participation)} sont remplacées ; None si un bureau ou un candidat est
+        inconnu (le cube doit alors être reconstruit)
+        """
+        positions = {bureau_id: self.ligne_bureau(bureau_id) for bureau_id in etats}
+        if None in positions.values() or any(
+            candidat_id not in self.colonnes for voix, _ in etats.values() for candidat_id in voix
+        ):
+            return None
+
+        voix = self.voix.copy()
+        nouvelle_participation = self.participation.copy()
+        for bureau_id, (voix_par_candidat, participation) in etats.items():
+            position = positions[bureau_id]
+            voix[position] = 0
+            for candidat_id, nombre in voix_par_candidat.items():
+                voix[position, self.colonnes[candidat_id]] = nombre
+            nouvelle_participation[position] = participation
+
+        cube = CubeResultats(
+            version, self.bureau_ids, self.candidats, voix, nouvelle_participation, dict(self.index)
+        )
+        # Même rattachement des bureaux : les groupes restent valables
+        cube._groupes = self._groupes
+        return cube
+
+    # ========== RÉDUCTIONS ==========
+
+    def _groupe(self, niveau, entite_id):
+        """
+        Positions des bureaux d'un noeud : tranche du tri des bureaux par noeud
+        (argsort des positions, calculé une fois par niveau), sans masque sur
+        toute la matrice ; tableau vide pour un noeud inconnu
+        """
+        ids, positions = self.index[niveau]
+        k = int(np.searchsorted(ids, int(entite_id)))
+        if k == len(ids) or ids[k] != int(entite_id):
+            return np.zeros(0, dtype=np.int64)
+
+        groupes = self._groupes.get(niveau)
+        if groupes is None:
+            ordre = np.argsort(positions, kind='stable')
+            debuts = np.searchsorted(positions[ordre], np.arange(len(ids) + 2))
+            groupes = self._groupes[niveau] = (_lecture_seule(ordre), _lecture_seule(debuts))
+
+        ordre, debuts = groupes
+        return ordre[debuts[k]:debuts[k + 1]]
+
+    def totaux(self, niveau=None, entite_id=None):
+        """Voix par candidat d'un noeud (national si `niveau` est None)"""
+        if niveau is None:
+            return self.voix.sum(axis=0, dtype=np.int64)
+
+        if niveau == 'bureau_vote':
+            position = self.ligne_bureau(int(entite_id))
+            if position is None:
+                return np.zeros(len(self.candidats), dtype=np.int64)
+            return self.voix[position].astype(np.int64)
+
+        return self.voix[self._groupe(niveau, entite_id)].sum(axis=0, dtype=np.int64)
+
+    def totaux_par(self, niveau):
+        """
+        Voix par candidat de chaque noeud d'un niveau, en une réduction :
+        (identifiants des noeuds, matrice noeuds x candidats)
+        """
+        ids, positions = self.index[niveau]
+        nombre_candidats = len(self.candidats)
+        groupes = len(ids) + 1  # + groupe fictif des bureaux sans ancêtre
+
+        plat = (positions[:, None] * nombre_candidats + np.arange(nombre_candidats)).ravel()
+        totaux = np.bincount(
+            plat, weights=self.voix.ravel(), minlength=groupes * nombre_candidats
+        ).reshape(groupes, nombre_candidats)
+
+        return ids, totaux[:-1].round().astype(np.int64)
+
+    def cumul_participation(self, niveau=None, entite_id=None):
+        """Participation cumulée des PV validés d'un noeud (national si `niveau` est None)"""
+        if niveau is None:
+            lignes = self.participation
+        elif niveau == 'bureau_vote':
+            position = self.ligne_bureau(int(entite_id))
+            lignes = self.participation[position:position + 1] if position is not None else self.participation[:0]
+        else:
+            lignes = self.participation[self._groupe(niveau, entite_id)]
+
+        return lignes.sum(axis=0, dtype=np.int64)
+
+    def nombre_bureaux(self):
+        """Nombre de bureaux où chaque candidat a obtenu des voix"""
+        return np.count_nonzero(self.voix, axis=0)
+
+    def ordre(self, totaux):
+        """Indices des candidats par voix décroissantes, puis numéro d'ordre"""
+        return np.lexsort((self.numeros, -totaux))
+
+
+class CubeService:
+    """Cube des résultats partagé entre workers (snapshot mmap) ou propre au worker"""
+
+    CLE_VERSION = 'stats:cube:version'
+    # Journal des versions : stats:cube:journal:<version> -> bureau modifié par cette version
+    CLE_JOURNAL = 'stats:cube:journal'
+    DUREE_JOURNAL = 60 * 60
+    # Au-delà, un worker en retard reconstruit son cube plutôt que de rejouer le journal
+    JOURNAL_MAX = 500
+    CLE_PUBLICATION = 'stats:cube:publication'
+    LIEN_COURANT = 'courant'
+    # Versions conservées sur disque : un worker peut encore projeter la précédente
+    VERSIONS_CONSERVEES = 3
+
+    def __init__(self):
+        self._cube = None
+        self._verrou = threading.Lock()
+
+    @property
+    def repertoire(self):
+        """Répertoire du snapshot partagé ; vide pour un cube propre à chaque worker"""
+        return getattr(settings, 'STATISTIQUES_CUBE_REPERTOIRE', '')
+
+    def cube(self):
+        """Cube courant : snapshot partagé s'il est configuré, sinon cube du worker"""
+        repertoire = self.repertoire
+        if repertoire:
+            cube = self._cube_partage(repertoire)
+            if cube is not None:
+                return cube
+            # Premier démarrage : aucun snapshot encore publié. La publication part
+            # en tâche de fond (une seule programmée pour tous les workers) et la
+            # requête est servie, en attendant, par le cube du worker
+            self.planifier_publication()
+
+        return self._cube_local()
+
+    # ========== SNAPSHOT PARTAGÉ ==========
+
+    def _cube_partage(self, repertoire):
+        """Cube de la version pointée par `courant`, projeté une fois par worker"""
+        try:
+            version = os.readlink(os.path.join(repertoire, self.LIEN_COURANT))
+        except OSError:
+            return None
+
+        cube = self._cube
+        if cube is not None and cube.version == version:
+            return cube
+
+        with self._verrou:
+            if self._cube is None or self._cube.version != version:
+                try:
+                    self._cube = CubeResultats.charger(os.path.join(repertoire, version), version)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Snapshot du cube {version} illisible: {str(e)}")
+                    return None
+            return self._cube
+
+    def publier(self):
+        """
+        Construit le cube depuis la base, l'écrit dans un nouveau répertoire
+        versionné et y fait pointer `courant` (renommage atomique).
+        Retourne la version publiée
+        """
+        repertoire = self.repertoire
+        os.makedirs(repertoire, exist_ok=True)
+
+        version = f'v{time.time_ns()}'
+        cube = CubeResultats.construire(version)
+
+        temporaire = tempfile.mkdtemp(prefix='.ecriture-', dir=repertoire)
+        try:
+            cube.ecrire(temporaire)
+            os.rename(temporaire, os.path.join(repertoire, version))
+        except Exception:
+            shutil.rmtree(temporaire, ignore_errors=True)
+            raise
+
+        lien = os.path.join(repertoire, f'.{self.LIEN_COURANT}-{os.getpid()}-{threading.get_ident()}')
+        os.symlink(version, lien)
+        os.replace(lien, os.path.join(repertoire, self.LIEN_COURANT))
+
+        self._nettoyer(repertoire)
+        return version
+
+    def _nettoyer(self, repertoire):
+        """Supprime les anciennes versions (les workers qui les projettent encore gardent leur mmap)"""
+        versions = sorted(nom for nom in os.listdir(repertoire) if nom.startswith('v'))
+        for nom in versions[:-self.VERSIONS_CONSERVEES]:
+            shutil.rmtree(os.path.join(repertoire, nom), ignore_errors=True)
+
+    def planifier_publication(self):
+        """Programme une publication (une seule en attente à la fois, regroupant les changements)"""
+        delai = getattr(settings, 'STATISTIQUES_CUBE_DELAI', 2)
+        if not cache.add(self.CLE_PUBLICATION, 1, delai * 10):
+            return False
+
+        from statistics.tasks import publier_cube_resultats
+
+        try:
+            publier_cube_resultats.apply_async(countdown=delai)
+        except Exception as e:
+            logger.warning(f"Publication du cube non programmée: {str(e)}")
+            cache.delete(self.CLE_PUBLICATION)
+            return False
+
+        return True
+
+    def liberer_publication(self):
+        """Appelé au début de la publication : les changements suivants en programment une autre"""
+        cache.delete(self.CLE_PUBLICATION)
+
+    # ========== CUBE PROPRE AU WORKER ==========
+
+    def _initialiser_version(self):
+        # Horodatage plutôt que 1 : après une purge du cache, aucun worker ne croit sa copie à jour
+        cache.add(self.CLE_VERSION, time.time_ns() // 1000, None)
+
+    def _version_partagee(self):
+        version = cache.get(self.CLE_VERSION)
+        if version is None:
+            self._initialiser_version()
+            version = cache.get(self.CLE_VERSION)
+        return version
+
+    def _nouvelle_version(self):
+        try:
+            return cache.incr(self.CLE_VERSION)
+        except ValueError:
+            self._initialiser_version()
+            return cache.incr(self.CLE_VERSION)
+
+    def _cube_local(self):
+        """
+        Cube du worker, à jour de la version partagée : rattrapé en relisant les
+        bureaux du journal, reconstruit si le journal ne suffit pas
+        """
+        version = self._version_partagee()
+        cube = self._cube
+        if cube is not None and cube.version == version:
+            return cube
+
+        with self._verrou:
+            if self._cube is None or self._cube.version != version:
+                cube = self._rattraper(self._cube, version)
+                self._cube = cube if cube is not None else CubeResultats.construire(version)
+            return self._cube
+
+    def _rattraper(self, cube, version):
+        """
+        Cube à jour de `version` obtenu en relisant les bureaux journalisés
+        depuis la version du cube ; None si le journal est incomplet
+        """
+        if cube is None or not isinstance(cube.version, int) or not 0 < version - cube.version <= self.JOURNAL_MAX:
+            return None
+
+        cles = [f'{self.CLE_JOURNAL}:{v}' for v in range(cube.version + 1, version + 1)]
+        journal = cache.get_many(cles)
+        if len(journal) != len(cles):
+            # Invalidation (pas d'entrée) ou entrée expirée : reconstruction complète
+            return None
+
+        return cube.avec_bureaux(self._etats_bureaux(set(journal.values())), version)
+
+    def _etats_bureaux(self, bureau_ids):
+        """{bureau_id: (voix par candidat, participation)} des PV validés de bureaux (2 requêtes)"""
+        etats = {bureau_id: ({}, [0] * len(PARTICIPATION)) for bureau_id in bureau_ids}
+
+        for bureau_id, candidat_id, voix in ResultatCandidat.objects.filter(
+            pv__bureau_vote_id__in=bureau_ids, pv__statut='VALIDE'
+        ).values('pv__bureau_vote_id', 'candidat_id').annotate(voix=Sum('nombre_voix')).values_list(
+            'pv__bureau_vote_id', 'candidat_id', 'voix'
+        ).order_by():
+            etats[bureau_id][0][candidat_id] = voix
+
+        for ligne in ProcesVerbal.objects.filter(
+            bureau_vote_id__in=bureau_ids, statut='VALIDE'
+        ).values('bureau_vote_id').annotate(
+            **{champ: Sum(champ) for champ in PARTICIPATION}
+        ).order_by():
+            etats[ligne['bureau_vote_id']] = (
+                etats[ligne['bureau_vote_id']][0], [ligne[champ] or 0 for champ in PARTICIPATION]
+            )
+
+        return etats
+
+    def bureau_modifie(self, bureau_id):
+        """
+        Un PV du bureau est entré dans (ou sorti de) l'état VALIDE : programme
+        une publication du snapshot partagé, ou patche le cube du worker et
+        journalise le bureau pour que les autres workers le relisent
+        """
+        if self.repertoire:
+            self.planifier_publication()
+            return
+
+        etats = self._etats_bureaux({bureau_id})
+
+        version = self._nouvelle_version()
+        cache.set(f'{self.CLE_JOURNAL}:{version}', bureau_id, self.DUREE_JOURNAL)
+        with self._verrou:
+            cube = self._cube
+            # Patch immédiat si aucune autre modification n'a eu lieu entre-temps ;
+            # sinon le cube sera rattrapé par le journal à la prochaine lecture
+            if cube is not None and cube.version == version - 1:
+                self._cube = cube.avec_bureaux(etats, version)
+
+    def invalider(self):
+        """Force la reconstruction du cube dans tous les workers"""
+        if self.repertoire:
+            self.planifier_publication()
+        else:
+            self._nouvelle_version()
+
+    # ========== LECTURES ==========
+
+    def resultats(self, niveau=None, entite_id=None):
+        """
+        Résultats par candidat d'un noeud (national si `niveau` est None), au
+        format de stats_resultats_candidats ; liste vide sans voix validée
+        """
+        cube = self.cube()
+        totaux = cube.totaux(niveau, entite_id)
+        total = int(totaux.sum())
+        if total == 0:
+            return []
+
+        return [
+            {
+                'candidat': cube.candidats[j]['nom_complet'],
+                'parti': cube.candidats[j]['parti_politique'],
+                'numero': cube.candidats[j]['numero_ordre'],
+                'voix': int(totaux[j]),
+                'pourcentage': round(int(totaux[j]) / total * 100, 2),
+            }
+            for j in cube.ordre(totaux)
+        ]
+
+    def classement_national(self):
+        """Classement national : voix, pourcentage, position et bureaux de chaque candidat"""
+        cube = self.cube()
+        totaux = cube.totaux()
+        total = int(totaux.sum())
+        bureaux = cube.nombre_bureaux()
+
+        return [
+            {
+                **cube.candidats[j],
+                'total_voix': int(totaux[j]),
+                'pourcentage': round(int(totaux[j]) / total * 100, 2) if total > 0 else 0,
+                'position': position,
+                'nombre_bureaux': int(bureaux[j]),
+            }
+            for position, j in enumerate(cube.ordre(totaux), 1)
+        ]
+
+    def participation(self, niveau=None, entite_id=None):
+        """Participation des PV validés d'un noeud (national si `niveau` est None)"""
+        cumul = dict(zip(PARTICIPATION, map(int, self.cube().cumul_participation(niveau, entite_id))))
+        inscrits = cumul['nombre_inscrits']
+        votants = cumul['nombre_votants']
+
+        cumul['taux_participation'] = round(votants / inscrits * 100, 2) if inscrits > 0 else 0
+        cumul['taux_nuls'] = round(cumul['bulletins_nuls'] / votants * 100, 2) if votants > 0 else 0
+        return cumul
+
+    def resultats_par(self, niveau):
+        """{identifiant du noeud: {candidat_id: voix}} pour tous les noeuds d'un niveau"""
+        cube = self.cube()
+        ids, totaux = cube.totaux_par(niveau)
+        candidat_ids = [candidat['id'] for candidat in cube.candidats]
+
+        return {
+            int(entite_id): dict(zip(candidat_ids, map(int, ligne)))
+            for entite_id, ligne in zip(ids, totaux)
+        }
+
+
+# Instance singleton
+cube_service = CubeService()
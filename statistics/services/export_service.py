@@ -0,0 +1,299 @@
+# statistics/services/export_service.py
+"""
+Exports asynchrones des statistiques (participation, résultats, incidents)
+
+Une demande est identifiée par son empreinte : SHA-256 du contenu, du format,
+du périmètre et de la version des données (nombre de lignes source et date de
+dernière modification, une requête agrégée). Tant que les données ne changent
+pas, une demande identique retrouve le même export, terminé ou en cours ; dès
+qu'elles changent, l'empreinte change et un nouvel export est généré.
+
+Le fichier est écrit par une tâche Celery, par blocs de TAILLE_BLOC lignes
+(values_list + iterator), dans un fichier temporaire renommé à la fin dans
+STATISTIQUES_EXPORT_REPERTOIRE sous le nom <empreinte>.<extension>.
+Format COLONNES : une archive .npz (lisible par np.load) contenant, pour chaque
+bloc, un tableau typé par colonne (bloc_00000/code_bv, ...) et schema.json.
+"""
+import csv
+import hashlib
+import json
+import os
+import time
+import zipfile
+from datetime import timedelta, timezone as dt_timezone
+from itertools import islice
+
+import numpy as np
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from geography.services import aggregation_service
+from geography.services.aggregation_service import MODELES_NIVEAUX, NIVEAUX
+from incidents.models import Incident
+from pv.models import ProcesVerbal, ResultatCandidat
+
+
+TAILLE_BLOC = 5000
+
+# Contenu -> (modèle, filtre, préfixe vers le PV / l'incident, champ de version, colonnes)
+# Colonne : (nom, champ lu en base, type NumPy de la colonne)
+CONTENUS = {
+    'PARTICIPATION': (ProcesVerbal, Q(statut='VALIDE'), '', 'updated_at', (
+        ('code_bv', 'bureau_vote__code_bv', 'U'),
+        ('nom_bv', 'bureau_vote__nom_bv', 'U'),
+        ('region', 'region__nom_region', 'U'),
+        ('inscrits', 'nombre_inscrits', 'i8'),
+        ('votants', 'nombre_votants', 'i8'),
+        ('exprimes', 'suffrages_exprimes', 'i8'),
+        ('nuls', 'bulletins_nuls', 'i8'),
+        ('blancs', 'bulletins_blancs', 'i8'),
+        ('date_validation', 'date_validation', 'M8[us]'),
+    )),
+    'RESULTATS': (ResultatCandidat, Q(pv__statut='VALIDE'), 'pv__', 'pv__updated_at', (
+        ('code_bv', 'pv__bureau_vote__code_bv', 'U'),
+        ('numero_ordre', 'candidat__numero_ordre', 'i8'),
+        ('candidat', 'candidat__nom_complet', 'U'),
+        ('parti', 'candidat__parti_politique', 'U'),
+        ('voix', 'nombre_voix', 'i8'),
+    )),
+    'INCIDENTS': (Incident, Q(), '', 'updated_at', (
+        ('numero_ticket', 'numero_ticket', 'U'),
+        ('code_bv', 'bureau_vote__code_bv', 'U'),
+        ('categorie', 'categorie', 'U'),
+        ('priorite', 'priorite', 'U'),
+        ('statut', 'statut', 'U'),
+        ('titre', 'titre', 'U'),
+        ('heure_incident', 'heure_incident', 'M8[us]'),
+    )),
+}
+
+EXTENSIONS = {'JSON': 'json', 'CSV': 'csv', 'XLSX': 'xlsx', 'COLONNES': 'npz'}
+
+
+def _naif(valeur):
+    """Datetime aware -> naïf UTC (Excel et NumPy ignorent les fuseaux)"""
+    return valeur.astimezone(dt_timezone.utc).replace(tzinfo=None) if valeur else valeur
+
+
+class ExportService:
+    """Demande, génération et réutilisation des exports de statistiques"""
+
+    @property
+    def repertoire(self):
+        return getattr(settings, 'STATISTIQUES_EXPORT_REPERTOIRE', '') or os.path.join(
+            settings.MEDIA_ROOT, 'exports'
+        )
+
+    def chemin(self, export):
+        return os.path.join(self.repertoire, export.fichier)
+
+    def _verifier(self, contenu, format_export):
+        if contenu not in CONTENUS:
+            raise ValueError(f"Contenu d'export non supporté: {contenu}")
+        if format_export not in EXTENSIONS:
+            raise ValueError(f"Format d'export non supporté: {format_export}")
+
+    def noeud(self, export):
+        """Noeud géographique de l'export (None pour le national)"""
+        if export.niveau == 'national':
+            return None
+        modele = {nom: modele for modele, nom in MODELES_NIVEAUX.items()}[export.niveau]
+        return modele.objects.filter(id=export.entite_id).first()
+
+    def _queryset(self, contenu, noeud=None):
+        modele, filtre, prefixe, _, _ = CONTENUS[contenu]
+        qs = modele.objects.filter(filtre)
+        if noeud is not None:
+            qs = qs.filter(**{prefixe + NIVEAUX[aggregation_service.niveau_de(noeud)][1]: noeud})
+        return qs
+
+    def version_donnees(self, contenu, noeud=None):
+        """Version des données d'un export : nombre de lignes et dernière modification"""
+        champ_version = CONTENUS[contenu][3]
+        agregat = self._queryset(contenu, noeud).aggregate(nombre=Count('pk'), maj=Max(champ_version))
+        return f"{agregat['nombre']}:{agregat['maj'].isoformat() if agregat['maj'] else ''}"
+
+    def _niveau(self, noeud):
+        return aggregation_service.niveau_de(noeud) if noeud is not None else 'national'
+
+    def empreinte(self, contenu, format_export, noeud, version):
+        """Adresse de l'export : SHA-256 de la demande et de la version des données"""
+        perimetre = [self._niveau(noeud), noeud.pk if noeud is not None else None]
+        cle = json.dumps([contenu, format_export, perimetre, version])
+        return hashlib.sha256(cle.encode()).hexdigest()
+
+    def demander(self, contenu, format_export, noeud=None, user=None):
+        """
+        Retourne (export, nouveau) pour la demande : l'export existant de même
+        empreinte s'il est terminé ou en cours, sinon un export planifié
+        """
+        from statistics.models import ExportStatistique
+
+        self._verifier(contenu, format_export)
+        version = self.version_donnees(contenu, noeud)
+
+        export, nouveau = ExportStatistique.objects.get_or_create(
+            empreinte=self.empreinte(contenu, format_export, noeud, version),
+            defaults={
+                'contenu': contenu,
+                'format': format_export,
+                'niveau': self._niveau(noeud),
+                'entite_id': noeud.pk if noeud is not None else None,
+                'version_donnees': version,
+                'demande_par': user,
+            }
+        )
+
+        # Échec, ou fichier disparu (nettoyage) : l'export est relancé
+        perdu = export.statut == 'TERMINE' and not os.path.exists(self.chemin(export))
+        if not nouveau and (export.statut == 'ECHEC' or perdu):
+            ExportStatistique.objects.filter(pk=export.pk).update(statut='EN_ATTENTE', message=None)
+            export.statut = 'EN_ATTENTE'
+            nouveau = True
+
+        if nouveau:
+            from statistics.tasks import generer_export
+
+            transaction.on_commit(lambda: generer_export.delay(str(export.pk)))
+
+        return export, nouveau
+
+    def generer(self, export_id):
+        """Écrit le fichier de l'export (un seul worker : passage EN_ATTENTE -> EN_COURS)"""
+        from statistics.models import ExportStatistique
+
+        if not ExportStatistique.objects.filter(pk=export_id, statut='EN_ATTENTE').update(statut='EN_COURS'):
+            return None
+
+        export = ExportStatistique.objects.get(pk=export_id)
+        debut = time.monotonic()
+        os.makedirs(self.repertoire, exist_ok=True)
+        fichier = f'{export.empreinte}.{EXTENSIONS[export.format]}'
+        temporaire = os.path.join(self.repertoire, f'.{fichier}.{os.getpid()}.tmp')
+
+        try:
+            colonnes = CONTENUS[export.contenu][4]
+            blocs = self._blocs(export, colonnes)
+            ecrire = getattr(self, f'_ecrire_{export.format.lower()}')
+            nombre_lignes = ecrire(temporaire, colonnes, blocs)
+            os.replace(temporaire, os.path.join(self.repertoire, fichier))
+        except Exception as e:
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+            ExportStatistique.objects.filter(pk=export_id).update(
+                statut='ECHEC', message=str(e), date_fin=timezone.now()
+            )
+            raise
+
+        ExportStatistique.objects.filter(pk=export_id).update(
+            statut='TERMINE',
+            fichier=fichier,
+            nombre_lignes=nombre_lignes,
+            taille_octets=os.path.getsize(os.path.join(self.repertoire, fichier)),
+            duree_ms=int((time.monotonic() - debut) * 1000),
+            date_fin=timezone.now(),
+        )
+        return fichier
+
+    def _blocs(self, export, colonnes):
+        """Lignes de l'export par blocs de TAILLE_BLOC ; la progression est enregistrée à chaque bloc"""
+        from statistics.models import ExportStatistique
+
+        champs = [champ for _, champ, _ in colonnes]
+        lignes = self._queryset(export.contenu, self.noeud(export)).order_by(*champs[:2], 'pk').values_list(
+            *champs
+        ).iterator(chunk_size=TAILLE_BLOC)
+
+        total = 0
+        while bloc := list(islice(lignes, TAILLE_BLOC)):
+            yield bloc
+            total += len(bloc)
+            ExportStatistique.objects.filter(pk=export.pk).update(nombre_lignes=total)
+
+    # ========== ÉCRITURE PAR FORMAT ==========
+
+    def _ecrire_csv(self, chemin, colonnes, blocs):
+        nombre = 0
+        with open(chemin, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([nom for nom, _, _ in colonnes])
+            for bloc in blocs:
+                writer.writerows(bloc)
+                nombre += len(bloc)
+        return nombre
+
+    def _ecrire_json(self, chemin, colonnes, blocs):
+        noms = [nom for nom, _, _ in colonnes]
+        nombre = 0
+        with open(chemin, 'w', encoding='utf-8') as f:
+            f.write('[')
+            for bloc in blocs:
+                for ligne in bloc:
+                    f.write(',\n' if nombre else '\n')
+                    f.write(json.dumps(dict(zip(noms, ligne)), cls=DjangoJSONEncoder, ensure_ascii=False))
+                    nombre += 1
+            f.write('\n]\n')
+        return nombre
+
+    def _ecrire_xlsx(self, chemin, colonnes, blocs):
+        import openpyxl
+
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet('Export')
+        ws.append([nom for nom, _, _ in colonnes])
+        dates = [i for i, (_, _, type_colonne) in enumerate(colonnes) if type_colonne.startswith('M8')]
+
+        nombre = 0
+        for bloc in blocs:
+            for ligne in bloc:
+                if dates:
+                    ligne = list(ligne)
+                    for i in dates:
+                        ligne[i] = _naif(ligne[i])
+                ws.append(ligne)
+            nombre += len(bloc)
+        wb.save(chemin)
+        return nombre
+
+    def _ecrire_colonnes(self, chemin, colonnes, blocs):
+        nombre = 0
+        numero = 0
+        with zipfile.ZipFile(chemin, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for numero, bloc in enumerate(blocs, 1):
+                for (nom, _, type_colonne), valeurs in zip(colonnes, zip(*bloc)):
+                    if type_colonne == 'U':
+                        valeurs = ['' if v is None else v for v in valeurs]
+                    elif type_colonne.startswith('M8'):
+                        valeurs = [_naif(v) for v in valeurs]
+                    with archive.open(f'bloc_{numero - 1:05d}/{nom}.npy', 'w') as f:
+                        np.save(f, np.array(valeurs, dtype=type_colonne))
+                nombre += len(bloc)
+
+            archive.writestr('schema.json', json.dumps({
+                'colonnes': [[nom, type_colonne] for nom, _, type_colonne in colonnes],
+                'blocs': numero,
+                'lignes': nombre,
+            }))
+        return nombre
+
+    # ========== MAINTENANCE ==========
+
+    def nettoyer(self, jours=None):
+        """Supprime les exports (et leurs fichiers) plus anciens que la rétention"""
+        from statistics.models import ExportStatistique
+
+        jours = jours or getattr(settings, 'STATISTIQUES_EXPORT_RETENTION_JOURS', 7)
+        anciens = ExportStatistique.objects.filter(created_at__lt=timezone.now() - timedelta(days=jours))
+        for fichier in anciens.exclude(fichier='').values_list('fichier', flat=True):
+            chemin = os.path.join(self.repertoire, fichier)
+            if os.path.exists(chemin):
+                os.remove(chemin)
+        return anciens.delete()[0]
+
+
+# Instance singleton
+export_service = ExportService()
@@ -0,0 +1,472 @@
+# statistics/services/snapshot_service.py
+"""
+Construction vectorisée des snapshots (SnapshotQuotidien)
+
+Chaque table n'est lue qu'une fois, en flux (iterator), sous forme de tuples
+d'entiers : bureaux (région, inscrits), PV (région, statut, votants),
+incidents (région, statut) et voix validées (région, candidat, voix).
+Les statuts sont encodés en SQL ; tous les cumuls, nationaux et par région,
+sont ensuite des réductions NumPy (bincount) sur ces tableaux.
+
+Série intra-horaire : toutes les STATISTIQUES_SNAPSHOT_INTERVALLE minutes
+(pendant la fenêtre de dépouillement), un point est enregistré comme écart
+(SnapshotDelta) avec le snapshot horaire de sa période. Un point se
+reconstruit à partir de sa base seule, sans rejouer les points précédents.
+"""
+import time
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from geography.models import BureauVote, Region
+from incidents.models import Incident
+from pv.models import Candidat, ProcesVerbal, ResultatCandidat
+
+
+STATUTS_PV = ('EN_ATTENTE', 'VALIDE', 'REJETE', 'CORRECTION')
+STATUTS_INCIDENT = ('OUVERT', 'EN_COURS', 'TRAITE', 'CLOS')
+
+# Taille des blocs lus depuis le curseur serveur
+TAILLE_BLOC = 5000
+
+# Champs chiffrés d'un snapshot (national et par région), encodés en écarts
+CHAMPS_NUMERIQUES = (
+    'total_bureaux', 'total_inscrits', 'total_pv_soumis', 'total_pv_valides',
+    'taux_soumission', 'taux_validation', 'total_votants', 'taux_participation_global',
+    'total_incidents', 'incidents_actifs', 'taux_resolution',
+)
+
+
+def _code(champ, valeurs):
+    """Expression SQL donnant la position d'une valeur dans `valeurs` (-1 sinon)"""
+    return Case(
+        *[When(**{champ: valeur}, then=Value(k)) for k, valeur in enumerate(valeurs)],
+        default=Value(-1),
+        output_field=IntegerField()
+    )
+
+
+def _matrice(queryset, *champs):
+    """Lit un queryset en flux et empile ses tuples d'entiers dans une matrice int64"""
+    blocs = []
+    bloc = []
+    # order_by() vide : l'ordering par défaut n'a pas de sens ici et ajouterait des jointures
+    for ligne in queryset.order_by().values_list(*champs).iterator(chunk_size=TAILLE_BLOC):
+        bloc.append(ligne)
+        if len(bloc) == TAILLE_BLOC:
+            blocs.append(np.array(bloc, dtype=np.int64))
+            bloc = []
+    if bloc:
+        blocs.append(np.array(bloc, dtype=np.int64))
+
+    if not blocs:
+        return np.zeros((0, len(champs)), dtype=np.int64)
+    return np.concatenate(blocs)
+
+
+def _taux(numerateur, denominateur):
+    return round(numerateur / denominateur * 100, 2) if denominateur > 0 else 0
+
+
+class SnapshotService:
+    """Construit et enregistre les snapshots nationaux, à la granularité voulue"""
+
+    GRANULARITES = ('HEURE', 'JOUR')
+
+    def debut_periode(self, granularite, instant=None):
+        """Début (heure locale) de la période contenant `instant`"""
+        if granularite not in self.GRANULARITES:
+            raise ValueError(f"Granularité non supportée: {granularite}")
+
+        instant = timezone.localtime(instant or timezone.now())
+        debut = instant.replace(minute=0, second=0, microsecond=0)
+        if granularite == 'JOUR':
+            debut = debut.replace(hour=0)
+        return debut
+
+    def construire(self, limite_candidats=None):
+        """
+        Calcule toutes les données d'un snapshot (6 requêtes, dont 4 lues en flux).
+        Retourne un dict aux champs de SnapshotQuotidien, duree_calcul_ms compris
+        """
+        debut = time.monotonic()
+
+        regions = list(Region.objects.order_by('id').values_list('id', 'code_region', 'nom_region'))
+        region_ids = np.array([region[0] for region in regions], dtype=np.int64)
+        taille = len(regions) + 1  # dernière case : hors région
+
+        def positions(colonne):
+            """Position de région de chaque ligne ; les lignes sans région vont en dernière case"""
+            k = np.searchsorted(region_ids, colonne)
+            connue = k < len(region_ids)
+            connue[connue] = region_ids[k[connue]] == colonne[connue]
+            return np.where(connue, k, len(regions))
+
+        sans_region = Value(0)
+
+        # Bureaux : nombre et inscrits par région
+        bureaux = _matrice(
+            BureauVote.objects.annotate(
+                region_cle=Coalesce('region_id', sans_region), inscrits=Coalesce('nombre_inscrits', Value(0))
+            ),
+            'region_cle', 'inscrits'
+        )
+        region_bureaux = positions(bureaux[:, 0])
+        nb_bureaux = np.bincount(region_bureaux, minlength=taille)
+        inscrits = np.bincount(region_bureaux, weights=bureaux[:, 1], minlength=taille).astype(np.int64)
+
+        # PV : région x statut, votants des PV validés
+        pv = _matrice(
+            ProcesVerbal.objects.annotate(
+                region_cle=Coalesce('region_id', sans_region), statut_code=_code('statut', STATUTS_PV)
+            ),
+            'region_cle', 'statut_code', 'nombre_votants'
+        )
+        region_pv = positions(pv[:, 0])
+        pv_par_statut = self._croiser(region_pv, pv[:, 1], taille, len(STATUTS_PV))
+        valides = pv[:, 1] == STATUTS_PV.index('VALIDE')
+        votants = np.bincount(
+            region_pv[valides], weights=pv[valides, 2], minlength=taille
+        ).astype(np.int64)
+
+        # Incidents : région x statut
+        incidents = _matrice(
+            Incident.objects.annotate(
+                region_cle=Coalesce('region_id', sans_region), statut_code=_code('statut', STATUTS_INCIDENT)
+            ),
+            'region_cle', 'statut_code'
+        )
+        incidents_par_statut = self._croiser(
+            positions(incidents[:, 0]), incidents[:, 1], taille, len(STATUTS_INCIDENT)
+        )
+
+        # Voix validées : région x candidat
+        candidats = list(Candidat.objects.order_by('numero_ordre').values(
+            'numero_ordre', 'nom_complet', 'parti_politique'
+        ))
+        numeros = np.array([candidat['numero_ordre'] for candidat in candidats], dtype=np.int64)
+        resultats = _matrice(
+            ResultatCandidat.objects.filter(pv__statut='VALIDE').annotate(
+                region_cle=Coalesce('pv__region_id', sans_region)
+            ),
+            'region_cle', 'candidat__numero_ordre', 'nombre_voix'
+        )
+        voix = np.zeros((taille, len(candidats)), dtype=np.int64)
+        if len(resultats):
+            np.add.at(
+                voix,
+                (positions(resultats[:, 0]), np.searchsorted(numeros, resultats[:, 1])),
+                resultats[:, 2]
+            )
+
+        national = self._bloc(
+            nb_bureaux.sum(), inscrits.sum(), pv_par_statut.sum(axis=0),
+            votants.sum(), incidents_par_statut.sum(axis=0)
+        )
+        national['resultats_snapshot'] = self._classement(voix.sum(axis=0), candidats, limite_candidats)
+
+        national['details_regions'] = [
+            {
+                'region_id': region_id,
+                'code_region': code,
+                'nom_region': nom,
+                **self._bloc(
+                    nb_bureaux[k], inscrits[k], pv_par_statut[k], votants[k], incidents_par_statut[k]
+                ),
+                'resultats': self._classement(voix[k], candidats, limite_candidats),
+            }
+            for k, (region_id, code, nom) in enumerate(regions)
+        ]
+
+        national['duree_calcul_ms'] = int((time.monotonic() - debut) * 1000)
+        return national
+
+    def _croiser(self, lignes, codes, nb_lignes, nb_codes):
+        """Tableau croisé lignes x codes (codes négatifs ignorés)"""
+        connus = codes >= 0
+        return np.bincount(
+            lignes[connus] * nb_codes + codes[connus], minlength=nb_lignes * nb_codes
+        ).reshape(nb_lignes, nb_codes)
+
+    def _bloc(self, total_bureaux, total_inscrits, pv_par_statut, total_votants, incidents_par_statut):
+        """Champs statistiques d'un snapshot (national ou région)"""
+        total_bureaux = int(total_bureaux)
+        total_inscrits = int(total_inscrits)
+        total_votants = int(total_votants)
+        total_pv = int(pv_par_statut.sum())
+        pv_valides = int(pv_par_statut[STATUTS_PV.index('VALIDE')])
+        incidents = dict(zip(STATUTS_INCIDENT, map(int, incidents_par_statut)))
+        total_incidents = sum(incidents.values())
+
+        return {
+            'total_bureaux': total_bureaux,
+            'total_inscrits': total_inscrits,
+            'total_pv_soumis': total_pv,
+            'total_pv_valides': pv_valides,
+            'taux_soumission': _taux(total_pv, total_bureaux),
+            'taux_validation': _taux(pv_valides, total_pv),
+            'total_votants': total_votants,
+            'taux_participation_global': _taux(total_votants, total_inscrits),
+            'total_incidents': total_incidents,
+            'incidents_actifs': incidents['OUVERT'] + incidents['EN_COURS'],
+            'taux_resolution': _taux(incidents['CLOS'], total_incidents),
+        }
+
+    def _classement(self, voix, candidats, limite=None):
+        """Classement des candidats par voix décroissantes (numéro d'ordre en cas d'égalité)"""
+        total = int(voix.sum())
+        ordre = np.lexsort((np.arange(len(voix)), -voix))
+        if limite is not None:
+            ordre = ordre[:limite]
+
+        return [
+            {
+                'candidat__numero_ordre': candidats[j]['numero_ordre'],
+                'candidat__nom_complet': candidats[j]['nom_complet'],
+                'candidat__parti_politique': candidats[j]['parti_politique'],
+                'total': int(voix[j]),
+                'pourcentage': _taux(int(voix[j]), total),
+            }
+            for j in ordre
+        ]
+
+    def enregistrer(self, granularite='JOUR', instant=None):
+        """Calcule et enregistre (ou remplace) le snapshot de la période courante"""
+        return self._enregistrer(granularite, self.debut_periode(granularite, instant))
+
+    def _enregistrer(self, granularite, horodatage):
+        """Calcule et enregistre le snapshot daté de `horodatage` (tel quel)"""
+        from statistics.models import SnapshotQuotidien
+
+        existant = SnapshotQuotidien.objects.filter(granularite=granularite, horodatage=horodatage).first()
+        if existant is not None and existant.deltas.exists():
+            # Base de points intra-horaires : la réécrire fausserait leurs écarts
+            return existant
+
+        data = self.construire()
+
+        try:
+            snapshot, _ = SnapshotQuotidien.objects.update_or_create(
+                granularite=granularite,
+                horodatage=horodatage,
+                defaults={'date': timezone.localdate(horodatage), **data}
+            )
+        except IntegrityError:
+            # Tâche concurrente sur la même période (snapshot horaire et point de :00) : elle a gagné
+            snapshot = SnapshotQuotidien.objects.get(granularite=granularite, horodatage=horodatage)
+        return snapshot
+
+    # ========== SÉRIE INTRA-HORAIRE ==========
+
+    @property
+    def intervalle(self):
+        """Pas de la série intra-horaire, en minutes"""
+        return max(1, getattr(settings, 'STATISTIQUES_SNAPSHOT_INTERVALLE', 5))
+
+    def debut_intervalle(self, instant=None):
+        """Début du pas de la série contenant `instant`"""
+        instant = timezone.localtime(instant or timezone.now())
+        return instant.replace(
+            minute=instant.minute - instant.minute % self.intervalle, second=0, microsecond=0
+        )
+
+    def dans_fenetre(self, instant=None):
+        """Vrai si `instant` tombe dans la fenêtre de dépouillement (toujours si elle n'est pas définie)"""
+        instant = instant or timezone.now()
+        debut = getattr(settings, 'STATISTIQUES_DEPOUILLEMENT_DEBUT', '')
+        fin = getattr(settings, 'STATISTIQUES_DEPOUILLEMENT_FIN', '')
+
+        def borne(valeur):
+            borne = datetime.fromisoformat(valeur)
+            return borne if timezone.is_aware(borne) else timezone.make_aware(borne)
+
+        if debut and instant < borne(debut):
+            return False
+        if fin and instant > borne(fin):
+            return False
+        return True
+
+    def enregistrer_point(self, instant=None):
+        """
+        Enregistre le point de la série pour le pas courant : le snapshot horaire
+        en début d'heure (il sert de base), un SnapshotDelta ensuite.
+        Si la base de l'heure manque (série démarrée en cours d'heure), elle est
+        datée du point lui-même plutôt que du début d'heure, qu'elle ne décrit pas
+        """
+        from statistics.models import SnapshotDelta, SnapshotQuotidien
+
+        horodatage = self.debut_intervalle(instant)
+        base = SnapshotQuotidien.objects.filter(
+            granularite='HEURE',
+            horodatage__range=(self.debut_periode('HEURE', horodatage), horodatage),
+        ).order_by('-horodatage').first()
+
+        if base is None or base.horodatage == horodatage:
+            # Le point est la base elle-même (écart nul)
+            return self._enregistrer('HEURE', horodatage)
+
+        data = self.construire()
+        point, _ = SnapshotDelta.objects.update_or_create(
+            horodatage=horodatage,
+            defaults={
+                'base': base,
+                'delta': self.encoder_delta(self.donnees(base), data),
+                'duree_calcul_ms': data['duree_calcul_ms'],
+            }
+        )
+        return point
+
+    def donnees(self, snapshot):
+        """Champs d'un SnapshotQuotidien sous forme de point de série"""
+        return {
+            'horodatage': snapshot.horodatage,
+            **{champ: getattr(snapshot, champ) for champ in CHAMPS_NUMERIQUES},
+            'resultats_snapshot': snapshot.resultats_snapshot,
+            'details_regions': snapshot.details_regions,
+        }
+
+    def serie(self, debut, fin=None):
+        """
+        Points de la série entre `debut` et `fin` (maintenant par défaut) :
+        snapshots horaires et deltas reconstruits, par horodatage croissant (2 requêtes)
+        """
+        from statistics.models import SnapshotDelta, SnapshotQuotidien
+
+        fin = fin or timezone.now()
+        deltas = list(SnapshotDelta.objects.filter(horodatage__range=(debut, fin)).order_by('horodatage'))
+
+        bases = {
+            base.pk: self.donnees(base)
+            for base in SnapshotQuotidien.objects.filter(
+                Q(granularite='HEURE', horodatage__range=(debut, fin)) |
+                Q(pk__in={delta.base_id for delta in deltas})
+            )
+        }
+
+        points = [point for point in bases.values() if debut <= point['horodatage'] <= fin]
+        points.extend(
+            {**self.appliquer_delta(bases[delta.base_id], delta.delta), 'horodatage': delta.horodatage}
+            for delta in deltas
+        )
+        return sorted(points, key=lambda point: point['horodatage'])
+
+    # ========== ENCODAGE DES ÉCARTS ==========
+
+    def _ecarts(self, base, data):
+        """Écarts non nuls des champs chiffrés"""
+        ecarts = {}
+        for champ in CHAMPS_NUMERIQUES:
+            ecart = data[champ] - base[champ]
+            if ecart:
+                ecarts[champ] = round(ecart, 2) if isinstance(ecart, float) else ecart
+        return ecarts
+
+    def _appliquer_ecarts(self, base, ecarts):
+        point = dict(base)
+        for champ, ecart in ecarts.items():
+            if isinstance(base[champ], float) or isinstance(ecart, float):
+                point[champ] = round(base[champ] + ecart, 2)
+            else:
+                point[champ] = base[champ] + ecart
+        return point
+
+    def _ecarts_voix(self, base, resultats):
+        """Écarts de voix par numéro d'ordre ; None si la liste des candidats a changé"""
+        voix_base = {ligne['candidat__numero_ordre']: ligne['total'] for ligne in base}
+        voix = {ligne['candidat__numero_ordre']: ligne['total'] for ligne in resultats}
+        if voix.keys() != voix_base.keys():
+            return None
+
+        return {
+            str(numero): total - voix_base[numero]
+            for numero, total in voix.items() if total != voix_base[numero]
+        }
+
+    def _appliquer_voix(self, base, ecarts):
+        """Classement de base mis à jour par les écarts de voix, retrié"""
+        lignes = [
+            {**ligne, 'total': ligne['total'] + ecarts.get(str(ligne['candidat__numero_ordre']), 0)}
+            for ligne in base
+        ]
+        lignes.sort(key=lambda ligne: (-ligne['total'], ligne['candidat__numero_ordre']))
+
+        total = sum(ligne['total'] for ligne in lignes)
+        for ligne in lignes:
+            ligne['pourcentage'] = _taux(ligne['total'], total)
+        return lignes
+
+    def encoder_delta(self, base, data):
+        """
+        Écart entre un point et sa base : champs chiffrés modifiés, voix modifiées,
+        et par région les mêmes écarts. Les listes dont la composition a changé
+        (candidat ou région ajouté) sont stockées en entier
+        """
+        delta = self._ecarts(base, data)
+
+        voix = self._ecarts_voix(base['resultats_snapshot'], data['resultats_snapshot'])
+        if voix is None:
+            delta['resultats_snapshot'] = data['resultats_snapshot']
+        elif voix:
+            delta['voix'] = voix
+
+        regions_base = {region['region_id']: region for region in base['details_regions']}
+        if regions_base.keys() != {region['region_id'] for region in data['details_regions']}:
+            delta['details_regions'] = data['details_regions']
+            return delta
+
+        regions = {}
+        for region in data['details_regions']:
+            reference = regions_base[region['region_id']]
+            ecarts = self._ecarts(reference, region)
+            voix = self._ecarts_voix(reference['resultats'], region['resultats'])
+            if voix is None:
+                ecarts['resultats'] = region['resultats']
+            elif voix:
+                ecarts['voix'] = voix
+            if ecarts:
+                regions[str(region['region_id'])] = ecarts
+
+        if regions:
+            delta['regions'] = regions
+        return delta
+
+    def appliquer_delta(self, base, delta):
+        """Reconstruit un point à partir de sa base et de son écart"""
+        point = self._appliquer_ecarts(
+            base, {champ: delta[champ] for champ in CHAMPS_NUMERIQUES if champ in delta}
+        )
+
+        if 'resultats_snapshot' in delta:
+            point['resultats_snapshot'] = delta['resultats_snapshot']
+        elif 'voix' in delta:
+            point['resultats_snapshot'] = self._appliquer_voix(base['resultats_snapshot'], delta['voix'])
+
+        if 'details_regions' in delta:
+            point['details_regions'] = delta['details_regions']
+            return point
+
+        regions = delta.get('regions', {})
+        details = []
+        for region in base['details_regions']:
+            ecarts = regions.get(str(region['region_id']))
+            if ecarts:
+                region = self._appliquer_ecarts(
+                    region, {champ: ecarts[champ] for champ in CHAMPS_NUMERIQUES if champ in ecarts}
+                )
+                if 'resultats' in ecarts:
+                    region['resultats'] = ecarts['resultats']
+                elif 'voix' in ecarts:
+                    region['resultats'] = self._appliquer_voix(region['resultats'], ecarts['voix'])
+            details.append(region)
+
+        point['details_regions'] = details
+        return point
+
+
+# Instance singleton
+snapshot_service = SnapshotService()
@@ -1,57 +1,61 @@
 # statistic/services/statistique_service.py
+from django.conf import settings
+from django.db import connection, transaction
 from django.db.models import Count, Sum, Avg, Q, F
 from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
-from pv.models import ProcesVerbal, ResultatCandidat
-from incidents.models import Incident
+import time
+import logging
+from pv.models import ResultatCandidat, Candidat
 from geography.models import BureauVote, Region
+from geography.services import aggregation_service
+from statistics.models import CacheStatistique, LogRefreshStatistique, StatistiqueRegion, StatistiqueBureau
+from .compteur_service import compteur_service
+
+logger = logging.getLogger(__name__)
 
 
 class StatistiqueService:
     """Service de calcul et mise en cache des statistiques"""
     
-    def get_stats_region(self, region, force_refresh=False):
-        """Obtenir les statistiques d'une région"""
-        cache_key = f'stats_region_{region.id}'
-        
-        if not force_refresh:
-            cached = cache.get(cache_key)
-            if cached:
-                return cached
+    def _resumer_stats(self, stats):
+        """Résumé à plat des blocs calculés par le moteur d'agrégation"""
+        total_bureaux = stats['bureaux']['total']
+        total_inscrits = stats['bureaux']['total_inscrits']
+        pv_valides = stats['pv']['pv_valides']
+        total_votants = stats['participation']['total_votants']
         
-        bureaux = BureauVote.objects.filter(region=region)
-        pv_valides = ProcesVerbal.objects.filter(
-            bureau_vote__region=region,
-            statut='VALIDE'
-        )
-        
-        stats = {
-            'total_bureaux': bureaux.count(),
-            'total_inscrits': bureaux.aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0,
-            'pv_valides': pv_valides.count(),
-            'pv_en_attente': ProcesVerbal.objects.filter(
-                bureau_vote__region=region,
-                statut='EN_ATTENTE'
-            ).count(),
-            'pv_rejetes': ProcesVerbal.objects.filter(
-                bureau_vote__region=region,
-                statut='REJETE'
-            ).count(),
-            'taux_soumission': 0,
-            'total_votants': pv_valides.aggregate(Sum('nombre_votants'))['nombre_votants__sum'] or 0,
-            'taux_participation': 0,
-            'total_incidents': Incident.objects.filter(bureau_vote__region=region).count(),
+        return {
+            'total_bureaux': total_bureaux,
+            'total_inscrits': total_inscrits,
+            'pv_valides': pv_valides,
+            'pv_en_attente': stats['pv']['pv_en_attente'],
+            'pv_rejetes': stats['pv']['pv_rejetes'],
+            'taux_soumission': (pv_valides / total_bureaux * 100) if total_bureaux > 0 else 0,
+            'total_votants': total_votants,
+            'taux_participation': (total_votants / total_inscrits * 100) if total_inscrits > 0 else 0,
+            'total_incidents': stats['incidents']['total'],
         }
+    
+    def get_stats_region(self, region, force_refresh=False):
+        """Obtenir les statistiques d'une région (lecture de la ligne StatistiqueRegion)"""
+        if force_refresh:
+            ligne = compteur_service.reconstruire_region(region.id)
+        else:
+            ligne = compteur_service.statistique_region(region.id)
         
-        if stats['total_bureaux'] > 0:
-            stats['taux_soumission'] = (pv_valides.count() / stats['total_bureaux'] * 100)
-        
-        if stats['total_inscrits'] > 0:
-            stats['taux_participation'] = (stats['total_votants'] / stats['total_inscrits'] * 100)
-        
-        cache.set(cache_key, stats, 300)  # Cache 5 minutes
-        return stats
+        return {
+            'total_bureaux': ligne.total_bureaux,
+            'total_inscrits': ligne.total_inscrits,
+            'pv_valides': ligne.total_pv_valides,
+            'pv_en_attente': ligne.total_pv_en_attente,
+            'pv_rejetes': ligne.total_pv_rejetes,
+            'taux_soumission': (ligne.total_pv_valides / ligne.total_bureaux * 100) if ligne.total_bureaux > 0 else 0,
+            'total_votants': ligne.total_votants,
+            'taux_participation': ligne.taux_participation,
+            'total_incidents': ligne.total_incidents,
+        }
     
     def get_stats_national(self, force_refresh=False):
         """Obtenir les statistiques nationales"""
@@ -62,53 +66,24 @@ class StatistiqueService:
             if cached:
                 return cached
         
-        bureaux = BureauVote.objects.all()
-        pv_valides = ProcesVerbal.objects.filter(statut='VALIDE')
-        
-        stats = {
-            'total_bureaux': bureaux.count(),
-            'total_inscrits': bureaux.aggregate(Sum('nombre_inscrits'))['nombre_inscrits__sum'] or 0,
-            'pv_valides': pv_valides.count(),
-            'pv_en_attente': ProcesVerbal.objects.filter(statut='EN_ATTENTE').count(),
-            'pv_rejetes': ProcesVerbal.objects.filter(statut='REJETE').count(),
-            'taux_soumission': 0,
-            'total_votants': pv_valides.aggregate(Sum('nombre_votants'))['nombre_votants__sum'] or 0,
-            'taux_participation': 0,
-            'total_incidents': Incident.objects.count(),
-        }
-        
-        if stats['total_bureaux'] > 0:
-            stats['taux_soumission'] = (pv_valides.count() / stats['total_bureaux'] * 100)
-        
-        if stats['total_inscrits'] > 0:
-            stats['taux_participation'] = (stats['total_votants'] / stats['total_inscrits'] * 100)
+        stats = self._resumer_stats(aggregation_service.stats_national())
         
         cache.set(cache_key, stats, 300)
         return stats
     
     def get_stats_bureau(self, bureau, force_refresh=False):
-        """Obtenir les statistiques d'un bureau"""
-        cache_key = f'stats_bureau_{bureau.id}'
-        
-        if not force_refresh:
-            cached = cache.get(cache_key)
-            if cached:
-                return cached
+        """Obtenir les statistiques d'un bureau (lecture de la ligne StatistiqueBureau)"""
+        if force_refresh:
+            ligne = compteur_service.reconstruire_bureau(bureau.id)
+        else:
+            ligne = compteur_service.statistique_bureau(bureau.id)
         
-        pv_valide = ProcesVerbal.objects.filter(
-            bureau_vote=bureau,
-            statut='VALIDE'
-        ).first()
-        
-        stats = {
-            'has_pv_valide': pv_valide is not None,
-            'nombre_votants': pv_valide.nombre_votants if pv_valide else 0,
-            'taux_participation': pv_valide.taux_participation if pv_valide else 0,
-            'total_incidents': Incident.objects.filter(bureau_vote=bureau).count()
+        return {
+            'has_pv_valide': ligne.has_pv_valide,
+            'nombre_votants': ligne.nombre_votants,
+            'taux_participation': ligne.taux_participation,
+            'total_incidents': ligne.total_incidents
         }
-        
-        cache.set(cache_key, stats, 300)
-        return stats
     
     def get_top_candidats(self, limit=5, region=None):
         """Obtenir le top des candidats"""
@@ -117,7 +92,7 @@ class StatistiqueService:
         )
         
         if region:
-            resultats = resultats.filter(pv__bureau_vote__region=region)
+            resultats = resultats.filter(pv__region=region)
         
         top = resultats.values(
             'candidat__id',
@@ -131,43 +106,12 @@ class StatistiqueService:
     
     def get_evolution_soumissions(self, jours=7):
         """Obtenir l'évolution des soumissions sur N jours"""
-        cache_key = f'evolution_soumissions_{jours}'
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-        
-        date_debut = timezone.now() - timedelta(days=jours)
-        
-        evolution = []
-        for i in range(jours):
-            date = date_debut + timedelta(days=i)
-            date_fin = date + timedelta(days=1)
-            
-            count = ProcesVerbal.objects.filter(
-                date_soumission__gte=date,
-                date_soumission__lt=date_fin
-            ).count()
-            
-            evolution.append({
-                'date': date.strftime('%d/%m'),
-                'count': count
-            })
+        from statistics.services.timeline_service import timeline_service
         
-        cache.set(cache_key, evolution, 600)  # 10 minutes
-        return evolution
-    
-    def calculer_et_sauvegarder(self, type_entite, entite_id):
-        """Calculer et sauvegarder les statistiques"""
-        if type_entite == 'region':
-            from apps.geography.models import Region
-            region = Region.objects.get(id=entite_id)
-            return self.get_stats_region(region, force_refresh=True)
-        elif type_entite == 'national':
-            return self.get_stats_national(force_refresh=True)
-        elif type_entite == 'bureau':
-            from apps.geography.models import BureauVote
-            bureau = BureauVote.objects.get(id=entite_id)
-            return self.get_stats_bureau(bureau, force_refresh=True)
+        return [
+            {'date': point['libelle'], 'count': point['valeur']}
+            for point in timeline_service.evolution('PV_SOUMISSIONS', jours)
+        ]
     
     def invalidate_cache_region(self, region):
         """Invalider le cache d'une région"""
@@ -188,10 +132,11 @@ class StatistiqueService:
             return cached
         
         regions = Region.objects.all()
+        stats_regions = aggregation_service.stats_niveau('region', [r.id for r in regions])
         comparaison = []
         
         for region in regions:
-            stats = self.get_stats_region(region)
+            stats = self._resumer_stats(stats_regions[region.id])
             comparaison.append({
                 'region': region.nom_region,
                 'region_id': region.id,
@@ -204,6 +149,496 @@ class StatistiqueService:
         cache.set(cache_key, comparaison, 300)
         return comparaison
 
+    
+    # ========== CALCUL DES ENTRÉES DU CACHE ==========
+    
+    def _donnees_generales(self, stats, top_candidats):
+        """Format GENERAL (région ou national) à partir des blocs du moteur d'agrégation"""
+        return {
+            # Bureaux
+            'total_bureaux': stats['bureaux']['total'],
+            'total_inscrits': stats['bureaux']['total_inscrits'],
+            'moyenne_inscrits': stats['bureaux']['moyenne_inscrits'],
+            
+            # PV
+            'total_pv': stats['pv']['total_pv'],
+            'pv_valides': stats['pv']['pv_valides'],
+            'pv_en_attente': stats['pv']['pv_en_attente'],
+            'pv_rejetes': stats['pv']['pv_rejetes'],
+            'taux_soumission': stats['pv']['taux_soumission'],
+            'taux_validation': stats['pv']['taux_validation'],
+            
+            # Participation
+            'total_votants': stats['participation']['total_votants'],
+            'total_exprimes': stats['participation']['total_exprimes'],
+            'total_nuls': stats['participation']['total_nuls'],
+            'total_blancs': stats['participation']['total_blancs'],
+            'taux_participation': stats['participation']['taux_participation'],
+            'taux_nuls': stats['participation']['taux_nuls'],
+            
+            # Incidents
+            'incidents': {
+                champ: stats['incidents'][champ]
+                for champ in ('total', 'ouverts', 'en_cours', 'traites', 'clos', 'urgents')
+            },
+            
+            # Résultats
+            'top_candidats': top_candidats,
+            
+            'date_calcul': timezone.now().isoformat(),
+        }
+    
+    def calculer_stats_region(self, region):
+        """Statistiques GENERAL d'une région, lues sur la ligne StatistiqueRegion"""
+        return self._donnees_region(compteur_service.statistique_region(region.id))
+    
+    def _donnees_region(self, ligne):
+        """Format GENERAL d'une ligne StatistiqueRegion"""
+        return {
+            'total_bureaux': ligne.total_bureaux,
+            'total_inscrits': ligne.total_inscrits,
+            'moyenne_inscrits': ligne.moyenne_inscrits_par_bureau,
+            'total_pv': ligne.total_pv_soumis,
+            'pv_valides': ligne.total_pv_valides,
+            'pv_en_attente': ligne.total_pv_en_attente,
+            'pv_rejetes': ligne.total_pv_rejetes,
+            'taux_soumission': round(ligne.taux_soumission, 2),
+            'taux_validation': round(ligne.taux_validation, 2),
+            'total_votants': ligne.total_votants,
+            'total_exprimes': ligne.total_suffrages_exprimes,
+            'total_nuls': ligne.total_bulletins_nuls,
+            'total_blancs': ligne.total_bulletins_blancs,
+            'taux_participation': round(ligne.taux_participation, 2),
+            'taux_nuls': round(ligne.taux_nuls, 2),
+            'incidents': {
+                'total': ligne.total_incidents,
+                'ouverts': ligne.incidents_ouverts,
+                'en_cours': ligne.incidents_en_cours,
+                'traites': ligne.incidents_traites,
+                'clos': ligne.incidents_clos,
+                'urgents': ligne.incidents_urgents,
+            },
+            'top_candidats': [{
+                'candidat__nom_complet': candidat['nom_complet'],
+                'candidat__parti_politique': candidat['parti_politique'],
+                'total_voix': candidat['total_voix'],
+            } for candidat in ligne.top_3_candidats],
+            'date_calcul': ligne.date_calcul.isoformat(),
+        }
+    
+    def calculer_stats_national(self):
+        """Statistiques GENERAL nationales (3 requêtes d'agrégation + top 3)"""
+        top_candidats = [
+            {key: valeur for key, valeur in ligne.items() if key != 'candidat__id'}
+            for ligne in self.get_top_candidats(limit=3)
+        ]
+        return self._donnees_generales(aggregation_service.stats_national(), top_candidats)
+    
+    def calculer_stats_bureau(self, bureau):
+        """Statistiques GENERAL d'un bureau, lues sur la ligne StatistiqueBureau"""
+        return self._donnees_bureau(compteur_service.statistique_bureau(bureau.id))
+    
+    def _donnees_bureau(self, ligne):
+        """Format GENERAL d'une ligne StatistiqueBureau"""
+        data = {
+            'has_pv_valide': ligne.has_pv_valide,
+            'pv_id': ligne.pv_id,
+            'statut_pv': ligne.statut_pv,
+            'total_incidents': ligne.total_incidents,
+            'incidents_ouverts': ligne.incidents_ouverts,
+            'incidents_critiques': ligne.incidents_critiques,
+            'superviseur_nom': ligne.superviseur_nom,
+            'superviseur_id': ligne.superviseur_id,
+        }
+        
+        if ligne.has_pv_valide:
+            data.update({
+                'nombre_votants': ligne.nombre_votants,
+                'suffrages_exprimes': ligne.suffrages_exprimes,
+                'bulletins_nuls': ligne.bulletins_nuls,
+                'bulletins_blancs': ligne.bulletins_blancs,
+                'taux_participation': ligne.taux_participation,
+                'resultats_candidats': ligne.resultats_candidats,
+                'candidat_vainqueur': ligne.candidat_vainqueur,
+                'voix_vainqueur': ligne.voix_vainqueur,
+            })
+        
+        return data
+    
+    def calculer_stats_candidat(self, candidat):
+        """Calcule les statistiques d'un candidat"""
+        return self.calculer_stats_candidats([candidat.id])[str(candidat.id)]
+    
+    def calculer_stats_candidats(self, candidat_ids=None):
+        """
+        Statistiques RESULTATS de plusieurs candidats (tous par défaut) : matrice
+        candidat x région, total national et 10 meilleurs bureaux en 3 requêtes,
+        quel que soit le nombre de candidats et de régions
+        """
+        candidats = Candidat.objects.all()
+        if candidat_ids is not None:
+            candidats = candidats.filter(pk__in=candidat_ids)
+        ids = list(candidats.values_list('id', flat=True))
+        
+        data = {
+            candidat_id: {'total_voix_national': 0, 'nombre_bureaux': 0, 'resultats_par_region': []}
+            for candidat_id in ids
+        }
+        
+        # Matrice candidat x région : le total national couvre tous les candidats
+        matrice = ResultatCandidat.objects.filter(pv__statut='VALIDE').values(
+            'candidat_id', 'pv__region__nom_region', 'pv__region__code_region'
+        ).annotate(
+            voix=Sum('nombre_voix'),
+            bureaux=Count('id')
+        ).order_by()
+        
+        total_national = 0
+        for ligne in matrice:
+            total_national += ligne['voix'] or 0
+            stats = data.get(ligne['candidat_id'])
+            if stats is None:
+                continue
+            
+            stats['total_voix_national'] += ligne['voix'] or 0
+            stats['nombre_bureaux'] += ligne['bureaux']
+            if ligne['pv__region__code_region'] is not None and ligne['voix']:
+                stats['resultats_par_region'].append({
+                    'region': ligne['pv__region__nom_region'],
+                    'code': ligne['pv__region__code_region'],
+                    'voix': ligne['voix']
+                })
+        
+        meilleurs = compteur_service.meilleurs_bureaux(10, ids)
+        for candidat_id, stats in data.items():
+            stats['pourcentage_national'] = round(
+                stats['total_voix_national'] / (total_national or 1) * 100, 2
+            )
+            stats['resultats_par_region'].sort(key=lambda region: -region['voix'])
+            stats['meilleurs_bureaux'] = [
+                {
+                    'bureau': ligne['pv__bureau_vote__code_bv'],
+                    'voix': ligne['nombre_voix'],
+                    'pourcentage': round(
+                        ligne['nombre_voix'] / ligne['pv__suffrages_exprimes'] * 100, 2
+                    ) if ligne['pv__suffrages_exprimes'] > 0 else 0
+                }
+                for ligne in meilleurs.get(candidat_id, [])
+            ]
+        
+        return {str(candidat_id): stats for candidat_id, stats in data.items()}
+    
+    def calculer_timeline_soumissions_pv(self, date_debut, date_fin, region=None):
+        """Calcule la timeline horaire des soumissions de PV"""
+        from statistics.services.timeline_service import timeline_service
+        
+        return timeline_service.calculer('PV_SOUMISSIONS', date_debut, date_fin, 'HEURE', region)
+    
+    def calculer_snapshot_national(self):
+        """Calcule le snapshot national (top 3 des candidats)"""
+        from statistics.services.snapshot_service import snapshot_service
+        
+        return snapshot_service.construire(limite_candidats=3)
+    
+    def _calculer(self, type_entite, entite_id, type_statistique):
+        """Calcule les données d'une entrée de cache"""
+        if type_entite == 'NATIONAL' and type_statistique == 'GENERAL':
+            return self.calculer_stats_national()
+        
+        if type_entite == 'REGION' and type_statistique == 'GENERAL':
+            return self.calculer_stats_region(Region.objects.get(id=entite_id))
+        
+        if type_entite == 'BUREAU_VOTE' and type_statistique == 'GENERAL':
+            return self.calculer_stats_bureau(BureauVote.objects.get(id=entite_id))
+        
+        if type_entite == 'CANDIDAT' and type_statistique == 'RESULTATS':
+            return self.calculer_stats_candidat(Candidat.objects.get(id=entite_id))
+        
+        raise ValueError(f"Type non supporté: {type_entite}/{type_statistique}")
+    
+    # ========== SAUVEGARDE DANS LE CACHE ==========
+    
+    def rafraichir_cache(self, type_entite, entite_id, type_statistique, user=None, triggered_by='service'):
+        """
+        Calcule une entrée et l'enregistre dans cache_statistiques (version + 1).
+        Retourne l'objet CacheStatistique
+        """
+        debut = time.monotonic()
+        
+        try:
+            with transaction.atomic():
+                data = self._calculer(type_entite, entite_id, type_statistique)
+                duree_ms = int((time.monotonic() - debut) * 1000)
+                data['duree_calcul_ms'] = duree_ms
+                
+                cache_obj = CacheStatistique.objects.select_for_update().filter(
+                    type_entite=type_entite,
+                    entite_id=str(entite_id),
+                    type_statistique=type_statistique
+                ).first()
+                
+                if cache_obj is None:
+                    cache_obj = CacheStatistique(
+                        type_entite=type_entite,
+                        entite_id=str(entite_id),
+                        type_statistique=type_statistique
+                    )
+                else:
+                    cache_obj.version += 1
+                
+                cache_obj.data = data
+                cache_obj.duree_calcul_ms = duree_ms
+                cache_obj.is_valid = True
+                cache_obj.force_refresh = False
+                cache_obj.save()
+                
+                # Logger le succès
+                LogRefreshStatistique.objects.create(
+                    cache_statistique=cache_obj,
+                    cache_key=cache_obj.cache_key,
+                    type_entite=type_entite,
+                    type_statistique=type_statistique,
+                    statut='SUCCESS',
+                    duree_ms=duree_ms,
+                    triggered_by=triggered_by,
+                    user=user
+                )
+            
+            return cache_obj
+            
+        except Exception as e:
+            logger.error(f"Erreur calcul stats {type_entite}/{entite_id}: {str(e)}")
+            
+            # Logger l'erreur (hors du bloc atomique annulé)
+            LogRefreshStatistique.objects.create(
+                cache_key=f"{type_entite}_{entite_id}_{type_statistique}".lower(),
+                type_entite=type_entite,
+                type_statistique=type_statistique,
+                statut='ERROR',
+                message=str(e),
+                duree_ms=int((time.monotonic() - debut) * 1000),
+                triggered_by=triggered_by,
+                user=user
+            )
+            
+            raise
+    
+    def calculer_et_sauvegarder(self, type_entite, entite_id, type_statistique='GENERAL', user=None,
+                                triggered_by='service'):
+        """
+        Calcule les statistiques, les sauvegarde dans le cache et les publie
+        dans les niveaux mémoire / Redis. Retourne les données
+        """
+        from .cache_service import cache_service
+        
+        cache_obj = self.rafraichir_cache(
+            type_entite, entite_id, type_statistique, user=user, triggered_by=triggered_by
+        )
+        cache_service.publier(cache_obj)
+        return cache_obj.data
+    
+    # ========== RAFRAÎCHISSEMENT EN MASSE ==========
+    
+    def planifier_lots(self, limite=None, taille_lot=None):
+        """
+        Découpe les caches à rafraîchir, par ordre de priorité, en lots
+        homogènes (même type_entite / type_statistique).
+        Retourne une liste de (type_entite, type_statistique, [entite_id, ...])
+        """
+        limite = limite or getattr(settings, 'STATISTIQUES_REFRESH_MAX', 2000)
+        taille_lot = taille_lot or getattr(settings, 'STATISTIQUES_REFRESH_TAILLE_LOT', 50)
+        
+        entrees = CacheStatistique.objects.a_rafraichir().values_list(
+            'type_entite', 'type_statistique', 'entite_id'
+        )[:limite]
+        
+        groupes = {}
+        for rang, (type_entite, type_statistique, entite_id) in enumerate(entrees):
+            groupes.setdefault((type_entite, type_statistique), []).append((rang, entite_id))
+        
+        lots = []
+        for (type_entite, type_statistique), entites in groupes.items():
+            for i in range(0, len(entites), taille_lot):
+                lot = entites[i:i + taille_lot]
+                lots.append((lot[0][0], (type_entite, type_statistique, [entite_id for _, entite_id in lot])))
+        
+        # Un lot prend le rang de son entrée la plus prioritaire
+        return [lot for _, lot in sorted(lots, key=lambda element: element[0])]
+    
+    def _calculer_lot(self, type_entite, type_statistique, entite_ids):
+        """
+        Données de plusieurs entrées d'un même type : une requête pour tout le
+        lot quand les lignes pré-calculées existent, calcul unitaire sinon.
+        Retourne (données par entite_id, erreurs par entite_id)
+        """
+        donnees, erreurs = {}, {}
+        
+        if (type_entite, type_statistique) == ('REGION', 'GENERAL'):
+            lignes = StatistiqueRegion.objects.filter(region_id__in=entite_ids)
+            donnees = {str(ligne.region_id): self._donnees_region(ligne) for ligne in lignes}
+        elif (type_entite, type_statistique) == ('BUREAU_VOTE', 'GENERAL'):
+            lignes = StatistiqueBureau.objects.filter(bureau_id__in=entite_ids)
+            donnees = {str(ligne.bureau_id): self._donnees_bureau(ligne) for ligne in lignes}
+        elif (type_entite, type_statistique) == ('CANDIDAT', 'RESULTATS'):
+            donnees = self.calculer_stats_candidats(entite_ids)
+        
+        for entite_id in entite_ids:
+            if entite_id in donnees:
+                continue
+            try:
+                donnees[entite_id] = self._calculer(type_entite, entite_id, type_statistique)
+            except Exception as e:
+                erreurs[entite_id] = str(e)
+        
+        return donnees, erreurs
+    
+    def rafraichir_lot(self, type_entite, type_statistique, entite_ids, triggered_by='auto'):
+        """
+        Recalcule un lot d'entrées et les enregistre en quelques requêtes
+        (bulk_update / bulk_create, logs groupés). Retourne les métriques du lot
+        """
+        from .cache_service import cache_service
+        
+        debut = time.monotonic()
+        compteur = CompteurRequetes()
+        
+        with connection.execute_wrapper(compteur):
+            donnees, erreurs = self._calculer_lot(type_entite, type_statistique, entite_ids)
+            duree_ms = int((time.monotonic() - debut) * 1000)
+            maintenant = timezone.now()
+            
+            with transaction.atomic():
+                existants = {
+                    cache_obj.entite_id: cache_obj
+                    for cache_obj in CacheStatistique.objects.select_for_update().filter(
+                        type_entite=type_entite,
+                        type_statistique=type_statistique,
+                        entite_id__in=list(donnees)
+                    )
+                }
+                
+                a_creer, a_modifier = [], []
+                for entite_id, data in donnees.items():
+                    cache_obj = existants.get(entite_id)
+                    if cache_obj is None:
+                        cache_obj = CacheStatistique(
+                            type_entite=type_entite,
+                            entite_id=entite_id,
+                            type_statistique=type_statistique
+                        )
+                        cache_obj.cache_key = cache_obj.generer_cache_key()
+                        a_creer.append(cache_obj)
+                    else:
+                        cache_obj.version += 1
+                        a_modifier.append(cache_obj)
+                    
+                    data['duree_calcul_ms'] = duree_ms
+                    cache_obj.data = data
+                    cache_obj.duree_calcul_ms = duree_ms
+                    cache_obj.is_valid = True
+                    cache_obj.force_refresh = False
+                    cache_obj.date_calcul = maintenant
+                    cache_obj.updated_at = maintenant
+                    cache_obj.date_expiration = maintenant + timedelta(minutes=cache_obj.ttl_minutes)
+                
+                CacheStatistique.objects.bulk_create(a_creer)
+                CacheStatistique.objects.bulk_update(a_modifier, [
+                    'data', 'version', 'duree_calcul_ms', 'is_valid', 'force_refresh',
+                    'date_calcul', 'updated_at', 'date_expiration'
+                ])
+                
+                duree_entree_ms = duree_ms // max(len(entite_ids), 1)
+                LogRefreshStatistique.objects.bulk_create([
+                    LogRefreshStatistique(
+                        cache_statistique=cache_obj,
+                        cache_key=cache_obj.cache_key,
+                        type_entite=type_entite,
+                        type_statistique=type_statistique,
+                        statut='SUCCESS',
+                        duree_ms=duree_entree_ms,
+                        triggered_by=triggered_by
+                    )
+                    for cache_obj in a_creer + a_modifier
+                ] + [
+                    LogRefreshStatistique(
+                        cache_key=f"{type_entite}_{entite_id}_{type_statistique}".lower(),
+                        type_entite=type_entite,
+                        type_statistique=type_statistique,
+                        statut='ERROR',
+                        message=message,
+                        duree_ms=duree_entree_ms,
+                        triggered_by=triggered_by
+                    )
+                    for entite_id, message in erreurs.items()
+                ])
+        
+        for cache_obj in a_creer + a_modifier:
+            cache_service.publier(cache_obj)
+        
+        for entite_id, message in erreurs.items():
+            logger.error(f"Erreur refresh {type_entite}/{entite_id}: {message}")
+        
+        return {
+            'type_entite': type_entite,
+            'type_statistique': type_statistique,
+            'total': len(entite_ids),
+            'succes': len(donnees),
+            'erreurs': len(erreurs),
+            'duree_ms': int((time.monotonic() - debut) * 1000),
+            'nombre_requetes_db': compteur.total,
+        }
+    
+    def enregistrer_bilan(self, bilans, duree_ms, triggered_by='auto'):
+        """Log LogRefreshStatistique récapitulatif d'un passage de rafraîchissement"""
+        total = sum(bilan['total'] for bilan in bilans)
+        succes = sum(bilan['succes'] for bilan in bilans)
+        erreurs = sum(bilan['erreurs'] for bilan in bilans)
+        debit = round(succes / (duree_ms / 1000), 2) if duree_ms > 0 else succes
+        
+        LogRefreshStatistique.objects.create(
+            cache_key='rafraichissement_global',
+            type_entite='*',
+            type_statistique='*',
+            statut='ERROR' if erreurs else 'SUCCESS',
+            message=(
+                f"{len(bilans)} lot(s), {succes}/{total} entrée(s) rafraîchie(s), "
+                f"{erreurs} erreur(s), {debit} entrée(s)/s"
+            ),
+            duree_ms=duree_ms,
+            nombre_requetes_db=sum(bilan['nombre_requetes_db'] for bilan in bilans),
+            triggered_by=triggered_by,
+            metriques={
+                'lots': len(bilans),
+                'total': total,
+                'succes': succes,
+                'erreurs': erreurs,
+                'entrees_par_seconde': debit,
+                'duree_lots_ms': sum(bilan['duree_ms'] for bilan in bilans),
+            }
+        )
+        
+        return {'total': total, 'succes': succes, 'erreurs': erreurs}
+    
+    def rafraichir_tous_les_caches_expires(self):
+        """Rafraîchit les caches expirés lot par lot, dans le processus courant"""
+        debut = time.monotonic()
+        bilans = [
+            self.rafraichir_lot(type_entite, type_statistique, entite_ids)
+            for type_entite, type_statistique, entite_ids in self.planifier_lots()
+        ]
+        return self.enregistrer_bilan(bilans, int((time.monotonic() - debut) * 1000))
+
+
+class CompteurRequetes:
+    """execute_wrapper qui compte les requêtes SQL exécutées (DEBUG inutile)"""
+    
+    def __init__(self):
+        self.total = 0
+    
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
 
 # Instance singleton
 statistique_service = StatistiqueService()
\ No newline at end of file
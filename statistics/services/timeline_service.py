@@ -0,0 +1,379 @@
+# statistics/services/timeline_service.py
+"""
+Moteur de timelines : séries temporelles complètes (périodes vides à zéro)
+
+Une série est un seul GROUP BY sur la date tronquée à la granularité (heure,
+jour, semaine), filtré sur le périmètre géographique, puis complétée en Python
+pour que chaque période de l'intervalle ait son point. Les séries sont mises
+en cache dans StatistiqueTimeline : STATISTIQUES_TIMELINE_TTL secondes tant
+que l'intervalle n'est pas clos, sans limite ensuite.
+
+Compteurs par période (CompteurTimeline) : chaque transition d'un PV ou d'un
+incident est convertie en deltas (type x région x heure) appliqués par
+INSERT ... ON CONFLICT DO UPDATE SET valeur = valeur + delta. Au-delà de
+STATISTIQUES_TIMELINE_RETENTION_HEURES, les heures sont compactées en jours.
+Les séries nationales et régionales se lisent alors sur ces compteurs, en
+O(périodes) ; les autres périmètres gardent le GROUP BY sur les tables sources.
+"""
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncWeek
+from django.utils import timezone
+
+from geography.models import Region
+from geography.services import aggregation_service
+from geography.services.aggregation_service import NIVEAUX
+from incidents.models import Incident
+from pv.models import ProcesVerbal
+
+
+# Type de timeline -> (modèle, champ date, filtre, valeur agrégée par période)
+TYPES = {
+    'PV_SOUMISSIONS': (ProcesVerbal, 'date_soumission', Q(), Count('id')),
+    'PV_VALIDATIONS': (ProcesVerbal, 'date_validation', Q(statut='VALIDE'), Count('id')),
+    'INCIDENTS': (Incident, 'created_at', Q(), Count('id')),
+    'PARTICIPATION': (ProcesVerbal, 'date_validation', Q(statut='VALIDE'), Sum('nombre_votants')),
+}
+
+# Granularité -> (troncature SQL, durée d'une période, format du libellé)
+GRANULARITES = {
+    'HEURE': (TruncHour, timedelta(hours=1), '%d/%m %Hh'),
+    'JOUR': (TruncDay, timedelta(days=1), '%d/%m'),
+    'SEMAINE': (TruncWeek, timedelta(weeks=1), 'S%V'),
+}
+
+
+class TimelineService:
+    """Séries temporelles des soumissions, validations, incidents et participation"""
+
+    def debut_periode(self, granularite, instant):
+        """Début (heure locale) de la période contenant `instant`"""
+        instant = timezone.localtime(instant)
+        debut = instant.replace(minute=0, second=0, microsecond=0)
+        if granularite in ('JOUR', 'SEMAINE'):
+            debut = debut.replace(hour=0)
+        if granularite == 'SEMAINE':
+            debut = debut - timedelta(days=debut.weekday())
+        return debut
+
+    def periode_suivante(self, granularite, debut):
+        """Début de la période suivante (recalé : robuste aux changements d'heure)"""
+        return self.debut_periode(granularite, debut + GRANULARITES[granularite][1] * 1.5)
+
+    def _verifier(self, type_timeline, granularite):
+        if type_timeline not in TYPES:
+            raise ValueError(f"Type de timeline non supporté: {type_timeline}")
+        if granularite not in GRANULARITES:
+            raise ValueError(f"Granularité non supportée: {granularite}")
+
+    def perimetre(self, noeud=None):
+        """Clé du périmètre géographique d'une série"""
+        if noeud is None:
+            return 'national'
+        return f'{aggregation_service.niveau_de(noeud)}:{noeud.pk}'
+
+    def calculer(self, type_timeline, date_debut, date_fin, granularite='JOUR', noeud=None):
+        """
+        Calcule la série d'un type entre deux dates, en une requête GROUP BY.
+        Les bornes sont étendues aux périodes entières qui les contiennent
+        """
+        self._verifier(type_timeline, granularite)
+
+        debut = time.monotonic()
+        modele, champ, filtre, agregat = TYPES[type_timeline]
+        tronquer = GRANULARITES[granularite][0]
+
+        premiere = self.debut_periode(granularite, date_debut)
+        qs = modele.objects.filter(filtre, **{f'{champ}__gte': premiere, f'{champ}__lt': date_fin})
+        if noeud is not None:
+            qs = qs.filter(**{NIVEAUX[aggregation_service.niveau_de(noeud)][1]: noeud})
+
+        # order_by() vide : l'ordering par défaut ne doit pas entrer dans le GROUP BY
+        valeurs = dict(
+            qs.annotate(periode=tronquer(champ)).values('periode').annotate(
+                valeur=agregat
+            ).order_by().values_list('periode', 'valeur')
+        )
+
+        return self._serie(granularite, premiere, date_fin, valeurs, debut)
+
+    def _serie(self, granularite, premiere, date_fin, valeurs, debut):
+        """Points de chaque période de l'intervalle et statistiques de la série"""
+        format_libelle = GRANULARITES[granularite][2]
+
+        data_points = []
+        periode = premiere
+        while periode < date_fin:
+            data_points.append({
+                'date': periode.isoformat(),
+                'libelle': periode.strftime(format_libelle),
+                'valeur': valeurs.get(periode) or 0,
+            })
+            periode = self.periode_suivante(granularite, periode)
+
+        valeurs_points = [point['valeur'] for point in data_points]
+        total = sum(valeurs_points)
+
+        return {
+            'data_points': data_points,
+            'total': total,
+            'moyenne': round(total / len(data_points), 2) if data_points else 0,
+            'minimum': min(valeurs_points) if data_points else 0,
+            'maximum': max(valeurs_points) if data_points else 0,
+            'duree_calcul_ms': int((time.monotonic() - debut) * 1000),
+        }
+
+    def lire_compteurs(self, type_timeline, date_debut, date_fin, granularite='JOUR', region=None):
+        """
+        Calcule la série depuis les compteurs par période (une requête, O(périodes)).
+        Une série horaire n'est exacte qu'après l'horizon de compaction
+        """
+        from statistics.models import CompteurTimeline
+
+        self._verifier(type_timeline, granularite)
+        debut = time.monotonic()
+
+        premiere = self.debut_periode(granularite, date_debut)
+        qs = CompteurTimeline.objects.filter(
+            type_timeline=type_timeline, periode__gte=premiere, periode__lt=date_fin
+        )
+        if granularite == 'HEURE':
+            qs = qs.filter(granularite='HEURE')
+        if region is not None:
+            qs = qs.filter(region=region)
+
+        valeurs = defaultdict(int)
+        for periode, valeur in qs.values('granularite', 'periode').annotate(
+            total=Sum('valeur')
+        ).order_by().values_list('periode', 'total'):
+            valeurs[self.debut_periode(granularite, periode)] += valeur
+
+        return self._serie(granularite, premiere, date_fin, valeurs, debut)
+
+    def obtenir(self, type_timeline, date_debut, date_fin, granularite='JOUR', noeud=None):
+        """
+        Série en cache dans StatistiqueTimeline, calculée si absente ou périmée.
+        Les bornes sont alignées sur les périodes : tous les appels d'une même
+        période partagent l'entrée
+        """
+        from statistics.models import StatistiqueTimeline
+
+        self._verifier(type_timeline, granularite)
+        debut = self.debut_periode(granularite, date_debut)
+        fin = self.periode_suivante(granularite, self.debut_periode(granularite, date_fin))
+        cle = {
+            'type_timeline': type_timeline,
+            'granularite': granularite,
+            'perimetre': self.perimetre(noeud),
+            'date_debut': debut,
+            'date_fin': fin,
+        }
+
+        limite = timezone.now() - timedelta(seconds=getattr(settings, 'STATISTIQUES_TIMELINE_TTL', 60))
+        timeline = StatistiqueTimeline.objects.filter(
+            Q(date_calcul__gte=limite) | Q(date_calcul__gte=F('date_fin')), **cle
+        ).first()
+        if timeline is not None:
+            return {
+                'data_points': timeline.data_points,
+                'total': timeline.total,
+                'moyenne': timeline.moyenne,
+                'minimum': timeline.minimum,
+                'maximum': timeline.maximum,
+            }
+
+        if self._sur_compteurs(granularite, debut, noeud):
+            data = self.lire_compteurs(type_timeline, debut, fin, granularite, noeud)
+        else:
+            data = self.calculer(type_timeline, debut, fin, granularite, noeud)
+        # Un seul INSERT ... ON CONFLICT : deux premiers calculs concurrents écrivent la même ligne
+        StatistiqueTimeline.objects.bulk_create(
+            [StatistiqueTimeline(
+                **cle,
+                region=noeud if isinstance(noeud, Region) else None,
+                data_points=data['data_points'],
+                total=data['total'],
+                moyenne=data['moyenne'],
+                minimum=data['minimum'],
+                maximum=data['maximum'],
+            )],
+            update_conflicts=True,
+            unique_fields=list(cle),
+            update_fields=['region', 'data_points', 'total', 'moyenne', 'minimum', 'maximum', 'date_calcul'],
+        )
+        return data
+
+    def _sur_compteurs(self, granularite, debut, noeud):
+        """Vrai si la série peut être lue sur les compteurs par période"""
+        if noeud is not None and not isinstance(noeud, Region):
+            return False
+        return granularite != 'HEURE' or debut >= self.horizon()
+
+    def nettoyer(self, jours=7):
+        """Supprime les séries non recalculées depuis `jours` jours (fenêtres glissantes passées)"""
+        from statistics.models import StatistiqueTimeline
+
+        supprimees, _ = StatistiqueTimeline.objects.filter(
+            date_calcul__lt=timezone.now() - timedelta(days=jours)
+        ).delete()
+        return supprimees
+
+    def evolution(self, type_timeline, nombre, granularite='JOUR', noeud=None):
+        """Points des `nombre` dernières périodes, période en cours comprise"""
+        self._verifier(type_timeline, granularite)
+        maintenant = timezone.now()
+        _, duree, _ = GRANULARITES[granularite]
+        return self.obtenir(
+            type_timeline, maintenant - duree * (nombre - 1), maintenant, granularite, noeud
+        )['data_points']
+
+
+    # ========== COMPTEURS PAR PÉRIODE ==========
+
+    def horizon(self):
+        """Début du premier jour encore compté par heure ; avant, les compteurs sont journaliers"""
+        retention = getattr(settings, 'STATISTIQUES_TIMELINE_RETENTION_HEURES', 48)
+        return self.debut_periode('JOUR', timezone.now() - timedelta(hours=retention))
+
+    def _contribution_pv(self, etat):
+        """Événements apportés par un PV dans un état donné : (type, région, instant) -> valeur"""
+        if not etat or not etat['region_id']:
+            return {}
+
+        contribution = {}
+        if etat['date_soumission']:
+            contribution[('PV_SOUMISSIONS', etat['region_id'], etat['date_soumission'])] = 1
+        if etat['statut'] == 'VALIDE' and etat['date_validation']:
+            contribution[('PV_VALIDATIONS', etat['region_id'], etat['date_validation'])] = 1
+            contribution[('PARTICIPATION', etat['region_id'], etat['date_validation'])] = (
+                etat['nombre_votants'] or 0
+            )
+        return contribution
+
+    def _contribution_incident(self, etat):
+        """Événement apporté par un incident"""
+        if not etat or not etat['region_id'] or not etat['created_at']:
+            return {}
+        return {('INCIDENTS', etat['region_id'], etat['created_at']): 1}
+
+    def _difference(self, avant, apres):
+        """Deltas non nuls entre deux contributions"""
+        deltas = defaultdict(int)
+        for signe, contribution in ((-1, avant), (1, apres)):
+            for cle, valeur in contribution.items():
+                deltas[cle] += signe * valeur
+        return {cle: delta for cle, delta in deltas.items() if delta}
+
+    def _appliquer(self, deltas):
+        """Range les deltas dans leur période (heure, ou jour avant l'horizon) et les applique"""
+        horizon = self.horizon()
+        lignes = defaultdict(int)
+        for (type_timeline, region_id, instant), delta in deltas.items():
+            periode = self.debut_periode('HEURE', instant)
+            if periode >= horizon:
+                lignes[(type_timeline, 'HEURE', region_id, periode)] += delta
+            else:
+                lignes[(type_timeline, 'JOUR', region_id, self.debut_periode('JOUR', instant))] += delta
+
+        self._incrementer({cle: delta for cle, delta in lignes.items() if delta})
+
+    def _incrementer(self, lignes):
+        """Incrémente (ou crée) en une requête les compteurs {(type, granularité, région, période): delta}"""
+        from statistics.models import CompteurTimeline
+
+        if not lignes:
+            return
+
+        table = CompteurTimeline._meta.db_table
+        valeurs = ', '.join(['(%s, %s, %s, %s, %s)'] * len(lignes))
+        parametres = [valeur for cle, delta in lignes.items() for valeur in (*cle, delta)]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (type_timeline, granularite, region_id, periode, valeur) '
+                f'VALUES {valeurs} '
+                f'ON CONFLICT (type_timeline, granularite, region_id, periode) '
+                f'DO UPDATE SET valeur = {table}.valeur + EXCLUDED.valeur',
+                parametres
+            )
+
+    def pv_enregistre(self, pv, avant=None):
+        """Répercute la création (avant=None) ou la transition d'un PV"""
+        from statistics.services.compteur_service import CHAMPS_SUIVIS_PV
+
+        apres = {champ: getattr(pv, champ) for champ in CHAMPS_SUIVIS_PV}
+        self._appliquer(self._difference(self._contribution_pv(avant), self._contribution_pv(apres)))
+
+    def pv_supprime(self, pv):
+        """Retire les événements d'un PV supprimé"""
+        from statistics.services.compteur_service import CHAMPS_SUIVIS_PV
+
+        etat = {champ: getattr(pv, champ) for champ in CHAMPS_SUIVIS_PV}
+        self._appliquer(self._difference(self._contribution_pv(etat), {}))
+
+    def incident_enregistre(self, incident, avant=None):
+        """Répercute la création (avant=None) ou le changement de région d'un incident"""
+        from statistics.services.compteur_service import CHAMPS_SUIVIS_INCIDENT
+
+        apres = {champ: getattr(incident, champ) for champ in CHAMPS_SUIVIS_INCIDENT}
+        self._appliquer(
+            self._difference(self._contribution_incident(avant), self._contribution_incident(apres))
+        )
+
+    def incident_supprime(self, incident):
+        """Retire l'événement d'un incident supprimé"""
+        from statistics.services.compteur_service import CHAMPS_SUIVIS_INCIDENT
+
+        etat = {champ: getattr(incident, champ) for champ in CHAMPS_SUIVIS_INCIDENT}
+        self._appliquer(self._difference(self._contribution_incident(etat), {}))
+
+    @transaction.atomic
+    def compacter(self):
+        """Regroupe en compteurs journaliers les compteurs horaires antérieurs à l'horizon"""
+        from statistics.models import CompteurTimeline
+
+        lignes = list(CompteurTimeline.objects.select_for_update().filter(
+            granularite='HEURE', periode__lt=self.horizon()
+        ).values_list('id', 'type_timeline', 'region_id', 'periode', 'valeur'))
+        if not lignes:
+            return 0
+
+        jours = defaultdict(int)
+        for _, type_timeline, region_id, periode, valeur in lignes:
+            jours[(type_timeline, 'JOUR', region_id, self.debut_periode('JOUR', periode))] += valeur
+
+        CompteurTimeline.objects.filter(id__in=[ligne[0] for ligne in lignes]).delete()
+        self._incrementer({cle: valeur for cle, valeur in jours.items() if valeur})
+        return len(lignes)
+
+    @transaction.atomic
+    def reconstruire_compteurs(self):
+        """Recalcule tous les compteurs depuis les tables sources (un GROUP BY par type)"""
+        from statistics.models import CompteurTimeline
+
+        CompteurTimeline.objects.all().delete()
+        horizon = self.horizon()
+
+        lignes = defaultdict(int)
+        for type_timeline, (modele, champ, filtre, agregat) in TYPES.items():
+            for region_id, periode, valeur in modele.objects.filter(
+                filtre, region__isnull=False, **{f'{champ}__isnull': False}
+            ).annotate(periode=TruncHour(champ)).values('region_id', 'periode').annotate(
+                valeur=agregat
+            ).order_by().values_list('region_id', 'periode', 'valeur'):
+                if periode >= horizon:
+                    lignes[(type_timeline, 'HEURE', region_id, periode)] += valeur or 0
+                else:
+                    lignes[(type_timeline, 'JOUR', region_id, self.debut_periode('JOUR', periode))] += valeur or 0
+
+        self._incrementer({cle: valeur for cle, valeur in lignes.items() if valeur})
+        return len(lignes)
+
+
+# Instance singleton
+timeline_service = TimelineService()
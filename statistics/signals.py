@@ -0,0 +1,158 @@
+# statistics/signals.py
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from geography.models import BureauVote
+from geography.signals import referentiel_importe
+from incidents.models import Incident
+from pv.models import Candidat, ProcesVerbal
+
+
+@receiver(pre_save, sender=ProcesVerbal)
+@receiver(pre_save, sender=Incident)
+def memoriser_etat(sender, instance, raw=False, **kwargs):
+    """Mémorise l'état en base (statut, région, volumes) avant la sauvegarde"""
+    if raw or instance._state.adding:
+        return
+
+    from statistics.services import compteur_service
+
+    instance._etat_statistiques = compteur_service.etat_en_base(sender, instance.pk)
+
+
+def invalider_caches(instance, avant=None):
+    """
+    Invalide, après commit, les caches du bureau (et de l'ancien bureau),
+    de ses ancêtres et du national si l'état suivi a changé
+    """
+    from statistics.services import cache_service
+
+    if avant is not None and all(avant[champ] == getattr(instance, champ) for champ in avant):
+        return
+
+    bureau_ids = {instance.bureau_vote_id}
+    if avant is not None:
+        bureau_ids.add(avant['bureau_vote_id'])
+
+    transaction.on_commit(lambda: cache_service.invalider_ascendance(bureau_ids))
+
+
+def patcher_cube(instance, avant=None):
+    """Reporte dans le cube des résultats, après commit, l'entrée ou la sortie d'un PV de l'état VALIDE"""
+    valide_avant = bool(avant) and avant['statut'] == 'VALIDE'
+    valide_apres = instance.statut == 'VALIDE'
+    bureau_avant = avant['bureau_vote_id'] if avant else instance.bureau_vote_id
+    if valide_avant == valide_apres and (not valide_apres or bureau_avant == instance.bureau_vote_id):
+        return
+
+    from statistics.services import cube_service
+
+    for bureau_id in {bureau_avant, instance.bureau_vote_id}:
+        transaction.on_commit(lambda bureau_id=bureau_id: cube_service.bureau_modifie(bureau_id))
+
+
+@receiver(post_save, sender=ProcesVerbal)
+def compter_pv(sender, instance, created, raw=False, **kwargs):
+    """Applique les deltas de la création ou de la transition d'un PV"""
+    avant = instance.__dict__.pop('_etat_statistiques', None)
+    if raw:
+        return
+
+    from statistics.services import compteur_service, timeline_service
+
+    compteur_service.pv_enregistre(instance, None if created else avant)
+    timeline_service.pv_enregistre(instance, None if created else avant)
+    invalider_caches(instance, None if created else avant)
+    patcher_cube(instance, None if created else avant)
+
+
+@receiver(post_save, sender=Incident)
+def compter_incident(sender, instance, created, raw=False, **kwargs):
+    """Applique les deltas de la création ou du changement de statut d'un incident"""
+    avant = instance.__dict__.pop('_etat_statistiques', None)
+    if raw:
+        return
+
+    from statistics.services import compteur_service, timeline_service
+
+    compteur_service.incident_enregistre(instance, None if created else avant)
+    timeline_service.incident_enregistre(instance, None if created else avant)
+    invalider_caches(instance, None if created else avant)
+
+
+@receiver(post_delete, sender=ProcesVerbal)
+def decompter_pv(sender, instance, **kwargs):
+    """Retire la contribution d'un PV supprimé"""
+    from statistics.services import compteur_service, cube_service, timeline_service
+
+    compteur_service.pv_supprime(instance)
+    timeline_service.pv_supprime(instance)
+    invalider_caches(instance)
+    if instance.statut == 'VALIDE':
+        transaction.on_commit(lambda: cube_service.bureau_modifie(instance.bureau_vote_id))
+
+
+@receiver(post_delete, sender=Incident)
+def decompter_incident(sender, instance, **kwargs):
+    """Retire la contribution d'un incident supprimé"""
+    from statistics.services import compteur_service, timeline_service
+
+    compteur_service.incident_supprime(instance)
+    timeline_service.incident_supprime(instance)
+    invalider_caches(instance)
+
+
+@receiver(pre_save, sender=BureauVote)
+def memoriser_bureau(sender, instance, raw=False, **kwargs):
+    """Mémorise la région et les inscrits en base avant la sauvegarde d'un bureau"""
+    if raw or instance._state.adding:
+        return
+
+    instance._etat_bureau = BureauVote.objects.filter(pk=instance.pk).values(
+        'region_id', 'nombre_inscrits'
+    ).first()
+
+
+@receiver(post_save, sender=BureauVote)
+@receiver(post_delete, sender=BureauVote)
+def recompter_bureaux(sender, instance, raw=False, **kwargs):
+    """Bureau créé, supprimé, déplacé ou aux inscrits modifiés : totaux de ses régions recalculés"""
+    avant = instance.__dict__.pop('_etat_bureau', None)
+    if raw:
+        return
+
+    region_ids = {instance.region_id}
+    if avant is not None:
+        if avant == {'region_id': instance.region_id, 'nombre_inscrits': instance.nombre_inscrits}:
+            return
+        region_ids.add(avant['region_id'])
+
+    from statistics.services import compteur_service
+
+    compteur_service.reconstruire_regions(region_ids - {None})
+
+
+@receiver(referentiel_importe)
+def recompter_referentiel(sender, **kwargs):
+    """Import en masse (sans signaux par bureau) : totaux de toutes les régions recalculés"""
+    from statistics.services import compteur_service
+
+    compteur_service.reconstruire_regions()
+
+
+@receiver(post_save, sender=Candidat)
+@receiver(post_save, sender=BureauVote)
+@receiver(post_delete, sender=Candidat)
+@receiver(post_delete, sender=BureauVote)
+@receiver(referentiel_importe)
+def reconstruire_cube(sender, raw=False, **kwargs):
+    """
+    Un candidat ou un bureau (ou son rattachement) change, ou le référentiel
+    est importé en masse : le cube des résultats est à reconstruire
+    """
+    if raw:
+        return
+
+    from statistics.services import cube_service
+
+    transaction.on_commit(cube_service.invalider)
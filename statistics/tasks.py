@@ -2,11 +2,16 @@
 """
 Tâches Celery pour le rafraîchissement automatique des caches
 """
-from celery import shared_task
+from celery import shared_task, chain, chord
+from django.conf import settings
 from django.utils import timezone
-from statistics.services import StatistiqueService
+from statistics.services import (
+    StatistiqueService, cache_service, compteur_service, cube_service, export_service, snapshot_service,
+    timeline_service
+)
 from statistics.models import CacheStatistique, SnapshotQuotidien
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -16,9 +21,62 @@ def rafraichir_caches_expires():
     """
     Tâche périodique: rafraîchit les caches expirés
     À exécuter toutes les 15 minutes
+    
+    Les caches sont répartis en lots homogènes, par priorité, sur au plus
+    STATISTIQUES_REFRESH_CONCURRENCE chaînes exécutées en parallèle ; le bilan
+    du passage est écrit dans LogRefreshStatistique une fois tous les lots terminés
+    """
+    lots = StatistiqueService().planifier_lots()
+    if not lots:
+        return {'total': 0, 'lots': 0}
+    
+    passage = rafraichissement_par_lots(lots)
+    passage.delay()
+    
+    logger.info(f"Rafraîchissement caches: {len(lots)} lot(s) sur {len(passage.tasks)} chaîne(s)")
+    return {'total': sum(len(entite_ids) for _, _, entite_ids in lots), 'lots': len(lots)}
+
+
+def rafraichissement_par_lots(lots):
     """
-    service = StatistiqueService()
-    resultats = service.rafraichir_tous_les_caches_expires()
+    Chord du passage de rafraîchissement : les lots répartis sur au plus
+    STATISTIQUES_REFRESH_CONCURRENCE chaînes, puis le bilan
+    """
+    concurrence = max(1, getattr(settings, 'STATISTIQUES_REFRESH_CONCURRENCE', 4))
+    chaines = [lots[i::concurrence] for i in range(min(concurrence, len(lots)))]
+    
+    return chord([
+        chain(
+            rafraichir_lot_caches.s([], *chaine[0]),
+            *[rafraichir_lot_caches.s(*lot) for lot in chaine[1:]]
+        )
+        for chaine in chaines
+    ], bilan_rafraichissement.s(debut=time.time()))
+
+
+@shared_task
+def rafraichir_lot_caches(bilans, type_entite, type_statistique, entite_ids):
+    """
+    Tâche asynchrone: rafraîchit un lot de caches d'un même type.
+    Les métriques s'accumulent le long de la chaîne (`bilans`)
+    """
+    try:
+        bilan = StatistiqueService().rafraichir_lot(type_entite, type_statistique, entite_ids)
+    except Exception as e:
+        logger.error(f"Erreur lot {type_entite}/{type_statistique}: {str(e)}")
+        bilan = {
+            'type_entite': type_entite, 'type_statistique': type_statistique,
+            'total': len(entite_ids), 'succes': 0, 'erreurs': len(entite_ids),
+            'duree_ms': 0, 'nombre_requetes_db': 0,
+        }
+    return bilans + [bilan]
+
+
+@shared_task
+def bilan_rafraichissement(resultats, debut):
+    """Callback du chord: enregistre les métriques du passage de rafraîchissement"""
+    bilans = [bilan for chaine in resultats for bilan in chaine]
+    resultats = StatistiqueService().enregistrer_bilan(bilans, int((time.time() - debut) * 1000))
     
     logger.info(
         f"Rafraîchissement caches: {resultats['succes']} succès, "
@@ -28,6 +86,57 @@ def rafraichir_caches_expires():
     return resultats
 
 
+@shared_task
+def rafraichir_cache_statistique(type_entite, entite_id, type_statistique):
+    """
+    Tâche asynchrone: recalcule une entrée servie périmée (stale-while-revalidate)
+    puis libère le verrou de recalcul posé par le lecteur
+    """
+    try:
+        StatistiqueService().calculer_et_sauvegarder(
+            type_entite, entite_id, type_statistique, triggered_by='revalidation'
+        )
+    finally:
+        cache_service.liberer_verrou(cache_service.cle(type_entite, entite_id, type_statistique))
+
+
+@shared_task
+def vider_compteurs_acces():
+    """
+    Tâche périodique: reporte en base, en un UPDATE groupé, les compteurs
+    d'accès (hit_count, last_accessed) accumulés dans Redis
+    À exécuter toutes les minutes
+    """
+    total = cache_service.vider_acces()
+    logger.info(f"Compteurs d'accès reportés pour {total} cache(s)")
+    return total
+
+
+@shared_task
+def classer_candidats():
+    """
+    Tâche périodique: recalcule pourcentage national et position des candidats
+    à partir des compteurs incrémentés à chaque validation
+    À exécuter toutes les minutes
+    """
+    total = compteur_service.classer_candidats()
+    logger.info(f"Classement mis à jour pour {total} candidat(s)")
+    return total
+
+
+@shared_task
+def publier_cube_resultats():
+    """
+    Tâche asynchrone: reconstruit le cube des résultats et publie un nouveau
+    snapshot partagé, que les workers projettent à leur prochaine lecture
+    """
+    # Libéré avant la construction : un PV validé pendant celle-ci programme la publication suivante
+    cube_service.liberer_publication()
+    version = cube_service.publier()
+    logger.info(f"Cube des résultats publié: {version}")
+    return version
+
+
 @shared_task
 def nettoyer_caches_expires():
     """
@@ -35,6 +144,8 @@ def nettoyer_caches_expires():
     À exécuter une fois par jour
     """
     CacheStatistique.nettoyer_expires()
+    timeline_service.nettoyer()
+    export_service.nettoyer()
     logger.info("Nettoyage des caches expirés effectué")
 
 
@@ -45,10 +156,59 @@ def creer_snapshot_quotidien():
     À exécuter à minuit
     """
     snapshot = SnapshotQuotidien.creer_snapshot_aujourdhui()
-    logger.info(f"Snapshot créé pour {snapshot.date}")
+    logger.info(f"Snapshot créé pour {snapshot.date} en {snapshot.duree_calcul_ms} ms")
     return str(snapshot.date)
 
 
+@shared_task
+def creer_snapshot_horaire():
+    """
+    Tâche périodique: crée le snapshot de l'heure en cours (soirée électorale)
+    À exécuter toutes les heures
+    """
+    snapshot = SnapshotQuotidien.creer_snapshot_horaire()
+    logger.info(f"{snapshot} créé en {snapshot.duree_calcul_ms} ms")
+    return snapshot.horodatage.isoformat()
+
+
+@shared_task
+def creer_point_snapshot():
+    """
+    Tâche périodique: enregistre le point intra-horaire de la série des snapshots
+    (écart avec le snapshot horaire), pendant la fenêtre de dépouillement
+    À exécuter toutes les STATISTIQUES_SNAPSHOT_INTERVALLE minutes
+    """
+    if not snapshot_service.dans_fenetre():
+        return None
+    
+    point = snapshot_service.enregistrer_point()
+    logger.info(f"{point} enregistré en {point.duree_calcul_ms} ms")
+    return point.horodatage.isoformat()
+
+
+@shared_task
+def compacter_compteurs_timeline():
+    """
+    Tâche périodique: regroupe en compteurs journaliers les compteurs horaires
+    des timelines sortis de la fenêtre STATISTIQUES_TIMELINE_RETENTION_HEURES
+    À exécuter toutes les heures
+    """
+    compactes = timeline_service.compacter()
+    logger.info(f"{compactes} compteurs horaires de timeline compactés")
+    return compactes
+
+
+@shared_task
+def generer_export(export_id):
+    """
+    Tâche asynchrone: génère le fichier d'un export de statistiques, par blocs
+    """
+    fichier = export_service.generer(export_id)
+    if fichier:
+        logger.info(f"Export {export_id} généré: {fichier}")
+    return fichier
+
+
 @shared_task
 def invalider_cache_par_pattern(pattern):
     """
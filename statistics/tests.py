@@ -1,3 +1,797 @@
-from django.test import TestCase
+# statistics/tests.py
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+import numpy as np
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from geography.models import Region, Departement, Commune, SousPrefecture, LieuVote, BureauVote
+from incidents.models import Incident
+from incidents.services import incident_service
+from pv.models import Candidat, ProcesVerbal, ResultatCandidat
+from pv.services import validation_service
+from statistics.models import (
+    CacheStatistique, CompteurTimeline, LogRefreshStatistique, SnapshotDelta, SnapshotQuotidien,
+    StatistiqueRegion, StatistiqueBureau, StatistiqueCandidat, StatistiqueTimeline
+)
+from statistics.services import (
+    cache_service, compteur_service, cube_service, export_service, snapshot_service, statistique_service,
+    timeline_service, CubeService
+)
+from statistics.tasks import (
+    generer_export, publier_cube_resultats, rafraichir_cache_statistique, rafraichissement_par_lots
+)
+
+
+class StatistiquesTestCase(TestCase):
+    """Jeu de données commun : une région, trois bureaux, deux candidats"""
+
+    def setUp(self):
+        """Une région, trois bureaux, deux candidats et deux PV en attente"""
+        self.region = Region.objects.create(code_region='CPT01', nom_region='Region Cpt')
+        departement = Departement.objects.create(
+            code_departement='CPTDEPT01', nom_departement='Dept Cpt', region=self.region
+        )
+        commune = Commune.objects.create(
+            code_commune='CPTCOM01', nom_commune='Commune Cpt', departement=departement
+        )
+        sous_prefecture = SousPrefecture.objects.create(
+            code_sous_prefecture='CPTSP01', nom_sous_prefecture='SP Cpt', commune=commune
+        )
+        lieu = LieuVote.objects.create(code_lv='CPTLV01', nom_lv='Lieu', sous_prefecture=sous_prefecture)
+        self.bureaux = [
+            BureauVote.objects.create(
+                code_bv=f'CPTBV0{i}', nom_bv=f'Bureau {i}', lieu_vote=lieu,
+                numero_ordre=i + 1, nombre_inscrits=100
+            )
+            for i in range(3)
+        ]
+
+        self.superviseur = User.objects.create_user(
+            email='cpt@test.com', password='test123', first_name='Cpt', last_name='Test',
+            role='SUPERVISEUR', bureau_vote=self.bureaux[0]
+        )
+        self.admin = User.objects.create_user(
+            email='cpt-admin@test.com', password='test123', first_name='Admin', last_name='Test',
+            role='SUPER_ADMIN', region=self.region
+        )
+        self.candidats = [
+            Candidat.objects.create(numero_ordre=i + 1, nom_complet=f'Candidat {i}')
+            for i in range(2)
+        ]
+
+        self.pvs = []
+        for bureau in self.bureaux[:2]:
+            pv = ProcesVerbal.objects.create(
+                bureau_vote=bureau, superviseur=self.superviseur,
+                nombre_inscrits=100, nombre_votants=50, suffrages_exprimes=40,
+                bulletins_nuls=6, bulletins_blancs=4,
+                photo_pv_officiel='pv.jpg', latitude=5.3, longitude=-4.0
+            )
+            for candidat, voix in zip(self.candidats, [30, 10]):
+                ResultatCandidat.objects.create(pv=pv, candidat=candidat, nombre_voix=voix)
+            self.pvs.append(pv)
+
+
+class CompteurServiceTestCase(StatistiquesTestCase):
+    """Tests des compteurs dénormalisés maintenus par deltas"""
+
+    def _region(self):
+        return StatistiqueRegion.objects.get(region=self.region)
+
+    def test_creation_et_validation(self):
+        """Soumission puis validation mettent à jour les compteurs régionaux"""
+        stats = self._region()
+        self.assertEqual(stats.total_bureaux, 3)
+        self.assertEqual(stats.total_pv_soumis, 2)
+        self.assertEqual(stats.total_pv_en_attente, 2)
+        self.assertEqual(stats.total_votants, 0)
+
+        validation_service.valider_pv(self.pvs[0], self.admin)
+
+        stats = self._region()
+        self.assertEqual(stats.total_pv_valides, 1)
+        self.assertEqual(stats.total_pv_en_attente, 1)
+        self.assertEqual(stats.total_votants, 50)
+        self.assertAlmostEqual(stats.taux_participation, 50 / 300 * 100)
+        self.assertEqual(stats.top_3_candidats[0]['total_voix'], 30)
+        self.assertTrue(StatistiqueBureau.objects.get(bureau=self.bureaux[0]).has_pv_valide)
+
+    def test_voix_candidats(self):
+        """Les voix entrent et sortent avec le statut VALIDE"""
+        for pv in self.pvs:
+            validation_service.valider_pv(pv, self.admin)
+        compteur_service.classer_candidats()
+
+        premier = StatistiqueCandidat.objects.get(candidat=self.candidats[0])
+        self.assertEqual(premier.total_voix_national, 60)
+        self.assertEqual(premier.nombre_bureaux, 2)
+        self.assertEqual(premier.position_nationale, 1)
+        self.assertEqual(premier.pourcentage_national, 75.0)
+        self.assertEqual(premier.resultats_par_region, {str(self.region.pk): 60})
+
+        validation_service.rejeter_pv(self.pvs[0], self.admin, 'Illisible')
+        validation_service.demander_correction(self.pvs[1], self.admin, 'A reprendre')
+
+        premier.refresh_from_db()
+        self.assertEqual(premier.total_voix_national, 0)
+        self.assertEqual(premier.resultats_par_region, {})
+        stats = self._region()
+        self.assertEqual((stats.total_pv_rejetes, stats.total_pv_en_attente, stats.total_votants), (1, 1, 0))
+
+    def test_validation_ne_touche_que_ses_candidats(self):
+        """Une validation n'écrit que les lignes de ses candidats ; un PV inchangé ne reconstruit rien"""
+        absent = Candidat.objects.create(numero_ordre=3, nom_complet='Candidat 2')
+        compteur_service.reconstruire_candidats()
+        version_absent = StatistiqueCandidat.objects.get(candidat=absent).version
+
+        validation_service.valider_pv(self.pvs[0], self.admin)
+
+        self.assertEqual(StatistiqueCandidat.objects.get(candidat=absent).version, version_absent)
+        self.assertEqual(StatistiqueCandidat.objects.get(candidat=self.candidats[0]).total_voix_national, 30)
+
+        bureau = StatistiqueBureau.objects.get(bureau=self.bureaux[0])
+        pv = ProcesVerbal.objects.get(pk=self.pvs[0].pk)
+        pv.save()
+        self.assertEqual(StatistiqueBureau.objects.get(bureau=self.bureaux[0]).version, bureau.version)
+
+    def test_transitions_incident(self):
+        """Chaque changement de statut déplace un incident d'un compteur à l'autre"""
+        incident = Incident.objects.create(
+            bureau_vote=self.bureaux[1], superviseur=self.superviseur,
+            categorie='AUTRE', priorite='URGENTE', titre='Incident',
+            description='Test', heure_incident=timezone.now()
+        )
+        self.assertEqual(self._region().incidents_ouverts, 1)
+
+        incident_service.demarrer_traitement(incident, self.admin)
+        incident_service.resoudre_incident(incident, self.admin, 'Réglé')
+
+        stats = self._region()
+        self.assertEqual(
+            (stats.total_incidents, stats.incidents_ouverts, stats.incidents_traites, stats.incidents_urgents),
+            (1, 0, 1, 1)
+        )
+        self.assertEqual(stats.taux_resolution_incidents, 100.0)
+        self.assertEqual(StatistiqueBureau.objects.get(bureau=self.bureaux[1]).incidents_critiques, 1)
+
+    def test_bureaux_modifies(self):
+        """Bureau créé, modifié, supprimé ou import en masse : bureaux et inscrits de la région suivent"""
+        from geography.signals import referentiel_importe
+
+        bureau = BureauVote.objects.create(
+            code_bv='CPTBV03', nom_bv='Bureau 3', lieu_vote=self.bureaux[0].lieu_vote,
+            numero_ordre=4, nombre_inscrits=200
+        )
+        self.assertEqual((self._region().total_bureaux, self._region().total_inscrits), (4, 500))
+
+        bureau.nombre_inscrits = 100
+        bureau.save()
+        self.assertEqual(self._region().total_inscrits, 400)
+        # Sauvegarde sans changement : la ligne régionale n'est pas recalculée
+        date_calcul = self._region().date_calcul
+        bureau.save()
+        self.assertEqual(self._region().date_calcul, date_calcul)
+
+        bureau.delete()
+        self.assertEqual((self._region().total_bureaux, self._region().total_inscrits), (3, 300))
+
+        BureauVote.objects.filter(pk=self.bureaux[2].pk).update(nombre_inscrits=200)
+        referentiel_importe.send(sender=self.__class__, rapport={})
+        self.assertEqual(self._region().total_inscrits, 400)
+
+    def test_lecture_par_cle(self):
+        """Les tableaux de bord lisent une seule ligne"""
+        compteur_service.statistique_region(self.region.pk)
+
+        with self.assertNumQueries(1):
+            stats = compteur_service.statistique_region(self.region.pk)
+            self.assertEqual(stats.region.code_region, 'CPT01')
+
+    def test_reconciliation(self):
+        """La réconciliation détecte et corrige des compteurs faussés"""
+        validation_service.valider_pv(self.pvs[0], self.admin)
+        self.assertEqual(compteur_service.reconcilier(), {'regions': [], 'candidats': [], 'bureaux': []})
+
+        StatistiqueRegion.objects.update(total_pv_valides=7)
+        StatistiqueCandidat.objects.filter(candidat=self.candidats[1]).update(total_voix_national=0)
+
+        sortie = StringIO()
+        call_command('reconcile_stats', '--fix', stdout=sortie)
+
+        self.assertIn('regions: 1 ligne(s) divergente(s)', sortie.getvalue())
+        self.assertEqual(self._region().total_pv_valides, 1)
+        self.assertEqual(
+            StatistiqueCandidat.objects.get(candidat=self.candidats[1]).total_voix_national, 10
+        )
+        self.assertEqual(compteur_service.reconcilier(), {'regions': [], 'candidats': [], 'bureaux': []})
+
+    def test_resultats_candidats_groupes(self):
+        """Les résultats de tous les candidats coûtent un nombre fixe de requêtes"""
+        for pv in self.pvs:
+            validation_service.valider_pv(pv, self.admin)
+        Candidat.objects.create(numero_ordre=3, nom_complet='Candidat sans voix')
+
+        with self.assertNumQueries(3):
+            resultats = statistique_service.calculer_stats_candidats()
+
+        premier = resultats[str(self.candidats[0].pk)]
+        self.assertEqual(premier['total_voix_national'], 60)
+        self.assertEqual(premier['pourcentage_national'], 75.0)
+        self.assertEqual(premier['resultats_par_region'], [{'region': 'Region Cpt', 'code': 'CPT01', 'voix': 60}])
+        self.assertEqual([bureau['voix'] for bureau in premier['meilleurs_bureaux']], [30, 30])
+        self.assertEqual(premier['meilleurs_bureaux'][0]['pourcentage'], 75.0)
+        self.assertEqual(len(resultats), 3)
+
+        with self.assertNumQueries(9):  # 7 requêtes + SAVEPOINT / RELEASE
+            lignes = compteur_service.reconstruire_candidats()
+        self.assertEqual(len(lignes), 3)
+        self.assertEqual(
+            StatistiqueCandidat.objects.get(candidat=self.candidats[1]).meilleurs_bureaux[0]['voix'], 10
+        )
+
+
+class CacheStatistiqueTestCase(StatistiquesTestCase):
+    """Tests de la lecture à plusieurs niveaux de CacheStatistique"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        cache_service.local.vider()
+        cache_service.acces.extraire()
+
+    def test_lecture_sans_base(self):
+        """Une fois calculée, une entrée est servie sans requête SQL"""
+        data = CacheStatistique.obtenir('REGION', self.region.pk, 'GENERAL')
+        self.assertEqual(data['total_pv'], 2)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(CacheStatistique.obtenir('REGION', self.region.pk, 'GENERAL'), data)
+
+        # Mémoire du worker perdue : Redis prend le relais
+        cache_service.local.vider()
+        with self.assertNumQueries(0):
+            self.assertEqual(CacheStatistique.obtenir('REGION', self.region.pk, 'GENERAL'), data)
+
+    def test_repli_sur_la_base(self):
+        """Sans Redis, la table sert l'entrée et la republie"""
+        CacheStatistique.obtenir('NATIONAL', 'national', 'GENERAL')
+        cache.clear()
+        cache_service.local.vider()
+
+        with self.assertNumQueries(1):
+            data = CacheStatistique.obtenir('NATIONAL', 'national', 'GENERAL')
+        self.assertEqual(data['total_bureaux'], 3)
+
+        with self.assertNumQueries(0):
+            CacheStatistique.obtenir('NATIONAL', 'national', 'GENERAL')
+
+    def test_invalidation_par_version(self):
+        """Une invalidation rend caduques les copies mémoire et Redis"""
+        CacheStatistique.obtenir('REGION', self.region.pk, 'GENERAL')
+        entree = CacheStatistique.objects.get(type_entite='REGION', entite_id=str(self.region.pk))
+
+        validation_service.valider_pv(self.pvs[0], self.admin)
+        entree.invalider()
+
+        data = CacheStatistique.obtenir('REGION', self.region.pk, 'GENERAL')
+        self.assertEqual(data['pv_valides'], 1)
+        entree.refresh_from_db()
+        self.assertEqual(entree.version, 3)
+        self.assertTrue(entree.is_valid)
+
+    def test_compteurs_acces_differes(self):
+        """Les accès sont comptés sans écriture, puis reportés en un UPDATE"""
+        CacheStatistique.obtenir('REGION', self.region.pk, 'GENERAL')
+        entree = CacheStatistique.objects.get(type_entite='REGION', entite_id=str(self.region.pk))
+
+        cache_service.local.vider()
+        for _ in range(3):
+            CacheStatistique.obtenir('REGION', self.region.pk, 'GENERAL')
+        entree.refresh_from_db()
+        self.assertEqual(entree.hit_count, 0)
+
+        with self.assertNumQueries(1):
+            cache_service.vider_acces()
+
+        entree.refresh_from_db()
+        self.assertEqual(entree.hit_count, 3)
+        self.assertIsNotNone(entree.last_accessed)
+
+    def _expirer(self, entree):
+        CacheStatistique.objects.filter(pk=entree.pk).update(date_expiration=timezone.now())
+        cache.clear()
+        cache_service.local.vider()
+
+    def test_entree_expiree_servie_perimee(self):
+        """Une entrée expirée est servie marquée stale et recalculée en tâche de fond"""
+        CacheStatistique.obtenir('REGION', self.region.pk, 'GENERAL')
+        entree = CacheStatistique.objects.get(type_entite='REGION', entite_id=str(self.region.pk))
+        self._expirer(entree)
+
+        data = CacheStatistique.obtenir('REGION', self.region.pk, 'GENERAL')
+        self.assertTrue(data['stale'])
+
+        # Recalcul programmé une seule fois : le verrou est tenu jusqu'à la tâche
+        entree.refresh_from_db()
+        self.assertEqual(entree.version, 1)
+        self.assertFalse(cache_service.revalider('REGION', self.region.pk, 'GENERAL'))
+
+        # La tâche, exécutée comme par le worker, recalcule, publie l'entrée et libère le verrou
+        rafraichir_cache_statistique.apply(args=['REGION', str(self.region.pk), 'GENERAL'])
+        entree.refresh_from_db()
+        self.assertEqual(entree.version, 2)
+        self.assertNotIn('stale', CacheStatistique.obtenir('REGION', self.region.pk, 'GENERAL'))
+
+    def test_recalcul_unique(self):
+        """Pendant le recalcul d'un autre worker, l'ancienne valeur est servie sans recalcul"""
+        CacheStatistique.obtenir('REGION', self.region.pk, 'GENERAL')
+        entree = CacheStatistique.objects.get(type_entite='REGION', entite_id=str(self.region.pk))
+        entree.invalider()
+        cache_service.local.vider()
+
+        cle = cache_service.cle('REGION', self.region.pk, 'GENERAL')
+        self.assertTrue(cache_service.acquerir_verrou(cle))
+        attente_max, cache_service.attente_max = cache_service.attente_max, 0.1
+        try:
+            data = CacheStatistique.obtenir('REGION', self.region.pk, 'GENERAL')
+        finally:
+            cache_service.attente_max = attente_max
+            cache_service.liberer_verrou(cle)
+
+        self.assertTrue(data['stale'])
+        entree.refresh_from_db()
+        self.assertFalse(entree.is_valid)
+
+    def test_invalidation_par_ascendance(self):
+        """Valider un PV invalide exactement son bureau, ses ancêtres et le national"""
+        autre_region = Region.objects.create(code_region='CPT02', nom_region='Autre')
+        for type_entite, entite_id in [
+            ('NATIONAL', 'national'), ('REGION', self.region.pk), ('REGION', autre_region.pk),
+            ('BUREAU_VOTE', self.bureaux[0].pk), ('BUREAU_VOTE', self.bureaux[1].pk),
+        ]:
+            CacheStatistique.obtenir(type_entite, entite_id, 'GENERAL')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            validation_service.valider_pv(self.pvs[0], self.admin)
+
+        invalides = set(
+            CacheStatistique.objects.filter(is_valid=False).values_list('type_entite', 'entite_id')
+        )
+        self.assertEqual(invalides, {
+            ('NATIONAL', 'national'), ('REGION', str(self.region.pk)),
+            ('BUREAU_VOTE', str(self.bureaux[0].pk)),
+        })
+
+    def test_invalidation_par_pattern_segmentee(self):
+        """Le pattern region_1 ne désigne pas region_10"""
+        for entite_id in ('1', '10'):
+            CacheStatistique.objects.create(
+                type_entite='REGION', entite_id=entite_id, type_statistique='GENERAL', data={}
+            )
+
+        self.assertEqual(CacheStatistique.invalider_par_pattern('region_1'), 1)
+        self.assertTrue(CacheStatistique.objects.get(entite_id='10').is_valid)
+
+    def test_rafraichissement_par_lots(self):
+        """Les caches expirés sont rafraîchis par lots prioritaires, bilan compris"""
+        for bureau in self.bureaux:
+            CacheStatistique.obtenir('BUREAU_VOTE', bureau.pk, 'GENERAL')
+        CacheStatistique.obtenir('REGION', self.region.pk, 'GENERAL')
+        CacheStatistique.objects.update(date_expiration=timezone.now())
+        for type_entite, entite_id, hit_count in [
+            ('BUREAU_VOTE', self.bureaux[2].pk, 50), ('BUREAU_VOTE', self.bureaux[0].pk, 20),
+            ('REGION', self.region.pk, 10),
+        ]:
+            CacheStatistique.objects.filter(
+                type_entite=type_entite, entite_id=str(entite_id)
+            ).update(hit_count=hit_count)
+
+        bureaux = [str(bureau.pk) for bureau in self.bureaux]
+        self.assertEqual(statistique_service.planifier_lots(taille_lot=2), [
+            ('BUREAU_VOTE', 'GENERAL', [bureaux[2], bureaux[0]]),
+            ('REGION', 'GENERAL', [str(self.region.pk)]),
+            ('BUREAU_VOTE', 'GENERAL', [bureaux[1]]),
+        ])
+
+        # Passage exécuté sur place, comme par les workers
+        with self.settings(STATISTIQUES_REFRESH_CONCURRENCE=2):
+            rafraichissement_par_lots(statistique_service.planifier_lots(taille_lot=2)).apply()
+
+        self.assertFalse(CacheStatistique.objects.expires().exists())
+        self.assertEqual(set(CacheStatistique.objects.values_list('version', flat=True)), {2})
+
+        bilan = LogRefreshStatistique.objects.get(cache_key='rafraichissement_global')
+        self.assertEqual(bilan.statut, 'SUCCESS')
+        self.assertEqual(bilan.metriques['lots'], 3)
+        self.assertEqual(bilan.metriques['succes'], 4)
+
+
+class CubeResultatsTestCase(StatistiquesTestCase):
+    """Tests du cube des résultats bureaux x candidats"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def _valider(self, pv):
+        with self.captureOnCommitCallbacks(execute=True):
+            validation_service.valider_pv(pv, self.admin)
+
+    def test_resultats_par_noeud(self):
+        """Les cumuls géographiques sont lus dans le cube, sans requête"""
+        for pv in self.pvs:
+            self._valider(pv)
+
+        resultats = self.region.stats_resultats_candidats
+        self.assertEqual([ligne['voix'] for ligne in resultats], [60, 20])
+        self.assertEqual(resultats[0]['pourcentage'], 75.0)
+
+        commune = self.bureaux[0].commune
+        with self.assertNumQueries(0):
+            self.assertEqual(commune.stats_resultats_candidats, resultats)
+            par_commune = cube_service.resultats_par('commune')
+
+        self.assertEqual(par_commune[commune.pk][self.candidats[1].pk], 20)
+        self.assertEqual(cube_service.resultats('region', 0), [])
+
+    def test_patch_a_la_validation(self):
+        """Valider un PV patche la ligne de son bureau au lieu de reconstruire le cube"""
+        self._valider(self.pvs[0])
+        self.assertEqual(cube_service.classement_national()[0]['total_voix'], 30)
+
+        with self.assertNumQueries(2):
+            cube_service.bureau_modifie(self.bureaux[1].pk)
+
+        self._valider(self.pvs[1])
+        with self.assertNumQueries(0):
+            classement = cube_service.classement_national()
+
+        self.assertEqual(
+            [(ligne['nom_complet'], ligne['total_voix'], ligne['nombre_bureaux']) for ligne in classement],
+            [('Candidat 0', 60, 2), ('Candidat 1', 20, 2)]
+        )
+
+    def test_rattrapage_par_journal(self):
+        """Un autre worker relit les seuls bureaux journalisés au lieu de reconstruire son cube"""
+        autre = CubeService()
+        self.assertEqual(autre.classement_national()[0]['total_voix'], 0)
+
+        self._valider(self.pvs[0])
+        self._valider(self.pvs[1])
+        with self.assertNumQueries(2):
+            classement = autre.classement_national()
+        self.assertEqual([ligne['total_voix'] for ligne in classement], [60, 20])
+        self.assertEqual(autre.participation('commune', self.bureaux[0].commune_id)['nombre_votants'], 100)
+
+        # Invalidation : pas d'entrée au journal, reconstruction complète
+        cube_service.invalider()
+        with self.assertNumQueries(4):
+            autre.cube()
+
+    def _publier(self):
+        """Exécute la publication programmée, comme le worker"""
+        self.assertTrue(cache.get(cube_service.CLE_PUBLICATION))
+        publier_cube_resultats.apply()
+
+    def test_snapshot_partage(self):
+        """Le cube publié est projeté en lecture seule et remplacé d'un bloc à la validation"""
+        with tempfile.TemporaryDirectory() as repertoire, \
+                override_settings(STATISTIQUES_CUBE_REPERTOIRE=repertoire):
+            self._valider(self.pvs[0])
+            self._publier()
+            premiere = os.readlink(os.path.join(repertoire, 'courant'))
+
+            # Deux "workers" projettent la même version, sans requête
+            autre = CubeService()
+            with self.assertNumQueries(0):
+                cube = autre.cube()
+                self.assertEqual(cube_service.cube().version, premiere)
+            self.assertEqual(cube.version, premiere)
+            self.assertIsInstance(cube.voix, np.memmap)
+            self.assertFalse(cube.voix.flags.writeable)
+            self.assertEqual(autre.participation()['nombre_votants'], 50)
+
+            self._valider(self.pvs[1])
+            self._publier()
+            self.assertNotEqual(os.readlink(os.path.join(repertoire, 'courant')), premiere)
+            self.assertEqual(autre.classement_national()[0]['total_voix'], 60)
+            self.assertEqual(autre.participation('region', self.region.pk)['taux_participation'], 50.0)
+
+    def test_premier_snapshot_en_tache_de_fond(self):
+        """Sans snapshot publié, la lecture sert le cube du worker et programme la publication"""
+        with tempfile.TemporaryDirectory() as repertoire, \
+                override_settings(STATISTIQUES_CUBE_REPERTOIRE=repertoire):
+            cube = cube_service.cube()
+            self.assertNotIsInstance(cube.voix, np.memmap)
+            self.assertFalse(os.path.exists(os.path.join(repertoire, 'courant')))
+
+            # Une fois la tâche exécutée, les lectures suivantes projettent le snapshot
+            self._publier()
+            self.assertTrue(os.path.exists(os.path.join(repertoire, 'courant')))
+            self.assertIsInstance(cube_service.cube().voix, np.memmap)
+
+
+class SnapshotTestCase(StatistiquesTestCase):
+    """Tests du constructeur vectorisé de snapshots"""
+
+    def test_snapshot_complet(self):
+        """Un snapshot remplit tous les champs, détails par région et classement compris"""
+        validation_service.valider_pv(self.pvs[0], self.admin)
+        incident_service.creer_incident(self.bureaux[0], self.superviseur, {
+            'categorie': 'AUTRE', 'priorite': 'BASSE', 'titre': 'Incident',
+            'description': 'Test', 'heure_incident': timezone.now(),
+        })
+
+        with self.assertNumQueries(6):
+            data = snapshot_service.construire()
+
+        self.assertEqual(data['total_bureaux'], 3)
+        self.assertEqual(data['total_inscrits'], 300)
+        self.assertEqual((data['total_pv_soumis'], data['total_pv_valides']), (2, 1))
+        self.assertEqual(data['taux_soumission'], 66.67)
+        self.assertEqual(data['taux_participation_global'], 16.67)
+        self.assertEqual((data['total_incidents'], data['incidents_actifs']), (1, 1))
+        self.assertEqual(
+            [(ligne['candidat__nom_complet'], ligne['total']) for ligne in data['resultats_snapshot']],
+            [('Candidat 0', 30), ('Candidat 1', 10)]
+        )
+
+        region, = data['details_regions']
+        self.assertEqual(region['code_region'], 'CPT01')
+        self.assertEqual(region['total_pv_valides'], 1)
+        self.assertEqual(region['resultats'][0]['pourcentage'], 75.0)
+
+    def test_snapshot_horaire(self):
+        """Les snapshots horaires coexistent avec le quotidien ; un même créneau est remplacé"""
+        quotidien = SnapshotQuotidien.creer_snapshot_aujourdhui()
+        horaire = SnapshotQuotidien.creer_snapshot_horaire()
+        self.assertEqual(SnapshotQuotidien.creer_snapshot_horaire().pk, horaire.pk)
+
+        self.assertEqual(horaire.granularite, 'HEURE')
+        self.assertEqual(horaire.horodatage.minute, 0)
+        self.assertEqual(quotidien.date, horaire.date)
+        self.assertEqual(SnapshotQuotidien.objects.count(), 2)
+
+    def test_serie_intra_horaire(self):
+        """Les points intra-horaires sont des écarts avec la base horaire, reconstruits à la lecture"""
+        debut = timezone.localtime().replace(hour=10, minute=0, second=0, microsecond=0)
+        base = snapshot_service.enregistrer_point(debut)
+        self.assertEqual(base.granularite, 'HEURE')
+
+        validation_service.valider_pv(self.pvs[0], self.admin)
+        premier = snapshot_service.enregistrer_point(debut + timedelta(minutes=7))
+        self.assertEqual(premier.horodatage.minute, 5)
+        self.assertEqual(premier.delta['total_pv_valides'], 1)
+        self.assertNotIn('total_bureaux', premier.delta)
+        self.assertEqual(premier.delta['voix'], {'1': 30, '2': 10})
+
+        validation_service.valider_pv(self.pvs[1], self.admin)
+        snapshot_service.enregistrer_point(debut + timedelta(minutes=10))
+        # La base a des points : elle n'est plus réécrite
+        self.assertEqual(snapshot_service.enregistrer('HEURE', debut).total_pv_valides, 0)
+
+        with self.assertNumQueries(2):
+            serie = snapshot_service.serie(debut, debut + timedelta(minutes=15))
+
+        self.assertEqual([point['total_pv_valides'] for point in serie], [0, 1, 2])
+        attendu = snapshot_service.construire()
+        for champ in ('taux_participation_global', 'resultats_snapshot', 'details_regions'):
+            self.assertEqual(serie[-1][champ], attendu[champ])
+        self.assertEqual(SnapshotDelta.objects.count(), 2)
+
+    def test_serie_demarree_en_cours_d_heure(self):
+        """Sans base horaire, le premier point est daté de son propre pas, pas du début d'heure"""
+        debut = timezone.localtime().replace(hour=14, minute=0, second=0, microsecond=0)
+        base = snapshot_service.enregistrer_point(debut + timedelta(minutes=37))
+        self.assertEqual(base.horodatage, debut + timedelta(minutes=35))
+        self.assertFalse(SnapshotQuotidien.objects.filter(horodatage=debut).exists())
+
+        validation_service.valider_pv(self.pvs[0], self.admin)
+        point = snapshot_service.enregistrer_point(debut + timedelta(minutes=40))
+        self.assertEqual(point.base_id, base.pk)
+        self.assertEqual(point.delta['total_pv_valides'], 1)
+
+        serie = snapshot_service.serie(debut, debut + timedelta(minutes=45))
+        self.assertEqual(
+            [(point['horodatage'].minute, point['total_pv_valides']) for point in serie], [(35, 0), (40, 1)]
+        )
+
+
+class TimelineTestCase(StatistiquesTestCase):
+    """Tests du moteur de timelines"""
+
+    def test_serie_complete(self):
+        """Une série a un point par période, vides compris, en une requête GROUP BY"""
+        ProcesVerbal.objects.filter(pk=self.pvs[1].pk).update(
+            date_soumission=timezone.now() - timedelta(days=3)
+        )
+
+        with self.assertNumQueries(1):
+            data = timeline_service.calculer(
+                'PV_SOUMISSIONS', timezone.now() - timedelta(days=6), timezone.now()
+            )
+
+        self.assertEqual([point['valeur'] for point in data['data_points']], [0, 0, 0, 1, 0, 0, 1])
+        self.assertEqual(data['data_points'][-1]['libelle'], timezone.localdate().strftime('%d/%m'))
+        self.assertEqual((data['total'], data['maximum']), (2, 1))
+        self.assertEqual(len(timeline_service.evolution('PV_SOUMISSIONS', 24, 'HEURE')), 24)
+
+    def test_types_et_perimetre(self):
+        """Validations, participation et incidents, sur un noeud quelconque"""
+        validation_service.valider_pv(self.pvs[0], self.admin)
+
+        def total(type_timeline, noeud=None):
+            return sum(p['valeur'] for p in timeline_service.evolution(type_timeline, 2, noeud=noeud))
+
+        self.assertEqual(total('PV_SOUMISSIONS', self.bureaux[0]), 1)
+        self.assertEqual(total('PV_SOUMISSIONS', self.bureaux[0].commune), 2)
+        self.assertEqual(total('PV_VALIDATIONS'), 1)
+        self.assertEqual(total('PARTICIPATION', self.region), 50)
+        self.assertEqual(total('INCIDENTS'), 0)
+
+        with self.assertRaises(ValueError):
+            timeline_service.evolution('RESULTATS', 7)
+
+    def test_cache_timeline(self):
+        """La série est mise en cache dans StatistiqueTimeline pour toute la période"""
+        timeline_service.evolution('PV_SOUMISSIONS', 7, noeud=self.region)
+
+        timeline = StatistiqueTimeline.objects.get()
+        self.assertEqual((timeline.perimetre, timeline.region), (f'region:{self.region.pk}', self.region))
+        self.assertEqual(timeline.total, 2)
+
+        with self.assertNumQueries(1):
+            points = timeline_service.evolution('PV_SOUMISSIONS', 7, noeud=self.region)
+        self.assertEqual(points, timeline.data_points)
+
+        # Entrée périmée recalculée : la même ligne est réécrite, jamais dupliquée
+        StatistiqueTimeline.objects.update(date_calcul=timezone.now() - timedelta(days=1))
+        validation_service.valider_pv(self.pvs[0], self.admin)
+        timeline_service.evolution('PV_SOUMISSIONS', 7, noeud=self.region)
+        self.assertEqual(StatistiqueTimeline.objects.get().pk, timeline.pk)
+
+    def _compteurs(self, granularite):
+        return dict(
+            CompteurTimeline.objects.filter(granularite=granularite, region=self.region).values_list(
+                'type_timeline', 'valeur'
+            )
+        )
+
+    def test_compteurs_incrementaux(self):
+        """Soumission, validation, incident et suppression mettent à jour les compteurs horaires"""
+        validation_service.valider_pv(self.pvs[0], self.admin)
+        Incident.objects.create(
+            bureau_vote=self.bureaux[1], superviseur=self.superviseur,
+            categorie='AUTRE', priorite='URGENTE', titre='Incident',
+            description='Test', heure_incident=timezone.now()
+        )
+        self.pvs[1].delete()
+
+        self.assertEqual(self._compteurs('HEURE'), {
+            'PV_SOUMISSIONS': 1, 'PV_VALIDATIONS': 1, 'PARTICIPATION': 50, 'INCIDENTS': 1
+        })
+
+        debut, fin = timezone.now() - timedelta(hours=5), timezone.now()
+        for type_timeline in ('PV_SOUMISSIONS', 'PARTICIPATION', 'INCIDENTS'):
+            with self.assertNumQueries(1):
+                data = timeline_service.lire_compteurs(type_timeline, debut, fin, 'HEURE', self.region)
+            attendu = timeline_service.calculer(type_timeline, debut, fin, 'HEURE', self.region)
+            self.assertEqual(data['data_points'], attendu['data_points'])
+
+    def test_compactage(self):
+        """Les compteurs horaires sortis de la fenêtre sont regroupés par jour"""
+        CompteurTimeline.objects.update(periode=timezone.now().replace(minute=0) - timedelta(days=4))
+
+        self.assertEqual(timeline_service.compacter(), 1)
+        self.assertEqual(self._compteurs('HEURE'), {})
+        self.assertEqual(self._compteurs('JOUR'), {'PV_SOUMISSIONS': 2})
+
+        points = timeline_service.lire_compteurs(
+            'PV_SOUMISSIONS', timezone.now() - timedelta(days=6), timezone.now()
+        )['data_points']
+        self.assertEqual([point['valeur'] for point in points], [0, 0, 2, 0, 0, 0, 0])
+
+        self.assertEqual(timeline_service.reconstruire_compteurs(), 1)
+        self.assertEqual(self._compteurs('HEURE'), {'PV_SOUMISSIONS': 2})
+
+
+class ExportTestCase(StatistiquesTestCase):
+    """Tests des exports asynchrones adressés par le contenu"""
+
+    def setUp(self):
+        super().setUp()
+        self.repertoire = tempfile.TemporaryDirectory()
+        self.addCleanup(self.repertoire.cleanup)
+        parametres = override_settings(STATISTIQUES_EXPORT_REPERTOIRE=self.repertoire.name)
+        parametres.enable()
+        self.addCleanup(parametres.disable)
+        validation_service.valider_pv(self.pvs[0], self.admin)
+
+    def _demander(self, contenu, format_export, noeud=None):
+        """Demande un export et exécute la tâche de génération, comme le worker"""
+        export, nouveau = export_service.demander(contenu, format_export, noeud, self.admin)
+        if nouveau:
+            generer_export.apply(args=[str(export.pk)])
+        export.refresh_from_db()
+        return export, nouveau
+
+    def test_formats(self):
+        """Le fichier est écrit par la tâche, dans chaque format"""
+        export, _ = self._demander('RESULTATS', 'CSV', self.region)
+        self.assertEqual((export.statut, export.nombre_lignes), ('TERMINE', 2))
+        with open(export_service.chemin(export), encoding='utf-8') as f:
+            lignes = f.read().splitlines()
+        self.assertEqual(lignes[0], 'code_bv,numero_ordre,candidat,parti,voix')
+        self.assertEqual(lignes[1:], ['CPTBV00,1,Candidat 0,,30', 'CPTBV00,2,Candidat 1,,10'])
+
+        export, _ = self._demander('PARTICIPATION', 'COLONNES')
+        colonnes = np.load(export_service.chemin(export))
+        self.assertEqual(list(colonnes['bloc_00000/votants']), [50])
+        self.assertEqual(colonnes['bloc_00000/date_validation'].dtype, np.dtype('M8[us]'))
+
+        for format_export in ('JSON', 'XLSX'):
+            export, _ = self._demander('PARTICIPATION', format_export, self.bureaux[0])
+            self.assertEqual((export.statut, export.nombre_lignes), ('TERMINE', 1))
+
+        with self.assertRaises(ValueError):
+            export_service.demander('RESULTATS', 'PARQUET')
+
+    def test_cache_par_empreinte(self):
+        """Une demande identique réutilise l'export tant que les données n'ont pas changé"""
+        export, nouveau = self._demander('PARTICIPATION', 'CSV')
+        self.assertTrue(nouveau)
+
+        with self.captureOnCommitCallbacks() as taches:
+            meme, nouveau = export_service.demander('PARTICIPATION', 'CSV')
+        self.assertEqual((meme.pk, nouveau, len(taches)), (export.pk, False, 0))
+
+        validation_service.valider_pv(self.pvs[1], self.admin)
+        autre, nouveau = self._demander('PARTICIPATION', 'CSV')
+        self.assertNotEqual(autre.pk, export.pk)
+        self.assertEqual(autre.nombre_lignes, 2)
+
+    def test_api(self):
+        """Demande, suivi et téléchargement par l'API"""
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            '/statistics/stats/export/',
+            {'contenu': 'participation', 'format': 'json', 'niveau': 'region', 'id': self.region.pk},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 202)
+
+        url = f"/statistics/stats/export/{response.json()['id']}/"
+        self.assertEqual(self.client.get(url).json()['statut'], 'EN_ATTENTE')
+        generer_export.apply(args=[response.json()['id']])
+        self.assertEqual(self.client.get(url).json()['statut'], 'TERMINE')
+
+        response = self.client.get(url + 'telecharger/')
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([ligne['code_bv'] for ligne in data], ['CPTBV00'])
+
+    def test_api_perimetre_national(self):
+        """Export national réservé aux Super Admins et au Back Office ; identifiant invalide : 404"""
+        export, _ = self._demander('PARTICIPATION', 'CSV')
+        url = f'/statistics/stats/export/{export.pk}/'
+
+        self.client.force_login(self.superviseur)
+        response = self.client.post(
+            '/statistics/stats/export/', {'contenu': 'participation', 'format': 'csv'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url + 'telecharger/').status_code, 403)
+
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get('/statistics/stats/export/abc/').status_code, 404)
@@ -10,7 +10,7 @@ from django.utils import timezone
 from datetime import timedelta
 
 from statistics.models import CacheStatistique, SnapshotQuotidien
-from statistics.services import StatistiqueService
+from statistics.services import StatistiqueService, cube_service, snapshot_service, timeline_service
 from geography.models import Region, BureauVote
 from pv.models import Candidat, ProcesVerbal, ResultatCandidat
 from incidents.models import Incident
@@ -23,6 +23,7 @@ def dashboard(request):
     service = StatistiqueService()
     
     # Déterminer le périmètre
+    noeud = None
     if user.role == 'SUPER_ADMIN':
         # Stats nationales
         titre = "Statistiques Nationales"
@@ -35,6 +36,7 @@ def dashboard(request):
     elif user.region:
         # Stats régionales
         titre = f"Statistiques - {user.region.nom_region}"
+        noeud = user.region
         data = CacheStatistique.obtenir('REGION', str(user.region.id), 'GENERAL')
         
         if not data:
@@ -43,6 +45,7 @@ def dashboard(request):
     elif user.bureau_vote:
         # Stats du bureau
         titre = f"Statistiques - {user.bureau_vote.code_bv}"
+        noeud = user.bureau_vote
         data = CacheStatistique.obtenir('BUREAU_VOTE', str(user.bureau_vote.id), 'GENERAL')
         
         if not data:
@@ -52,20 +55,11 @@ def dashboard(request):
         data = {}
         titre = "Statistiques"
     
-    # Évolution sur 7 jours (pour graphique)
-    date_fin = timezone.now()
-    date_debut = date_fin - timedelta(days=7)
-    
-    evolution = []
-    for i in range(7):
-        date = date_debut + timedelta(days=i)
-        count_pv = ProcesVerbal.objects.filter(
-            date_soumission__date=date.date()
-        ).count()
-        evolution.append({
-            'date': date.strftime('%d/%m'),
-            'pv': count_pv
-        })
+    # Évolution sur 7 jours (pour graphique), sur le périmètre affiché
+    evolution = [
+        {'date': point['libelle'], 'pv': point['valeur']}
+        for point in timeline_service.evolution('PV_SOUMISSIONS', 7, noeud=noeud)
+    ]
     
     context = {
         'titre': titre,
@@ -100,7 +94,7 @@ def stats_region(request, region_id):
     
     for dept in departements:
         bureaux = BureauVote.objects.filter(
-            lieu_vote__sous_prefecture__commune__departement=dept
+            departement=dept
         )
         
         pv_dept = ProcesVerbal.objects.filter(bureau_vote__in=bureaux)
@@ -118,8 +112,8 @@ def stats_region(request, region_id):
     
     # Top candidats dans la région
     top_candidats = ResultatCandidat.objects.filter(
-        proces_verbal__statut='VALIDE',
-        proces_verbal__bureau_vote__lieu_vote__sous_prefecture__commune__departement__region=region
+        pv__statut='VALIDE',
+        pv__region=region
     ).values(
         'candidat__nom_complet',
         'candidat__parti_politique'
@@ -154,7 +148,7 @@ def stats_national(request):
     
     for region in regions:
         bureaux = BureauVote.objects.filter(
-            lieu_vote__sous_prefecture__commune__departement__region=region
+            region=region
         )
         pv_region = ProcesVerbal.objects.filter(bureau_vote__in=bureaux)
         pv_valides = pv_region.filter(statut='VALIDE')
@@ -180,26 +174,22 @@ def stats_national(request):
             )
         })
     
-    # Top 10 candidats nationaux
-    top_candidats = ResultatCandidat.objects.filter(
-        proces_verbal__statut='VALIDE'
-    ).values(
-        'candidat__nom_complet',
-        'candidat__parti_politique',
-        'candidat__numero_ordre'
-    ).annotate(
-        total_voix=Sum('nombre_voix')
-    ).order_by('-total_voix')[:10]
+    # Top 10 candidats nationaux (cube des résultats)
+    top_candidats = [
+        {
+            'candidat__nom_complet': ligne['nom_complet'],
+            'candidat__parti_politique': ligne['parti_politique'],
+            'candidat__numero_ordre': ligne['numero_ordre'],
+            'total_voix': ligne['total_voix'],
+        }
+        for ligne in cube_service.classement_national()[:10]
+    ]
     
     # Évolution par jour (30 derniers jours)
-    evolution = []
-    for i in range(29, -1, -1):
-        date = timezone.now().date() - timedelta(days=i)
-        count_pv = ProcesVerbal.objects.filter(date_soumission__date=date).count()
-        evolution.append({
-            'date': date.strftime('%d/%m'),
-            'pv': count_pv
-        })
+    evolution = [
+        {'date': point['libelle'], 'pv': point['valeur']}
+        for point in timeline_service.evolution('PV_SOUMISSIONS', 30)
+    ]
     
     context = {
         'data': data,
@@ -239,17 +229,17 @@ def stats_candidat(request, candidat_id):
 @login_required
 def comparaison_candidats(request):
     """Comparaison des candidats"""
-    candidats = Candidat.objects.actifs().order_by('numero_ordre')
-    
-    # Résultats de chaque candidat
-    resultats_candidats = []
+    candidats = Candidat.objects.filter(est_actif=True).order_by('numero_ordre')
     
-    for candidat in candidats:
-        resultats_nationaux = candidat.get_resultats_nationaux()
-        resultats_candidats.append({
+    # Résultats nationaux de chaque candidat (cube des résultats)
+    classement = {ligne['id']: ligne for ligne in cube_service.classement_national()}
+    resultats_candidats = [
+        {
             'candidat': candidat,
-            'resultats': resultats_nationaux
-        })
+            'resultats': classement.get(candidat.id, {})
+        }
+        for candidat in candidats
+    ]
     
     context = {
         'resultats_candidats': resultats_candidats,
@@ -264,33 +254,44 @@ def tendances(request):
     if request.user.role != 'SUPER_ADMIN':
         return HttpResponseForbidden()
     
-    # Obtenir les snapshots des 30 derniers jours
-    date_limite = timezone.now().date() - timedelta(days=30)
-    snapshots = SnapshotQuotidien.objects.filter(
-        date__gte=date_limite
-    ).order_by('date')
+    if request.GET.get('granularite') == 'MINUTE':
+        # Série intra-horaire des dernières 24 heures (points reconstruits depuis leurs deltas)
+        snapshots = snapshot_service.serie(timezone.now() - timedelta(hours=24))
+        points = snapshots
+        format_date = '%H:%M'
+    else:
+        # Obtenir les snapshots des 30 derniers jours
+        date_limite = timezone.now().date() - timedelta(days=30)
+        snapshots = SnapshotQuotidien.objects.filter(
+            granularite='JOUR',
+            date__gte=date_limite
+        ).order_by('date')
+        points = [snapshot_service.donnees(snapshot) for snapshot in snapshots]
+        format_date = '%d/%m'
     
     # Préparer les données pour les graphiques
     evolution_pv = []
     evolution_participation = []
     evolution_incidents = []
     
-    for snapshot in snapshots:
+    for point in points:
+        date = timezone.localtime(point['horodatage']).strftime(format_date)
+        
         evolution_pv.append({
-            'date': snapshot.date.strftime('%d/%m'),
-            'soumis': snapshot.total_pv_soumis,
-            'valides': snapshot.total_pv_valides
+            'date': date,
+            'soumis': point['total_pv_soumis'],
+            'valides': point['total_pv_valides']
         })
         
         evolution_participation.append({
-            'date': snapshot.date.strftime('%d/%m'),
-            'taux': snapshot.taux_participation_global
+            'date': date,
+            'taux': point['taux_participation_global']
         })
         
         evolution_incidents.append({
-            'date': snapshot.date.strftime('%d/%m'),
-            'total': snapshot.total_incidents,
-            'actifs': snapshot.incidents_actifs
+            'date': date,
+            'total': point['total_incidents'],
+            'actifs': point['incidents_actifs']
         })
     
     context = {
@@ -9,17 +9,22 @@ from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from datetime import timedelta
+import os
+import uuid
 
 from statistics.models import (
     CacheStatistique, StatistiqueRegion, StatistiqueBureau,
     StatistiqueCandidat, StatistiqueTimeline, StatistiquePerformance,
-    SnapshotQuotidien
+    SnapshotQuotidien, ExportStatistique
 )
 from statistics.serializers import *
 from statistics.permissions import *
 from statistics.filters import *
-from statistics.services import StatistiqueService
+from statistics.services import (
+    StatistiqueService, compteur_service, export_service, snapshot_service, timeline_service
+)
 from geography.models import Region, BureauVote
+from geography.services.aggregation_service import MODELES_NIVEAUX
 from pv.models import Candidat
 
 
@@ -102,20 +107,65 @@ class CacheStatistiqueViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated, CanManageCache])
     def invalidate_pattern(self, request):
-        """Invalide tous les caches correspondant à un pattern"""
+        """
+        Invalide des caches, au choix :
+        - par dimensions : type_entite, entite_id et/ou type_statistique ;
+        - par ascendance : bureau_vote (le bureau, ses ancêtres et le national),
+          éventuellement restreint à un type_statistique ;
+        - par pattern : préfixe de clé, segment par segment
+        """
         pattern = request.data.get('pattern')
-        
-        if not pattern:
+        bureau_vote = request.data.get('bureau_vote')
+        type_entite = request.data.get('type_entite')
+        entite_id = request.data.get('entite_id')
+        type_statistique = request.data.get('type_statistique')
+        
+        types_entite = dict(CacheStatistique.TYPE_ENTITE_CHOICES)
+        types_statistique = dict(CacheStatistique.TYPE_STATISTIQUE_CHOICES)
+        if type_entite and type_entite not in types_entite:
             return Response({
                 'status': 'error',
-                'message': 'Le paramètre "pattern" est requis'
+                'message': f'type_entite invalide: {type_entite}'
             }, status=status.HTTP_400_BAD_REQUEST)
+        if type_statistique and type_statistique not in types_statistique:
+            return Response({
+                'status': 'error',
+                'message': f'type_statistique invalide: {type_statistique}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if bureau_vote:
+            if not str(bureau_vote).isdigit() or not BureauVote.objects.filter(pk=bureau_vote).exists():
+                return Response({
+                    'status': 'error',
+                    'message': 'Bureau de vote introuvable'
+                }, status=status.HTTP_404_NOT_FOUND)
+            total = CacheStatistique.invalider_ascendance(bureau_vote, type_statistique)
+            description = f'le bureau {bureau_vote} et ses ancêtres'
+        
+        elif type_entite or entite_id or type_statistique:
+            total = CacheStatistique.invalider_par_dimensions(type_entite, entite_id, type_statistique)
+            description = ', '.join(
+                f'{nom}={valeur}' for nom, valeur in [
+                    ('type_entite', type_entite), ('entite_id', entite_id),
+                    ('type_statistique', type_statistique)
+                ] if valeur
+            )
         
-        CacheStatistique.invalider_par_pattern(pattern)
+        elif pattern:
+            total = CacheStatistique.invalider_par_pattern(pattern)
+            description = f'le pattern: {pattern}'
+        
+        else:
+            return Response({
+                'status': 'error',
+                'message': 'Indiquer "pattern", "bureau_vote" ou au moins une dimension '
+                           '("type_entite", "entite_id", "type_statistique")'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'status': 'success',
-            'message': f'Caches invalidés pour le pattern: {pattern}'
+            'message': f'{total} cache(s) invalidé(s) pour {description}',
+            'total': total
         })
     
     @action(detail=False, methods=['get'])
@@ -191,15 +241,10 @@ class StatistiqueViewSet(viewsets.ViewSet):
                 }, status=status.HTTP_403_FORBIDDEN)
         
         try:
-            region = Region.objects.get(id=region_id)
-            data = CacheStatistique.obtenir('REGION', str(region_id), 'GENERAL')
-            
-            serializer = StatsRegionDetailSerializer({
-                'region': region,
-                **data
-            })
+            # Ligne dénormalisée maintenue par deltas : lecture par clé
+            statistiques = compteur_service.statistique_region(region_id)
             
-            return Response(serializer.data)
+            return Response(StatistiqueRegionSerializer(statistiques).data)
         
         except Region.DoesNotExist:
             return Response({
@@ -223,11 +268,11 @@ class StatistiqueViewSet(viewsets.ViewSet):
                     'message': 'Accès non autorisé à ce bureau'
                 }, status=status.HTTP_403_FORBIDDEN)
             
-            data = CacheStatistique.obtenir('BUREAU_VOTE', str(bureau_id), 'GENERAL')
+            statistiques = compteur_service.statistique_bureau(bureau.id)
             
             return Response({
                 'bureau': BureauVoteSerializer(bureau).data,
-                'statistiques': data
+                'statistiques': StatistiqueBureauSerializer(statistiques).data
             })
         
         except BureauVote.DoesNotExist:
@@ -244,7 +289,7 @@ class StatistiqueViewSet(viewsets.ViewSet):
         """
         try:
             candidat = Candidat.objects.get(id=candidat_id)
-            data = CacheStatistique.obtenir('CANDIDAT', str(candidat_id), 'RESULTATS')
+            statistiques = compteur_service.statistique_candidat(candidat.id)
             
             return Response({
                 'candidat': {
@@ -253,7 +298,7 @@ class StatistiqueViewSet(viewsets.ViewSet):
                     'parti': candidat.parti_politique,
                     'numero_ordre': candidat.numero_ordre
                 },
-                'resultats': data
+                'resultats': StatistiqueCandidatSerializer(statistiques).data
             })
         
         except Candidat.DoesNotExist:
@@ -262,26 +307,72 @@ class StatistiqueViewSet(viewsets.ViewSet):
                 'message': 'Candidat non trouvé'
             }, status=status.HTTP_404_NOT_FOUND)
     
+    def _noeud(self, request, niveau, noeud_id):
+        """
+        Noeud géographique demandé (None pour le national) et réponse d'erreur
+        éventuelle : niveau inconnu (400), noeud introuvable (404), hors périmètre (403)
+        """
+        if not niveau or niveau == 'national':
+            return None, self._refus_national(request)
+        
+        modeles = {nom: modele for modele, nom in MODELES_NIVEAUX.items()}
+        if niveau not in modeles:
+            return None, Response({
+                'status': 'error',
+                'message': f'Niveau géographique inconnu: {niveau}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        noeud_id = str(noeud_id)
+        noeud = modeles[niveau].objects.filter(id=noeud_id).first() if noeud_id.isdigit() else None
+        if noeud is None:
+            return None, Response({
+                'status': 'error',
+                'message': 'Noeud géographique non trouvé'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        if not request.user.peut_voir_noeud(noeud):
+            return None, Response({
+                'status': 'error',
+                'message': 'Accès non autorisé à ce périmètre'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        return noeud, None
+    
+    def _refus_national(self, request):
+        """Réponse 403 si l'utilisateur n'a pas accès au périmètre national, None sinon"""
+        if CanViewNationalStatistics().has_permission(request, self):
+            return None
+        return Response({
+            'status': 'error',
+            'message': 'Accès réservé aux Super Admins et au Back Office'
+        }, status=status.HTTP_403_FORBIDDEN)
+    
     @action(detail=False, methods=['get'])
     def timeline(self, request):
         """
-        Timeline des événements
-        GET /api/statistics/timeline/?type=PV_SOUMISSIONS&jours=7
+        Timeline des événements, périodes vides comprises
+        GET /api/statistics/timeline/?type=PV_SOUMISSIONS&jours=7&granularite=HEURE
+        GET /api/statistics/timeline/?type=INCIDENTS&granularite=JOUR&niveau=commune&id=12
         """
         type_timeline = request.query_params.get('type', 'PV_SOUMISSIONS')
+        granularite = request.query_params.get('granularite', 'HEURE')
         jours = int(request.query_params.get('jours', 7))
         
+        noeud, erreur = self._noeud(
+            request, request.query_params.get('niveau'), request.query_params.get('id', '')
+        )
+        if erreur:
+            return erreur
+        
         date_fin = timezone.now()
         date_debut = date_fin - timedelta(days=jours)
         
-        service = StatistiqueService()
-        
-        if type_timeline == 'PV_SOUMISSIONS':
-            data = service.calculer_timeline_soumissions_pv(date_debut, date_fin)
-        else:
+        try:
+            data = timeline_service.obtenir(type_timeline, date_debut, date_fin, granularite, noeud)
+        except ValueError as e:
             return Response({
                 'status': 'error',
-                'message': f'Type de timeline non supporté: {type_timeline}'
+                'message': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
         
         return Response(data)
@@ -320,26 +411,101 @@ class StatistiqueViewSet(viewsets.ViewSet):
         serializer = ComparaisonRegionsSerializer(comparaisons, many=True)
         return Response(serializer.data)
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['post'])
     def export(self, request):
         """
-        Export des statistiques en différents formats
-        GET /api/statistics/export/?format=csv&type=region&region_id=xxx
+        Demande d'export des statistiques, généré en tâche de fond
+        POST /api/statistics/export/
+        {"contenu": "RESULTATS", "format": "csv", "niveau": "region", "id": 12}
+        
+        contenu : PARTICIPATION, RESULTATS, INCIDENTS
+        format : json, csv, xlsx, colonnes (archive .npz de colonnes typées)
+        Une demande identique sur des données inchangées renvoie l'export existant
         """
-        format_export = request.query_params.get('format', 'json')
+        noeud, erreur = self._noeud(request, request.data.get('niveau'), request.data.get('id', ''))
+        if erreur:
+            return erreur
         
-        if format_export not in ['json', 'csv', 'excel']:
+        try:
+            export, nouveau = export_service.demander(
+                str(request.data.get('contenu', 'PARTICIPATION')).upper(),
+                str(request.data.get('format', 'json')).upper(),
+                noeud,
+                request.user
+            )
+        except ValueError as e:
             return Response({
                 'status': 'error',
-                'message': 'Format non supporté. Utilisez: json, csv, excel'
+                'message': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # TODO: Implémenter l'export selon le format
+        return Response(
+            ExportStatistiqueSerializer(export).data,
+            status=status.HTTP_202_ACCEPTED if export.statut != 'TERMINE' else status.HTTP_200_OK
+        )
+    
+    def _export(self, request, export_id):
+        """Export demandé et réponse d'erreur éventuelle (introuvable, hors périmètre)"""
+        try:
+            export = ExportStatistique.objects.filter(id=uuid.UUID(export_id)).first()
+        except ValueError:
+            export = None
+        if export is None:
+            return None, Response({
+                'status': 'error',
+                'message': 'Export non trouvé'
+            }, status=status.HTTP_404_NOT_FOUND)
         
-        return Response({
-            'status': 'not_implemented',
-            'message': 'Export à implémenter'
-        }, status=status.HTTP_501_NOT_IMPLEMENTED)
+        if export.niveau == 'national':
+            refus = self._refus_national(request)
+            return (None, refus) if refus else (export, None)
+
+        noeud = export_service.noeud(export)
+        if noeud is None or not request.user.peut_voir_noeud(noeud):
+            return None, Response({
+                'status': 'error',
+                'message': 'Accès non autorisé à ce périmètre'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        return export, None
+    
+    @action(detail=False, methods=['get'], url_path='export/(?P<export_id>[0-9a-f-]+)')
+    def export_statut(self, request, export_id=None):
+        """
+        Suivi d'un export (statut, lignes écrites)
+        GET /api/statistics/export/<id>/
+        """
+        export, erreur = self._export(request, export_id)
+        if erreur:
+            return erreur
+        
+        return Response(ExportStatistiqueSerializer(export).data)
+    
+    @action(detail=False, methods=['get'], url_path='export/(?P<export_id>[0-9a-f-]+)/telecharger')
+    def export_telecharger(self, request, export_id=None):
+        """
+        Téléchargement d'un export terminé
+        GET /api/statistics/export/<id>/telecharger/
+        """
+        from django.http import FileResponse
+        
+        export, erreur = self._export(request, export_id)
+        if erreur:
+            return erreur
+        
+        chemin = export_service.chemin(export)
+        if export.statut != 'TERMINE' or not os.path.exists(chemin):
+            return Response({
+                'status': 'error',
+                'message': f"Export non disponible (statut: {export.statut})"
+            }, status=status.HTTP_409_CONFLICT)
+        
+        nom = f'statistiques_{export.contenu}_{export.niveau}'.lower()
+        if export.entite_id:
+            nom = f'{nom}_{export.entite_id}'
+        return FileResponse(
+            open(chemin, 'rb'), as_attachment=True, filename=f'{nom}.{export.fichier.rsplit(".", 1)[1]}'
+        )
 
 
 # ============================================================
@@ -423,50 +589,66 @@ class SnapshotQuotidienViewSet(viewsets.ReadOnlyModelViewSet):
     def tendances(self, request):
         """
         Analyse des tendances sur une période
-        GET /api/statistics/snapshots/tendances/?jours=30
+        GET /api/statistics/snapshots/tendances/?jours=30&granularite=HEURE
+        GET /api/statistics/snapshots/tendances/?heures=6&granularite=MINUTE (série intra-horaire)
         """
         jours = int(request.query_params.get('jours', 30))
-        date_limite = timezone.now().date() - timedelta(days=jours)
-        
-        snapshots = self.get_queryset().filter(date__gte=date_limite).order_by('date')
+        granularite = request.query_params.get('granularite', 'JOUR')
         
-        if not snapshots.exists():
+        if granularite == 'MINUTE':
+            heures = int(request.query_params.get('heures', 24))
+            points = snapshot_service.serie(timezone.now() - timedelta(hours=heures))
+            serie = points
+        else:
+            date_limite = timezone.now().date() - timedelta(days=jours)
+            snapshots = list(self.get_queryset().filter(
+                granularite=granularite, date__gte=date_limite
+            ).order_by('horodatage'))
+            points = [snapshot_service.donnees(snapshot) for snapshot in snapshots]
+            serie = SnapshotQuotidienSerializer(snapshots, many=True).data
+        
+        if not points:
             return Response({
                 'status': 'error',
                 'message': 'Aucun snapshot trouvé pour cette période'
             }, status=status.HTTP_404_NOT_FOUND)
         
         # Calculer les tendances
-        premier = snapshots.first()
-        dernier = snapshots.last()
+        premier = points[0]
+        dernier = points[-1]
         
-        tendances = {
-            'periode': {
-                'debut': premier.date,
-                'fin': dernier.date,
+        if granularite == 'MINUTE':
+            periode = {'debut': premier['horodatage'], 'fin': dernier['horodatage'], 'heures': heures}
+        else:
+            periode = {
+                'debut': timezone.localdate(premier['horodatage']),
+                'fin': timezone.localdate(dernier['horodatage']),
                 'jours': jours
-            },
+            }
+        
+        tendances = {
+            'periode': periode,
             'evolution': {
                 'pv_soumis': {
-                    'debut': premier.total_pv_soumis,
-                    'fin': dernier.total_pv_soumis,
-                    'variation': dernier.total_pv_soumis - premier.total_pv_soumis,
+                    'debut': premier['total_pv_soumis'],
+                    'fin': dernier['total_pv_soumis'],
+                    'variation': dernier['total_pv_soumis'] - premier['total_pv_soumis'],
                     'variation_pct': round(
-                        ((dernier.total_pv_soumis - premier.total_pv_soumis) / premier.total_pv_soumis * 100), 2
-                    ) if premier.total_pv_soumis > 0 else 0
+                        ((dernier['total_pv_soumis'] - premier['total_pv_soumis']) / premier['total_pv_soumis'] * 100), 2
+                    ) if premier['total_pv_soumis'] > 0 else 0
                 },
                 'participation': {
-                    'debut': premier.taux_participation_global,
-                    'fin': dernier.taux_participation_global,
-                    'variation': round(dernier.taux_participation_global - premier.taux_participation_global, 2)
+                    'debut': premier['taux_participation_global'],
+                    'fin': dernier['taux_participation_global'],
+                    'variation': round(dernier['taux_participation_global'] - premier['taux_participation_global'], 2)
                 },
                 'incidents': {
-                    'debut': premier.total_incidents,
-                    'fin': dernier.total_incidents,
-                    'variation': dernier.total_incidents - premier.total_incidents
+                    'debut': premier['total_incidents'],
+                    'fin': dernier['total_incidents'],
+                    'variation': dernier['total_incidents'] - premier['total_incidents']
                 }
             },
-            'snapshots': SnapshotQuotidienSerializer(snapshots, many=True).data
+            'snapshots': serie
         }
         
         return Response(tendances)
\ No newline at end of file